@@ -0,0 +1,8 @@
+"""benchmarks for the NG911 validation tools using synthetic counties, these do not need arcpy.
+
+Run from the repository root:
+
+    python -m benchmarks --sizes 1000 10000 100000 1000000
+    python -m benchmarks --sizes 10000 --compare benchmarks/results/benchmark_<timestamp>.json
+    python -m benchmarks.lines --sizes 10000 100000
+"""
@@ -0,0 +1,20 @@
+import argparse
+import json
+from .suite import run_benchmarks, compare_results, DEFAULT_SIZES, DEFAULT_MAX_QUERIES
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='times the NG911 validation tools against synthetic counties')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='the number of address points for each county')
+    parser.add_argument('--seed', type=int, default=0, help='the random seed for the synthetic counties')
+    parser.add_argument('--error-rates', type=json.loads, default=None, help='JSON object of error kind to share of points, e.g. {"wrong_parity": 0.05}')
+    parser.add_argument('--max-queries', type=int, default=DEFAULT_MAX_QUERIES, help='the most points used for point by point lookups, 0 for every point')
+    parser.add_argument('--output', help='the JSON file for the results, defaults to benchmarks/results/benchmark_<timestamp>.json')
+    parser.add_argument('--compare', help='an earlier results file to compare against')
+    args = parser.parse_args()
+
+    run = run_benchmarks(args.sizes, args.seed, args.error_rates, args.max_queries or None, args.output)
+    if args.compare:
+        compare_results(args.compare, run.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""micro-benchmark for the batch line helpers against calling the per line helpers in a loop.
+
+Run from the repository root:
+
+    python -m benchmarks.lines --sizes 10000 100000
+"""
+import argparse
+import random
+import numpy as np
+from collections import namedtuple
+from typing import List
+from ilng911.support.munch import Munch
+from ilng911.spatial.lines import (
+    line_dir, get_angle, midpoint, extended_xy, quadrant_bearing,
+    line_dirs, get_angles, midpoints, extended_coords, quadrant_bearings
+)
+from .suite import timed
+
+DEFAULT_LINE_SIZES = [10000, 100000]
+
+# distance the lines are extended by
+EXTEND_DISTANCE = 10.0
+
+# stand ins for arcpy.Point and arcpy.Polyline, the per line helpers only use these attributes
+Point = namedtuple('Point', ['X', 'Y'])
+Line = namedtuple('Line', ['firstPoint', 'lastPoint'])
+
+def random_lines(size: int, seed: int=0) -> Munch:
+    """random two point lines, as objects for the per line helpers and as arrays for the batch helpers"""
+    rand = random.Random(seed)
+    coords = [(rand.uniform(0, 1e6), rand.uniform(0, 1e6), rand.uniform(0, 1e6), rand.uniform(0, 1e6)) for _ in range(size)]
+    array = np.array(coords, dtype=np.float64).reshape(-1, 4)
+    return Munch(
+        lines=[Line(Point(x1, y1), Point(x2, y2)) for x1, y1, x2, y2 in coords],
+        first=array[:, :2],
+        last=array[:, 2:]
+    )
+
+def run_line_benchmarks(sizes: List[int]=DEFAULT_LINE_SIZES, seed: int=0) -> List[Munch]:
+    """times each helper for every line in a loop and in one batch call
+
+    Args:
+        sizes (List[int], optional): the number of lines. Defaults to DEFAULT_LINE_SIZES.
+        seed (int, optional): the random seed. Defaults to 0.
+
+    Returns:
+        List[Munch]: the loop and batch results, the batch results have the speedup
+    """
+    results = []
+    print(f'{"benchmark":<24}{"size":>10}{"count":>10}{"elapsed":>13}{"per item":>16}')
+    for size in sizes:
+        data = random_lines(size, seed)
+        lines, first, last = data.lines, data.first, data.last
+        helpers = [
+            ('line_dir', lambda: [line_dir(l) for l in lines], lambda: line_dirs(first, last)),
+            ('get_angle', lambda: [get_angle(l.firstPoint, l.lastPoint) for l in lines], lambda: get_angles(first, last)),
+            ('midpoint', lambda: [midpoint(l.firstPoint, l.lastPoint) for l in lines], lambda: midpoints(first, last)),
+            ('extended_coord', lambda: [extended_xy(l.firstPoint, l.lastPoint, EXTEND_DISTANCE) for l in lines],
+                               lambda: extended_coords(first, last, EXTEND_DISTANCE)),
+            ('quadrant_bearing', lambda: [quadrant_bearing(l) for l in lines], lambda: quadrant_bearings(first, last)),
+        ]
+        for name, loop, batch in helpers:
+            looped = timed(f'{name}_loop', size, size, loop)
+            batched = timed(f'{name}_batch', size, size, batch)
+            looped.pop('output')
+            batched.pop('output')
+            batched.speedup = round(looped.seconds / batched.seconds, 1) if batched.seconds else None
+            results.extend([looped, batched])
+    print()
+    for r in results:
+        if r.get('speedup'):
+            print(f'{r.benchmark[:-6]:<24}{r.size:>10,}{r.speedup:>10.1f}x')
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.lines', description='times the batch line helpers against the per line helpers')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_LINE_SIZES, help='the number of lines')
+    parser.add_argument('--seed', type=int, default=0, help='the random seed for the lines')
+    args = parser.parse_args()
+    run_line_benchmarks(args.sizes, args.seed)
+
+if __name__ == '__main__':
+    main()
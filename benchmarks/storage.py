@@ -0,0 +1,111 @@
+"""a local stand-in for the NG911 geodatabase, so feature commits can be timed without arcpy.
+
+The tables keep the same shape as the arcpy.da cursors (a list of fields with rows of values)
+and MemoryWorkspace.commit_features() follows the same steps as DataSchema.commit_features():
+insert into a temporary copy, append to the target table and then create NENA identifiers for
+the rows that do not have one.
+"""
+import datetime
+from typing import List, Dict, Iterable, Callable, Any
+
+class MemoryTable:
+    """an in memory table with an auto incrementing OBJECTID"""
+    def __init__(self, name: str, fields: List[str], oidField: str='OBJECTID'):
+        self.name = name
+        self.oidField = oidField
+        self.fields = [oidField] + [f for f in fields if f != oidField]
+        self.rows: List[list] = []
+        self._nextOID = 1
+
+    def __len__(self):
+        return len(self.rows)
+
+    def insert_rows(self, fields: List[str], rows: Iterable[list]) -> int:
+        """inserts rows, like an arcpy.da.InsertCursor
+
+        Args:
+            fields (List[str]): the fields for the row values
+            rows (Iterable[list]): the row values
+
+        Returns:
+            int: the number of rows inserted
+        """
+        positions = [self.fields.index(f) for f in fields]
+        count = 0
+        for values in rows:
+            row = [None] * len(self.fields)
+            row[0] = self._nextOID
+            for pos, v in zip(positions, values):
+                if pos:
+                    row[pos] = v
+            self.rows.append(row)
+            self._nextOID += 1
+            count += 1
+        return count
+
+    def update_rows(self, fields: List[str], func: Callable[[list], list], where: Callable[[list], bool]=None) -> int:
+        """updates rows, like an arcpy.da.UpdateCursor
+
+        Args:
+            fields (List[str]): the fields passed to the update function
+            func (Callable[[list], list]): returns the new values for the fields
+            where (Callable[[list], bool], optional): a filter for the rows to update, it receives
+                the full row. Defaults to None.
+
+        Returns:
+            int: the number of rows updated
+        """
+        positions = [self.fields.index(f) for f in fields]
+        count = 0
+        for row in self.rows:
+            if where and not where(row):
+                continue
+            for pos, v in zip(positions, func([row[p] for p in positions])):
+                row[pos] = v
+            count += 1
+        return count
+
+    def append_from(self, other: 'MemoryTable') -> int:
+        """appends every row from another table with the same fields, like arcpy.management.Append"""
+        return self.insert_rows(other.fields[1:], (row[1:] for row in other.rows))
+
+
+class MemoryWorkspace:
+    """a set of MemoryTables with a NENA identifier sequence for each table"""
+    def __init__(self, agencyID: str):
+        self.agencyID = agencyID
+        self.tables: Dict[str, MemoryTable] = {}
+        self.nenaIds: Dict[str, int] = {}
+
+    def create_table(self, name: str, fields: List[str]) -> MemoryTable:
+        """creates an empty table"""
+        self.tables[name] = MemoryTable(name, fields)
+        return self.tables[name]
+
+    def get_next_nena_id(self, name: str) -> int:
+        self.nenaIds[name] = self.nenaIds.get(name, 0) + 1
+        return self.nenaIds[name]
+
+    def commit_features(self, name: str, features: List[Dict[str, Any]], nenaField: str, prefix: str) -> int:
+        """commits new features to a table
+
+        Args:
+            name (str): the table name
+            features (List[Dict[str, Any]]): the feature attributes, including SHAPE@
+            nenaField (str): the NENA identifier field
+            prefix (str): the NENA identifier prefix
+
+        Returns:
+            int: the number of features committed
+        """
+        table = self.tables[name]
+        editable = [f for f in table.fields if f != table.oidField]
+        temp = MemoryTable(f'temp_{name}', editable)
+        count = temp.insert_rows(editable, ([ft.get(f) for f in editable] for ft in features))
+        table.append_from(temp)
+
+        today = datetime.datetime.now().date()
+        create = lambda row: [f'{prefix}{self.get_next_nena_id(name)}@{self.agencyID}', today]
+        pos = table.fields.index(nenaField)
+        table.update_rows([nenaField, 'DateUpdate'], create, lambda row: row[pos] is None)
+        return count
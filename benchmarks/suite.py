@@ -0,0 +1,299 @@
+"""times the validation tools against synthetic counties, see run_benchmarks()"""
+import os
+import sys
+import json
+import math
+import time
+import platform
+import tempfile
+import datetime
+from typing import List, Dict, Callable, Any
+from ilng911.support.munch import Munch
+from ilng911.core.fields import ADDRESS_FIELDS
+from ilng911.core.rules import get_default_rules
+from ilng911.core.bulk import BulkAddressValidator
+from ilng911.core.centerlines import CenterlineIndex
+from ilng911.core.streets import FULL_STREET_FIELDS
+from ilng911.core.geocoder import AddressGeocoder, MATCH_STATUS
+from ilng911.core.reverse import ReverseGeocoder
+from ilng911.core.topology import check_road_topology
+from ilng911.core.ranges import find_range_conflicts
+from ilng911.spatial.polylines import PolylineStore
+from ilng911.core.overlays import OverlayLayer, OverlayCache, ZipCodeService
+from ilng911.core.refresh import AddressOverlayRefresher
+from .synthetic import generate_county, DEFAULT_ERROR_RATES, ERROR_FLAGS, ADDRESS_POINT_FIELDS, AGENCY_ID, ADDRESS_PREFIX
+from .storage import MemoryWorkspace
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+# point by point lookups are timed on an evenly spaced sample of the address points
+DEFAULT_MAX_QUERIES = 100000
+
+# search distance (in feet) for the unfiltered closest centerline search, like find_closest_centerlines
+CENTERLINE_SEARCH_DISTANCE = 3000
+
+# first search distance (in feet) for the centerlines of an address street, like validate_address
+STREET_SEARCH_DISTANCE = 600
+
+RESULTS_FOLDER = os.path.join(os.path.dirname(__file__), 'results')
+
+def timed(benchmark: str, size: int, count: int, func: Callable[[], Any], **extra) -> Munch:
+    """runs a function once and records the elapsed time
+
+    Args:
+        benchmark (str): the benchmark name
+        size (int): the number of address points in the county
+        count (int): the number of items the function processes
+        func (Callable[[], Any]): the function to time
+
+    Returns:
+        Munch: the result, the output of the function is kept in the "output" key
+    """
+    st = time.perf_counter()
+    output = func()
+    seconds = time.perf_counter() - st
+    result = Munch(
+        benchmark=benchmark,
+        size=size,
+        count=count,
+        seconds=round(seconds, 6),
+        microsecondsPerItem=round(seconds / count * 1e6, 3) if count else None,
+        **extra
+    )
+    print(f'{benchmark:<24}{size:>10,}{count:>10,}{seconds:>12.3f}s{result.microsecondsPerItem or 0:>14.1f}us')
+    result.output = output
+    return result
+
+def sample_indices(size: int, maxQueries: int=None) -> List[int]:
+    """evenly spaced record indices, at most maxQueries"""
+    step = max(1, math.ceil(size / maxQueries)) if maxQueries else 1
+    return list(range(0, size, step))
+
+def check_errors(county: Munch, results: List[Munch]) -> Dict[str, int]:
+    """counts the synthetic errors that did not raise their validation flag"""
+    flagsByOid = {r.oid: r.flags for r in results}
+    return {
+        kind: sum(1 for oid in oids if not flagsByOid[oid].get(ERROR_FLAGS[kind]))
+        for kind, oids in county.errors.items()
+    }
+
+def run_size(size: int, seed: int=0, errorRates: Dict[str, float]=None, maxQueries: int=DEFAULT_MAX_QUERIES) -> List[Munch]:
+    """runs every benchmark for a county with a number of address points
+
+    Args:
+        size (int): the number of address points
+        seed (int, optional): the random seed for the county. Defaults to 0.
+        errorRates (Dict[str, float], optional): the share of points with each kind of error. Defaults to None.
+        maxQueries (int, optional): the most points to use for point by point lookups. Defaults to DEFAULT_MAX_QUERIES.
+
+    Returns:
+        List[Munch]: the benchmark results
+    """
+    results = []
+    def record(result: Munch) -> Any:
+        results.append(result)
+        return result.pop('output')
+
+    county = record(timed('generate_county', size, size, lambda: generate_county(size, seed, errorRates)))
+    roads, addresses, overlays = county.roads, county.addresses, county.overlays
+    results[-1].update(roads=len(roads), blocks=list(county.blocks))
+
+    # validate_address checks for every point in one pass
+    validator = record(timed('index_centerlines', size, len(roads), lambda: BulkAddressValidator(roads, rules=get_default_rules())))
+    validated = record(timed('validate_addresses', size, len(addresses), lambda: validator.validate(addresses)))
+    missed = check_errors(county, validated)
+    results[-1].update(
+        flagged=sum(1 for r in validated if r.flags.FLAG_COUNT),
+        errors=sum(len(oids) for oids in county.errors.values()),
+        missedErrors=sum(missed.values())
+    )
+
+    # side of the street, range and parity for every matched point in one vectorized pass
+    xs = [s[0] for s in addresses.shapes]
+    ys = [s[1] for s in addresses.shapes]
+    roadIndices = [roads.oidIndex.get(r.roadOID) for r in validated]
+    record(timed('segment_arrays', size, len(roads), lambda: validator.segments))
+    record(timed('range_and_parity', size, len(addresses), lambda: validator.range_and_parity(xs, ys, roadIndices)))
+
+    # closest centerline to a point regardless of street name
+    indices = sample_indices(len(addresses), maxQueries)
+    maxDistance = roads.from_feet(CENTERLINE_SEARCH_DISTANCE)
+    shapes = [addresses.shapes[i] for i in indices]
+    def centerline_search():
+        return sum(1 for x, y in shapes if validator.index.nearest(x, y, maxDistance)[0] is not None)
+    found = record(timed('centerline_search', size, len(shapes), centerline_search))
+    results[-1].update(found=found)
+
+    # the k closest distinct streets, like find_closest_centerlines on each Create Address Point click
+    centerlines = CenterlineIndex(roads)
+    def closest_streets():
+        return sum(len(centerlines.closest(x, y, maxDistance=maxDistance)) for x, y in shapes)
+    found = record(timed('closest_streets', size, len(shapes), closest_streets))
+    results[-1].update(found=found)
+
+    # the centerlines of the address street near the point, with the street index of the centerlines
+    streets = [{f: addresses.get(f)[i] for f in FULL_STREET_FIELDS} for i in indices]
+    streetDistance = roads.from_feet(STREET_SEARCH_DISTANCE)
+    def street_lookups():
+        return sum(1 for attrs, (x, y) in zip(streets, shapes) if centerlines.streets.segments_near(attrs, x, y, streetDistance))
+    found = record(timed('street_lookups', size, len(shapes), street_lookups))
+    results[-1].update(found=found, streets=len(centerlines.streets))
+
+    # single line addresses interpolated along the centerline ranges, then the same addresses from the cache
+    geocoder = AddressGeocoder(centerlines)
+    texts = [' '.join(str(addresses.get(f)[i]) for f in [ADDRESS_FIELDS.NUMBER] + FULL_STREET_FIELDS if addresses.get(f)[i]) for i in indices]
+    def geocode():
+        return sum(1 for r in geocoder.geocode_addresses(texts) if r.status != MATCH_STATUS.UNMATCHED)
+    found = record(timed('geocode_addresses', size, len(texts), geocode))
+    results[-1].update(found=found)
+    record(timed('geocode_cached', size, len(texts), geocode))
+
+    # the nearest address point and interpolated centerline address for clicked locations, then the same clicks again
+    reverseGeocoder = record(timed('index_address_points', size, len(addresses), lambda: ReverseGeocoder(centerlines, addresses)))
+    def reverse_geocode():
+        return sum(1 for r in reverseGeocoder.reverse_many(shapes) if r.address and r.centerline)
+    found = record(timed('reverse_geocode', size, len(shapes), reverse_geocode))
+    results[-1].update(found=found)
+    record(timed('reverse_geocode_cached', size, len(shapes), reverse_geocode))
+
+    # centerline connectivity and address range continuity along each street
+    topology = record(timed('road_topology', size, len(roads), lambda: check_road_topology(roads)))
+    results[-1].update(nodes=len(topology.topology), dangles=len(topology.dangles), rangeIssues=len(topology.rangeIssues))
+
+    # overlapping address ranges and parity conflicts on the same street, community and side
+    conflicts = record(timed('range_conflicts', size, len(roads), lambda: find_range_conflicts(roads)))
+    results[-1].update(conflicts=len(conflicts))
+
+    # the centerline geometry as flat arrays, measured, flipped and extended all at once, then saved and memory mapped
+    store = record(timed('polyline_store', size, len(roads), lambda: PolylineStore.from_columns(roads)))
+    results[-1].update(vertices=store.vertexCount)
+    record(timed('polyline_measures', size, len(store), lambda: (store.lengths(), store.midpoints(), store.angles())))
+    record(timed('polyline_edits', size, len(store), lambda: store.flip().extend(roads.from_feet(10))))
+    storeFile = os.path.join(tempfile.mkdtemp(), 'roads.npy')
+    def save_and_load():
+        return len(PolylineStore.load(store.save(storeFile)).lengths())
+    record(timed('polyline_store_io', size, len(store), save_and_load))
+    os.remove(storeFile)
+    os.rmdir(os.path.dirname(storeFile))
+
+    # the get_city_limits and get_zip_code lookups
+    layers = [overlays.incorporated, overlays.unincorporated, overlays.zipCodes]
+    def overlay_lookups():
+        return sum(1 for x, y in shapes for layer in layers if layer.find(x, y) is not None)
+    found = record(timed('overlay_lookups', size, len(shapes) * len(layers), overlay_lookups))
+    results[-1].update(found=found, polygons=sum(len(layer) for layer in layers))
+
+    # the same lookups with the prepared polygon indexes, point by point and as one batch
+    indexed = record(timed('index_overlays', size, sum(len(layer) for layer in layers), lambda: [OverlayLayer(layer.columns) for layer in layers]))
+    def indexed_lookups():
+        return sum(1 for x, y in shapes for layer in indexed if layer.find(x, y) is not None)
+    found = record(timed('overlay_index_lookups', size, len(shapes) * len(layers), indexed_lookups))
+    results[-1].update(found=found)
+    xs, ys = [x for x, y in shapes], [y for x, y in shapes]
+    def batch_lookups():
+        return sum(int((layer.find_many(xs, ys) >= 0).sum()) for layer in indexed)
+    found = record(timed('overlay_batch_lookups', size, len(shapes) * len(layers), batch_lookups))
+    results[-1].update(found=found)
+    # the lookups through the session cache, the second pass is answered from the cache like repeated clicks in the same block
+    overlayCache = OverlayCache()
+    def cached_lookups():
+        return sum(1 for x, y in shapes for i, layer in enumerate(indexed) if overlayCache.lookup(i, x, y, layer.find, layer.columns.metersPerUnit) is not None)
+    found = record(timed('overlay_cached_lookups', size, len(shapes) * len(layers), cached_lookups))
+    results[-1].update(found=found)
+    record(timed('overlay_cache_hits', size, len(shapes) * len(layers), cached_lookups))
+    zipService = ZipCodeService(indexed[2])
+    found = record(timed('zip_code_batch_lookups', size, len(shapes), lambda: sum(1 for r in zipService.lookup_many(xs, ys) if r.source)))
+    results[-1].update(found=found)
+
+    # every overlay attribute of the whole address table recomputed from the centerlines and polygons, like refresh_address_overlays()
+    refresher = AddressOverlayRefresher(centerlines, {'IncorporatedMunicipal': indexed[0], 'UnincorporatedMunicipal': indexed[1]}, zipService)
+    def overlay_refresh():
+        return sum(1 for v in refresher.compute(addresses).ESN if v is not None)
+    found = record(timed('overlay_refresh', size, len(addresses), overlay_refresh))
+    results[-1].update(found=found)
+
+    # committing new address points in batches, as if they were created with the address tools
+    workspace = MemoryWorkspace(AGENCY_ID)
+    workspace.create_table('AddressPoints', ADDRESS_POINT_FIELDS + ['SHAPE@', 'DateUpdate'])
+    batchSize = max(1000, size // 100)
+    features = []
+    for i in range(len(addresses)):
+        ft = {f: addresses.columns[f][i] for f in ADDRESS_POINT_FIELDS}
+        ft[ADDRESS_FIELDS.GUID] = None
+        ft['SHAPE@'] = addresses.shapes[i]
+        features.append(ft)
+    def commit():
+        return sum(
+            workspace.commit_features('AddressPoints', features[i:i + batchSize], ADDRESS_FIELDS.GUID, ADDRESS_PREFIX)
+            for i in range(0, len(features), batchSize)
+        )
+    record(timed('feature_commits', size, len(features), commit, batchSize=batchSize))
+    return results
+
+def run_benchmarks(sizes: List[int]=DEFAULT_SIZES, seed: int=0, errorRates: Dict[str, float]=None,
+                   maxQueries: int=DEFAULT_MAX_QUERIES, output: str=None) -> Munch:
+    """runs the benchmark suite and saves the results as JSON
+
+    Args:
+        sizes (List[int], optional): the number of address points for each county. Defaults to DEFAULT_SIZES.
+        seed (int, optional): the random seed for the counties. Defaults to 0.
+        errorRates (Dict[str, float], optional): the share of points with each kind of error. Defaults to None (DEFAULT_ERROR_RATES).
+        maxQueries (int, optional): the most points to use for point by point lookups. Defaults to DEFAULT_MAX_QUERIES.
+        output (str, optional): the JSON file to write. Defaults to None (a timestamped file in the results folder).
+
+    Returns:
+        Munch: the run information and results
+    """
+    errorRates = dict(DEFAULT_ERROR_RATES if errorRates is None else errorRates)
+    run = Munch(
+        created=datetime.datetime.now().isoformat(timespec='seconds'),
+        python=sys.version.split()[0],
+        platform=platform.platform(),
+        processor=platform.processor() or platform.machine(),
+        seed=seed,
+        errorRates=errorRates,
+        maxQueries=maxQueries,
+        results=[]
+    )
+    print(f'{"benchmark":<24}{"size":>10}{"count":>10}{"elapsed":>13}{"per item":>16}')
+    for size in sizes:
+        run.results.extend(run_size(size, seed, errorRates, maxQueries))
+
+    if not output:
+        os.makedirs(RESULTS_FOLDER, exist_ok=True)
+        output = os.path.join(RESULTS_FOLDER, time.strftime('benchmark_%Y%m%d%H%M%S.json'))
+    with open(output, 'w') as f:
+        json.dump(run, f, indent=2)
+    print(f'saved benchmark results to "{output}"')
+    run.output = output
+    return run
+
+def compare_results(previous: str, current: str) -> List[Munch]:
+    """compares the per item times of two benchmark runs
+
+    Args:
+        previous (str): the JSON file for the earlier run
+        current (str): the JSON file for the later run
+
+    Returns:
+        List[Munch]: the benchmark, size, both times and the speedup for each benchmark in both runs
+    """
+    def load(path):
+        with open(path) as f:
+            return {(r['benchmark'], r['size']): r for r in json.load(f)['results']}
+
+    before, after = load(previous), load(current)
+    comparison = []
+    for key, result in after.items():
+        if key not in before:
+            continue
+        a, b = before[key]['microsecondsPerItem'], result['microsecondsPerItem']
+        comparison.append(Munch(
+            benchmark=key[0],
+            size=key[1],
+            before=a,
+            after=b,
+            speedup=round(a / b, 2) if a and b else None
+        ))
+        print(f'{key[0]:<24}{key[1]:>10,}{a or 0:>14.1f}us{b or 0:>14.1f}us{comparison[-1].speedup or 0:>9.2f}x')
+    return comparison
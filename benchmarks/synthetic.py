@@ -0,0 +1,319 @@
+"""deterministic synthetic counties for benchmarking the validation tools without arcpy or an SDE.
+
+A county is a grid of blocks.  East-west streets are numbered (1ST ST, 2ND ST, ...) and
+north-south streets are named (OAK AVE, ELM AVE, ...).  Every segment gets a 100 block
+range with odd numbers on the left and even numbers on the right, and address points are
+placed on both sides with the attributes of the side of the street they fall on.  A share
+of the points get an error (wrong parity, misspelled streets, duplicates...) at configurable
+rates, the OBJECTIDs of the damaged points are kept so the results can be checked.
+
+Coordinates are in feet, starting at a State Plane like false origin.
+"""
+import math
+import random
+from typing import List, Dict
+from ilng911.support.munch import Munch
+from ilng911.utils.columns import FeatureColumns, FEET_TO_METERS
+from ilng911.spatial.planar import polyline_extent, point_in_polygon
+from ilng911.core.fields import STREET_FIELDS, ADDRESS_FIELDS, VALIDATION_FLAGS
+from ilng911.core.bulk import ADDRESS_VALIDATION_FIELDS, ROAD_VALIDATION_FIELDS, SIDE_CHECKS
+
+ORIGIN = (1000000.0, 500000.0)
+BLOCK_LENGTH = 400.0
+# distance from the centerline to the address points
+SETBACK = 40.0
+POINTS_PER_SIDE = 5
+
+AGENCY_ID = 'synthetic.il.us'
+ROAD_PREFIX = 'RCL'
+ADDRESS_PREFIX = 'SITE'
+COUNTY = 'SYNTHETIC'
+STATE = 'IL'
+
+STREET_NAMES = [
+    'OAK', 'ELM', 'MAPLE', 'PINE', 'CEDAR', 'WALNUT', 'HICKORY', 'ASH', 'BIRCH', 'WILLOW',
+    'CHERRY', 'SPRUCE', 'LOCUST', 'POPLAR', 'SYCAMORE', 'LINDEN', 'CHESTNUT', 'MULBERRY'
+]
+
+# the share of address points with each kind of error
+DEFAULT_ERROR_RATES = dict(
+    missing_number=0.005,
+    wrong_parity=0.01,
+    out_of_range=0.01,
+    misspelled_street=0.01,
+    duplicate_address=0.005,
+    duplicate_identifier=0.005,
+    missing_identifier=0.005,
+    wrong_postal_code=0.01,
+    wrong_municipality=0.01,
+)
+
+# the validation flag each kind of error should raise
+ERROR_FLAGS = dict(
+    missing_number=VALIDATION_FLAGS.MISSING_ADDRESS_NUMBER,
+    wrong_parity=VALIDATION_FLAGS.INVALID_PARITY,
+    out_of_range=VALIDATION_FLAGS.ADDRESS_OUTSIDE_RANGE,
+    misspelled_street=VALIDATION_FLAGS.INVALID_STREET_NAME,
+    duplicate_address=VALIDATION_FLAGS.DUPLICATE_ADDRESS,
+    duplicate_identifier=VALIDATION_FLAGS.DUPLICATE_NENA_IDENTIFIER,
+    missing_identifier=VALIDATION_FLAGS.MISSING_NENA_IDENTIFIER,
+    wrong_postal_code=VALIDATION_FLAGS.INVALID_POSTAL_CODE,
+    wrong_municipality=VALIDATION_FLAGS.INVALID_INCORPORATED_MUNICIPALITY,
+)
+
+ROAD_FIELDS = [STREET_FIELDS.GUID] + ROAD_VALIDATION_FIELDS
+ADDRESS_POINT_FIELDS = ADDRESS_VALIDATION_FIELDS
+
+def ordinal(n: int) -> str:
+    """formats a street number, 1 -> 1ST, 12 -> 12TH"""
+    suffix = 'TH' if 10 <= n % 100 <= 20 else {1: 'ST', 2: 'ND', 3: 'RD'}.get(n % 10, 'TH')
+    return f'{n}{suffix}'
+
+def street_name(n: int) -> str:
+    """the name of the nth north-south street"""
+    name = STREET_NAMES[n % len(STREET_NAMES)]
+    rnd = n // len(STREET_NAMES)
+    return f'{name} {rnd + 1}' if rnd else name
+
+def densified_rectangle(xmin: float, ymin: float, xmax: float, ymax: float, verticesPerSide: int=16) -> List[List[tuple]]:
+    """creates a rectangle polygon with extra vertices along each side, like a digitized boundary"""
+    corners = [(xmin, ymin), (xmin, ymax), (xmax, ymax), (xmax, ymin)]
+    ring = []
+    for (ax, ay), (bx, by) in zip(corners, corners[1:] + corners[:1]):
+        for i in range(verticesPerSide):
+            t = i / verticesPerSide
+            ring.append((ax + t * (bx - ax), ay + t * (by - ay)))
+    ring.append(ring[0])
+    return [ring]
+
+def irregular_polygon(cx: float, cy: float, radius: float, rng: random.Random, vertices: int=64) -> List[List[tuple]]:
+    """creates a star shaped polygon with a jittered radius, like a municipal boundary"""
+    ring = []
+    for i in range(vertices):
+        angle = 2 * math.pi * i / vertices
+        r = radius * rng.uniform(0.75, 1.0)
+        # clockwise like esri outer rings
+        ring.append((cx + r * math.cos(-angle), cy + r * math.sin(-angle)))
+    ring.append(ring[0])
+    return [ring]
+
+class PolygonLayer:
+    """a polygon layer held in memory, looked up with a bounding box check followed by a ray cast.
+
+    This is the baseline for overlay lookups, similar to SelectLayerByLocation against an unindexed layer.
+    """
+    def __init__(self, columns: FeatureColumns):
+        self.columns = columns
+        self.extents = [polyline_extent(shape) for shape in columns.shapes]
+
+    def __len__(self):
+        return len(self.columns)
+
+    def find(self, x: float, y: float) -> int:
+        """finds the first polygon that contains a point
+
+        Args:
+            x (float): the point x
+            y (float): the point y
+
+        Returns:
+            int: the polygon index, or None
+        """
+        for i, (xmin, ymin, xmax, ymax) in enumerate(self.extents):
+            if xmin <= x <= xmax and ymin <= y <= ymax and point_in_polygon(x, y, self.columns.shapes[i]):
+                return i
+        return None
+
+    def value(self, x: float, y: float, field: str, default=None):
+        """gets an attribute of the polygon that contains a point"""
+        i = self.find(x, y)
+        return default if i is None else self.columns.get(field)[i]
+
+
+def pick_error(rng: random.Random, errorRates: Dict[str, float]) -> str:
+    """picks the kind of error for an address point, or None"""
+    r = rng.random()
+    for kind, rate in errorRates.items():
+        if r < rate:
+            return kind
+        r -= rate
+    return None
+
+def generate_overlays(cols: int, rows: int, rng: random.Random) -> Munch:
+    """creates the municipal and ZIP code polygons for a grid of blocks
+
+    Args:
+        cols (int): the number of blocks east to west
+        rows (int): the number of blocks north to south
+        rng (random.Random): the random generator
+
+    Returns:
+        Munch: PolygonLayers for incorporated and unincorporated municipalities and ZIP codes
+    """
+    x0, y0 = ORIGIN
+    width, height = cols * BLOCK_LENGTH, rows * BLOCK_LENGTH
+
+    # ZIP codes tile the whole county
+    zips = FeatureColumns(['ZipCode', 'ZipCode4'], FEET_TO_METERS, shapeType='Polygon')
+    zipCols, zipRows = max(1, min(4, math.ceil(cols / 8))), max(1, min(4, math.ceil(rows / 8)))
+    for j in range(zipRows):
+        for i in range(zipCols):
+            shape = densified_rectangle(
+                x0 + width * i / zipCols, y0 + height * j / zipRows,
+                x0 + width * (i + 1) / zipCols, y0 + height * (j + 1) / zipRows
+            )
+            zips.append(len(zips) + 1, shape, [f'{62000 + len(zips) * 7}', None])
+
+    # municipalities on a coarse lattice with small unincorporated communities between them
+    incorporated = FeatureColumns(['Inc_Muni'], FEET_TO_METERS, shapeType='Polygon')
+    unincorporated = FeatureColumns(['Uninc_Comm'], FEET_TO_METERS, shapeType='Polygon')
+    muniCols, muniRows = max(1, min(5, math.ceil(cols / 6))), max(1, min(5, math.ceil(rows / 6)))
+    dx, dy = width / muniCols, height / muniRows
+    for j in range(muniRows):
+        for i in range(muniCols):
+            n = len(incorporated)
+            incorporated.append(n + 1, irregular_polygon(x0 + dx * (i + 0.5), y0 + dy * (j + 0.5), min(dx, dy) * 0.3, rng), [f'CITY {n + 1}'])
+            unincorporated.append(n + 1, irregular_polygon(x0 + dx * (i + 1), y0 + dy * (j + 1), min(dx, dy) * 0.1, rng, 24), [f'COMMUNITY {n + 1}'])
+
+    return Munch(
+        incorporated=PolygonLayer(incorporated),
+        unincorporated=PolygonLayer(unincorporated),
+        zipCodes=PolygonLayer(zips)
+    )
+
+def side_attributes(overlays: Munch, x: float, y: float) -> Dict[str, str]:
+    """gets the centerline side attributes (without the _L or _R suffix) for a location"""
+    zipIdx = overlays.zipCodes.find(x, y)
+    incMuni = overlays.incorporated.value(x, y, 'Inc_Muni', 'UNINCORPORATED')
+    unincCom = overlays.unincorporated.value(x, y, 'Uninc_Comm')
+    return dict(
+        ESN=f'{100 + (zipIdx or 0)}',
+        IncMuni=incMuni,
+        UnincCom=unincCom,
+        PostCode=overlays.zipCodes.columns.get('ZipCode')[zipIdx] if zipIdx is not None else None,
+        MSAGComm=incMuni if incMuni != 'UNINCORPORATED' else (unincCom or COUNTY),
+        NbrhdCom=None,
+        AddCode=None,
+        County=COUNTY,
+        State=STATE,
+    )
+
+def generate_county(points: int, seed: int=0, errorRates: Dict[str, float]=None, pointsPerSide: int=POINTS_PER_SIDE) -> Munch:
+    """generates a synthetic county with roughly square grid of blocks sized for a number of address points
+
+    Args:
+        points (int): the number of address points
+        seed (int, optional): the random seed, the same seed always creates the same county. Defaults to 0.
+        errorRates (Dict[str, float], optional): the share of points with each kind of error, see DEFAULT_ERROR_RATES.
+            Defaults to None (DEFAULT_ERROR_RATES).
+        pointsPerSide (int, optional): the number of address points on each side of a block (1-9). Defaults to POINTS_PER_SIDE.
+
+    Returns:
+        Munch: the roads and addresses (FeatureColumns), the overlays (PolygonLayers) and the errors
+            (a dict of error kind to the OBJECTIDs of the damaged address points)
+    """
+    rng = random.Random(seed)
+    errorRates = dict(DEFAULT_ERROR_RATES if errorRates is None else errorRates)
+    unknown = set(errorRates) - set(ERROR_FLAGS)
+    if unknown:
+        raise RuntimeError(f'unknown synthetic error types: {sorted(unknown)}')
+    if sum(errorRates.values()) > 1:
+        raise RuntimeError('the synthetic error rates cannot add up to more than 1')
+    pointsPerSide = max(1, min(9, pointsPerSide))
+
+    # each segment holds points on both sides, a square grid has about 2 segments per block
+    blocks = max(1, math.ceil(points / (4 * pointsPerSide)))
+    cols = rows = max(1, math.ceil(math.sqrt(blocks)))
+    overlays = generate_overlays(cols, rows, rng)
+    x0, y0 = ORIGIN
+
+    # east-west streets run west to east and north-south streets run south to north
+    streets = []
+    for j in range(rows + 1):
+        streets.append((ordinal(j + 1), 'ST', [((x0 + i * BLOCK_LENGTH, y0 + j * BLOCK_LENGTH), (x0 + (i + 1) * BLOCK_LENGTH, y0 + j * BLOCK_LENGTH)) for i in range(cols)]))
+    for i in range(cols + 1):
+        streets.append((street_name(i), 'AVE', [((x0 + i * BLOCK_LENGTH, y0 + j * BLOCK_LENGTH), (x0 + i * BLOCK_LENGTH, y0 + (j + 1) * BLOCK_LENGTH)) for j in range(rows)]))
+
+    roads = FeatureColumns(ROAD_FIELDS, FEET_TO_METERS, shapeType='Polyline')
+    addresses = FeatureColumns(ADDRESS_POINT_FIELDS, FEET_TO_METERS, shapeType='Point')
+    errors = {kind: [] for kind in errorRates}
+    addressRows = []
+    for name, postType, segments in streets:
+        for block, ((ax, ay), (bx, by)) in enumerate(segments):
+            base = (block + 1) * 100
+            length = math.hypot(bx - ax, by - ay)
+            # the right hand normal, matching the R side of locate_on_polyline
+            nx, ny = (by - ay) / length, -(bx - ax) / length
+            mx, my = (ax + bx) / 2, (ay + by) / 2
+            attrs = {
+                STREET_FIELDS.GUID: f'{ROAD_PREFIX}{len(roads) + 1}@{AGENCY_ID}',
+                STREET_FIELDS.NAME: name,
+                STREET_FIELDS.POST_TYPE: postType,
+                'FromAddr_L': base + 1, 'ToAddr_L': base + 99, 'Parity_L': 'O',
+                'FromAddr_R': base, 'ToAddr_R': base + 98, 'Parity_R': 'E',
+            }
+            sides = {}
+            for side, sign in [('L', -1), ('R', 1)]:
+                sides[side] = side_attributes(overlays, mx + sign * nx * SETBACK, my + sign * ny * SETBACK)
+                for attr, value in sides[side].items():
+                    attrs[f'{attr}_{side}'] = value
+            roads.append(len(roads) + 1, [[(ax, ay), (bx, by)]], [attrs.get(f) for f in ROAD_FIELDS])
+
+            # numbers end in 1 on the left and 4 on the right, so a wrong parity never duplicates a neighbor
+            for side, sign, first in [('L', -1, base + 1), ('R', 1, base + 4)]:
+                for i in range(pointsPerSide):
+                    if len(addressRows) >= points:
+                        break
+                    t = (i + 1) / (pointsPerSide + 1)
+                    xy = (ax + t * (bx - ax) + sign * nx * SETBACK, ay + t * (by - ay) + sign * ny * SETBACK)
+                    row = {
+                        ADDRESS_FIELDS.GUID: f'{ADDRESS_PREFIX}{len(addressRows) + 1}@{AGENCY_ID}',
+                        ADDRESS_FIELDS.NUMBER: first + 10 * i,
+                        ADDRESS_FIELDS.NAME: name,
+                        ADDRESS_FIELDS.POST_TYPE: postType,
+                    }
+                    for roadAttr, addressAttr, _ in SIDE_CHECKS:
+                        row[addressAttr] = sides[side][roadAttr]
+                    addressRows.append((xy, row))
+
+    # at most one error per point, so each damaged point raises the flag for its error
+    for n, (xy, row) in enumerate(addressRows):
+        oid = n + 1
+        kind = pick_error(rng, errorRates)
+        prev = addressRows[n - 1][1] if n else {}
+        if kind == 'missing_number':
+            row[ADDRESS_FIELDS.NUMBER] = None
+        elif kind == 'wrong_parity':
+            row[ADDRESS_FIELDS.NUMBER] += 1
+        elif kind == 'out_of_range':
+            row[ADDRESS_FIELDS.NUMBER] += 50000
+        elif kind == 'misspelled_street':
+            row[ADDRESS_FIELDS.NAME] = row[ADDRESS_FIELDS.NAME][:-1] + 'X'
+        elif kind == 'duplicate_address' and prev.get(ADDRESS_FIELDS.NUMBER):
+            # same address as the previous point, both points are duplicates
+            for f in [ADDRESS_FIELDS.NUMBER, ADDRESS_FIELDS.NAME, ADDRESS_FIELDS.POST_TYPE]:
+                row[f] = prev[f]
+            errors[kind].append(oid - 1)
+        elif kind == 'duplicate_identifier' and prev.get(ADDRESS_FIELDS.GUID):
+            row[ADDRESS_FIELDS.GUID] = prev[ADDRESS_FIELDS.GUID]
+            errors[kind].append(oid - 1)
+        elif kind == 'missing_identifier':
+            row[ADDRESS_FIELDS.GUID] = None
+        elif kind == 'wrong_postal_code':
+            row[ADDRESS_FIELDS.POST_CODE] = '00000'
+        elif kind == 'wrong_municipality':
+            row[ADDRESS_FIELDS.INC_MUNI] = 'NOWHERE'
+        else:
+            kind = None
+        if kind:
+            errors[kind].append(oid)
+        addresses.append(oid, xy, [row.get(f) for f in ADDRESS_POINT_FIELDS])
+
+    return Munch(
+        seed=seed,
+        roads=roads,
+        addresses=addresses,
+        overlays=overlays,
+        errors={kind: sorted(set(oids)) for kind, oids in errors.items()},
+        blocks=(cols, rows)
+    )
@@ -22,6 +22,7 @@ from ..utils.helpers import field_types, find_nena_guid_field
 from ..support.munch import munchify
 from ..config import write_config
 from ..core.database import NG911LayerTypes, NG911SchemaTables
+from ..core.spatial_join import clear_spatial_join_engines
 from ..schemas import DATA_TYPES, DATA_TYPES_LOOKUP, DEFAULT_NENA_PREFIXES
 
 def features_from_json(json_file: str, out_path: str, registerAsVersioned: bool=False):
@@ -77,7 +78,7 @@ def features_from_json(json_file: str, out_path: str, registerAsVersioned: bool=
         temp = os.path.join('in_memory', base)
         temp = arcpy.conversion.JSONToFeatures(json_file, temp).getOutput(0)
         log(f'created temporary features: "{temp}"')
-        if base in ['AddressFlags', 'ValidatedAddresses']:
+        if base in ['AddressFlags', 'ValidatedAddresses', 'AddressRangeFlags']:
             arcpy.conversion.FeatureClassToFeatureClass(temp, *os.path.split(out_path))
         else:
             arcpy.conversion.TableToTable(temp, *os.path.split(out_path))
@@ -293,28 +294,49 @@ def create_ng911_admin_gdb(ng911_gdb: str, schemas_gdb_path: str, agency: str, c
     log('completed NextGen911 Admin database setup')
 
 def register_spatial_join_fields(target_table: str, target_field: str, join_table: str, fields: List[str]):
-    """registers spatial join fields
+    """registers spatial join fields, the target field is filled from the join fields of the polygon
+    in the join table that a feature falls in (see ilng911.core.spatial_join)
 
     Args:
-        target_table (str): _description_
-        target_field (str): _description_
-        join_table (str): _description_
-        fields (List[str]): _description_
+        target_table (str): the NG911 feature type (ex: ADDRESS_POINTS) or the path to a registered NG911 feature class
+        target_field (str): the field to fill in the target table
+        join_table (str): the path to the polygon table to join
+        fields (List[str]): the fields in the join table, the first one with a value is used
     """
     ng_911_db = get_ng911_db()
 
+    if target_table not in NG911LayerTypes.__props__:
+        featureType = ng_911_db.get_table_type(target_table)
+        if not featureType:
+            raise RuntimeError(f'"{target_table}" is not a registered NG911 feature class')
+        target_table = featureType
+
     spatialFeatures = ng_911_db.get_table(NG911SchemaTables.SPATIAL_JOIN_FEATURES)
     spatialFields = ng_911_db.get_table(NG911SchemaTables.SPATIAL_JOIN_FIELDS)
-    features_name = os.path.basename(spatialFeatures)
-    existing_where = f"Path = '{target_table}' AND TableName = '{features_name}'"
-
-    tab = arcpy.management.MakeTableView(spatialFeatures, 'spatial_features', existing_where)
 
-    if not int(arcpy.management.GetCount(tab).getOutput(0)):
-        # does not exist, insert row
+    # join tables are matched on their full path, tables with the same name in different workspaces are different tables
+    join_key = os.path.normcase(os.path.normpath(join_table))
+    join_name = None
+    names = set()
+    with UpdateCursor(spatialFeatures, ['Path', 'TableName']) as rows:
+        for r in rows:
+            names.add(r[1])
+            if join_name is None and r[0] and os.path.normcase(os.path.normpath(r[0])) == join_key:
+                join_name = r[1]
+                if r[0] != join_table:
+                    rows.updateRow([join_table, join_name])
+                    log(f'Updated Spatial Join Feature path for "{join_name}": "{join_table}"')
+
+    if join_name is None:
+        # does not exist, insert row with a name the rules can refer to
+        base_name = join_name = os.path.basename(join_table)
+        suffix = 2
+        while join_name in names:
+            join_name = f'{base_name}_{suffix}'
+            suffix += 1
         with InsertCursor(spatialFeatures, ['Path', 'TableName']) as rows:
-            rows.insertRow([spatialFeatures, features_name])
-            log(f'Registered new Spatial Join Feature: "{spatialFeatures}"')
+            rows.insertRow([join_table, join_name])
+            log(f'Registered new Spatial Join Feature "{join_name}": "{join_table}"')
 
     spa_fields = ['TargetTable', 'TargetField', 'TableName', 'JoinField']
     with arcpy.da.SearchCursor(spatialFields, spa_fields) as rows:
@@ -322,10 +344,13 @@ def register_spatial_join_fields(target_table: str, target_field: str, join_tabl
 
     with InsertCursor(spatialFields, spa_fields) as rows:
         for fld in fields:
-            vals = [target_table, target_field, features_name, fld]
+            vals = [target_table, target_field, join_name, fld]
             if vals not in existing:
                 rows.insertRow(vals)
-                log(f'Added new Spatial Join Field "{fld}" from "{features_name}" to be inserted into "{target_table}" in "{target_field}" field.')
+                log(f'Added new Spatial Join Field "{fld}" from "{join_name}" to be inserted into "{target_table}" in "{target_field}" field.')
+
+    # the rules are reread by the next spatial join
+    clear_spatial_join_engines()
 
 
 def add_cad_vendor_fields(featureType: str, vendor: str, cad_fields: List[List[str]]):
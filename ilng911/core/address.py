@@ -9,29 +9,16 @@ from ..core.common import Feature
 from ..core.geometry import get_angle
 from ..schemas import DataType, DataSchema
 from .validators import get_range_and_parity, validate_address
+from .centerlines import get_centerline_index, DEFAULT_STREET_COUNT, DEFAULT_SEARCH_DISTANCE
+from . import overlays
 from warnings import warn
 from itertools import zip_longest
-from .fields import FIELDS, POINT_SIDE_MAPPING
+from .fields import FIELDS, POINT_SIDE_MAPPING, STREET_ATTRIBUTES
 from ..logging import log
 
 thisDir = os.path.abspath(os.path.dirname(__file__))
 
-FALLBACK_ZIP_CODES = os.path.join(os.path.dirname(thisDir), 'data', 'il_zip_codes.shp')
-
-STREET_ATTRIBUTES = [
-    'St_PreMod', 
-    'St_PreDir', 
-    'St_PreTyp', 
-    'St_PreSep', 
-    'St_Name', 
-    'St_PosTyp', 
-    'St_PosDir', 
-    'St_PosMod', 
-    'LSt_PreDir', 
-    'LSt_Name', 
-    'LSt_Type', 
-    'LSt_PosDir'
-]
+FALLBACK_ZIP_CODES = overlays.FALLBACK_ZIP_CODES
 
 ADDRESS_ATTRIBUTES = [
     'AddCode', 
@@ -134,7 +121,8 @@ def merge_street_segment_attributes(address: Feature, centerline: Union[int, Fea
     return address
 
 def get_zip_code(pt: arcpy.PointGeometry) -> Dict[str, str]:
-    """gets a zip code from a given point, using authoritative data from the USPS
+    """gets a zip code from a given point, from the NG911 ZipCodes layer or the authoritative data
+    from the USPS bundled with the tools when the ZipCodes layer does not have the point
 
     see: https://www.arcgis.com/home/item.html?id=8d2012a2016e484dafaac0451f9aea24
 
@@ -142,58 +130,22 @@ def get_zip_code(pt: arcpy.PointGeometry) -> Dict[str, str]:
         pt (arcpy.PointGeometry): an arcpy Point geometry
 
     Returns:
-        str: the intersecting zip code used by the USPS
+        Dict[str, str]: the Post_Code, Post_Code4 and the "source" that answered (see overlays.ZIP_SOURCES)
     """
-    # get ng911_db helper
-    count = 0
-    ng911_db = get_ng911_db()
-    zipLyr = ng911_db.get_911_layer(DataType.ZIP_CODES)
-    if zipLyr:
-        arcpy.management.SelectLayerByLocation(zipLyr, 'INTERSECT', pt)
-        count = arcpy.management.GetCount(zipLyr).getOutput(0)
-    if count:
-        # get zip code and zip code 4
-        with arcpy.da.SearchCursor(zipLyr, ['ZipCode', 'ZipCode4']) as rows:
-            for row in rows:
-                return dict(zip(['Post_Code', 'Post_Code4'], row))
-
-    # use fallback
-    fallback = arcpy.management.MakeFeatureLayer(FALLBACK_ZIP_CODES).getOutput(0)
-    log(f'using fallback zip codes {fallback} -> {fallback.dataSource}')
-    
-    arcpy.management.SelectLayerByLocation(fallback, 'INTERSECT', pt)
-    with arcpy.da.SearchCursor(fallback, ['ZIP_CODE']) as rows:
-        for row in rows:
-            return dict(zip(['Post_Code', 'Post_Code4'], row + (None,)))
-
-    return { 'Post_Code': None, 'Post_Code4': None }
+    result = overlays.get_zip_code(pt)
+    log(f'found zip code {result.Post_Code} from {result.source or "no zip code layer"}')
+    return result
 
 def get_city_limits(pt: arcpy.PointGeometry) -> Dict[str, str]:
-    """gets the city limits for a given point
+    """gets the city limits for a given point from the session overlay layers, see get_overlay_layer()
 
     Args:
-        pt (arcpy.PointGeometry): [description]
+        pt (arcpy.PointGeometry): the point
 
     Returns:
-        Dict[str, str]: [description]
+        Dict[str, str]: the Inc_Muni ("UNINCORPORATED" outside of every municipality) and Uninc_Comm
     """
-    # get ng911_db helper
-    ng911_db = get_ng911_db()
-    incLyr = ng911_db.get_911_layer(DataType.INCORPORATED_MUNICIPAL)
-    uniLyr = ng911_db.get_911_layer(DataType.UNINCORPORATED_MUNICIPAL)
-    attrs = dict(
-        Inc_Muni='UNINCORPORATED',
-        Uninc_Comm=None
-    )
-
-    types = [(incLyr, 'Inc_Muni'), (uniLyr, 'Uninc_Comm')]
-    for lyr, field in types:
-        arcpy.management.SelectLayerByLocation(lyr, 'INTERSECT', pt)
-        with arcpy.da.SearchCursor(lyr, [ field ]) as rows:
-            for r in rows:
-                attrs[field] = r[0]
-                break # in case there are more than one?
-    return attrs
+    return overlays.get_city_limits(pt)
 
 
 def create_address_point(pg: arcpy.PointGeometry, centerlineOID: int, **kwargs):
@@ -213,6 +165,10 @@ def create_address_point(pg: arcpy.PointGeometry, centerlineOID: int, **kwargs):
             ft.update(**get_zip_code(pg))
         except Exception as e:
             log(f'faield to get zip code from spatial search: {e}')
+    try:
+        schema.calculate_spatial_join_fields(ft)
+    except Exception as e:
+        log(f'failed to calculate spatial join fields: {e}', level='warn')
     schema.calculate_custom_fields(ft)
     schema.calculate_vendor_fields(ft)
     schema.commit_features()
@@ -226,61 +182,33 @@ def create_address_point(pg: arcpy.PointGeometry, centerlineOID: int, **kwargs):
     #     log(f'failed to validate address: {e}', level='warn')
     return ft, schema
 
-def find_closest_centerlines(pg: Union[arcpy.Geometry, Feature]) -> Dict:
-    """finds the closest road centerlines from a given point
+def find_closest_centerlines(pg: Union[arcpy.Geometry, Feature], k: int=DEFAULT_STREET_COUNT, max_distance: float=DEFAULT_SEARCH_DISTANCE) -> List[Munch]:
+    """finds the closest road centerlines from a given point, one centerline for each street.
+
+    Uses the session centerline index (see get_centerline_index()), so no selections
+    are made on the road centerlines layer.
 
     Args:
-        pg (Union[arcpy.Geometry, Feature]): _description_
+        pg (Union[arcpy.Geometry, Feature]): the point
+        k (int, optional): the number of streets to return. Defaults to DEFAULT_STREET_COUNT.
+        max_distance (float, optional): the search distance in feet. Defaults to DEFAULT_SEARCH_DISTANCE.
 
     Returns:
-        Dict: _description_
+        List[Munch]: the closest centerline for each street with the OID@, street name and type, address
+            ranges, distance, block, range and side, sorted by distance
     """
     if isinstance(pg, Feature):
         pg = pg.geometry
 
-    # get ng911_db helper
-    ng911_db = get_ng911_db()
-    roads_lyr = ng911_db.get_911_layer(DataType.ROAD_CENTERLINE)
-    distances = [200, 500, 1000, 3000]
-    for dist in distances:
-        arcpy.management.SelectLayerByLocation(roads_lyr, 'WITHIN_A_DISTANCE', pg, search_distance=f'{dist} FEET')
-        count = int(arcpy.management.GetCount(roads_lyr).getOutput(0))
-        log(f'selected {count} roads within a distance of {dist} ft to the new address point')
-        if count:
-            break
-
-    fields = ['SHAPE@', 'OID@', 'St_Name', 'St_PosTyp', 'FromAddr_L', 'ToAddr_L',  'FromAddr_R', 'ToAddr_R']
-    # f'{min(r[4:])} - {max(r[4:])}' #range
-    roads = []
-    with arcpy.da.SearchCursor(roads_lyr, fields) as rows:
-        for r in rows:
-            attrs = dict(zip(fields[1:], r[1:]))
-            # get distance (will be in DD)
-            attrs['distance'] = pg.distanceTo(r[0])
-            attrs['block'] =  round(list(filter(None, r[4:]) or [0])[0], -2)
-            attrs['range'] = f'{min(r[4:])} - {max(r[4:])}'
-            roads.append(munchify(attrs))
-    
-    if len(roads) == 1:
-        return roads
-
-    closest = []
-    # find unique roads
-    unique = {}
+    index = get_centerline_index()
+    sr = index.roads.spatialReference
+    if sr and pg.spatialReference and pg.spatialReference.name != sr.name:
+        pg = pg.projectAs(sr)
+    pt = pg.firstPoint
+    roads = index.closest(pt.X, pt.Y, k, index.roads.from_feet(max_distance))
     for r in roads:
-        st = f'{r.St_Name} {r.St_PosTyp}'
-        if st in unique:
-            unique[st].append(r) 
-        else:
-            unique[st] = [r]
-    
-    for rd in unique.keys():
-        rds = unique[rd]
-        min_dist = min(r.distance for r in rds)
-        log(f'distance to closest segment of "{rd}" is {min_dist}')
-        closest.append([r for r in rds if r.distance == min_dist][0])
-
-    return sorted(closest, key=lambda d: d['distance'])
+        log(f'distance to closest segment of "{r.St_Name} {r.St_PosTyp}" is {r.distance}')
+    return roads
 
     
 if __name__ == '__main__':
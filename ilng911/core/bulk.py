@@ -0,0 +1,313 @@
+import numpy as np
+from typing import List, Iterable, Tuple, Set
+from ..support.munch import Munch
+from ..utils import lazyprop
+from ..utils.columns import FeatureColumns
+from ..spatial.planar import LineLocation, locate_on_polyline
+from ..spatial.grid import SegmentIndex
+from ..spatial.vectorized import SegmentArrays, locate_points
+from ..logging import log, timeit
+from .fields import STREET_FIELDS, ADDRESS_FIELDS, get_validation_template
+from .duplicates import DuplicateAddressIndex, DUPLICATE_ADDRESS_FIELDS
+from .identifiers import NenaIdentifierAudit
+from .rules import (
+    ValidationBatch, ValidationRuleRegistry, DEFAULT_RULES, SIDE_CHECKS, RANGE_FIELDS,
+    normalize_value, score_flags
+)
+
+# street attributes used to find candidate centerlines for an address, the fields of the where clause the
+# original validate_address() selected centerlines with.  They are not the full street name of
+# streets.StreetIndex (which matches on the directions and not on the separator or modifier), so the
+# validator keeps its own grouping and the flags stay the same as the selection based validation.
+STREET_MATCH_FIELDS = [
+    STREET_FIELDS.PRE_TYPE,
+    STREET_FIELDS.PRE_TYPE_SEPERATOR,
+    STREET_FIELDS.NAME,
+    STREET_FIELDS.POST_TYPE,
+    STREET_FIELDS.POST_MODIFIER
+]
+
+# search distances (in feet) used to find the closest centerline when more than one segment matches
+SEARCH_DISTANCES = [600, 1000, 1500, 2000]
+
+# the validator for the current session, see get_bulk_validator()
+_bulkValidator: 'BulkAddressValidator' = None
+
+# fields to read into memory for bulk validation
+ADDRESS_VALIDATION_FIELDS = list(dict.fromkeys(
+    [ADDRESS_FIELDS.GUID] + DUPLICATE_ADDRESS_FIELDS + [c[1] for c in SIDE_CHECKS]
+))
+
+ROAD_VALIDATION_FIELDS = STREET_MATCH_FIELDS + [
+    f'{attr}_{side}' for attr in RANGE_FIELDS + [c[0] for c in SIDE_CHECKS] for side in ['L', 'R']
+]
+
+class BulkAddressValidator:
+    """validates many address points at once against an in memory copy of the road centerlines.
+
+    The centerline segments are indexed in a uniform grid keyed by street name once, so
+    each address only measures distances to nearby segments of its own street instead
+    of running geoprocessing selections.  The flags are set by the rules in a
+    ValidationRuleRegistry, each run over the whole batch of addresses.
+
+    validate_address() and the bulk validation both match streets here, not with the
+    StreetIndex of the session CenterlineIndex, see STREET_MATCH_FIELDS.
+    """
+    def __init__(self, roads: FeatureColumns, searchDistances: List[float]=SEARCH_DISTANCES, rules: ValidationRuleRegistry=None):
+        self.roads = roads
+        self.rules = rules if rules is not None else DEFAULT_RULES
+        self.maxDistance = roads.from_feet(max(searchDistances))
+        names = [normalize_value(name) for name in roads.get(STREET_FIELDS.NAME)]
+        # centerlines by street name, candidate_roads() narrows them down with the other STREET_MATCH_FIELDS
+        self.streets = {}
+        for i, key in enumerate(names):
+            if key:
+                self.streets.setdefault(key, []).append(i)
+
+        self.index = SegmentIndex(roads.shapes, names)
+        self.table = None
+        self._roadMatchColumns = [(f, [normalize_value(v) for v in roads.get(f)]) for f in STREET_MATCH_FIELDS if f != STREET_FIELDS.NAME]
+        log(f'bulk validator indexed {len(roads)} centerlines ({len(self.index)} segments) for {len(self.streets)} street names')
+
+    def candidate_roads(self, attrs: dict) -> List[int]:
+        """finds the centerlines that match the street attributes of an address
+
+        Args:
+            attrs (dict): the normalized street attributes of the address
+
+        Returns:
+            List[int]: the centerline indices
+        """
+        candidates = self.streets.get(attrs.get(STREET_FIELDS.NAME), [])
+        for f, column in self._roadMatchColumns:
+            # like the where clause in validate_address, only populated address attributes must match
+            v = attrs.get(f)
+            if v:
+                candidates = [i for i in candidates if column[i] == v]
+        return candidates
+
+    def match_road(self, x: float, y: float, attrs: dict) -> Tuple[int, LineLocation]:
+        """finds the closest matching centerline for an address
+
+        Args:
+            x (float): the address x coordinate
+            y (float): the address y coordinate
+            attrs (dict): the normalized street attributes of the address
+
+        Returns:
+            Tuple[int, LineLocation]: the centerline index and the location of the address along it
+        """
+        candidates = self.candidate_roads(attrs)
+        if len(candidates) == 1 and self.roads.shapes[candidates[0]]:
+            # a single matching segment is used regardless of distance
+            idx = candidates[0]
+            return idx, locate_on_polyline(x, y, self.roads.shapes[idx])
+
+        if not candidates:
+            return None, None
+        name = attrs.get(STREET_FIELDS.NAME)
+        # only filter by centerline when the other street attributes narrowed down the name matches
+        features = set(candidates) if len(candidates) < len(self.streets.get(name, [])) else None
+        return self.index.nearest(x, y, self.maxDistance, key=name, features=features)
+
+    def locate(self, xy: Tuple[float, float], attrs: dict, roadIdx: int=None) -> Tuple[int, str]:
+        """finds the centerline of an address and the side of the street it is on
+
+        Args:
+            xy (Tuple[float, float]): the address coordinates, None when it has no shape
+            attrs (dict): the normalized street attributes of the address
+            roadIdx (int, optional): a known centerline record. Defaults to None (the closest matching centerline).
+
+        Returns:
+            Tuple[int, str]: the centerline index and the side (R|L), None when they cannot be found
+        """
+        if not xy:
+            return roadIdx, None
+        if roadIdx is None:
+            if not attrs.get(STREET_FIELDS.NAME):
+                return None, None
+            roadIdx, loc = self.match_road(*xy, attrs)
+        else:
+            loc = locate_on_polyline(*xy, self.roads.shapes[roadIdx]) if self.roads.shapes[roadIdx] else None
+        return roadIdx, loc.side if loc else None
+
+    def validate_point(self, oid: int, xy: Tuple[float, float], attrs: dict, roadIdx: int=None, isDuplicate: bool=False,
+                       isNenaDuplicate: bool=False, rules: ValidationRuleRegistry=None, enabled: Iterable[str]=None,
+                       disabled: Iterable[str]=None) -> Munch:
+        """validates a single address point, the per point version of validate() used by validate_address()
+
+        Args:
+            oid (int): the address OBJECTID
+            xy (Tuple[float, float]): the address coordinates in the centerline coordinate system, None when it has no shape
+            attrs (dict): the address attributes, see ADDRESS_VALIDATION_FIELDS
+            roadIdx (int, optional): a known centerline record. Defaults to None (the closest matching centerline).
+            isDuplicate (bool, optional): the address is duplicated. Defaults to False.
+            isNenaDuplicate (bool, optional): the NENA identifier is duplicated. Defaults to False.
+            rules (ValidationRuleRegistry, optional): the validation rules. Defaults to None (the rules of the validator).
+            enabled (Iterable[str], optional): only run the rules for these flags. Defaults to None (all rules).
+            disabled (Iterable[str], optional): skip the rules for these flags. Defaults to None.
+
+        Returns:
+            Munch: the oid, flags, roadOID and side, like the results of validate()
+        """
+        addresses = FeatureColumns(ADDRESS_VALIDATION_FIELDS)
+        addresses.append(oid, xy, [attrs.get(f) for f in ADDRESS_VALIDATION_FIELDS])
+        roadIdx, side = self.locate(xy, {f: normalize_value(attrs.get(f)) for f in STREET_MATCH_FIELDS}, roadIdx)
+        batch = ValidationBatch(
+            addresses, [0], self.roads, [roadIdx], [side],
+            {oid} if isDuplicate else set(),
+            {oid} if isNenaDuplicate else set()
+        )
+        rules = rules if rules is not None else self.rules
+        flags = Munch(get_validation_template())
+        for flag, vector in rules.run(batch, enabled, disabled).items():
+            flags[flag] = vector[0]
+        return Munch(
+            oid=oid,
+            flags=score_flags(flags),
+            roadOID=self.roads.oids[roadIdx] if roadIdx is not None else None,
+            side=side
+        )
+
+    @timeit
+    def validate(self, addresses: FeatureColumns, indices: Iterable[int]=None, nenaAudit: NenaIdentifierAudit=None,
+                 duplicateOids: Set[int]=None, enabled: Iterable[str]=None, disabled: Iterable[str]=None) -> List[Munch]:
+        """validates address points
+
+        Args:
+            addresses (FeatureColumns): the address points, must be in the same coordinate system as the centerlines
+            indices (Iterable[int], optional): the records to validate, duplicates are still
+                checked against every address. Defaults to None (all addresses).
+            nenaAudit (NenaIdentifierAudit, optional): an existing audit of the address point identifiers.
+                Defaults to None (the audit is built from the addresses).
+            duplicateOids (Set[int], optional): the OBJECTIDs of every duplicate address, used when the
+                addresses are only a shard of the layer. Defaults to None (found from the addresses).
+            enabled (Iterable[str], optional): only run the rules for these flags. Defaults to None (all rules).
+            disabled (Iterable[str], optional): skip the rules for these flags. Defaults to None.
+
+        Returns:
+            List[Munch]: the results containing the index, oid, flags, roadOID and side
+        """
+        indices = list(range(len(addresses)) if indices is None else indices)
+
+        # layer wide checks, one pass with hash counts
+        if duplicateOids is None:
+            duplicateOids = DuplicateAddressIndex(addresses).duplicateOids
+        if nenaAudit is None:
+            nenaAudit = NenaIdentifierAudit.from_columns(addresses, ADDRESS_FIELDS.GUID)
+
+        # match each address to its closest centerline, the rules share the matches
+        streetColumns = {f: addresses.get(f) for f in STREET_MATCH_FIELDS}
+        roadIndices, sides = [], []
+        for i in indices:
+            roadIdx, side = self.locate(addresses.shapes[i], {f: normalize_value(col[i]) for f, col in streetColumns.items()})
+            roadIndices.append(roadIdx)
+            sides.append(side)
+
+        batch = ValidationBatch(addresses, indices, self.roads, roadIndices, sides, duplicateOids, nenaAudit.duplicateOids)
+        vectors = self.rules.run(batch, enabled, disabled)
+
+        # the results are flat, so plain Munch copies are used instead of munchify() for each row
+        template = get_validation_template()
+        results = []
+        for n, i in enumerate(indices):
+            flags = Munch(template)
+            for flag, vector in vectors.items():
+                flags[flag] = vector[n]
+            roadIdx = roadIndices[n]
+            results.append(Munch(
+                index=i,
+                oid=addresses.oids[i],
+                flags=score_flags(flags),
+                roadOID=self.roads.oids[roadIdx] if roadIdx is not None else None,
+                side=sides[n]
+            ))
+
+        log(f'validated {len(results)} address points, {sum(1 for r in results if r.flags.FLAG_COUNT)} were flagged')
+        return results
+
+    @classmethod
+    def from_table(cls, table, **kwargs) -> 'BulkAddressValidator':
+        """reads the road centerlines into memory with a single SearchCursor and creates the validator
+
+        Args:
+            table: the road centerlines feature class or layer
+
+        Returns:
+            BulkAddressValidator: the validator
+        """
+        from ..utils.cursors import read_columns
+        validator = cls(read_columns(table, ROAD_VALIDATION_FIELDS), **kwargs)
+        validator.table = table
+        return validator
+
+    @lazyprop
+    def segments(self) -> SegmentArrays:
+        """the centerline segments as numpy arrays, for batch_range_and_parity()"""
+        return SegmentArrays(self.roads.shapes)
+
+    def range_and_parity(self, xs: Iterable[float], ys: Iterable[float], roadIndices: Iterable[int]) -> Munch:
+        """finds the side, range and parity for many points on their matched centerlines, see batch_range_and_parity()"""
+        return batch_range_and_parity(self.roads, xs, ys, roadIndices, self.segments)
+
+
+def get_bulk_validator(refresh: bool=False) -> BulkAddressValidator:
+    """gets the validator for the NG911 road centerlines, it is built on first use and then kept for the session
+
+    Args:
+        refresh (bool, optional): reread the centerlines. Defaults to False.
+
+    Returns:
+        BulkAddressValidator: the validator
+    """
+    global _bulkValidator
+    from ..env import get_ng911_db
+    table = get_ng911_db().roadCenterlines
+    if refresh or _bulkValidator is None or _bulkValidator.table != table:
+        _bulkValidator = BulkAddressValidator.from_table(table)
+    return _bulkValidator
+
+def clear_bulk_validator():
+    """removes the session validator, the centerlines are reread on next use"""
+    global _bulkValidator
+    _bulkValidator = None
+
+def batch_range_and_parity(roads: FeatureColumns, xs: Iterable[float], ys: Iterable[float], roadIndices: Iterable[int],
+                           segments: SegmentArrays=None) -> Munch:
+    """finds the side of the street, position along the centerline and the address range and parity for
+    many points at once, the batch version of get_range_and_parity().  Each point is measured against
+    every segment of its matched centerline in one vectorized pass.
+
+    Args:
+        roads (FeatureColumns): the road centerlines
+        xs (Iterable[float]): the point x coordinates, in the centerline coordinate system
+        ys (Iterable[float]): the point y coordinates, in the centerline coordinate system
+        roadIndices (Iterable[int]): the matched centerline record for each point, or None
+        segments (SegmentArrays, optional): the centerline segments, pass these when calling more
+            than once for the same roads. Defaults to None (built from the roads).
+
+    Returns:
+        Munch: lists of the side (R|L), parity, from_address, to_address and address_prefix for each point
+            (None without a matched centerline), with arrays of the percent along the centerline, the
+            distance along it and the distance to it
+    """
+    segments = segments if segments is not None else SegmentArrays(roads.shapes)
+    roadIndices = np.array([-1 if r is None else r for r in roadIndices], dtype=np.int64)
+    loc = locate_points(segments, xs, ys, roadIndices)
+    rows = np.maximum(roadIndices, 0)
+
+    def side_values(left: str, right: str) -> list:
+        leftValues = np.asarray(roads.get(left), dtype=object)[rows]
+        rightValues = np.asarray(roads.get(right), dtype=object)[rows]
+        return np.where(loc.matched, np.where(loc.right, rightValues, leftValues), None).tolist()
+
+    return Munch(
+        side=np.where(loc.matched, np.where(loc.right, 'R', 'L'), None).tolist(),
+        parity=side_values(STREET_FIELDS.PARITY_LEFT, STREET_FIELDS.PARITY_RIGHT),
+        from_address=side_values(STREET_FIELDS.FROM_ADDRESS_LEFT, STREET_FIELDS.FROM_ADDRESS_RIGHT),
+        to_address=side_values(STREET_FIELDS.TO_ADDRESS_LEFT, STREET_FIELDS.TO_ADDRESS_RIGHT),
+        address_prefix=side_values(STREET_FIELDS.ADDRESS_PREFIX_LEFT, STREET_FIELDS.ADDRESS_PREFIX_RIGHT),
+        percent=loc.percent,
+        along=loc.along,
+        distance=loc.distance
+    )
@@ -0,0 +1,180 @@
+from typing import List, Iterable, Any
+from ..support.munch import Munch
+from ..utils.columns import FeatureColumns
+from ..spatial.planar import LineLocation
+from ..spatial.grid import SegmentIndex
+from ..logging import log
+from .fields import STREET_FIELDS, STREET_ATTRIBUTES, POINT_SIDE_MAPPING
+from .streets import StreetIndex, FULL_STREET_FIELDS, full_street_name
+
+# the centerline attributes returned for each street, the same as find_closest_centerlines always returned
+CENTERLINE_FIELDS = [
+    STREET_FIELDS.NAME,
+    STREET_FIELDS.POST_TYPE,
+    STREET_FIELDS.FROM_ADDRESS_LEFT,
+    STREET_FIELDS.TO_ADDRESS_LEFT,
+    STREET_FIELDS.FROM_ADDRESS_RIGHT,
+    STREET_FIELDS.TO_ADDRESS_RIGHT,
+]
+
+RANGE_ATTRIBUTES = CENTERLINE_FIELDS[2:]
+
+# the fields read for the index, the full street name is needed to tell streets apart,
+# the parity and address number prefixes to geocode addresses and the street and side
+# attributes to reverse geocode them like merge_street_segment_attributes()
+INDEX_FIELDS = list(dict.fromkeys(CENTERLINE_FIELDS + FULL_STREET_FIELDS + [
+    STREET_FIELDS.PARITY_LEFT,
+    STREET_FIELDS.PARITY_RIGHT,
+    STREET_FIELDS.ADDRESS_PREFIX_LEFT,
+    STREET_FIELDS.ADDRESS_PREFIX_RIGHT,
+] + STREET_ATTRIBUTES + [f"{m['ln']}_{side}" for m in POINT_SIDE_MAPPING for side in ['L', 'R']]))
+
+# the number of streets returned and the search distance in feet
+DEFAULT_STREET_COUNT = 5
+DEFAULT_SEARCH_DISTANCE = 3000
+
+# the index for the current session, see get_centerline_index()
+_centerlineIndex: 'CenterlineIndex' = None
+
+class CenterlineIndex:
+    """in memory nearest neighbour index of the road centerline segments.
+
+    Finds the closest distinct streets to a point without geoprocessing selections,
+    the centerlines are also grouped by full street name in the streets index.  New centerlines are added with add() or update_from_table() so the index does not
+    need to be rebuilt after each commit.
+    """
+    def __init__(self, roads: FeatureColumns, cellSize: float=None):
+        """creates the index
+
+        Args:
+            roads (FeatureColumns): the road centerlines with the INDEX_FIELDS
+            cellSize (float, optional): the grid cell size. Defaults to None (twice the mean segment length).
+        """
+        self.roads = roads
+        self.streets = StreetIndex(roads)
+        self.index = SegmentIndex(roads.shapes, [full_street_name(k) or None for k in self.streets.keys], cellSize)
+        self.maxOID = max(roads.oids, default=0)
+        self.table = None
+        log(f'centerline index built for {len(roads)} centerlines ({len(self.index)} segments)')
+
+    def __len__(self):
+        return len(self.roads)
+
+    def add(self, oid: int, shape: List[List[tuple]], values: Iterable[Any]) -> int:
+        """adds a new centerline
+
+        Args:
+            oid (int): the OBJECTID
+            shape (List[List[tuple]]): the polyline parts
+            values (Iterable[Any]): the attribute values, in the same order as the roads fields
+
+        Returns:
+            int: the record index of the centerline
+        """
+        self.roads.append(oid, shape, values)
+        idx = len(self.roads) - 1
+        street = self.streets.add(idx)
+        self.index.add(idx, shape, street.name if street else None)
+        self.maxOID = max(self.maxOID, oid)
+        return idx
+
+    def describe(self, idx: int, loc: LineLocation) -> Munch:
+        """the attributes for a centerline found near a point
+
+        Args:
+            idx (int): the centerline record index
+            loc (LineLocation): the location of the point along the centerline
+
+        Returns:
+            Munch: the OID@, centerline fields, distance, block, range and side
+        """
+        attrs = Munch({'OID@': self.roads.oids[idx]})
+        for f in CENTERLINE_FIELDS:
+            attrs[f] = self.roads.value(f, idx)
+        numbers = [attrs[f] for f in RANGE_ATTRIBUTES if attrs[f]]
+        attrs.distance = loc.distance
+        attrs.block = round(numbers[0] if numbers else 0, -2)
+        attrs.range = f'{min(numbers)} - {max(numbers)}' if numbers else None
+        attrs.side = loc.side
+        return attrs
+
+    def closest(self, x: float, y: float, k: int=DEFAULT_STREET_COUNT, maxDistance: float=None) -> List[Munch]:
+        """finds the closest centerline of each of the k closest streets
+
+        Args:
+            x (float): the point x, in the centerline coordinate system
+            y (float): the point y, in the centerline coordinate system
+            k (int, optional): the number of streets. Defaults to DEFAULT_STREET_COUNT.
+            maxDistance (float, optional): the search distance in coordinate units. Defaults to None
+                (DEFAULT_SEARCH_DISTANCE feet).
+
+        Returns:
+            List[Munch]: the centerline attributes from describe(), sorted by distance
+        """
+        if maxDistance is None:
+            maxDistance = self.roads.from_feet(DEFAULT_SEARCH_DISTANCE)
+        return [self.describe(idx, loc) for idx, loc in self.index.nearest_k(x, y, k, maxDistance, distinctKeys=True)]
+
+    @classmethod
+    def from_table(cls, table: str, spatial_reference=None) -> 'CenterlineIndex':
+        """reads the centerlines from a table
+
+        Args:
+            table (str): the road centerlines feature class or layer
+            spatial_reference (arcpy.SpatialReference, optional): the coordinate system to index in. Defaults to None.
+
+        Returns:
+            CenterlineIndex: the index
+        """
+        from ..utils import cursors
+        index = cls(cursors.read_columns(table, INDEX_FIELDS, spatial_reference=spatial_reference))
+        index.table = table
+        return index
+
+    def update_from_table(self, table: str=None) -> int:
+        """adds the centerlines created since the index was built or last updated
+
+        Args:
+            table (str, optional): the road centerlines. Defaults to None (the table the index was read from).
+
+        Returns:
+            int: the number of centerlines added
+        """
+        import arcpy
+        from ..utils import cursors
+        table = table or self.table
+        oidField = arcpy.Describe(table).OIDFieldName
+        new = cursors.read_columns(table, self.roads.fields, f'{oidField} > {self.maxOID}', self.roads.spatialReference)
+        for i, oid in enumerate(new.oids):
+            self.add(oid, new.shapes[i], [new.value(f, i) for f in self.roads.fields])
+        if new.oids:
+            log(f'added {len(new)} new centerlines to the centerline index')
+        return len(new)
+
+
+def get_centerline_index(refresh: bool=False) -> CenterlineIndex:
+    """gets the centerline index for the NG911 road centerlines, it is built on first use and then kept
+    for the session.  Centerlines committed with DataSchema.commit_features() are added as they are created.
+
+    Args:
+        refresh (bool, optional): rebuild the index, use after centerlines were edited outside these tools. Defaults to False.
+
+    Returns:
+        CenterlineIndex: the index
+    """
+    global _centerlineIndex
+    from ..env import get_ng911_db
+    table = get_ng911_db().roadCenterlines
+    if refresh or _centerlineIndex is None or _centerlineIndex.table != table:
+        _centerlineIndex = CenterlineIndex.from_table(table)
+    return _centerlineIndex
+
+def update_centerline_index() -> int:
+    """adds new centerlines to the session index, if it has been built
+
+    Returns:
+        int: the number of centerlines added
+    """
+    if _centerlineIndex is None:
+        return 0
+    return _centerlineIndex.update_from_table()
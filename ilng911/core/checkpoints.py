@@ -0,0 +1,69 @@
+import datetime
+import arcpy
+from ..support.munch import munchify, Munch
+from ..env import get_ng911_db
+from ..utils import cursors
+from ..logging import log
+from .database import NG911SchemaTables
+
+CHECKPOINT_FIELDS = ['Name', 'Digest', 'LastOID', 'RecordCount', 'Signature', 'DateUpdate']
+
+def get_checkpoints_table() -> str:
+    """gets the ValidationCheckpoints table, creating it if needed"""
+    return get_ng911_db().ensure_schema_table(NG911SchemaTables.VALIDATION_CHECKPOINTS)
+
+def get_checkpoint(name: str) -> Munch:
+    """fetches a checkpoint
+
+    Args:
+        name (str): the checkpoint name
+
+    Returns:
+        Munch: the checkpoint, or None if it does not exist
+    """
+    with arcpy.da.SearchCursor(get_checkpoints_table(), CHECKPOINT_FIELDS, f"Name = '{name}'") as rows:
+        for r in rows:
+            return munchify(dict(zip(CHECKPOINT_FIELDS, r)))
+    return None
+
+def save_checkpoint(name: str, digest: str=None, lastOID: int=None, recordCount: int=None, signature: str=None, dateUpdate: datetime.datetime=None) -> Munch:
+    """saves a checkpoint, replacing any existing checkpoint with the same name
+
+    Args:
+        name (str): the checkpoint name
+        digest (str, optional): a content hash for the checkpoint. Defaults to None.
+        lastOID (int, optional): the last OBJECTID processed. Defaults to None.
+        recordCount (int, optional): the number of records processed. Defaults to None.
+        signature (str, optional): the signature of the source tables, see cursors.table_signature(). Defaults to None.
+        dateUpdate (datetime.datetime, optional): when the tables were read. Defaults to None (now).
+
+    Returns:
+        Munch: the checkpoint
+    """
+    table = get_checkpoints_table()
+    row = [name, digest, lastOID, recordCount, signature, dateUpdate or datetime.datetime.now()]
+    updated = False
+    with cursors.UpdateCursor(table, CHECKPOINT_FIELDS, f"Name = '{name}'") as rows:
+        for r in rows:
+            if updated:
+                rows.deleteRow()
+            else:
+                rows.updateRow(row)
+                updated = True
+
+    if not updated:
+        with cursors.InsertCursor(table, CHECKPOINT_FIELDS) as irows:
+            irows.insertRow(row)
+    log(f'saved checkpoint "{name}": last OID {lastOID}, {recordCount} records')
+    return munchify(dict(zip(CHECKPOINT_FIELDS, row)))
+
+def clear_checkpoint(name: str):
+    """removes a checkpoint
+
+    Args:
+        name (str): the checkpoint name
+    """
+    with cursors.UpdateCursor(get_checkpoints_table(), ['Name'], f"Name = '{name}'") as rows:
+        for r in rows:
+            rows.deleteRow()
+    log(f'cleared checkpoint "{name}"')
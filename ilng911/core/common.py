@@ -10,6 +10,7 @@ from typing import List
 from .parser import *
 from ..logging import log
 from .fields import NUMERIC_FIELDS, INTEGER_FIELDS, FLOAT_FIELDS
+from ..spatial.projection import get_transformer, spatial_reference_key
 
 SHAPE_PAT = re.compile('^(shape)[@]?', re.I)
 SHAPE_ATTR_PAT = re.compile('^(shape)[@._](\w+)', re.I)
@@ -80,8 +81,8 @@ class Feature(FeatureBase):
     def __init__(self, fields: List[arcpy.Field], geometry: arcpy.Geometry=None, **kwargs):
         
         self.fields = fields
-        self.geometry = geometry
         self.attributes = {}
+        self.geometry = geometry
         
         oid = None
         for fld, val in kwargs.items():
@@ -94,20 +95,30 @@ class Feature(FeatureBase):
 
         if oid:
             kwargs[self.oidField] = oid
-            
-        # set attributes
-        if (LOCATION_FIELDS.LATITUDE in self.fieldNames and LOCATION_FIELDS.LONGITUDE in self.fieldNames) and geometry:
-            if geometry.spatialReference.factoryCode != WGS_84_WKID:
-                wgs84 = geometry.projectAs(arcpy.SpatialReference(WGS_84_WKID))
-            else:
-                wgs84 = geometry
-            kwargs[LOCATION_FIELDS.LATITUDE] = wgs84.centroid.Y
-            kwargs[LOCATION_FIELDS.LONGITUDE] = wgs84.centroid.X
 
         # log(f'kwargs before filtering:\n{json.dumps(kwargs, indent=4, cls=NG911Encoder)}')
         self.attributes.update(self.filter_attrs(kwargs))
         # log(f'filtered kwargs:\n{json.dumps(self.filter_attrs(kwargs), indent=4, cls=NG911Encoder)}')
 
+    @property
+    def geometry(self) -> arcpy.Geometry:
+        return self._geometry
+
+    @geometry.setter
+    def geometry(self, geometry: arcpy.Geometry):
+        # the Lat and Long are calculated from the geometry when they are first needed, see resolve_locations()
+        self._geometry = geometry
+        self._locationPending = bool(geometry) and self.hasLocationFields
+
+    @lazyprop
+    def hasLocationFields(self) -> bool:
+        return LOCATION_FIELDS.LATITUDE in self.fieldNames and LOCATION_FIELDS.LONGITUDE in self.fieldNames
+
+    def resolve_location(self):
+        """calculates the Lat and Long from the geometry if it has not been done yet"""
+        if self._locationPending:
+            resolve_locations([self])
+
     @lazyprop
     def _writable(self):
         return [f for f in self.fieldNames if not SHAPE_ATTR_PAT.match(f)]
@@ -125,13 +136,18 @@ class Feature(FeatureBase):
         Returns:
             the desired attribute
         """
+        if attribute in (LOCATION_FIELDS.LATITUDE, LOCATION_FIELDS.LONGITUDE):
+            self.resolve_location()
         return self.attributes.get(attribute, default)
 
     def update(self, **kwargs):
+        if LOCATION_FIELDS.LATITUDE in kwargs or LOCATION_FIELDS.LONGITUDE in kwargs:
+            self.resolve_location()
         self.attributes.update(self.filter_attrs(kwargs))
 
     def toJson(self) -> Munch:
         """ convert Feature to JSON object """
+        self.resolve_location()
         return munchify(
             dict(
                 attributes=self.attributes,
@@ -209,6 +225,8 @@ class Feature(FeatureBase):
         log(json.dumps(dct, cls=NG911Encoder, indent=2))
 
     def toRow(self, fields: List[str]):
+        if LOCATION_FIELDS.LATITUDE in fields or LOCATION_FIELDS.LONGITUDE in fields:
+            self.resolve_location()
         vals = []
         for f in fields:
             if f in self.attributes:
@@ -218,3 +236,26 @@ class Feature(FeatureBase):
             elif f.lower() == 'oid@':
                 vals.append(self.objectId)
         return vals
+
+
+def resolve_locations(features: List[Feature]):
+    """calculates the Lat and Long of features from the centroid of their geometry.  The centroids are
+    grouped by coordinate system and each group is projected to WGS84 in one batch with a cached transformer.
+
+    Args:
+        features (List[Feature]): the features, ones that already have their location are skipped
+    """
+    groups = {}
+    for ft in features:
+        if not ft._locationPending:
+            continue
+        sr = ft.geometry.spatialReference
+        groups.setdefault(spatial_reference_key(sr), (sr, []))[1].append(ft)
+
+    for sr, group in groups.values():
+        centroids = [ft.geometry.centroid for ft in group]
+        xs, ys = get_transformer(sr, WGS_84_WKID).project([c.X for c in centroids], [c.Y for c in centroids])
+        for ft, x, y in zip(group, xs.tolist(), ys.tolist()):
+            ft.attributes[LOCATION_FIELDS.LATITUDE] = y
+            ft.attributes[LOCATION_FIELDS.LONGITUDE] = x
+            ft._locationPending = False
@@ -4,10 +4,13 @@ from ..support.munch import munchify, Munch
 # from ..schemas import load_schema, DataType
 from ..utils import lazyprop, PropIterator, Singleton, date_to_mil
 from ..utils.cursors import InsertCursor, UpdateCursor
+from ..utils.json_helpers import load_json
+from ..utils.helpers import field_types
 from ..logging import log
+from .identifiers import NenaIdentifierAudit
 from ..config import load_config
 try:
-    from typing import List, TypedDict
+    from typing import List, Dict, TypedDict
 
     class NG911TableInfo(TypedDict):
         Path: str
@@ -52,7 +55,9 @@ class NG911SchemaTables(PropIterator):
         'SpatialJoinFields',
         'SpatialJoinFeatures',
         'ValidatedAddresses',
-        'AddressFlags'
+        'AddressFlags',
+        'ValidationCheckpoints',
+        'AddressRangeFlags'
     ]
 
     NG911_TABLES = 'NG911_Tables'
@@ -63,6 +68,8 @@ class NG911SchemaTables(PropIterator):
     SPATIAL_JOIN_FEATURES = 'SpatialJoinFeatures'
     VALIDATED_ADDRESSES = 'ValidatedAddresses'
     ADDRESS_FLAGS = 'AddressFlags'
+    VALIDATION_CHECKPOINTS = 'ValidationCheckpoints'
+    ADDRESS_RANGE_FLAGS = 'AddressRangeFlags'
 
 class NG911Data(metaclass=Singleton): 
     state = None
@@ -204,6 +211,10 @@ class NG911Data(metaclass=Singleton):
     def validatedAddresses(self) -> str:
         return os.path.join(self.gdb_path, 'ValidatedAddresses') if self.gdb_path else None
 
+    @property
+    def addressRangeFlags(self) -> str:
+        return os.path.join(self.gdb_path, 'AddressRangeFlags') if self.gdb_path else None
+
     @staticmethod
     def get_basename(path: str) -> str:
         """gets the basname for a feature class
@@ -395,9 +406,34 @@ class NG911Data(metaclass=Singleton):
         log(f'set maximum NENA Identifier for "{target}": {uid}')
 
 
+    def audit_nena_identifiers(self, featureTypes: List[str]=None) -> Dict[str, NenaIdentifierAudit]:
+        """audits the NENA identifiers of the 911 tables with a single scan of each table,
+        finding duplicate, missing and malformed identifiers.
+
+        Args:
+            featureTypes (List[str], optional): the feature types to audit. Defaults to None (all 911 tables).
+
+        Returns:
+            Dict[str, NenaIdentifierAudit]: the audits by feature type
+        """
+        audits = {}
+        for info in self.get_911_features():
+            if featureTypes and info.FeatureType not in featureTypes:
+                continue
+            if not info.GUID_Field or not arcpy.Exists(info.Path):
+                log(f'skipping NENA identifier audit for "{info.FeatureType}", no table or GUID field found', level='warn')
+                continue
+            audit = NenaIdentifierAudit(info.FeatureType, info.NENA_PREFIX, self.agencyID)
+            with arcpy.da.SearchCursor(info.Path, ['OID@', info.GUID_Field]) as rows:
+                audit.update(rows)
+            summary = audit.summary()
+            log(f'audited {summary.total} NENA identifiers for "{info.FeatureType}": {summary.duplicates} duplicated, {summary.nulls} missing, {summary.malformed} malformed')
+            audits[info.FeatureType] = audit
+        return audits
+
     def valiate_nena_id_fields(self):
-        # TODO - check for IDs that were maybe added outside of these tools
-        pass
+        """checks for IDs that were maybe added outside of these tools"""
+        return self.audit_nena_identifiers()
 
     def get_table_type(self, path):
         """get the table type from a given path
@@ -442,6 +478,32 @@ class NG911Data(metaclass=Singleton):
         return None
 
 
+    def ensure_schema_table(self, name: str) -> str:
+        """makes sure a schema table matches its JSON definition, for databases created with an
+        older version of these tools the table is created if missing, otherwise any missing fields are added.
+
+        Args:
+            name (str): the schema table name
+
+        Returns:
+            str: the full path to the table
+        """
+        json_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'admin', 'data_structures', f'{name}.json')
+        table = os.path.join(self.gdb_path, name)
+        if not arcpy.Exists(table):
+            # imported here, the admin package depends on this module
+            from ..admin.schemas import features_from_json
+            log(f'creating missing schema table "{name}"')
+            features_from_json(json_file, table)
+            return table
+
+        existing = [f.name.lower() for f in arcpy.ListFields(table)]
+        for fld in load_json(json_file).fields:
+            if fld.name.lower() not in existing and fld.type in field_types:
+                arcpy.management.AddField(table, fld.name, field_types[fld.type], field_length=fld.get('length'), field_alias=fld.alias)
+                log(f'added missing field "{fld.name}" to schema table "{name}"')
+        return table
+
     def get_table_view(self, name: str=NG911SchemaTables.NG911_TABLES, where: str=None, view_name: str=None):
         """creates a table view
 
@@ -0,0 +1,130 @@
+import re
+from typing import List, Dict, Set, Tuple
+from ..support.munch import munchify, Munch
+from ..utils import lazyprop
+from ..utils.columns import FeatureColumns
+from ..logging import log
+from .fields import ADDRESS_FIELDS
+from .parser import STREET_DIRECTIONS_ABBR
+
+# all of these must match for two address points to be considered duplicates
+DUPLICATE_ADDRESS_FIELDS = [
+    ADDRESS_FIELDS.NUMBER_PREFIX,
+    ADDRESS_FIELDS.NUMBER,
+    ADDRESS_FIELDS.NUMBER_SUFFIX,
+    ADDRESS_FIELDS.PRE_MOD,
+    ADDRESS_FIELDS.PRE_DIRECTION,
+    ADDRESS_FIELDS.PRE_TYPE,
+    ADDRESS_FIELDS.PRE_TYPE_SEPERATOR,
+    ADDRESS_FIELDS.NAME,
+    ADDRESS_FIELDS.POST_TYPE,
+    ADDRESS_FIELDS.POST_DIRECTION,
+    ADDRESS_FIELDS.POST_MODIFIER,
+    ADDRESS_FIELDS.BUILDING,
+    ADDRESS_FIELDS.FLOOR,
+    ADDRESS_FIELDS.UNIT,
+    ADDRESS_FIELDS.SEAT,
+]
+
+DIRECTION_FIELDS = [ADDRESS_FIELDS.PRE_DIRECTION, ADDRESS_FIELDS.POST_DIRECTION]
+
+# punctuation that does not change an address ("APT #2." == "APT 2")
+PUNCTUATION_PAT = re.compile(r'[#.,]')
+
+def normalize_key_value(field: str, value) -> str:
+    """normalizes a single address attribute for the duplicate key
+
+    Args:
+        field (str): the address field name
+        value: the attribute value
+
+    Returns:
+        str: the normalized value, or None if empty
+    """
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = ' '.join(PUNCTUATION_PAT.sub(' ', str(value)).upper().split())
+    if field in DIRECTION_FIELDS:
+        value = STREET_DIRECTIONS_ABBR.get(value, value)
+    return value or None
+
+def address_key(attrs: Dict) -> Tuple[str]:
+    """creates a normalized composite key for an address
+
+    Args:
+        attrs (Dict): the address attributes (a dict, Munch or Feature)
+
+    Returns:
+        Tuple[str]: the key, or None if the address has no populated key fields
+    """
+    key = tuple(normalize_key_value(f, attrs.get(f)) for f in DUPLICATE_ADDRESS_FIELDS)
+    return key if any(key) else None
+
+
+class DuplicateAddressIndex:
+    """hash index of normalized address keys, built with a single pass over the address points"""
+    def __init__(self, addresses: FeatureColumns):
+        self.addresses = addresses
+        columns = [[normalize_key_value(f, v) for v in addresses.get(f)] for f in DUPLICATE_ADDRESS_FIELDS]
+        self.keys: List[Tuple[str]] = [k if any(k) else None for k in zip(*columns)]
+        self.index: Dict[Tuple[str], List[int]] = {}
+        for i, key in enumerate(self.keys):
+            if key:
+                self.index.setdefault(key, []).append(i)
+
+    @lazyprop
+    def duplicateGroups(self) -> Dict[Tuple[str], List[int]]:
+        """the keys that are shared by more than one address point"""
+        return {k: idx for k, idx in self.index.items() if len(idx) > 1}
+
+    @lazyprop
+    def duplicateIndices(self) -> Set[int]:
+        """the record indices of every address point that belongs to a duplicate group"""
+        return {i for idx in self.duplicateGroups.values() for i in idx}
+
+    @lazyprop
+    def duplicateOids(self) -> Set[int]:
+        """the OBJECTIDs of every address point that belongs to a duplicate group"""
+        return {self.addresses.oids[i] for i in self.duplicateIndices}
+
+    def is_duplicate(self, index: int) -> bool:
+        """checks if an address point shares its address with another address point
+
+        Args:
+            index (int): the record index
+
+        Returns:
+            bool: True if the address is a duplicate
+        """
+        return index in self.duplicateIndices
+
+    def find(self, attrs: Dict) -> List[int]:
+        """finds the address points that match a given address
+
+        Args:
+            attrs (Dict): the address attributes (a dict, Munch or Feature)
+
+        Returns:
+            List[int]: the matching record indices
+        """
+        return self.index.get(address_key(attrs), [])
+
+
+def find_duplicate_addresses(addresses: FeatureColumns) -> List[Munch]:
+    """finds every group of address points that share the same address
+
+    Args:
+        addresses (FeatureColumns): the address points
+
+    Returns:
+        List[Munch]: the duplicate groups, each with the "address" key values and the "oids" in the group
+    """
+    index = DuplicateAddressIndex(addresses)
+    groups = [
+        dict(address=dict(zip(DUPLICATE_ADDRESS_FIELDS, key)), oids=[addresses.oids[i] for i in idx])
+        for key, idx in index.duplicateGroups.items()
+    ]
+    log(f'found {len(groups)} duplicate address groups containing {len(index.duplicateIndices)} address points')
+    return munchify(groups)
@@ -1,4 +1,5 @@
-from ..support.munch import munchify
+from ..support.munch import munchify, Munch
+from ..utils import PropIterator
 from typing import List
 # from decimal import Decimal
 import datetime
@@ -48,7 +49,7 @@ class STREET_FIELDS(STREET_BASE):
     TO_ADDRESS_LEFT='ToAddr_L'
     TO_ADDRESS_RIGHT='ToAddr_R'
     PARITY_LEFT='Parity_L'
-    PARITY_RIGHT='Parity_L'
+    PARITY_RIGHT='Parity_R'
     PRE_DIRECTION='St_PreDir'
     POST_DIRECTION='St_PosDir'
     COUNTRY_L='Country_L'
@@ -108,6 +109,22 @@ class ADDRESS_FIELDS(STREET_BASE):
     STATE='State'
     COUNTY='County'
 
+# street name attributes copied from a centerline to its address points
+STREET_ATTRIBUTES = [
+    'St_PreMod', 
+    'St_PreDir', 
+    'St_PreTyp', 
+    'St_PreSep', 
+    'St_Name', 
+    'St_PosTyp', 
+    'St_PosDir', 
+    'St_PosMod', 
+    'LSt_PreDir', 
+    'LSt_Name', 
+    'LSt_Type', 
+    'LSt_PosDir'
+]
+
 POINT_SIDE_MAPPING = [
     {
         'pt': 'MSAGComm', 
@@ -156,3 +173,51 @@ ROAD_SIDE_ATTRS = get_road_side_attrs()
 class FIELDS:
     STREET = STREET_FIELDS
     ADDRESS = ADDRESS_FIELDS
+
+# validation flags, these are also the flag fields in the AddressFlags table
+class VALIDATION_FLAGS(PropIterator):
+    __props__ = [
+        "ADDRESS_OUTSIDE_RANGE",
+        "DUPLICATE_ADDRESS",
+        "DUPLICATE_NENA_IDENTIFIER",
+        "INVALID_COUNTY",
+        'INVALID_STATE',
+        "INVALID_ESN",
+        "INVALID_INCORPORATED_MUNICIPALITY",
+        "INVALID_MSAG",
+        "INVALID_PARITY",
+        "INVALID_STREET_NAME",
+        "INVALID_UNINCORPORATED_MUNICIPALITY",
+        "MISSING_NENA_IDENTIFIER",
+        "MISSING_STREET_NAME",
+        "MISSING_ADDRESS_NUMBER",
+        'INVALID_POSTAL_CODE',
+        'INVALID_NEIGHBORHOOD',
+        'INVALID_ADDITIONAL_CODE'
+    ]
+
+    ADDRESS_OUTSIDE_RANGE = 'ADDRESS_OUTSIDE_RANGE'
+    DUPLICATE_ADDRESS = 'DUPLICATE_ADDRESS'
+    DUPLICATE_NENA_IDENTIFIER = 'DUPLICATE_NENA_IDENTIFIER'
+    INVALID_COUNTY = 'INVALID_COUNTY'
+    INVALID_STATE='INVALID_STATE'
+    INVALID_ESN = 'INVALID_ESN'
+    INVALID_INCORPORATED_MUNICIPALITY = 'INVALID_INCORPORATED_MUNICIPALITY'
+    INVALID_MSAG = 'INVALID_MSAG'
+    INVALID_PARITY = 'INVALID_PARITY'
+    INVALID_STREET_NAME = 'INVALID_STREET_NAME'
+    INVALID_UNINCORPORATED_MUNICIPALITY = 'INVALID_UNINCORPORATED_MUNICIPALITY'
+    MISSING_NENA_IDENTIFIER = 'MISSING_NENA_IDENTIFIER'
+    MISSING_STREET_NAME = 'MISSING_STREET_NAME'
+    MISSING_ADDRESS_NUMBER = "MISSING_ADDRESS_NUMBER"
+    INVALID_POSTAL_CODE = 'INVALID_POSTAL_CODE'
+    INVALID_NEIGHBORHOOD='INVALID_NEIGHBORHOOD'
+    INVALID_ADDITIONAL_CODE='INVALID_ADDITIONAL_CODE'
+
+def get_validation_template() -> Munch:
+    return munchify(dict(
+        zip(
+            VALIDATION_FLAGS.__props__, 
+            [0] * len(VALIDATION_FLAGS.__props__)
+        )  
+    ))
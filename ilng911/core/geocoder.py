@@ -0,0 +1,281 @@
+import re
+import itertools
+from typing import List, Dict, Union, Iterable
+from ..support.munch import Munch
+from ..spatial.planar import point_along_polyline, polyline_length
+from ..utils.cache import LRUCache, DEFAULT_CACHE_SIZE, MISSING
+from ..logging import log
+from .fields import STREET_FIELDS, ADDRESS_FIELDS
+from .parser import STREET_DIRECTIONS_ABBR
+from .rules import normalize_value, in_address_range, parity_matches
+from .centerlines import CenterlineIndex
+from .streets import full_street_name
+
+# distance (in feet) the geocoded point is moved off the centerline, toward the side of the street
+DEFAULT_SIDE_OFFSET = 25
+
+# match status codes, the same as the ArcGIS geocoders
+class MATCH_STATUS:
+    MATCHED = 'M'
+    TIED = 'T'
+    UNMATCHED = 'U'
+
+# "N123A" -> address number prefix, number and suffix
+ADDRESS_NUMBER_PAT = re.compile(r'^([A-Z]*?)(\d+)([A-Z]?)$')
+
+PUNCTUATION_PAT = re.compile(r'[#.]')
+
+DIRECTIONS = set(STREET_DIRECTIONS_ABBR.keys()) | set(STREET_DIRECTIONS_ABBR.values())
+
+# [side, from address, to address, parity, address number prefix]
+SIDE_FIELDS = [
+    ['L', STREET_FIELDS.FROM_ADDRESS_LEFT, STREET_FIELDS.TO_ADDRESS_LEFT, STREET_FIELDS.PARITY_LEFT, STREET_FIELDS.ADDRESS_PREFIX_LEFT],
+    ['R', STREET_FIELDS.FROM_ADDRESS_RIGHT, STREET_FIELDS.TO_ADDRESS_RIGHT, STREET_FIELDS.PARITY_RIGHT, STREET_FIELDS.ADDRESS_PREFIX_RIGHT],
+]
+
+# the geocoder for the current session, see get_geocoder()
+_geocoder: 'AddressGeocoder' = None
+
+def parse_address(address: str) -> Munch:
+    """splits a single line address into the address number and street name tokens,
+    anything after a comma (city, state, zip) is ignored.
+
+    Args:
+        address (str): the address, for example "142 N MAIN ST"
+
+    Returns:
+        Munch: the number, prefix, suffix and the street tokens, or None when the address does not start with a number
+    """
+    text = PUNCTUATION_PAT.sub(' ', str(address or '').split(',')[0]).upper()
+    tokens = text.split()
+    match = ADDRESS_NUMBER_PAT.match(tokens[0]) if tokens else None
+    if not match or len(tokens) < 2:
+        return None
+    prefix, number, suffix = match.groups()
+    return Munch(number=int(number), prefix=prefix or None, suffix=suffix or None, tokens=tokens[1:])
+
+def street_candidates(tokens: List[str]) -> List[Dict[str, str]]:
+    """the ways the street tokens can be split into the full street name parts, the splits
+    that use the most parts come first.  "N MAIN ST" can be the pre-direction "N", name "MAIN" and
+    post-type "ST", or the name "N MAIN ST" and so on.
+
+    Args:
+        tokens (List[str]): the street tokens
+
+    Returns:
+        List[Dict[str, str]]: the street attributes for each split
+    """
+    candidates = []
+    for preDir, preType, postType, postDir in itertools.product([True, False], repeat=4):
+        rest = list(tokens)
+        attrs = {}
+        if preDir:
+            if len(rest) < 2 or rest[0] not in DIRECTIONS:
+                continue
+            attrs[STREET_FIELDS.PRE_DIRECTION] = rest.pop(0)
+        if postDir:
+            if len(rest) < 2 or rest[-1] not in DIRECTIONS:
+                continue
+            attrs[STREET_FIELDS.POST_DIRECTION] = rest.pop()
+        if preType:
+            if len(rest) < 2:
+                continue
+            attrs[STREET_FIELDS.PRE_TYPE] = rest.pop(0)
+        if postType:
+            if len(rest) < 2:
+                continue
+            attrs[STREET_FIELDS.POST_TYPE] = rest.pop()
+        attrs[STREET_FIELDS.NAME] = ' '.join(rest)
+        candidates.append(attrs)
+    return sorted(candidates, key=len, reverse=True)
+
+class AddressGeocoder:
+    """interpolates addresses along the road centerline address ranges.
+
+    The street is found in the street index of a CenterlineIndex, then the centerline
+    and side whose range, parity and address number prefix fit the number.  The point is
+    placed proportionally between the from and to address and moved off the centerline
+    toward its side.  Results are cached by the normalized address.
+    """
+    def __init__(self, centerlines: CenterlineIndex, offset: float=DEFAULT_SIDE_OFFSET, cacheSize: int=DEFAULT_CACHE_SIZE):
+        """creates the geocoder
+
+        Args:
+            centerlines (CenterlineIndex): the centerline index, the roads must have the INDEX_FIELDS
+            offset (float, optional): the side offset in feet. Defaults to DEFAULT_SIDE_OFFSET.
+            cacheSize (int, optional): the most results to cache. Defaults to DEFAULT_CACHE_SIZE.
+        """
+        self.centerlines = centerlines
+        self.offset = centerlines.roads.from_feet(offset)
+        self.cache = LRUCache(cacheSize)
+        self._roadCount = len(centerlines.roads)
+
+    def find_ranges(self, number: int, prefix: str, streets: List[Munch]) -> List[Munch]:
+        """finds the centerline sides whose address range holds a number
+
+        Args:
+            number (int): the address number
+            prefix (str): the address number prefix
+            streets (List[Munch]): the streets from the street index
+
+        Returns:
+            List[Munch]: the street, centerline record index, side, from and to address for each match
+        """
+        roads = self.centerlines.roads
+        prefix = normalize_value(prefix)
+        columns = [(side, roads.get(f), roads.get(t), roads.get(p), roads.get(n)) for side, f, t, p, n in SIDE_FIELDS]
+        found = []
+        for street in streets:
+            if not any(lo <= number <= hi for side in ['L', 'R'] for lo, hi in street.ranges[side]):
+                continue
+            for idx in street.roads:
+                for side, fromAddresses, toAddresses, parities, prefixes in columns:
+                    fromAddress, toAddress = fromAddresses[idx], toAddresses[idx]
+                    if not in_address_range(number, fromAddress, toAddress) or not parity_matches(number, parities[idx]):
+                        continue
+                    if prefix != normalize_value(prefixes[idx]):
+                        continue
+                    found.append(Munch(street=street, idx=idx, side=side, from_address=fromAddress, to_address=toAddress))
+        return found
+
+    def interpolate(self, number: int, match: Munch) -> Munch:
+        """places an address number along a centerline
+
+        Args:
+            number (int): the address number
+            match (Munch): the centerline side from find_ranges()
+
+        Returns:
+            Munch: the x, y and percent along the centerline
+        """
+        shape = self.centerlines.roads.shapes[match.idx]
+        low, high = match.from_address, match.to_address
+        # the from address is at the start of the centerline
+        ratio = (number - low) / (high - low) if high != low else 0.5
+        point = point_along_polyline(shape, ratio * polyline_length(shape))
+        if point is None:
+            return None
+        x, y, dx, dy = point
+        # the right side is clockwise from the direction of the line
+        sign = 1 if match.side == 'R' else -1
+        return Munch(x=x + sign * dy * self.offset, y=y - sign * dx * self.offset, percent=ratio * 100)
+
+    def geocode(self, address: Union[str, Dict]) -> Munch:
+        """geocodes an address
+
+        Args:
+            address (Union[str, Dict]): a single line address ("142 N MAIN ST") or the address point
+                attributes (Add_Number, AddNum_Pre and the street name fields)
+
+        Returns:
+            Munch: the status (M|T|U), x, y, street, number, side, roadOID, from_address, to_address,
+                percent and the number of candidates
+        """
+        if len(self.centerlines.roads) != self._roadCount:
+            # centerlines were added, unmatched addresses may match now
+            self.cache.clear()
+            self._roadCount = len(self.centerlines.roads)
+
+        if isinstance(address, str):
+            parsed = parse_address(address)
+            key = parsed and (parsed.prefix, parsed.number, tuple(parsed.tokens))
+        else:
+            parsed = Munch(
+                number=address.get(ADDRESS_FIELDS.NUMBER),
+                prefix=normalize_value(address.get(ADDRESS_FIELDS.NUMBER_PREFIX)),
+                suffix=normalize_value(address.get(ADDRESS_FIELDS.NUMBER_SUFFIX)),
+                attrs={f: address.get(f) for f in [STREET_FIELDS.PRE_DIRECTION, STREET_FIELDS.PRE_TYPE, STREET_FIELDS.NAME, STREET_FIELDS.POST_TYPE, STREET_FIELDS.POST_DIRECTION]}
+            )
+            key = (parsed.prefix, parsed.number, tuple(normalize_value(v) for v in parsed.attrs.values()))
+
+        result = self.cache.get(key) if key else MISSING
+        if result is MISSING:
+            result = self._geocode(parsed)
+            if key:
+                self.cache.put(key, result)
+        return Munch(result, address=address)
+
+    def _geocode(self, parsed: Munch) -> Munch:
+        result = Munch(status=MATCH_STATUS.UNMATCHED, x=None, y=None, street=None, number=None, side=None,
+                       roadOID=None, from_address=None, to_address=None, percent=None, candidates=0)
+        if not parsed or parsed.number is None:
+            return result
+        result.number = parsed.number
+        streets = self.centerlines.streets
+        if 'attrs' in parsed:
+            candidates = [parsed.attrs]
+        else:
+            candidates = street_candidates(parsed.tokens)
+
+        # exact full street names first, then streets that share the parts the address has
+        matches = []
+        for attrs in candidates:
+            street = streets.get(attrs)
+            if street:
+                matches = self.find_ranges(parsed.number, parsed.prefix, [street])
+                if matches:
+                    break
+        if not matches:
+            for attrs in candidates:
+                matches = self.find_ranges(parsed.number, parsed.prefix, streets.find(attrs))
+                if matches:
+                    break
+        if not matches:
+            return result
+
+        match = matches[0]
+        location = self.interpolate(parsed.number, match)
+        if location is None:
+            return result
+        result.update(
+            status=MATCH_STATUS.MATCHED if len(matches) == 1 else MATCH_STATUS.TIED,
+            street=full_street_name(match.street.key),
+            side=match.side,
+            roadOID=self.centerlines.roads.oids[match.idx],
+            from_address=match.from_address,
+            to_address=match.to_address,
+            candidates=len(matches),
+            **location
+        )
+        return result
+
+    def geocode_addresses(self, addresses: Iterable[Union[str, Dict]]) -> List[Munch]:
+        """geocodes a batch of addresses, repeated addresses are only interpolated once
+
+        Args:
+            addresses (Iterable[Union[str, Dict]]): the single line addresses or address attributes
+
+        Returns:
+            List[Munch]: the results from geocode(), in the same order
+        """
+        results = [self.geocode(a) for a in addresses]
+        log(f'geocoded {len(results)} addresses, {sum(1 for r in results if r.status != MATCH_STATUS.UNMATCHED)} were matched')
+        return results
+
+
+def get_geocoder(refresh: bool=False) -> AddressGeocoder:
+    """gets the address geocoder for the session centerline index, see get_centerline_index()
+
+    Args:
+        refresh (bool, optional): rebuild the centerline index and clear the cache. Defaults to False.
+
+    Returns:
+        AddressGeocoder: the geocoder
+    """
+    global _geocoder
+    from .centerlines import get_centerline_index
+    centerlines = get_centerline_index(refresh)
+    if _geocoder is None or _geocoder.centerlines is not centerlines:
+        _geocoder = AddressGeocoder(centerlines)
+    return _geocoder
+
+def geocode_addresses(addresses: Iterable[Union[str, Dict]]) -> List[Munch]:
+    """geocodes addresses against the NG911 road centerlines
+
+    Args:
+        addresses (Iterable[Union[str, Dict]]): the single line addresses or address attributes
+
+    Returns:
+        List[Munch]: the results from AddressGeocoder.geocode(), coordinates are in the road centerline coordinate system
+    """
+    return get_geocoder().geocode_addresses(addresses)
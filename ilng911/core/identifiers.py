@@ -0,0 +1,129 @@
+import re
+from typing import List, Dict, Set, Iterable, Tuple
+from ..support.munch import munchify, Munch
+from ..utils import lazyprop
+from ..utils.columns import FeatureColumns
+
+
+class NenaIdentifierAudit:
+    """streaming audit of the NENA identifiers in a single 911 table.
+
+    Identifiers are counted in a hash table as they are read, so one scan of the
+    GUID column finds every duplicate, null and malformed identifier.  Well formed
+    identifiers follow DataSchema.create_identifier(): "{prefix}{n}@{agencyID}".
+    """
+    def __init__(self, featureType: str=None, prefix: str=None, agencyID: str=None):
+        self.featureType = featureType
+        self.prefix = prefix or ''
+        self.agencyID = agencyID
+        self.identifiers: Dict[str, List[int]] = {}
+        self.nulls: List[int] = []
+        self.malformed: List[int] = []
+        self.maxId = 0
+        agency = re.escape(agencyID) if agencyID else '.+'
+        self.pattern = re.compile(f'^{re.escape(self.prefix)}(\\d+)@{agency}$', re.I)
+
+    def __len__(self):
+        return sum(len(oids) for oids in self.identifiers.values()) + len(self.nulls)
+
+    def add(self, oid: int, guid: str):
+        """adds an identifier to the audit
+
+        Args:
+            oid (int): the OBJECTID of the feature
+            guid (str): the NENA identifier
+        """
+        if guid is None or not str(guid).strip():
+            self.nulls.append(oid)
+            return
+
+        self.identifiers.setdefault(guid, []).append(oid)
+        match = self.pattern.match(guid)
+        if match:
+            num = int(match.group(1))
+            if num > self.maxId:
+                self.maxId = num
+        else:
+            self.malformed.append(oid)
+
+    def update(self, rows: Iterable[Tuple[int, str]]):
+        """adds many (oid, guid) rows to the audit"""
+        for oid, guid in rows:
+            self.add(oid, guid)
+        # new rows invalidate the cached duplicates
+        for prop in ('duplicates', 'duplicateOids'):
+            self.__dict__.pop(prop, None)
+        return self
+
+    @lazyprop
+    def duplicates(self) -> Dict[str, List[int]]:
+        """the identifiers used by more than one feature, with their OBJECTIDs"""
+        return {g: oids for g, oids in self.identifiers.items() if len(oids) > 1}
+
+    @lazyprop
+    def duplicateOids(self) -> Set[int]:
+        """the OBJECTIDs of every feature that shares its identifier"""
+        return {oid for oids in self.duplicates.values() for oid in oids}
+
+    @property
+    def nextId(self) -> int:
+        """the next numeric id for a new identifier, one more than the highest in use"""
+        return self.maxId + 1
+
+    def next_identifier(self) -> str:
+        """creates the next well formed identifier, like DataSchema.create_identifier()
+
+        Returns:
+            str: the identifier, "{prefix}{n}@{agencyID}"
+        """
+        return f'{self.prefix}{self.nextId}@{self.agencyID}'
+
+    def is_duplicate(self, guid: str) -> bool:
+        """checks if an identifier is used by more than one feature
+
+        Args:
+            guid (str): the NENA identifier
+
+        Returns:
+            bool: True if the identifier is a duplicate
+        """
+        return len(self.identifiers.get(guid, [])) > 1
+
+    def copy_duplicates(self) -> 'NenaIdentifierAudit':
+        """returns a lightweight copy that only holds the duplicated identifiers, this is
+        enough for is_duplicate() and is much cheaper to send to another process.
+
+        Returns:
+            NenaIdentifierAudit: the copy
+        """
+        audit = NenaIdentifierAudit(self.featureType, self.prefix, self.agencyID)
+        audit.identifiers = dict(self.duplicates)
+        audit.maxId = self.maxId
+        return audit
+
+    def summary(self) -> Munch:
+        """returns the audit counts"""
+        return munchify(dict(
+            featureType=self.featureType,
+            total=len(self),
+            unique=len(self.identifiers),
+            duplicates=len(self.duplicates),
+            duplicateFeatures=len(self.duplicateOids),
+            nulls=len(self.nulls),
+            malformed=len(self.malformed),
+            maxId=self.maxId,
+            nextId=self.nextId
+        ))
+
+    @classmethod
+    def from_columns(cls, columns: FeatureColumns, guidField: str, **kwargs) -> 'NenaIdentifierAudit':
+        """creates an audit from a table that has already been read into memory
+
+        Args:
+            columns (FeatureColumns): the in memory table
+            guidField (str): the NENA identifier field
+
+        Returns:
+            NenaIdentifierAudit: the audit
+        """
+        return cls(**kwargs).update(zip(columns.oids, columns.get(guidField)))
@@ -0,0 +1,533 @@
+import os
+import time
+import numpy as np
+from typing import List, Dict, Iterable, Any, Hashable, Callable
+from ..support.munch import Munch
+from ..utils.columns import FeatureColumns, FEET_TO_METERS
+from ..utils.cache import LRUCache, DEFAULT_CACHE_SIZE, MISSING
+from ..spatial.polygons import PolygonIndex
+from ..logging import log
+from .fields import ADDRESS_FIELDS
+
+# [NG911 feature type, attribute] of the city limits layers
+CITY_LIMITS_FIELDS = [
+    ['IncorporatedMunicipal', ADDRESS_FIELDS.INC_MUNI],
+    ['UnincorporatedMunicipal', ADDRESS_FIELDS.UNINC_MUNI],
+]
+
+# Inc_Muni for points outside of every incorporated municipality
+UNINCORPORATED = 'UNINCORPORATED'
+
+# the NG911 ZIP code layer and its ZIP code and ZIP+4 fields
+ZIP_CODES_LAYER = 'ZipCodes'
+ZIP_CODE_FIELDS = ['ZipCode', 'ZipCode4']
+
+# USPS ZIP codes bundled with the tools, used where the NG911 ZIP code layer has no polygon, see:
+# https://www.arcgis.com/home/item.html?id=8d2012a2016e484dafaac0451f9aea24
+FALLBACK_ZIP_CODES = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'il_zip_codes.shp')
+FALLBACK_ZIP_CODE_FIELD = 'ZIP_CODE'
+
+class ZIP_SOURCES:
+    AUTHORITATIVE = 'ZipCodes'
+    FALLBACK = 'Fallback'
+
+# the overlay layers for the current session by name, see get_overlay_layer()
+_overlayLayers: Dict[str, 'OverlayLayer'] = {}
+
+# the names that are not in the NG911 data, so they are not looked up again
+_missingLayers = set()
+
+# points within this many feet of each other share cached overlay lookups, see OverlayCache
+DEFAULT_GRID_SIZE = 1
+
+# the source layers are checked for edits at most this often, in seconds
+DEFAULT_CHANGE_CHECK_INTERVAL = 2
+
+# the lookup cache for the current session, see get_overlay_cache()
+_overlayCache: 'OverlayCache' = None
+
+class OverlayLayer:
+    """a polygon layer held in memory with a PolygonIndex, for attributes that come from the
+    polygon a point falls in (city limits, ZIP codes, ESNs...)."""
+    def __init__(self, columns: FeatureColumns, table: str=None):
+        """creates the layer
+
+        Args:
+            columns (FeatureColumns): the polygons and their attributes
+            table (str, optional): the feature class the polygons were read from. Defaults to None.
+        """
+        self.columns = columns
+        self.table = table
+        self.index = PolygonIndex(columns.shapes)
+        # the fields asked for when the layer was read, including ones the table does not have
+        self.requestedFields = list(columns.fields)
+
+    def __len__(self):
+        return len(self.columns)
+
+    @property
+    def fields(self) -> List[str]:
+        return self.columns.fields
+
+    @property
+    def spatialReference(self):
+        return self.columns.spatialReference
+
+    def find(self, x: float, y: float) -> int:
+        """finds the first polygon that contains a point
+
+        Args:
+            x (float): the x coordinate, in the coordinate system of the layer
+            y (float): the y coordinate, in the coordinate system of the layer
+
+        Returns:
+            int: the record index, or None
+        """
+        return self.index.find(x, y)
+
+    def value(self, x: float, y: float, field: str, default: Any=None) -> Any:
+        """gets an attribute of the polygon that contains a point, the default when there is none"""
+        idx = self.index.find(x, y)
+        return default if idx is None else self.columns.value(field, idx)
+
+    def values(self, x: float, y: float, fields: List[str]=None) -> Munch:
+        """gets the attributes of the polygon that contains a point
+
+        Args:
+            x (float): the x coordinate
+            y (float): the y coordinate
+            fields (List[str], optional): the attributes. Defaults to None (every field).
+
+        Returns:
+            Munch: the attributes, None when no polygon contains the point
+        """
+        idx = self.index.find(x, y)
+        if idx is None:
+            return None
+        return Munch({f: self.columns.value(f, idx) for f in (fields or self.fields)})
+
+    def find_many(self, xs: Iterable[float], ys: Iterable[float]) -> np.ndarray:
+        """finds the polygon for a batch of points
+
+        Returns:
+            np.ndarray: the record index of each point, -1 where no polygon contains the point
+        """
+        return self.index.find_many(xs, ys)
+
+    def value_many(self, xs: Iterable[float], ys: Iterable[float], field: str, default: Any=None) -> List[Any]:
+        """gets an attribute of the polygon for a batch of points
+
+        Args:
+            xs (Iterable[float]): the x coordinates
+            ys (Iterable[float]): the y coordinates
+            field (str): the attribute
+            default (Any, optional): the value for points outside of every polygon. Defaults to None.
+
+        Returns:
+            List[Any]: the value for each point
+        """
+        column = self.columns.get(field)
+        return [default if idx < 0 else column[idx] for idx in self.index.find_many(xs, ys).tolist()]
+
+    def project(self, pt) -> tuple:
+        """the x and y of a point in the coordinate system of the layer
+
+        Args:
+            pt (arcpy.PointGeometry): the point
+
+        Returns:
+            tuple: the (x, y)
+        """
+        sr = self.spatialReference
+        if sr and pt.spatialReference and pt.spatialReference.name != sr.name:
+            pt = pt.projectAs(sr)
+        return pt.firstPoint.X, pt.firstPoint.Y
+
+    @classmethod
+    def from_table(cls, table: str, fields: List[str], spatial_reference=None) -> 'OverlayLayer':
+        """reads a polygon layer
+
+        Args:
+            table (str): the polygon feature class or layer
+            fields (List[str]): the attribute fields to read
+            spatial_reference (arcpy.SpatialReference, optional): the coordinate system to read the polygons in. Defaults to None.
+
+        Returns:
+            OverlayLayer: the layer
+        """
+        from ..utils import cursors
+        layer = cls(cursors.read_columns(table, fields, spatial_reference=spatial_reference), table)
+        layer.requestedFields = list(fields)
+        log(f'loaded {len(layer)} overlay polygons from "{table}"')
+        return layer
+
+
+def overlay_signature(table: str) -> tuple:
+    """a signature that changes when an overlay table is edited: the modification time of the nearest file
+    or folder on disk (the shapefile or the file geodatabase, None for enterprise data) and the row count,
+    highest OBJECTID and latest edit date from cursors.table_signature().  Only single rows are read, so
+    it is cheap enough to check while address points are being created.
+
+    Args:
+        table (str): the feature class or layer
+
+    Returns:
+        tuple: the (modification time, table signature)
+    """
+    import arcpy
+    from ..utils import cursors
+    path = arcpy.Describe(table).catalogPath
+    while path and not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    mtime = os.path.getmtime(path) if path and os.path.exists(path) else None
+    return mtime, cursors.table_signature(table)
+
+class OverlayCache:
+    """memoizes overlay lookups (ZIP codes, city limits, ESBs...) for points placed close together.
+
+    Results are keyed by layer and by the point snapped to a grid of gridSize feet, and the least
+    recently used results are dropped once maxSize is reached.  Each layer has a generation that is
+    part of the key, when the source table changes the generation goes up so the old results are
+    never returned again and age out of the cache.
+    """
+    def __init__(self, gridSize: float=DEFAULT_GRID_SIZE, maxSize: int=DEFAULT_CACHE_SIZE, checkInterval: float=DEFAULT_CHANGE_CHECK_INTERVAL):
+        """creates the cache
+
+        Args:
+            gridSize (float, optional): the grid cell size in feet, 0 only shares results for the exact same point. Defaults to DEFAULT_GRID_SIZE.
+            maxSize (int, optional): the most results to keep. Defaults to DEFAULT_CACHE_SIZE.
+            checkInterval (float, optional): the seconds between checks of a source table for edits. Defaults to DEFAULT_CHANGE_CHECK_INTERVAL.
+        """
+        self.gridSize = gridSize
+        self.checkInterval = checkInterval
+        self.cache = LRUCache(maxSize)
+        # the signature, last check time and generation of each layer
+        self.states: Dict[Hashable, Munch] = {}
+
+    def __len__(self):
+        return len(self.cache)
+
+    def key(self, layer: Hashable, x: float, y: float, metersPerUnit: float=1.0, kind: Hashable=None) -> tuple:
+        """the cache key for a point
+
+        Args:
+            layer (Hashable): the layer name
+            x (float): the x coordinate
+            y (float): the y coordinate
+            metersPerUnit (float, optional): meters per coordinate unit of the layer. Defaults to 1.0.
+            kind (Hashable, optional): tells apart different lookups on the same layer, such as the fields. Defaults to None.
+
+        Returns:
+            tuple: the layer, its generation, the kind and the grid cell of the point
+        """
+        state = self.states.get(layer)
+        generation = state.generation if state else 0
+        if not self.gridSize:
+            return (layer, generation, kind, x, y)
+        cell = self.gridSize * FEET_TO_METERS / (metersPerUnit or 1.0)
+        return (layer, generation, kind, round(x / cell), round(y / cell))
+
+    def lookup(self, layer: Hashable, x: float, y: float, compute: Callable[[float, float], Any], metersPerUnit: float=1.0, kind: Hashable=None) -> Any:
+        """gets a cached result, or computes and caches it
+
+        Args:
+            layer (Hashable): the layer name
+            x (float): the x coordinate
+            y (float): the y coordinate
+            compute (Callable[[float, float], Any]): computes the result for the point
+            metersPerUnit (float, optional): meters per coordinate unit of the layer. Defaults to 1.0.
+            kind (Hashable, optional): tells apart different lookups on the same layer, such as the fields. Defaults to None.
+
+        Returns:
+            Any: the result
+        """
+        key = self.key(layer, x, y, metersPerUnit, kind)
+        result = self.cache.get(key)
+        if result is MISSING:
+            result = self.cache.put(key, compute(x, y))
+        return result
+
+    def check(self, layer: Hashable, signature: Callable[[], Hashable]) -> bool:
+        """checks if the source of a layer changed, at most once every checkInterval seconds
+
+        Args:
+            layer (Hashable): the layer name
+            signature (Callable[[], Hashable]): gets the current signature of the source, see overlay_signature()
+
+        Returns:
+            bool: True if the signature changed since the last check, the cached results of the layer are invalidated
+        """
+        now = time.monotonic()
+        state = self.states.get(layer)
+        if state is not None and now - state.checked < self.checkInterval:
+            return False
+        current = signature()
+        changed = state is not None and state.signature != current
+        generation = (state.generation + changed) if state else 0
+        self.states[layer] = Munch(signature=current, checked=now, generation=generation)
+        if changed:
+            log(f'overlay layer "{layer}" changed, its cached lookups are invalidated')
+        return changed
+
+    def reset(self, layer: Hashable, signature: Hashable):
+        """records the signature of a layer that was just read, the results cached before are invalidated
+
+        Args:
+            layer (Hashable): the layer name
+            signature (Hashable): the signature of the source, see overlay_signature()
+        """
+        state = self.states.get(layer)
+        generation = state.generation + 1 if state else 0
+        self.states[layer] = Munch(signature=signature, checked=time.monotonic(), generation=generation)
+
+    def invalidate(self, layer: Hashable=None):
+        """drops the cached results of a layer, or every result when no layer is given"""
+        if layer is None:
+            self.cache.clear()
+            self.states.clear()
+        elif layer in self.states:
+            self.states[layer].generation += 1
+
+    @property
+    def stats(self) -> dict:
+        """the size, hits and misses of the cache"""
+        return self.cache.stats
+
+
+def get_overlay_cache() -> OverlayCache:
+    """gets the overlay lookup cache for the session"""
+    global _overlayCache
+    if _overlayCache is None:
+        _overlayCache = OverlayCache()
+    return _overlayCache
+
+def configure_overlay_cache(gridSize: float=DEFAULT_GRID_SIZE, maxSize: int=DEFAULT_CACHE_SIZE, checkInterval: float=DEFAULT_CHANGE_CHECK_INTERVAL) -> OverlayCache:
+    """replaces the overlay lookup cache for the session, see OverlayCache
+
+    Args:
+        gridSize (float, optional): the grid cell size in feet. Defaults to DEFAULT_GRID_SIZE.
+        maxSize (int, optional): the most results to keep. Defaults to DEFAULT_CACHE_SIZE.
+        checkInterval (float, optional): the seconds between checks of a source table for edits. Defaults to DEFAULT_CHANGE_CHECK_INTERVAL.
+
+    Returns:
+        OverlayCache: the new cache
+    """
+    global _overlayCache
+    _overlayCache = OverlayCache(gridSize, maxSize, checkInterval)
+    return _overlayCache
+
+def get_overlay_layer(name: str, fields: List[str], refresh: bool=False) -> OverlayLayer:
+    """gets an overlay layer, it is read on first use and then kept for the session.  The polygons
+    are read in the coordinate system of the NG911 address points.
+
+    Args:
+        name (str): the NG911 feature type or basename, or the path to a polygon feature class
+        fields (List[str]): the attribute fields needed, the layer is reread when it is missing any
+        refresh (bool, optional): reread the layer, use after it was edited. Defaults to False.
+
+    Returns:
+        OverlayLayer: the layer, None when the NG911 data does not have the layer
+    """
+    if name in _missingLayers and not refresh:
+        return None
+    layer = _overlayLayers.get(name)
+    if layer is not None and layer.table and not refresh and name != FALLBACK_ZIP_CODES:
+        # reread a layer that was edited since it was loaded, the bundled fallback ZIP codes never change
+        refresh = get_overlay_cache().check(name, lambda: overlay_signature(layer.table))
+    if refresh or layer is None or any(f not in layer.requestedFields for f in fields):
+        import arcpy
+        from ..env import get_ng911_db
+        ng911_db = get_ng911_db()
+        table = ng911_db.get_911_table(name) or (name if arcpy.Exists(name) else None)
+        if not table:
+            _missingLayers.add(name)
+            return None
+        _missingLayers.discard(name)
+        if layer is not None and layer.table == table:
+            fields = list(dict.fromkeys(layer.requestedFields + list(fields)))
+        sr = arcpy.Describe(ng911_db.addressPoints).spatialReference
+        layer = _overlayLayers[name] = OverlayLayer.from_table(table, fields, sr)
+        get_overlay_cache().reset(name, overlay_signature(table) if name != FALLBACK_ZIP_CODES else None)
+    return layer
+
+class ZipCodeService:
+    """answers the Post_Code and Post_Code4 of points from the NG911 ZIP code layer, and from the
+    bundled USPS ZIP codes where the NG911 layer has no polygon.  Both layers are held in memory.
+    """
+    def __init__(self, zipCodes: OverlayLayer=None, fallback: OverlayLayer=None):
+        """creates the service
+
+        Args:
+            zipCodes (OverlayLayer, optional): the NG911 ZIP code layer with the ZIP_CODE_FIELDS. Defaults to None.
+            fallback (OverlayLayer, optional): the fallback ZIP codes with the FALLBACK_ZIP_CODE_FIELD. Defaults to None.
+        """
+        self.zipCodes = zipCodes
+        self.fallback = fallback
+
+    def lookup(self, x: float, y: float) -> Munch:
+        """gets the ZIP code for a point
+
+        Args:
+            x (float): the x coordinate, in the coordinate system of the layers
+            y (float): the y coordinate, in the coordinate system of the layers
+
+        Returns:
+            Munch: the Post_Code, Post_Code4 and the source that answered (ZIP_SOURCES), None values when neither layer has the point
+        """
+        if self.zipCodes:
+            idx = self.zipCodes.find(x, y)
+            if idx is not None:
+                return self._result(self.zipCodes, idx)
+        if self.fallback:
+            idx = self.fallback.find(x, y)
+            if idx is not None:
+                return self._result(self.fallback, idx)
+        return Munch(Post_Code=None, Post_Code4=None, source=None)
+
+    def lookup_many(self, xs: Iterable[float], ys: Iterable[float]) -> List[Munch]:
+        """gets the ZIP codes for a batch of points, only the points the NG911 layer misses are checked in the fallback
+
+        Args:
+            xs (Iterable[float]): the x coordinates
+            ys (Iterable[float]): the y coordinates
+
+        Returns:
+            List[Munch]: the results from lookup() for each point
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        results = [None] * len(xs)
+        missing = np.arange(len(xs))
+        for layer in (self.zipCodes, self.fallback):
+            if not layer or not missing.size:
+                continue
+            found = layer.find_many(xs[missing], ys[missing])
+            for i, idx in zip(missing[found >= 0].tolist(), found[found >= 0].tolist()):
+                results[i] = self._result(layer, idx)
+            missing = missing[found < 0]
+        for i in missing.tolist():
+            results[i] = Munch(Post_Code=None, Post_Code4=None, source=None)
+        return results
+
+    def _result(self, layer: OverlayLayer, idx: int) -> Munch:
+        if layer is self.zipCodes:
+            return Munch(
+                Post_Code=layer.columns.value(ZIP_CODE_FIELDS[0], idx),
+                Post_Code4=layer.columns.value(ZIP_CODE_FIELDS[1], idx),
+                source=ZIP_SOURCES.AUTHORITATIVE
+            )
+        return Munch(Post_Code=layer.columns.value(FALLBACK_ZIP_CODE_FIELD, idx), Post_Code4=None, source=ZIP_SOURCES.FALLBACK)
+
+    def project(self, pt) -> tuple:
+        """the x and y of a point in the coordinate system of the layers"""
+        layer = self.zipCodes or self.fallback
+        return layer.project(pt) if layer else (pt.firstPoint.X, pt.firstPoint.Y)
+
+
+def get_zip_code_service(refresh: bool=False) -> ZipCodeService:
+    """gets the ZIP code service for the session, see get_overlay_layer()
+
+    Args:
+        refresh (bool, optional): reread both layers. Defaults to False.
+
+    Returns:
+        ZipCodeService: the service
+    """
+    return ZipCodeService(
+        get_overlay_layer(ZIP_CODES_LAYER, ZIP_CODE_FIELDS, refresh),
+        get_overlay_layer(FALLBACK_ZIP_CODES, [FALLBACK_ZIP_CODE_FIELD], refresh)
+    )
+
+def get_zip_code(pt) -> Munch:
+    """gets the ZIP code for a point, lookups are cached for the session, see get_overlay_cache()
+
+    Args:
+        pt (arcpy.PointGeometry): the point, it is projected to the coordinate system of the layers when needed
+
+    Returns:
+        Munch: the Post_Code, Post_Code4 and the source that answered (ZIP_SOURCES)
+    """
+    service = get_zip_code_service()
+    layer = service.zipCodes or service.fallback
+    if layer is None:
+        return service.lookup(*service.project(pt))
+    x, y = service.project(pt)
+    return Munch(get_overlay_cache().lookup(ZIP_CODES_LAYER, x, y, service.lookup, layer.columns.metersPerUnit))
+
+def get_zip_codes_many(xs: Iterable[float], ys: Iterable[float]) -> List[Munch]:
+    """gets the ZIP codes for a batch of points
+
+    Args:
+        xs (Iterable[float]): the x coordinates, in the coordinate system of the NG911 address points
+        ys (Iterable[float]): the y coordinates, in the coordinate system of the NG911 address points
+
+    Returns:
+        List[Munch]: the Post_Code, Post_Code4 and source for each point
+    """
+    return get_zip_code_service().lookup_many(xs, ys)
+
+def clear_overlay_layers():
+    """removes every overlay layer from the session, they are reread on next use"""
+    _overlayLayers.clear()
+    _missingLayers.clear()
+    if _overlayCache is not None:
+        _overlayCache.invalidate()
+
+def get_city_limits_many(xs: Iterable[float], ys: Iterable[float]) -> List[Dict[str, str]]:
+    """gets the city limits for a batch of points
+
+    Args:
+        xs (Iterable[float]): the x coordinates, in the coordinate system of the NG911 address points
+        ys (Iterable[float]): the y coordinates, in the coordinate system of the NG911 address points
+
+    Returns:
+        List[Dict[str, str]]: the Inc_Muni and Uninc_Comm for each point
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    columns = []
+    for name, field in CITY_LIMITS_FIELDS:
+        layer = get_overlay_layer(name, [field])
+        default = UNINCORPORATED if field == ADDRESS_FIELDS.INC_MUNI else None
+        columns.append(layer.value_many(xs, ys, field, default) if layer else [default] * len(xs))
+    return [dict(zip([field for _, field in CITY_LIMITS_FIELDS], values)) for values in zip(*columns)]
+
+def get_city_limits(pt) -> Dict[str, str]:
+    """gets the city limits for a point, lookups are cached for the session, see get_overlay_cache()
+
+    Args:
+        pt (arcpy.PointGeometry): the point, it is projected to the coordinate system of the layers when needed
+
+    Returns:
+        Dict[str, str]: the Inc_Muni and Uninc_Comm
+    """
+    attrs = {}
+    cache = get_overlay_cache()
+    for name, field in CITY_LIMITS_FIELDS:
+        layer = get_overlay_layer(name, [field])
+        default = UNINCORPORATED if field == ADDRESS_FIELDS.INC_MUNI else None
+        if layer is None:
+            attrs[field] = default
+            continue
+        x, y = layer.project(pt)
+        attrs[field] = cache.lookup(name, x, y, lambda x, y: layer.value(x, y, field, default), layer.columns.metersPerUnit, field)
+    return attrs
+
+def get_overlay_values(name: str, fields: List[str], pt) -> Munch:
+    """gets the attributes of the polygon a point falls in from any overlay layer, such as the ESB or
+    PSAP boundaries.  Lookups are cached for the session, see get_overlay_cache().
+
+    Args:
+        name (str): the NG911 feature type or basename, or the path to a polygon feature class
+        fields (List[str]): the attributes
+        pt (arcpy.PointGeometry): the point, it is projected to the coordinate system of the layer when needed
+
+    Returns:
+        Munch: the attributes, None when the layer does not exist or no polygon contains the point
+    """
+    layer = get_overlay_layer(name, fields)
+    if layer is None:
+        return None
+    x, y = layer.project(pt)
+    result = get_overlay_cache().lookup(name, x, y, lambda x, y: layer.values(x, y, fields), layer.columns.metersPerUnit, tuple(fields))
+    return Munch(result) if result is not None else None
@@ -0,0 +1,162 @@
+import os
+import sys
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Iterable, Iterator, Set, Tuple, Dict
+from ..support.munch import Munch
+from ..utils.columns import FeatureColumns
+from ..logging import log, timeit
+from .bulk import BulkAddressValidator, SEARCH_DISTANCES
+from .identifiers import NenaIdentifierAudit
+from .rules import ValidationRuleRegistry, DEFAULT_RULES
+from .duplicates import DuplicateAddressIndex
+from .fields import ADDRESS_FIELDS
+
+# below this many address points the cost of starting the worker processes outweighs the gain
+MIN_PARALLEL_RECORDS = 5000
+
+# shards per worker, a few extra shards keep the workers busy when some areas are denser than others
+SHARDS_PER_PROCESS = 4
+
+# the road validator for a worker process, built once by the pool initializer
+_validator: BulkAddressValidator = None
+
+def _init_worker(roads: FeatureColumns, searchDistances: List[float], rules: ValidationRuleRegistry):
+    global _validator
+    _validator = BulkAddressValidator(roads, searchDistances, rules)
+
+def _validate_shard(addresses: FeatureColumns, nenaAudit: NenaIdentifierAudit, duplicateOids: Set[int], enabled: List[str], disabled: List[str]) -> Tuple[List[Munch], Dict[str, float]]:
+    # the rule timings are sent back with the results, only the time spent on this shard
+    _validator.rules.reset_timings()
+    results = _validator.validate(addresses, nenaAudit=nenaAudit, duplicateOids=duplicateOids, enabled=enabled, disabled=disabled)
+    return results, _validator.rules.timings
+
+def set_python_executable():
+    """sets the python executable for new processes.  Inside ArcGIS Pro sys.executable
+    is ArcGISPro.exe, so workers must be started with the pythonw.exe of the Pro environment.
+    """
+    if os.name != 'nt':
+        return
+    exe = os.path.join(sys.exec_prefix, 'pythonw.exe')
+    if os.path.exists(exe) and os.path.basename(sys.executable).lower() not in ('python.exe', 'pythonw.exe'):
+        multiprocessing.set_executable(exe)
+
+def shard_by_oid(addresses: FeatureColumns, indices: Iterable[int], shards: int) -> List[List[int]]:
+    """splits records into contiguous OBJECTID ranges
+
+    Args:
+        addresses (FeatureColumns): the address points
+        indices (Iterable[int]): the records to split
+        shards (int): the number of shards
+
+    Returns:
+        List[List[int]]: the record indices for each shard
+    """
+    ordered = sorted(indices, key=lambda i: addresses.oids[i])
+    size = max(1, -(-len(ordered) // max(1, shards)))
+    return [ordered[i:i+size] for i in range(0, len(ordered), size)]
+
+def iter_validate_parallel(roads: FeatureColumns, addresses: FeatureColumns, indices: Iterable[int]=None, nenaAudit: NenaIdentifierAudit=None,
+                           processes: int=None, searchDistances: List[float]=SEARCH_DISTANCES, duplicateOids: Set[int]=None,
+                           rules: ValidationRuleRegistry=None, enabled: Iterable[str]=None, disabled: Iterable[str]=None,
+                           chunkSize: int=None) -> Iterator[Tuple[List[Munch], Dict[str, float]]]:
+    """validates address points in worker processes, yielding the results one OBJECTID range at a time.
+
+    Each worker builds a read only road validator once, validates OBJECTID range shards
+    of the address points and returns the flag rows.  Duplicate checks need the whole
+    layer, so they are computed once here before the shards are sent out.  Nothing is
+    written by the workers, the caller is the only writer.  Shards are yielded in OBJECTID
+    order as they finish, so a caller can save its progress after each one.
+
+    Args:
+        roads (FeatureColumns): the road centerlines
+        addresses (FeatureColumns): the address points, in the same coordinate system as the roads
+        indices (Iterable[int], optional): the records to validate. Defaults to None (all addresses).
+        nenaAudit (NenaIdentifierAudit, optional): an existing identifier audit. Defaults to None.
+        processes (int, optional): the number of worker processes. Defaults to None (the cpu count).
+        searchDistances (List[float], optional): the road search distances in feet. Defaults to SEARCH_DISTANCES.
+        duplicateOids (Set[int], optional): the OBJECTIDs of every duplicate address. Defaults to None (found from the addresses).
+        rules (ValidationRuleRegistry, optional): the validation rules, its timings are reset and the worker timings are added to it. Defaults to None (DEFAULT_RULES).
+        enabled (Iterable[str], optional): only run the rules for these flags. Defaults to None (all rules).
+        disabled (Iterable[str], optional): skip the rules for these flags. Defaults to None.
+        chunkSize (int, optional): the most address points in each shard. Defaults to None (the records
+            are split evenly between SHARDS_PER_PROCESS shards per process).
+
+    Yields:
+        Tuple[List[Munch], Dict[str, float]]: the results for a shard, in the same form as
+            BulkAddressValidator.validate(), and the seconds spent on each rule for the shard
+    """
+    indices = list(range(len(addresses)) if indices is None else indices)
+    processes = processes or os.cpu_count() or 1
+    rules = rules if rules is not None else DEFAULT_RULES
+    # the timings are for this run only, not every run since the registry was created
+    rules.reset_timings()
+    enabled = list(enabled) if enabled is not None else None
+    disabled = list(disabled or [])
+    if duplicateOids is None:
+        duplicateOids = DuplicateAddressIndex(addresses).duplicateOids
+    if nenaAudit is None:
+        nenaAudit = NenaIdentifierAudit.from_columns(addresses, ADDRESS_FIELDS.GUID)
+
+    serial = processes < 2 or len(indices) < MIN_PARALLEL_RECORDS
+    shardCount = 1 if serial else processes * SHARDS_PER_PROCESS
+    if chunkSize:
+        shardCount = max(shardCount, -(-len(indices) // chunkSize))
+    shards = shard_by_oid(addresses, indices, shardCount)
+
+    if serial:
+        validator = BulkAddressValidator(roads, searchDistances, rules)
+        for shard in shards:
+            before = dict(rules.timings)
+            results = validator.validate(addresses, shard, nenaAudit, duplicateOids, enabled, disabled)
+            yield results, {k: v - before.get(k, 0.0) for k, v in rules.timings.items()}
+        return
+
+    nenaDuplicates = nenaAudit.copy_duplicates()
+    log(f'validating {len(indices)} address points in {len(shards)} shards with {processes} processes')
+
+    set_python_executable()
+    with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(roads, searchDistances, rules)) as pool:
+        futures = []
+        for shard in shards:
+            subset = addresses.take(shard)
+            shardDuplicates = duplicateOids.intersection(subset.oids)
+            futures.append(pool.submit(_validate_shard, subset, nenaDuplicates, shardDuplicates, enabled, disabled))
+        for shard, future in zip(shards, futures):
+            results, timings = future.result()
+            rules.add_timings(timings)
+            for res in results:
+                # map the shard index back to the full table
+                res.index = shard[res.index]
+            yield results, timings
+
+@timeit
+def validate_parallel(roads: FeatureColumns, addresses: FeatureColumns, indices: Iterable[int]=None, nenaAudit: NenaIdentifierAudit=None,
+                      processes: int=None, searchDistances: List[float]=SEARCH_DISTANCES, duplicateOids: Set[int]=None,
+                      rules: ValidationRuleRegistry=None, enabled: Iterable[str]=None, disabled: Iterable[str]=None) -> List[Munch]:
+    """validates address points in worker processes, see iter_validate_parallel()
+
+    Args:
+        roads (FeatureColumns): the road centerlines
+        addresses (FeatureColumns): the address points, in the same coordinate system as the roads
+        indices (Iterable[int], optional): the records to validate. Defaults to None (all addresses).
+        nenaAudit (NenaIdentifierAudit, optional): an existing identifier audit. Defaults to None.
+        processes (int, optional): the number of worker processes. Defaults to None (the cpu count).
+        searchDistances (List[float], optional): the road search distances in feet. Defaults to SEARCH_DISTANCES.
+        duplicateOids (Set[int], optional): the OBJECTIDs of every duplicate address. Defaults to None (found from the addresses).
+        rules (ValidationRuleRegistry, optional): the validation rules, its timings are reset and the worker timings are added to it. Defaults to None (DEFAULT_RULES).
+        enabled (Iterable[str], optional): only run the rules for these flags. Defaults to None (all rules).
+        disabled (Iterable[str], optional): skip the rules for these flags. Defaults to None.
+
+    Returns:
+        List[Munch]: the results, in the same form as BulkAddressValidator.validate()
+    """
+    results = []
+    shards = iter_validate_parallel(
+        roads, addresses, indices, nenaAudit, processes, searchDistances, duplicateOids, rules, enabled, disabled
+    )
+    for shardResults, timings in shards:
+        results.extend(shardResults)
+    results.sort(key=lambda r: r.index)
+    log(f'validated {len(results)} address points, {sum(1 for r in results if r.flags.FLAG_COUNT)} were flagged')
+    return results
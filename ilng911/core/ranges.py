@@ -0,0 +1,122 @@
+from typing import List, Dict, Tuple
+from ..support.munch import Munch
+from ..utils.columns import FeatureColumns
+from ..logging import log
+from .fields import STREET_FIELDS
+from .streets import FULL_STREET_FIELDS, full_street_key, full_street_name
+from .rules import normalize_value
+
+# [side, from address, to address, parity, MSAG community]
+RANGE_SIDE_FIELDS = [
+    ['L', STREET_FIELDS.FROM_ADDRESS_LEFT, STREET_FIELDS.TO_ADDRESS_LEFT, STREET_FIELDS.PARITY_LEFT, STREET_FIELDS.MSAG_COM_L],
+    ['R', STREET_FIELDS.FROM_ADDRESS_RIGHT, STREET_FIELDS.TO_ADDRESS_RIGHT, STREET_FIELDS.PARITY_RIGHT, STREET_FIELDS.MSAG_COM_R],
+]
+
+# fields read from the road centerlines for the range checks
+RANGE_CHECK_FIELDS = list(dict.fromkeys(
+    [STREET_FIELDS.GUID] + FULL_STREET_FIELDS + [f for side in RANGE_SIDE_FIELDS for f in side[1:]]
+))
+
+class RANGE_ISSUES:
+    RANGE_OVERLAP = 'RANGE_OVERLAP'
+    PARITY_CONFLICT = 'PARITY_CONFLICT'
+
+def parity_code(parity: str) -> str:
+    """the one letter parity code (O|E|B|Z), None when empty"""
+    return (normalize_value(parity) or '')[:1] or None
+
+def range_parity_conflict(fromAddress: int, toAddress: int, parity: str) -> bool:
+    """checks if the ends of a range disagree with each other or with the parity of the range
+
+    Args:
+        fromAddress (int): the from address
+        toAddress (int): the to address
+        parity (str): the parity code
+
+    Returns:
+        bool: True if the range has a parity conflict
+    """
+    code = parity_code(parity)
+    if code == 'O':
+        return fromAddress % 2 == 0 or toAddress % 2 == 0
+    if code == 'E':
+        return fromAddress % 2 == 1 or toAddress % 2 == 1
+    if code == 'B':
+        return False
+    return fromAddress % 2 != toAddress % 2
+
+def parities_overlap(a: str, b: str) -> bool:
+    """checks if two ranges with these parities can hold the same numbers"""
+    a, b = parity_code(a), parity_code(b)
+    return a == b or a in (None, 'B', 'Z') or b in (None, 'B', 'Z')
+
+def group_ranges(roads: FeatureColumns) -> Dict[Tuple, List[Tuple]]:
+    """groups the centerline ranges by full street name, MSAG community and side
+
+    Args:
+        roads (FeatureColumns): the road centerlines with the RANGE_CHECK_FIELDS
+
+    Returns:
+        Dict[Tuple, List[Tuple]]: the (low, high, parity, record index) ranges for each (street key, MSAG, side),
+            unaddressed sides (both ends empty or 0) are left out
+    """
+    groups: Dict[Tuple, List[Tuple]] = {}
+    streetColumns = [roads.get(f) for f in FULL_STREET_FIELDS]
+    sideColumns = [(side, roads.get(f), roads.get(t), roads.get(p), roads.get(m)) for side, f, t, p, m in RANGE_SIDE_FIELDS]
+    for idx in range(len(roads)):
+        key = full_street_key(dict(zip(FULL_STREET_FIELDS, (col[idx] for col in streetColumns))))
+        if key is None:
+            continue
+        for side, froms, tos, parities, msags in sideColumns:
+            numbers = [n for n in (froms[idx], tos[idx]) if n]
+            if not numbers:
+                continue
+            groups.setdefault((key, normalize_value(msags[idx]), side), []).append((min(numbers), max(numbers), parities[idx], idx))
+    return groups
+
+def find_range_conflicts(roads: FeatureColumns) -> List[Munch]:
+    """finds overlapping address ranges and parity conflicts on the same street, MSAG community and side.
+
+    The ranges of each group are sorted and swept once, each range is compared with the earlier range
+    that reaches the highest number so far, which is the one it is most likely to overlap.  Overlapping
+    ranges with parities that cannot share numbers (odd and even) are parity conflicts, as are single
+    ranges whose ends do not match their parity.
+
+    Args:
+        roads (FeatureColumns): the road centerlines with the RANGE_CHECK_FIELDS
+
+    Returns:
+        List[Munch]: the issue, street, msag, side, the record index, OID@ and range of the centerline and the
+            other centerline (None for single range parity conflicts)
+    """
+    oids = roads.oids
+    found = []
+    def issue(kind, key, msag, side, current, other=None):
+        found.append(Munch(
+            issue=kind,
+            street=full_street_name(key),
+            msag=msag,
+            side=side,
+            index=current[3],
+            oid=oids[current[3]],
+            range=current[:2],
+            otherIndex=other[3] if other else None,
+            otherOid=oids[other[3]] if other else None,
+            otherRange=other[:2] if other else None,
+        ))
+
+    for (key, msag, side), ranges in group_ranges(roads).items():
+        ranges.sort(key=lambda r: (r[0], r[1], r[3]))
+        reach = None
+        for current in ranges:
+            low, high, parity, idx = current
+            if range_parity_conflict(low, high, parity):
+                issue(RANGE_ISSUES.PARITY_CONFLICT, key, msag, side, current)
+            if reach is not None and low <= reach[1]:
+                kind = RANGE_ISSUES.RANGE_OVERLAP if parities_overlap(parity, reach[2]) else RANGE_ISSUES.PARITY_CONFLICT
+                issue(kind, key, msag, side, current, reach)
+            if reach is None or high > reach[1]:
+                reach = current
+    log(f'found {sum(1 for f in found if f.issue == RANGE_ISSUES.RANGE_OVERLAP)} overlapping address ranges and '
+        f'{sum(1 for f in found if f.issue == RANGE_ISSUES.PARITY_CONFLICT)} parity conflicts')
+    return found
@@ -0,0 +1,196 @@
+import numpy as np
+from typing import List, Dict
+from ..support.munch import Munch
+from ..utils.columns import FeatureColumns
+from ..logging import log, timeit
+from .fields import ADDRESS_FIELDS, POINT_SIDE_MAPPING
+from .streets import FULL_STREET_FIELDS
+from .centerlines import CenterlineIndex, DEFAULT_SEARCH_DISTANCE
+from .overlays import OverlayLayer, ZipCodeService, CITY_LIMITS_FIELDS, UNINCORPORATED, get_overlay_cache
+from .spatial_join import SpatialJoinEngine, is_empty
+
+# the address point attributes that come from the side of the street centerline, see merge_street_segment_attributes()
+SIDE_FIELDS = [m['pt'] for m in POINT_SIDE_MAPPING]
+
+# the address point attributes that come from the city limits and ZIP code layers
+CITY_LIMITS_ATTRIBUTES = [field for _, field in CITY_LIMITS_FIELDS]
+ZIP_CODE_ATTRIBUTES = [ADDRESS_FIELDS.POST_CODE, ADDRESS_FIELDS.POST_CODE_4]
+
+# every attribute refresh_address_overlays() can recompute, besides the registered spatial join fields
+OVERLAY_ATTRIBUTES = list(dict.fromkeys(SIDE_FIELDS + CITY_LIMITS_ATTRIBUTES + ZIP_CODE_ATTRIBUTES))
+
+class AddressOverlayRefresher:
+    """recomputes the address point attributes that come from overlays for many address points at once,
+    the same way a new address point gets them in create_address_point():
+
+    1. the side attributes (MSAGComm, ESN, Inc_Muni...) of the closest centerline of the address's street
+    2. the city limits where the centerline has no Inc_Muni
+    3. the ZIP code layers where the centerline has no Post_Code
+    4. the spatial join fields registered for address points
+
+    Values that cannot be found are None so the current values are kept.
+    """
+    def __init__(self, centerlines: CenterlineIndex=None, cityLimits: Dict[str, OverlayLayer]=None,
+                 zipCodes: ZipCodeService=None, spatialJoins: SpatialJoinEngine=None, searchDistance: float=DEFAULT_SEARCH_DISTANCE):
+        """creates the refresher
+
+        Args:
+            centerlines (CenterlineIndex, optional): the road centerlines. Defaults to None.
+            cityLimits (Dict[str, OverlayLayer], optional): the city limits layers by NG911 feature type, see CITY_LIMITS_FIELDS. Defaults to None.
+            zipCodes (ZipCodeService, optional): the ZIP codes. Defaults to None.
+            spatialJoins (SpatialJoinEngine, optional): the spatial join fields for address points. Defaults to None.
+            searchDistance (float, optional): how far an address can be from its street, in feet. Defaults to DEFAULT_SEARCH_DISTANCE.
+        """
+        self.centerlines = centerlines
+        self.cityLimits = cityLimits or {}
+        self.zipCodes = zipCodes
+        self.spatialJoins = spatialJoins
+        self.searchDistance = searchDistance
+
+    @property
+    def fields(self) -> List[str]:
+        """the attributes that can be recomputed"""
+        fields = OVERLAY_ATTRIBUTES[:]
+        if self.spatialJoins is not None:
+            fields.extend(self.spatialJoins.targetFields)
+        return list(dict.fromkeys(fields))
+
+    def street_sides(self, addresses: FeatureColumns, xs: np.ndarray, ys: np.ndarray) -> Munch:
+        """gets the side attributes from the closest centerline of each address's street
+
+        Args:
+            addresses (FeatureColumns): the address points with the FULL_STREET_FIELDS
+            xs (np.ndarray): the x coordinates, in the coordinate system of the centerlines
+            ys (np.ndarray): the y coordinates, in the coordinate system of the centerlines
+
+        Returns:
+            Munch: a list of values for each of the SIDE_FIELDS, None where no centerline of the street was found
+        """
+        columns = Munch({f: [None] * len(addresses) for f in SIDE_FIELDS})
+        if self.centerlines is None:
+            return columns
+        roads = self.centerlines.roads
+        maxDistance = roads.from_feet(self.searchDistance)
+        for i in range(len(addresses)):
+            x, y = float(xs[i]), float(ys[i])
+            if np.isnan(x) or np.isnan(y):
+                continue
+            best, bestLoc = None, None
+            for street in self.centerlines.streets.find({f: addresses.value(f, i) for f in FULL_STREET_FIELDS}):
+                idx, loc = self.centerlines.index.nearest(x, y, maxDistance, key=street.name)
+                if idx is not None and (bestLoc is None or loc.distance < bestLoc.distance):
+                    best, bestLoc = idx, loc
+            if best is not None:
+                for mapping in POINT_SIDE_MAPPING:
+                    columns[mapping['pt']][i] = roads.value(f"{mapping['ln']}_{bestLoc.side}", best)
+        return columns
+
+    def compute(self, addresses: FeatureColumns, roadCoords: tuple=None) -> Munch:
+        """recomputes the attributes of a batch of address points
+
+        Args:
+            addresses (FeatureColumns): the address points with the FULL_STREET_FIELDS, in the coordinate system of the overlay layers
+            roadCoords (tuple, optional): the (xs, ys) in the coordinate system of the centerlines. Defaults to None (the same as the address points).
+
+        Returns:
+            Munch: a list of values for each of the fields, in the order of the address points
+        """
+        n = len(addresses)
+        xs = np.array([s[0] if s else np.nan for s in addresses.shapes], dtype=np.float64)
+        ys = np.array([s[1] if s else np.nan for s in addresses.shapes], dtype=np.float64)
+        rxs, rys = roadCoords or (xs, ys)
+        columns = self.street_sides(addresses, rxs, rys)
+        located = np.isfinite(xs) & np.isfinite(ys)
+
+        # both city limits come from the polygons when the centerline has no Inc_Muni, like merge_street_segment_attributes()
+        missing = np.array([i for i, v in enumerate(columns[ADDRESS_FIELDS.INC_MUNI]) if is_empty(v) and located[i]], dtype=np.int64)
+        if missing.size:
+            for name, field in CITY_LIMITS_FIELDS:
+                layer = self.cityLimits.get(name)
+                default = UNINCORPORATED if field == ADDRESS_FIELDS.INC_MUNI else None
+                values = layer.value_many(xs[missing], ys[missing], field, default) if layer else [default] * missing.size
+                for i, v in zip(missing.tolist(), values):
+                    columns[field][i] = v
+
+        # the ZIP code layers when the centerline has no Post_Code
+        columns[ADDRESS_FIELDS.POST_CODE_4] = [None] * n
+        missing = np.array([i for i, v in enumerate(columns[ADDRESS_FIELDS.POST_CODE]) if is_empty(v) and located[i]], dtype=np.int64)
+        if missing.size and self.zipCodes is not None:
+            for i, result in zip(missing.tolist(), self.zipCodes.lookup_many(xs[missing], ys[missing])):
+                columns[ADDRESS_FIELDS.POST_CODE][i] = result.Post_Code
+                columns[ADDRESS_FIELDS.POST_CODE_4][i] = result.Post_Code4
+
+        # the registered spatial join fields go last, they replace the values found above like SpatialJoinEngine.apply()
+        if self.spatialJoins is not None and len(self.spatialJoins):
+            for field, values in self.spatialJoins.join_many(xs, ys).items():
+                column = columns.setdefault(field, [None] * n)
+                for i, v in enumerate(values):
+                    if v is not None:
+                        column[i] = v
+        return columns
+
+
+def get_address_overlay_refresher(refresh: bool=False) -> AddressOverlayRefresher:
+    """creates a refresher from the session indexes, see get_centerline_index(), get_overlay_layer() and get_spatial_join_engine()
+
+    Args:
+        refresh (bool, optional): reread the centerlines, overlay layers and spatial join rules. Defaults to False.
+
+    Returns:
+        AddressOverlayRefresher: the refresher
+    """
+    from .database import NG911LayerTypes
+    from .centerlines import get_centerline_index
+    from .overlays import get_overlay_layer, get_zip_code_service
+    from .spatial_join import get_spatial_join_engine
+    return AddressOverlayRefresher(
+        get_centerline_index(refresh),
+        {name: get_overlay_layer(name, [field], refresh) for name, field in CITY_LIMITS_FIELDS},
+        get_zip_code_service(refresh),
+        get_spatial_join_engine(NG911LayerTypes.ADDRESS_POINTS, refresh)
+    )
+
+@timeit
+def refresh_address_overlays(table: str=None, fields: List[str]=None, where: str=None, refresh: bool=True) -> Munch:
+    """recomputes the overlay attributes (Inc_Muni, ESN, MSAGComm, Post_Code...) of address points after boundaries
+    or centerlines change.  The address points are read once, the attributes are computed in memory and only the
+    rows where a value changed are written back with a single UpdateCursor in one edit session.
+
+    Args:
+        table (str, optional): the address points, a layer's selection is honored. Defaults to None (the NG911 address points).
+        fields (List[str], optional): the attributes to recompute. Defaults to None (every attribute the refresher knows).
+        where (str, optional): an optional where clause. Defaults to None.
+        refresh (bool, optional): reread the centerlines and overlay layers and clear the overlay cache first, they have
+            usually just been edited. Defaults to True.
+
+    Returns:
+        Munch: the number of address points read ("total"), the number "updated" and the "fields" that were recomputed
+    """
+    import arcpy
+    from ..env import get_ng911_db
+    from ..utils import cursors
+    from ..spatial.projection import project_coordinates
+    ng911_db = get_ng911_db()
+    table = table or ng911_db.addressPoints
+    if refresh:
+        # the layers were just edited, drop every cached lookup instead of waiting for the next change check
+        get_overlay_cache().invalidate()
+    refresher = get_address_overlay_refresher(refresh)
+    existing = [f.name for f in arcpy.ListFields(table)]
+    fields = [f for f in (fields or refresher.fields) if f in refresher.fields and f in existing]
+    if not fields:
+        raise RuntimeError(f'none of the overlay attributes can be recomputed for "{table}"')
+
+    sr = arcpy.Describe(ng911_db.addressPoints).spatialReference
+    addresses = cursors.read_columns(table, FULL_STREET_FIELDS, where, sr)
+    roadCoords = None
+    roadSR = refresher.centerlines.roads.spatialReference if refresher.centerlines else None
+    if roadSR and sr and roadSR.name != sr.name:
+        roadCoords = project_coordinates([s[0] if s else np.nan for s in addresses.shapes], [s[1] if s else np.nan for s in addresses.shapes], sr, roadSR)
+    computed = refresher.compute(addresses, roadCoords)
+
+    columns = [computed.get(f) or [None] * len(addresses) for f in fields]
+    values = {oid: [c[i] for c in columns] for i, oid in enumerate(addresses.oids)}
+    updated = cursors.update_changed_rows(table, fields, values, where)
+    log(f'refreshed {fields} for {len(addresses)} address points, {updated} were updated')
+    return Munch(total=len(addresses), updated=updated, fields=fields)
@@ -0,0 +1,100 @@
+import arcpy
+from typing import List, Union
+from ..support.munch import Munch
+from ..env import get_ng911_db
+from ..utils import cursors
+from ..logging import log
+from .fields import VALIDATION_FLAGS
+
+# number of validated points kept in memory before they are written
+DEFAULT_FLUSH_SIZE = 5000
+
+BASE_FIELDS = ['NENA_GUID', 'POINT_OID', 'SHAPE@']
+FLAG_FIELDS = BASE_FIELDS + VALIDATION_FLAGS.__props__ + ['FLAG_COUNT', 'VALIDATION_SCORE']
+VALIDATED_FIELDS = BASE_FIELDS + ['ROW_HASH']
+
+class ValidationResultSink:
+    """buffers address validation results and writes them to the AddressFlags and
+    ValidatedAddresses tables in batches.  Each flush writes both tables inside a single
+    edit session, opening an edit session per point is the largest fixed cost on SDE.
+
+    Use as a context manager so any remaining results are flushed on exit:
+
+        with ValidationResultSink() as sink:
+            for pt in points:
+                sink.add(pt.get('Site_NGUID'), pt.OBJECTID, pt.geometry, flags)
+    """
+    def __init__(self, flushSize: int=DEFAULT_FLUSH_SIZE, spatialReference: arcpy.SpatialReference=None, extraFlags: List[str]=None):
+        """buffered writer for validation results
+
+        Args:
+            flushSize (int, optional): the number of points to buffer before writing. Defaults to DEFAULT_FLUSH_SIZE.
+            spatialReference (arcpy.SpatialReference, optional): the spatial reference for (x, y) locations. Defaults to None.
+            extraFlags (List[str], optional): flags from extra validation rules, these are only written
+                when a field with the same name has been added to AddressFlags. Defaults to None.
+        """
+        ng911_db = get_ng911_db()
+        self.addressFlags = ng911_db.addressFlags
+        self.flagFields = list(FLAG_FIELDS)
+        extraFlags = [f for f in extraFlags or [] if f not in FLAG_FIELDS]
+        if extraFlags:
+            existing = [f.name for f in arcpy.ListFields(self.addressFlags)]
+            for f in extraFlags:
+                if f in existing:
+                    self.flagFields.append(f)
+                else:
+                    log(f'AddressFlags has no "{f}" field, the flag will count towards the score but will not be written', level='warn')
+        self.validatedAddresses = ng911_db.validatedAddresses
+        self.flushSize = max(1, flushSize or DEFAULT_FLUSH_SIZE)
+        self.spatialReference = spatialReference
+        self.flagRows: List[list] = []
+        self.validatedRows: List[list] = []
+        self.flagCount = 0
+        self.validatedCount = 0
+
+    def __len__(self):
+        return len(self.validatedRows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        # keep what was validated before an error, it will not need to be validated again
+        self.flush()
+
+    def add(self, guid: str, oid: int, shape: Union[arcpy.PointGeometry, tuple], flags: Munch, rowHash: str=None):
+        """adds the result for an address point, the buffer is written once it reaches the flush size
+
+        Args:
+            guid (str): the NENA identifier
+            oid (int): the address point OBJECTID
+            shape (Union[arcpy.PointGeometry, tuple]): the point geometry or (x, y) coordinates
+            flags (Munch): the validation flags with FLAG_COUNT and VALIDATION_SCORE
+            rowHash (str, optional): the content hash of the address point. Defaults to None.
+        """
+        if isinstance(shape, (tuple, list)):
+            shape = arcpy.PointGeometry(arcpy.Point(*shape), self.spatialReference)
+        if flags.get('FLAG_COUNT'):
+            self.flagRows.append([guid, oid, shape] + [flags.get(f) for f in self.flagFields[len(BASE_FIELDS):]])
+        self.validatedRows.append([guid, oid, shape, rowHash])
+        if len(self.validatedRows) >= self.flushSize:
+            self.flush()
+
+    def flush(self):
+        """writes the buffered results in a single edit session"""
+        if not self.validatedRows:
+            return
+        with cursors.EditSession(self.validatedAddresses):
+            if self.flagRows:
+                with arcpy.da.InsertCursor(self.addressFlags, self.flagFields) as irows:
+                    for row in self.flagRows:
+                        irows.insertRow(row)
+            with arcpy.da.InsertCursor(self.validatedAddresses, VALIDATED_FIELDS) as irows:
+                for row in self.validatedRows:
+                    irows.insertRow(row)
+
+        log(f'wrote {len(self.validatedRows)} validated addresses and {len(self.flagRows)} address flags')
+        self.flagCount += len(self.flagRows)
+        self.validatedCount += len(self.validatedRows)
+        self.flagRows = []
+        self.validatedRows = []
@@ -0,0 +1,270 @@
+from typing import List, Iterable, Any
+from ..support.munch import Munch
+from ..utils.columns import FeatureColumns
+from ..utils.cache import LRUCache, DEFAULT_CACHE_SIZE, MISSING
+from ..spatial.grid import PointIndex
+from ..logging import log
+from .fields import STREET_FIELDS, ADDRESS_FIELDS, STREET_ATTRIBUTES, POINT_SIDE_MAPPING
+from .centerlines import CenterlineIndex, DEFAULT_SEARCH_DISTANCE
+from .streets import full_street_key, full_street_name
+from .rules import normalize_value
+
+# the address point attributes returned for the nearest address
+REVERSE_ADDRESS_FIELDS = list(dict.fromkeys([
+    ADDRESS_FIELDS.GUID,
+    ADDRESS_FIELDS.NUMBER_PREFIX,
+    ADDRESS_FIELDS.NUMBER,
+    ADDRESS_FIELDS.NUMBER_SUFFIX,
+] + STREET_ATTRIBUTES + [m['pt'] for m in POINT_SIDE_MAPPING]))
+
+# clicks within this distance (in feet) of each other share a cached result
+DEFAULT_TOLERANCE = 1
+
+# the geocoder for the current session, see get_reverse_geocoder()
+_reverseGeocoder: 'ReverseGeocoder' = None
+
+def address_label(attrs: dict) -> str:
+    """formats an address, "N142 N MAIN ST" """
+    number = ''.join(str(v) for v in [attrs.get(ADDRESS_FIELDS.NUMBER_PREFIX), attrs.get(ADDRESS_FIELDS.NUMBER), attrs.get(ADDRESS_FIELDS.NUMBER_SUFFIX)] if v is not None)
+    return ' '.join(filter(None, [number, full_street_name(full_street_key(attrs))])) or None
+
+def interpolate_number(ratio: float, fromAddress: int, toAddress: int, parity: str=None) -> int:
+    """finds the address number a share of the way along a range, matching the parity of the range
+
+    Args:
+        ratio (float): the share of the centerline length from its start (0-1)
+        fromAddress (int): the from address, at the start of the centerline
+        toAddress (int): the to address, at the end of the centerline
+        parity (str, optional): the parity of the range (O|E|B|Z). Defaults to None (the parity of the from address).
+
+    Returns:
+        int: the address number, None when the range is not populated
+    """
+    if fromAddress is None or toAddress is None:
+        return None
+    number = int(round(fromAddress + ratio * (toAddress - fromAddress)))
+    code = (normalize_value(parity) or '')[:1]
+    if code in ('O', 'E'):
+        odd = code == 'O'
+    elif code == 'B':
+        odd = None
+    else:
+        odd = fromAddress % 2 == 1
+    if odd is not None and (number % 2 == 1) != odd:
+        # step toward the middle of the range so the number stays inside it
+        low, high = min(fromAddress, toAddress), max(fromAddress, toAddress)
+        number = number + 1 if number + 1 <= high else number - 1
+        if number < low:
+            return None
+    return number
+
+def copy_match(match: Munch) -> Munch:
+    """copies a cached address or centerline match, only the attributes are copied again so they can be changed"""
+    return Munch(match, attributes=Munch(match.attributes)) if match else match
+
+class ReverseGeocoder:
+    """finds the nearest address point and the interpolated address on the nearest centerline for a location.
+
+    Both layers are held in memory in grid indexes and results are cached by the location
+    rounded to a tolerance, so clicking around the same spot does not search again.
+    """
+    def __init__(self, centerlines: CenterlineIndex, addresses: FeatureColumns, tolerance: float=DEFAULT_TOLERANCE,
+                 maxDistance: float=DEFAULT_SEARCH_DISTANCE, cacheSize: int=DEFAULT_CACHE_SIZE):
+        """creates the geocoder
+
+        Args:
+            centerlines (CenterlineIndex): the centerline index, the roads must have the INDEX_FIELDS
+            addresses (FeatureColumns): the address points with the REVERSE_ADDRESS_FIELDS, in the same coordinate system
+            tolerance (float, optional): the cache tolerance in feet. Defaults to DEFAULT_TOLERANCE.
+            maxDistance (float, optional): the search distance in feet. Defaults to DEFAULT_SEARCH_DISTANCE.
+            cacheSize (int, optional): the most results to cache. Defaults to DEFAULT_CACHE_SIZE.
+        """
+        self.centerlines = centerlines
+        self.addresses = addresses
+        self.points = PointIndex(addresses.shapes)
+        self.tolerance = centerlines.roads.from_feet(tolerance)
+        self.maxDistance = centerlines.roads.from_feet(maxDistance)
+        self.maxOID = max(addresses.oids, default=0)
+        self.cache = LRUCache(cacheSize)
+        self.table = None
+        self._counts = (len(centerlines.roads), len(addresses))
+
+    def add_address(self, oid: int, point: tuple, values: Iterable[Any]) -> int:
+        """adds a new address point
+
+        Args:
+            oid (int): the OBJECTID
+            point (tuple): the (x, y) point
+            values (Iterable[Any]): the attribute values, in the same order as the address fields
+
+        Returns:
+            int: the record index of the address point
+        """
+        self.addresses.append(oid, point, values)
+        idx = len(self.addresses) - 1
+        self.points.add(idx, point)
+        self.maxOID = max(self.maxOID, oid)
+        return idx
+
+    def nearest_address(self, x: float, y: float) -> Munch:
+        """finds the closest address point
+
+        Args:
+            x (float): the x coordinate
+            y (float): the y coordinate
+
+        Returns:
+            Munch: the OID@, distance, address label and address attributes, None if there is no address within the search distance
+        """
+        idx, dist = self.points.nearest(x, y, self.maxDistance)
+        if idx is None:
+            return None
+        attrs = Munch({f: self.addresses.value(f, idx) for f in self.addresses.fields})
+        return Munch({'OID@': self.addresses.oids[idx]}, distance=dist, address=address_label(attrs), attributes=attrs)
+
+    def nearest_centerline(self, x: float, y: float) -> Munch:
+        """interpolates the address of a location from the closest centerline
+
+        Args:
+            x (float): the x coordinate
+            y (float): the y coordinate
+
+        Returns:
+            Munch: the OID@, distance, side, address label and the attributes an address point would get from
+                merge_street_segment_attributes() with the interpolated Add_Number, None if there is no centerline
+                within the search distance
+        """
+        idx, loc = self.centerlines.index.nearest(x, y, self.maxDistance)
+        if idx is None:
+            return None
+        roads = self.centerlines.roads
+        side = loc.side
+        attrs = Munch({f: roads.value(f, idx) for f in STREET_ATTRIBUTES})
+        for mapping in POINT_SIDE_MAPPING:
+            attrs[mapping['pt']] = roads.value(f"{mapping['ln']}_{side}", idx)
+        ratio = loc.along / loc.length if loc.length else 0.5
+        fromField, toField, parityField, prefixField = (
+            [STREET_FIELDS.FROM_ADDRESS_RIGHT, STREET_FIELDS.TO_ADDRESS_RIGHT, STREET_FIELDS.PARITY_RIGHT, STREET_FIELDS.ADDRESS_PREFIX_RIGHT]
+            if side == 'R' else
+            [STREET_FIELDS.FROM_ADDRESS_LEFT, STREET_FIELDS.TO_ADDRESS_LEFT, STREET_FIELDS.PARITY_LEFT, STREET_FIELDS.ADDRESS_PREFIX_LEFT]
+        )
+        attrs[ADDRESS_FIELDS.NUMBER] = interpolate_number(ratio, roads.value(fromField, idx), roads.value(toField, idx), roads.value(parityField, idx))
+        attrs[ADDRESS_FIELDS.NUMBER_PREFIX] = roads.value(prefixField, idx)
+        return Munch({'OID@': roads.oids[idx]}, distance=loc.distance, side=side, address=address_label(attrs), attributes=attrs)
+
+    def reverse(self, x: float, y: float) -> Munch:
+        """reverse geocodes a location
+
+        Args:
+            x (float): the x coordinate, in the coordinate system of the layers
+            y (float): the y coordinate, in the coordinate system of the layers
+
+        Returns:
+            Munch: the nearest "address" point and the interpolated address on the nearest "centerline",
+                a copy of the cached result so it can be changed
+        """
+        counts = (len(self.centerlines.roads), len(self.addresses))
+        if counts != self._counts:
+            # features were added, cached results may no longer be the closest
+            self.cache.clear()
+            self._counts = counts
+
+        key = (round(x / self.tolerance), round(y / self.tolerance)) if self.tolerance else (x, y)
+        result = self.cache.get(key)
+        if result is MISSING:
+            result = self.cache.put(key, Munch(address=self.nearest_address(x, y), centerline=self.nearest_centerline(x, y)))
+        return Munch(address=copy_match(result.address), centerline=copy_match(result.centerline))
+
+    def reverse_many(self, points: Iterable[tuple]) -> List[Munch]:
+        """reverse geocodes a batch of locations
+
+        Args:
+            points (Iterable[tuple]): the (x, y) locations
+
+        Returns:
+            List[Munch]: the results from reverse(), in the same order
+        """
+        return [self.reverse(x, y) for x, y in points]
+
+    @classmethod
+    def from_tables(cls, centerlines: CenterlineIndex, table: str) -> 'ReverseGeocoder':
+        """reads the address points from a table
+
+        Args:
+            centerlines (CenterlineIndex): the centerline index
+            table (str): the address points feature class or layer
+
+        Returns:
+            ReverseGeocoder: the geocoder
+        """
+        from ..utils import cursors
+        geocoder = cls(centerlines, cursors.read_columns(table, REVERSE_ADDRESS_FIELDS, spatial_reference=centerlines.roads.spatialReference))
+        geocoder.table = table
+        return geocoder
+
+    def update_from_table(self, table: str=None) -> int:
+        """adds the address points created since the geocoder was built or last updated
+
+        Args:
+            table (str, optional): the address points. Defaults to None (the table the addresses were read from).
+
+        Returns:
+            int: the number of address points added
+        """
+        import arcpy
+        from ..utils import cursors
+        table = table or self.table
+        oidField = arcpy.Describe(table).OIDFieldName
+        new = cursors.read_columns(table, self.addresses.fields, f'{oidField} > {self.maxOID}', self.addresses.spatialReference)
+        for i, oid in enumerate(new.oids):
+            self.add_address(oid, new.shapes[i], [new.value(f, i) for f in self.addresses.fields])
+        if new.oids:
+            log(f'added {len(new)} new address points to the reverse geocoder')
+        return len(new)
+
+
+def get_reverse_geocoder(refresh: bool=False) -> ReverseGeocoder:
+    """gets the reverse geocoder for the NG911 address points and the session centerline index, it is
+    built on first use and then kept for the session.  Address points committed with DataSchema.commit_features()
+    are added as they are created.
+
+    Args:
+        refresh (bool, optional): reread both layers. Defaults to False.
+
+    Returns:
+        ReverseGeocoder: the geocoder
+    """
+    global _reverseGeocoder
+    from ..env import get_ng911_db
+    from .centerlines import get_centerline_index
+    centerlines = get_centerline_index(refresh)
+    table = get_ng911_db().addressPoints
+    geocoder = _reverseGeocoder
+    if refresh or geocoder is None or geocoder.table != table or geocoder.centerlines is not centerlines:
+        _reverseGeocoder = ReverseGeocoder.from_tables(centerlines, table)
+    return _reverseGeocoder
+
+def update_reverse_geocoder() -> int:
+    """adds new address points to the session reverse geocoder, if it has been built
+
+    Returns:
+        int: the number of address points added
+    """
+    if _reverseGeocoder is None:
+        return 0
+    return _reverseGeocoder.update_from_table()
+
+def reverse_geocode(pt) -> Munch:
+    """reverse geocodes a point against the NG911 address points and road centerlines
+
+    Args:
+        pt (arcpy.PointGeometry): the point, it is projected to the road centerline coordinate system when needed
+
+    Returns:
+        Munch: the nearest "address" point and the interpolated address on the nearest "centerline"
+    """
+    geocoder = get_reverse_geocoder()
+    sr = geocoder.centerlines.roads.spatialReference
+    if sr and pt.spatialReference.name != sr.name:
+        pt = pt.projectAs(sr)
+    return geocoder.reverse(pt.firstPoint.X, pt.firstPoint.Y)
@@ -0,0 +1,383 @@
+import abc
+import time
+from typing import List, Dict, Set, Callable, Iterable
+from ..support.munch import munchify, Munch
+from ..utils import lazyprop
+from ..utils.columns import FeatureColumns
+from ..logging import log
+from .fields import STREET_FIELDS, ADDRESS_FIELDS, VALIDATION_FLAGS
+
+# [centerline attribute (without the _L or _R side suffix), address attribute, validation flag]
+SIDE_CHECKS = [
+    ['ESN', ADDRESS_FIELDS.ESN, VALIDATION_FLAGS.INVALID_ESN],
+    ['IncMuni', ADDRESS_FIELDS.INC_MUNI, VALIDATION_FLAGS.INVALID_INCORPORATED_MUNICIPALITY],
+    ['UnincCom', ADDRESS_FIELDS.UNINC_MUNI, VALIDATION_FLAGS.INVALID_UNINCORPORATED_MUNICIPALITY],
+    ['PostCode', ADDRESS_FIELDS.POST_CODE, VALIDATION_FLAGS.INVALID_POSTAL_CODE],
+    ['MSAGComm', ADDRESS_FIELDS.MSAG_COM, VALIDATION_FLAGS.INVALID_MSAG],
+    ['NbrhdCom', ADDRESS_FIELDS.NEIGHBORHOOD_COM, VALIDATION_FLAGS.INVALID_NEIGHBORHOOD],
+    ['AddCode', ADDRESS_FIELDS.CODE, VALIDATION_FLAGS.INVALID_ADDITIONAL_CODE],
+    ['County', ADDRESS_FIELDS.COUNTY, VALIDATION_FLAGS.INVALID_COUNTY],
+    ['State', ADDRESS_FIELDS.STATE, VALIDATION_FLAGS.INVALID_STATE],
+]
+
+RANGE_FIELDS = ['FromAddr', 'ToAddr', 'Parity']
+
+# keys in a set of validation flags that are not flags
+SCORE_FIELDS = ['FLAG_COUNT', 'VALIDATION_SCORE']
+
+def normalize_value(value) -> str:
+    """normalizes an attribute value for comparisons, empty values become None"""
+    if value is None:
+        return None
+    value = str(value).strip().upper()
+    return value or None
+
+def in_address_range(number: int, from_address: int, to_address: int) -> bool:
+    """checks if an address number falls within a block range, ranges may be stored in either direction
+
+    Args:
+        number (int): the address number
+        from_address (int): the from address
+        to_address (int): the to address
+
+    Returns:
+        bool: True if the number is within the range
+    """
+    if number is None or from_address is None or to_address is None:
+        return False
+    return min(from_address, to_address) <= number <= max(from_address, to_address)
+
+def parity_matches(number: int, parity: str) -> bool:
+    """checks the parity of an address number, supports both the NENA codes (O|E|B|Z) and "Odd" or "Even"
+
+    Args:
+        number (int): the address number
+        parity (str): the centerline parity
+
+    Returns:
+        bool: False if the number is on the wrong side of the street
+    """
+    code = (normalize_value(parity) or '')[:1]
+    if code == 'O':
+        return (number or 0) % 2 == 1
+    if code == 'E':
+        return (number or 0) % 2 == 0
+    return True
+
+def score_flags(flags: Munch) -> Munch:
+    """sets the FLAG_COUNT and VALIDATION_SCORE for a set of validation flags, flags from
+    extra rules count the same as the built in flags.
+
+    Args:
+        flags (Munch): the validation flags
+
+    Returns:
+        Munch: the flags
+    """
+    names = [f for f in flags.keys() if f not in SCORE_FIELDS]
+    flagCount = sum(flags.get(f) or 0 for f in names)
+    flagCheckCount = len(names) or 1
+    flags['FLAG_COUNT'] = flagCount
+    flags['VALIDATION_SCORE'] = (flagCount / flagCheckCount) * 100 if flagCount else 100
+    return flags
+
+
+class ValidationBatch:
+    """the columns for a batch of address points and their matched centerlines, every rule
+    receives the same batch so columns are only pulled once.
+
+    Rules read address columns with address(), normalized(), and the attributes of the
+    matched centerline on the side the address falls on with road_side().
+    """
+    def __init__(self, addresses: FeatureColumns, indices: List[int], roads: FeatureColumns=None,
+                 roadIndices: List[int]=None, sides: List[str]=None, duplicateOids: Set[int]=None,
+                 nenaDuplicateOids: Set[int]=None):
+        """creates a batch
+
+        Args:
+            addresses (FeatureColumns): the address points
+            indices (List[int]): the address records in the batch
+            roads (FeatureColumns, optional): the road centerlines. Defaults to None.
+            roadIndices (List[int], optional): the matched centerline record for each address, or None. Defaults to None.
+            sides (List[str], optional): the side of the matched centerline (R|L) for each address. Defaults to None.
+            duplicateOids (Set[int], optional): the OBJECTIDs of duplicate addresses in the whole layer. Defaults to None.
+            nenaDuplicateOids (Set[int], optional): the OBJECTIDs of addresses with a duplicate NENA identifier. Defaults to None.
+        """
+        self.addresses = addresses
+        self.indices = list(indices)
+        self.roads = roads
+        self.roadIndices = roadIndices or [None] * len(self.indices)
+        self.sides = sides or [None] * len(self.indices)
+        self.duplicateOids = duplicateOids or set()
+        self.nenaDuplicateOids = nenaDuplicateOids or set()
+        self._columns: Dict[str, list] = {}
+
+    def __len__(self):
+        return len(self.indices)
+
+    @lazyprop
+    def oids(self) -> List[int]:
+        return [self.addresses.oids[i] for i in self.indices]
+
+    @lazyprop
+    def shapes(self) -> list:
+        return [self.addresses.shapes[i] for i in self.indices]
+
+    @lazyprop
+    def matched(self) -> List[bool]:
+        """whether each address was matched to a centerline"""
+        return [r is not None for r in self.roadIndices]
+
+    def address(self, field: str) -> list:
+        """the values of an address field for the batch"""
+        key = f'address:{field}'
+        if key not in self._columns:
+            column = self.addresses.get(field)
+            self._columns[key] = [column[i] for i in self.indices]
+        return self._columns[key]
+
+    def normalized(self, field: str) -> list:
+        """the normalized values of an address field for the batch"""
+        key = f'normalized:{field}'
+        if key not in self._columns:
+            self._columns[key] = [normalize_value(v) for v in self.address(field)]
+        return self._columns[key]
+
+    def road_side(self, attr: str) -> list:
+        """the value of a centerline attribute on the side of the street of each address,
+        None where no centerline was matched.
+
+        Args:
+            attr (str): the attribute without the side suffix, such as "ESN" for ESN_L and ESN_R
+
+        Returns:
+            list: the values
+        """
+        key = f'road:{attr}'
+        if key not in self._columns:
+            left = self.roads.get(f'{attr}_L') if self.roads is not None else []
+            right = self.roads.get(f'{attr}_R') if self.roads is not None else []
+            self._columns[key] = [
+                None if r is None else (right[r] if side == 'R' else left[r])
+                for r, side in zip(self.roadIndices, self.sides)
+            ]
+        return self._columns[key]
+
+
+class ValidationRule(abc.ABC):
+    """a validation check for a single flag, run() returns a flag (0 or 1) for every
+    address in a batch.  Subclass this, or register a function with ValidationRuleRegistry.rule().
+
+    Rules are sent to worker processes for parallel runs, so they must be importable
+    (defined at the module level, not in __main__ or as a lambda).
+    """
+    def __init__(self, flag: str, description: str=None):
+        self.flag = flag
+        self.description = description or flag
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.flag}>'
+
+    @abc.abstractmethod
+    def run(self, batch: ValidationBatch) -> List[int]:
+        pass
+
+
+class FunctionRule(ValidationRule):
+    """a rule that calls a function with the batch"""
+    def __init__(self, flag: str, func: Callable[[ValidationBatch], Iterable], description: str=None):
+        super().__init__(flag, description or func.__doc__)
+        self.func = func
+
+    def run(self, batch: ValidationBatch) -> List[int]:
+        return [1 if f else 0 for f in self.func(batch)]
+
+
+class SideAttributeRule(ValidationRule):
+    """flags addresses whose attribute does not match the centerline attribute on its side of the street"""
+    def __init__(self, flag: str, roadAttr: str, addressAttr: str):
+        super().__init__(flag, f'{addressAttr} does not match {roadAttr} on the side of the street')
+        self.roadAttr = roadAttr
+        self.addressAttr = addressAttr
+
+    def run(self, batch: ValidationBatch) -> List[int]:
+        return [
+            1 if m and rv != av else 0
+            for m, rv, av in zip(batch.matched, batch.road_side(self.roadAttr), batch.address(self.addressAttr))
+        ]
+
+
+class ValidationRuleRegistry:
+    """the validation rules for a run, in the order they are evaluated.  Rules can be
+    enabled or disabled on the registry or for a single run, and the time spent in
+    each rule is tracked in timings.  The timings are cleared at the start of each run
+    with reset_timings(), so a shared registry like DEFAULT_RULES only reports the last run.
+    """
+    def __init__(self, rules: List[ValidationRule]=None):
+        self.rules: Dict[str, ValidationRule] = {}
+        self.disabled: Set[str] = set()
+        self.timings: Dict[str, float] = {}
+        for rule in rules or []:
+            self.register(rule)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def __contains__(self, flag: str):
+        return flag in self.rules
+
+    @property
+    def flags(self) -> List[str]:
+        return list(self.rules.keys())
+
+    def register(self, rule: ValidationRule, replace: bool=False) -> ValidationRule:
+        """registers a rule
+
+        Args:
+            rule (ValidationRule): the rule
+            replace (bool, optional): replace an existing rule for the same flag. Defaults to False.
+
+        Raises:
+            RuntimeError: if a rule already exists for the flag
+
+        Returns:
+            ValidationRule: the rule
+        """
+        if rule.flag in self.rules and not replace:
+            raise RuntimeError(f'a validation rule is already registered for "{rule.flag}"')
+        self.rules[rule.flag] = rule
+        return rule
+
+    def rule(self, flag: str, description: str=None, replace: bool=False):
+        """decorator to register a function as a rule, the function receives a ValidationBatch
+        and returns a truthy value for each address that should be flagged.
+
+            @DEFAULT_RULES.rule('MISSING_UNIT')
+            def missing_unit(batch):
+                return [not u for u in batch.address('Unit')]
+        """
+        def decorator(func):
+            self.register(FunctionRule(flag, func, description), replace)
+            return func
+        return decorator
+
+    def unregister(self, flag: str):
+        """removes a rule"""
+        self.rules.pop(flag, None)
+
+    def enable(self, *flags: str):
+        """enables rules that were disabled"""
+        self.disabled.difference_update(flags)
+
+    def disable(self, *flags: str):
+        """disables rules for every run until they are enabled"""
+        self.disabled.update(flags)
+
+    def active(self, enabled: Iterable[str]=None, disabled: Iterable[str]=None) -> List[ValidationRule]:
+        """gets the rules for a run
+
+        Args:
+            enabled (Iterable[str], optional): only run these rules. Defaults to None (all enabled rules).
+            disabled (Iterable[str], optional): skip these rules for this run. Defaults to None.
+
+        Returns:
+            List[ValidationRule]: the rules
+        """
+        skip = self.disabled.union(disabled or [])
+        flags = self.flags if enabled is None else [f for f in enabled if f in self.rules]
+        return [self.rules[f] for f in flags if f not in skip]
+
+    def run(self, batch: ValidationBatch, enabled: Iterable[str]=None, disabled: Iterable[str]=None) -> Dict[str, List[int]]:
+        """runs the rules over a batch
+
+        Args:
+            batch (ValidationBatch): the batch
+            enabled (Iterable[str], optional): only run these rules. Defaults to None (all enabled rules).
+            disabled (Iterable[str], optional): skip these rules for this run. Defaults to None.
+
+        Returns:
+            Dict[str, List[int]]: the flag vector for each rule that ran
+        """
+        vectors = {}
+        for rule in self.active(enabled, disabled):
+            st = time.perf_counter()
+            vectors[rule.flag] = rule.run(batch)
+            self.timings[rule.flag] = self.timings.get(rule.flag, 0.0) + time.perf_counter() - st
+        return vectors
+
+    def reset_timings(self):
+        """clears the timings, called at the start of each run"""
+        self.timings = {}
+
+    def add_timings(self, timings: Dict[str, float]):
+        """adds timings from another run of these rules, such as from a worker process"""
+        for flag, seconds in timings.items():
+            self.timings[flag] = self.timings.get(flag, 0.0) + seconds
+
+    def timing_report(self) -> List[Munch]:
+        """logs and returns the time spent in each rule, slowest first"""
+        total = sum(self.timings.values()) or 1.0
+        report = [
+            dict(flag=flag, seconds=round(seconds, 4), percent=round(seconds / total * 100, 1))
+            for flag, seconds in sorted(self.timings.items(), key=lambda t: -t[1])
+        ]
+        for r in report:
+            log(f'validation rule "{r["flag"]}": {r["seconds"]}s ({r["percent"]}%)')
+        return munchify(report)
+
+    def copy(self) -> 'ValidationRuleRegistry':
+        """creates a copy of the registry with the same rules, timings are not copied"""
+        registry = ValidationRuleRegistry(list(self.rules.values()))
+        registry.disabled = set(self.disabled)
+        return registry
+
+
+def missing_address_number(batch: ValidationBatch) -> list:
+    return [not n for n in batch.address(ADDRESS_FIELDS.NUMBER)]
+
+def duplicate_address(batch: ValidationBatch) -> list:
+    return [oid in batch.duplicateOids for oid in batch.oids]
+
+def missing_nena_identifier(batch: ValidationBatch) -> list:
+    return [not g for g in batch.address(ADDRESS_FIELDS.GUID)]
+
+def duplicate_nena_identifier(batch: ValidationBatch) -> list:
+    return [oid in batch.nenaDuplicateOids for oid in batch.oids]
+
+def missing_street_name(batch: ValidationBatch) -> list:
+    return [not n for n in batch.normalized(STREET_FIELDS.NAME)]
+
+def invalid_street_name(batch: ValidationBatch) -> list:
+    # a named address with a location that did not match any centerline
+    return [
+        bool(n) and bool(s) and not m
+        for n, s, m in zip(batch.normalized(STREET_FIELDS.NAME), batch.shapes, batch.matched)
+    ]
+
+def address_outside_range(batch: ValidationBatch) -> list:
+    return [
+        m and not in_address_range(n, f, t)
+        for m, n, f, t in zip(batch.matched, batch.address(ADDRESS_FIELDS.NUMBER), batch.road_side('FromAddr'), batch.road_side('ToAddr'))
+    ]
+
+def invalid_parity(batch: ValidationBatch) -> list:
+    return [
+        m and not parity_matches(n, p)
+        for m, n, p in zip(batch.matched, batch.address(ADDRESS_FIELDS.NUMBER), batch.road_side('Parity'))
+    ]
+
+def get_default_rules() -> ValidationRuleRegistry:
+    """creates a registry with a rule for each of the VALIDATION_FLAGS"""
+    return ValidationRuleRegistry([
+        FunctionRule(VALIDATION_FLAGS.MISSING_ADDRESS_NUMBER, missing_address_number),
+        FunctionRule(VALIDATION_FLAGS.DUPLICATE_ADDRESS, duplicate_address),
+        FunctionRule(VALIDATION_FLAGS.MISSING_NENA_IDENTIFIER, missing_nena_identifier),
+        FunctionRule(VALIDATION_FLAGS.DUPLICATE_NENA_IDENTIFIER, duplicate_nena_identifier),
+        FunctionRule(VALIDATION_FLAGS.MISSING_STREET_NAME, missing_street_name),
+        FunctionRule(VALIDATION_FLAGS.INVALID_STREET_NAME, invalid_street_name),
+        FunctionRule(VALIDATION_FLAGS.ADDRESS_OUTSIDE_RANGE, address_outside_range),
+        FunctionRule(VALIDATION_FLAGS.INVALID_PARITY, invalid_parity),
+    ] + [SideAttributeRule(flag, roadAttr, addressAttr) for roadAttr, addressAttr, flag in SIDE_CHECKS])
+
+# the rules used by default, sites can add their own with DEFAULT_RULES.rule() or DEFAULT_RULES.register()
+DEFAULT_RULES = get_default_rules()
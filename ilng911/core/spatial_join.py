@@ -0,0 +1,212 @@
+import numpy as np
+from typing import List, Dict, Iterable
+from ..support.munch import Munch
+from ..logging import log, timeit
+from .overlays import OverlayLayer, get_overlay_layer
+
+# the fields of a rule in the SpatialJoinFields table
+SPATIAL_JOIN_RULE_FIELDS = ['TargetField', 'TableName', 'JoinField']
+
+# the spatial join engines for the current session by target table, see get_spatial_join_engine()
+_engines: Dict[str, 'SpatialJoinEngine'] = {}
+
+def is_empty(value) -> bool:
+    """checks for a value a spatial join may fill, None or a blank string"""
+    return value is None or (isinstance(value, str) and not value.strip())
+
+class SpatialJoinEngine:
+    """fills the overlay fields registered in the SpatialJoinFields table for one target table.
+
+    Each source table is held in memory once as an OverlayLayer with every join field registered
+    from it, so all of the target fields of a feature are filled with one point in polygon lookup
+    per source table.  When several join fields go to the same target field, the first one that
+    has a value (in the order they were registered) is used.
+    """
+    def __init__(self, rules: List[Munch], layers: Dict[str, OverlayLayer]):
+        """creates the engine
+
+        Args:
+            rules (List[Munch]): the TargetField, TableName and JoinField of each rule
+            layers (Dict[str, OverlayLayer]): the source layer for each TableName, rules without a layer are skipped
+        """
+        self.rules = [r for r in rules if layers.get(r.TableName) is not None]
+        self.layers = {name: layers[name] for name in dict.fromkeys(r.TableName for r in self.rules)}
+        self.targetFields = list(dict.fromkeys(r.TargetField for r in self.rules))
+
+    def __len__(self):
+        return len(self.rules)
+
+    @property
+    def spatialReference(self):
+        """the coordinate system of the source layers"""
+        for layer in self.layers.values():
+            return layer.spatialReference
+        return None
+
+    def join(self, x: float, y: float) -> Munch:
+        """gets the target fields for a point
+
+        Args:
+            x (float): the x coordinate, in the coordinate system of the source layers
+            y (float): the y coordinate, in the coordinate system of the source layers
+
+        Returns:
+            Munch: the value of each target field, None where no source polygon contains the point
+        """
+        found = {name: layer.find(x, y) for name, layer in self.layers.items()}
+        attrs = Munch({f: None for f in self.targetFields})
+        for r in self.rules:
+            idx = found[r.TableName]
+            if idx is not None and is_empty(attrs[r.TargetField]):
+                attrs[r.TargetField] = self.layers[r.TableName].columns.value(r.JoinField, idx)
+        return attrs
+
+    def join_many(self, xs: Iterable[float], ys: Iterable[float]) -> Munch:
+        """gets the target fields for a batch of points, one find_many() per source layer
+
+        Args:
+            xs (Iterable[float]): the x coordinates, NaN for features without a shape
+            ys (Iterable[float]): the y coordinates, NaN for features without a shape
+
+        Returns:
+            Munch: a list of values for each target field, in the order of the points
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        found = {name: layer.find_many(xs, ys).tolist() for name, layer in self.layers.items()}
+        columns = Munch({f: [None] * len(xs) for f in self.targetFields})
+        for r in self.rules:
+            values = self.layers[r.TableName].columns.get(r.JoinField)
+            column = columns[r.TargetField]
+            for i, idx in enumerate(found[r.TableName]):
+                if idx >= 0 and is_empty(column[i]):
+                    column[i] = values[idx]
+        return columns
+
+    def project(self, geometry) -> tuple:
+        """the x and y used to join a geometry, the point itself or the centroid of a line or polygon
+        (the same as a SHAPE@XY cursor token) in the coordinate system of the source layers
+
+        Args:
+            geometry (arcpy.Geometry): the geometry
+
+        Returns:
+            tuple: the (x, y)
+        """
+        sr = self.spatialReference
+        if sr and geometry.spatialReference and geometry.spatialReference.name != sr.name:
+            geometry = geometry.projectAs(sr)
+        pt = geometry.firstPoint if geometry.type == 'point' else geometry.centroid
+        return pt.X, pt.Y
+
+    def apply(self, ft) -> Munch:
+        """fills the target fields of a feature, fields are left as they are where no source polygon contains it.
+        A value found by the join replaces one already set on the feature (ex: the ESN from the centerline),
+        the same as AddressOverlayRefresher.compute()
+
+        Args:
+            ft (Feature): the feature
+
+        Returns:
+            Munch: the attributes that were set
+        """
+        if not self.rules or ft.geometry is None:
+            return Munch()
+        attrs = Munch({f: v for f, v in self.join(*self.project(ft.geometry)).items() if v is not None and f in ft._writable})
+        # not ft.update(), it only fills the fields that are still empty
+        ft.attributes.update(attrs)
+        return attrs
+
+
+def read_spatial_join_rules(target_table: str) -> List[Munch]:
+    """reads the rules registered for a target table with register_spatial_join_fields()
+
+    Args:
+        target_table (str): the NG911 feature type, ex: ADDRESS_POINTS
+
+    Returns:
+        List[Munch]: the TargetField, TableName, JoinField and Path of the source table for each rule
+    """
+    import arcpy
+    from ..env import get_ng911_db
+    from .database import NG911SchemaTables
+    ng911_db = get_ng911_db()
+    featuresTable = ng911_db.get_table(NG911SchemaTables.SPATIAL_JOIN_FEATURES)
+    fieldsTable = ng911_db.get_table(NG911SchemaTables.SPATIAL_JOIN_FIELDS)
+    if not featuresTable or not fieldsTable:
+        return []
+    with arcpy.da.SearchCursor(featuresTable, ['TableName', 'Path']) as rows:
+        paths = {r[0]: r[1] for r in rows if r[1]}
+    with arcpy.da.SearchCursor(fieldsTable, SPATIAL_JOIN_RULE_FIELDS, f"TargetTable = '{target_table}'") as rows:
+        return [Munch(dict(zip(SPATIAL_JOIN_RULE_FIELDS, r)), Path=paths.get(r[1])) for r in rows if all(r)]
+
+def get_spatial_join_engine(target_table: str, refresh: bool=False) -> SpatialJoinEngine:
+    """gets the spatial join engine for a target table, the rules are read once per session and the
+    source tables are shared with the other overlays, see get_overlay_layer()
+
+    Args:
+        target_table (str): the NG911 feature type, ex: ADDRESS_POINTS
+        refresh (bool, optional): reread the rules and the source tables. Defaults to False.
+
+    Returns:
+        SpatialJoinEngine: the engine, it has no rules when nothing is registered for the table
+    """
+    engine = _engines.get(target_table)
+    if engine is None or refresh:
+        rules = read_spatial_join_rules(target_table)
+        joinFields: Dict[str, List[str]] = {}
+        for r in rules:
+            joinFields.setdefault(r.TableName, []).append(r.JoinField)
+        paths = {r.TableName: r.Path for r in rules}
+        layers = {}
+        for name, fields in joinFields.items():
+            layer = get_overlay_layer(paths[name], fields, refresh) if paths[name] else None
+            if layer is None:
+                log(f'spatial join table "{name}" was not found, skipping its fields', level='warn')
+            layers[name] = layer
+        engine = _engines[target_table] = SpatialJoinEngine(rules, layers)
+        log(f'loaded {len(engine)} spatial join rules for "{target_table}" from {len(engine.layers)} tables')
+    return engine
+
+def clear_spatial_join_engines():
+    """removes every spatial join engine from the session, the rules are reread on next use"""
+    _engines.clear()
+
+@timeit
+def calculate_spatial_joins(target_table: str, where: str=None) -> int:
+    """recalculates the registered overlay fields of a NG911 table.  The features are joined to every source
+    table in one batch and only the rows where a value changed are written back, in a single edit session.
+
+    Args:
+        target_table (str): the NG911 feature type, ex: ADDRESS_POINTS
+        where (str, optional): an optional where clause to limit the features. Defaults to None.
+
+    Returns:
+        int: the number of features that were updated
+    """
+    import arcpy
+    from ..env import get_ng911_db
+    from ..utils import cursors
+    table = get_ng911_db().get_911_table(target_table)
+    if not table:
+        raise RuntimeError(f'no NG911 table is registered for "{target_table}"')
+    engine = get_spatial_join_engine(target_table)
+    existing = [f.name for f in arcpy.ListFields(table)]
+    fields = [f for f in engine.targetFields if f in existing]
+    if not fields:
+        log(f'no spatial join fields are registered for "{target_table}"')
+        return 0
+
+    oids, xs, ys = [], [], []
+    with arcpy.da.SearchCursor(table, ['OID@', 'SHAPE@XY'], where, spatial_reference=engine.spatialReference) as rows:
+        for oid, xy in rows:
+            oids.append(oid)
+            x, y = xy if xy and xy[0] is not None else (np.nan, np.nan)
+            xs.append(x)
+            ys.append(y)
+    joined = engine.join_many(xs, ys)
+    values = {oid: [joined[f][i] for f in fields] for i, oid in enumerate(oids)}
+
+    count = cursors.update_changed_rows(table, fields, values, where)
+    log(f'updated spatial join fields {fields} for {count} of {len(oids)} features in "{target_table}"')
+    return count
@@ -0,0 +1,200 @@
+import numpy as np
+from typing import List, Dict, Tuple, Iterable
+from ..support.munch import Munch
+from ..utils.columns import FeatureColumns
+from ..spatial.planar import polyline_extent, locate_on_polyline
+from .fields import STREET_FIELDS
+from .duplicates import normalize_key_value
+
+# the parts of a full street name, in order
+FULL_STREET_FIELDS = [
+    STREET_FIELDS.PRE_DIRECTION,
+    STREET_FIELDS.PRE_TYPE,
+    STREET_FIELDS.NAME,
+    STREET_FIELDS.POST_TYPE,
+    STREET_FIELDS.POST_DIRECTION,
+]
+
+# [side, from address field, to address field]
+RANGE_SIDES = [
+    ['L', STREET_FIELDS.FROM_ADDRESS_LEFT, STREET_FIELDS.TO_ADDRESS_LEFT],
+    ['R', STREET_FIELDS.FROM_ADDRESS_RIGHT, STREET_FIELDS.TO_ADDRESS_RIGHT],
+]
+
+def full_street_key(attrs: Dict) -> Tuple[str]:
+    """creates the normalized full street name key (pre-dir, pre-type, name, post-type, post-dir),
+    directions are abbreviated so "NORTH" and "N" match
+
+    Args:
+        attrs (Dict): the street attributes (a dict, Munch or Feature)
+
+    Returns:
+        Tuple[str]: the key, or None when there is no street name
+    """
+    key = tuple(normalize_key_value(f, attrs.get(f)) for f in FULL_STREET_FIELDS)
+    return key if key[2] else None
+
+def full_street_name(key: Tuple[str]) -> str:
+    """formats a full street key, ("N", None, "MAIN", "ST", None) -> "N MAIN ST" """
+    return ' '.join(filter(None, key or []))
+
+def merge_ranges(ranges: Iterable[Tuple[int, int]], gap: int=2) -> List[Tuple[int, int]]:
+    """merges address ranges that overlap or follow each other
+
+    Args:
+        ranges (Iterable[Tuple[int, int]]): the (low, high) ranges
+        gap (int, optional): ranges this close are joined, 2 joins the next number of the same parity. Defaults to 2.
+
+    Returns:
+        List[Tuple[int, int]]: the merged ranges, sorted
+    """
+    merged = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1] + gap:
+            if hi > merged[-1][1]:
+                merged[-1] = (merged[-1][0], hi)
+        else:
+            merged.append((lo, hi))
+    return merged
+
+class StreetIndex:
+    """groups the road centerlines by normalized full street name.
+
+    Each street keeps its centerline records, their envelopes, the street envelope
+    and the merged address ranges on each side, so finding the segments of a street
+    near a point is a dict lookup followed by an envelope check on the street's centerlines.
+    """
+    def __init__(self, roads: FeatureColumns):
+        """creates the index
+
+        Args:
+            roads (FeatureColumns): the road centerlines with the FULL_STREET_FIELDS and address ranges
+        """
+        self.roads = roads
+        self.streets: Dict[Tuple[str], Munch] = {}
+        # street keys by name, for addresses that leave out some parts of the street name
+        self.names: Dict[str, List[Tuple[str]]] = {}
+        self.keys: List[Tuple[str]] = []
+        for idx in range(len(roads)):
+            self.add(idx)
+
+    def __len__(self):
+        return len(self.streets)
+
+    def __contains__(self, key):
+        return key in self.streets
+
+    def add(self, idx: int) -> Munch:
+        """adds a centerline record to its street, used for centerlines appended to the roads after the index was built
+
+        Args:
+            idx (int): the centerline record index
+
+        Returns:
+            Munch: the street, or None if the centerline has no street name
+        """
+        roads = self.roads
+        key = full_street_key({f: roads.value(f, idx) for f in FULL_STREET_FIELDS})
+        self.keys.extend([None] * (idx + 1 - len(self.keys)))
+        self.keys[idx] = key
+        if key is None:
+            return None
+
+        street = self.streets.get(key)
+        if street is None:
+            street = self.streets[key] = Munch(key=key, name=full_street_name(key), roads=[], extents=[], extent=None, ranges=Munch(L=[], R=[]), bounds=None)
+            self.names.setdefault(key[2], []).append(key)
+
+        extent = polyline_extent(roads.shapes[idx] or [])
+        street.roads.append(idx)
+        street.extents.append(extent)
+        street.bounds = None
+        if extent:
+            ext = street.extent
+            street.extent = extent if ext is None else (min(ext[0], extent[0]), min(ext[1], extent[1]), max(ext[2], extent[2]), max(ext[3], extent[3]))
+
+        for side, fromField, toField in RANGE_SIDES:
+            numbers = [roads.value(fromField, idx), roads.value(toField, idx)]
+            numbers = [n for n in numbers if n is not None]
+            if numbers:
+                street.ranges[side] = merge_ranges(street.ranges[side] + [(min(numbers), max(numbers))])
+        return street
+
+    def get(self, attrs: Dict) -> Munch:
+        """finds the street for a full set of street attributes
+
+        Args:
+            attrs (Dict): the street attributes
+
+        Returns:
+            Munch: the street with its key, name, roads (record indices), extents, extent and ranges, or None
+        """
+        return self.streets.get(full_street_key(attrs))
+
+    def find(self, attrs: Dict) -> List[Munch]:
+        """finds the streets that match the populated parts of a street name, an address
+        with only "MAIN" matches both "N MAIN ST" and "S MAIN ST"
+
+        Args:
+            attrs (Dict): the street attributes
+
+        Returns:
+            List[Munch]: the matching streets
+        """
+        key = full_street_key(attrs)
+        if key is None:
+            return []
+        if key in self.streets:
+            return [self.streets[key]]
+        return [
+            self.streets[k] for k in self.names.get(key[2], [])
+            if all(v is None or v == kv for v, kv in zip(key, k))
+        ]
+
+    def segments_near(self, attrs: Dict, x: float, y: float, distance: float) -> List[int]:
+        """finds the centerlines of a street within a distance of a point
+
+        Args:
+            attrs (Dict): the street attributes
+            x (float): the point x
+            y (float): the point y
+            distance (float): the search distance
+
+        Returns:
+            List[int]: the centerline record indices, closest first
+        """
+        found = []
+        for street in self.find(attrs):
+            ext = street.extent
+            if ext is None or x < ext[0] - distance or x > ext[2] + distance or y < ext[1] - distance or y > ext[3] + distance:
+                continue
+            if street.bounds is None:
+                # the centerline envelopes as an array, rebuilt after centerlines are added
+                street.bounds = np.array([e or (np.nan,) * 4 for e in street.extents], dtype=np.float64).reshape(-1, 4)
+            b = street.bounds
+            near = np.flatnonzero((b[:, 0] - distance <= x) & (b[:, 2] + distance >= x) & (b[:, 1] - distance <= y) & (b[:, 3] + distance >= y))
+            for i in near.tolist():
+                idx = street.roads[i]
+                loc = locate_on_polyline(x, y, self.roads.shapes[idx])
+                if loc and loc.distance <= distance:
+                    found.append((loc.distance, idx))
+        return [idx for d, idx in sorted(found)]
+
+    def in_range(self, attrs: Dict, number: int, side: str=None) -> bool:
+        """checks if an address number falls within the merged ranges of a street
+
+        Args:
+            attrs (Dict): the street attributes
+            number (int): the address number
+            side (str, optional): only check one side of the street (R|L). Defaults to None (both sides).
+
+        Returns:
+            bool: True if the number is within a range of the street
+        """
+        if number is None:
+            return False
+        street = self.get(attrs)
+        if street is None:
+            return False
+        sides = [side] if side else ['L', 'R']
+        return any(lo <= number <= hi for s in sides for lo, hi in street.ranges[s])
@@ -0,0 +1,247 @@
+import math
+from typing import List, Dict, Tuple
+from ..support.munch import Munch
+from ..utils import lazyprop
+from ..utils.columns import FeatureColumns
+from ..logging import log
+from .fields import STREET_FIELDS
+from .streets import StreetIndex
+
+# centerline ends closer than this (in feet) are the same node
+DEFAULT_SNAP_TOLERANCE = 1
+
+# consecutive segments of a street may skip this many numbers before it is reported as a gap,
+# a jump to the next hundred block (199 -> 201) is not a gap but skipping a block (199 -> 301) is
+DEFAULT_MAX_RANGE_GAP = 100
+
+# [side, from address field, to address field]
+SIDE_RANGES = {
+    'L': (STREET_FIELDS.FROM_ADDRESS_LEFT, STREET_FIELDS.TO_ADDRESS_LEFT),
+    'R': (STREET_FIELDS.FROM_ADDRESS_RIGHT, STREET_FIELDS.TO_ADDRESS_RIGHT),
+}
+
+class TOPOLOGY_ISSUES:
+    DANGLE = 'DANGLE'
+    RANGE_GAP = 'RANGE_GAP'
+    RANGE_OVERLAP = 'RANGE_OVERLAP'
+
+class RoadTopology:
+    """node and edge graph of the road centerlines.
+
+    Centerline ends are snapped to nodes with a hash of the coordinates divided by the
+    tolerance, only the neighbouring hash cells are checked so the graph is built in one
+    pass without comparing centerlines to each other.  Each street (by full street name)
+    is walked along its connected centerlines once to compare the address ranges of
+    consecutive segments.
+    """
+    def __init__(self, roads: FeatureColumns, tolerance: float=DEFAULT_SNAP_TOLERANCE, streets: StreetIndex=None):
+        """creates the graph
+
+        Args:
+            roads (FeatureColumns): the road centerlines with the full street name and address range fields
+            tolerance (float, optional): the snapping tolerance in feet. Defaults to DEFAULT_SNAP_TOLERANCE.
+            streets (StreetIndex, optional): the street index for the roads. Defaults to None (built from the roads).
+        """
+        self.roads = roads
+        self.tolerance = roads.from_feet(tolerance) or 1e-9
+        self.nodes: List[Tuple[float, float]] = []
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        # the (from node, to node) of each centerline, None for empty shapes
+        self.ends: List[Tuple[int, int]] = []
+        # the centerlines touching each node
+        self.edges: Dict[int, List[int]] = {}
+        self.streets = streets or StreetIndex(roads)
+        for parts in roads.shapes:
+            self.add(parts)
+        log(f'road topology built for {len(roads)} centerlines with {len(self.nodes)} nodes')
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def snap(self, x: float, y: float) -> int:
+        """finds the node for a coordinate, a new node is created when none are within the tolerance
+
+        Args:
+            x (float): the x coordinate
+            y (float): the y coordinate
+
+        Returns:
+            int: the node id
+        """
+        tol = self.tolerance
+        col, row = int(math.floor(x / tol)), int(math.floor(y / tol))
+        for c in (col - 1, col, col + 1):
+            for r in (row - 1, row, row + 1):
+                for node in self.cells.get((c, r), []):
+                    nx, ny = self.nodes[node]
+                    if math.hypot(nx - x, ny - y) <= tol:
+                        return node
+        node = len(self.nodes)
+        self.nodes.append((x, y))
+        self.cells.setdefault((col, row), []).append(node)
+        return node
+
+    def add(self, parts: List[List[tuple]]) -> Tuple[int, int]:
+        """adds the next centerline to the graph
+
+        Args:
+            parts (List[List[tuple]]): the polyline parts
+
+        Returns:
+            Tuple[int, int]: the from and to nodes
+        """
+        idx = len(self.ends)
+        coords = [p for p in (parts or []) if p]
+        if not coords:
+            self.ends.append(None)
+            return None
+        ends = (self.snap(*coords[0][0][:2]), self.snap(*coords[-1][-1][:2]))
+        self.ends.append(ends)
+        for node in set(ends):
+            self.edges.setdefault(node, []).append(idx)
+        return ends
+
+    def degree(self, node: int) -> int:
+        """the number of centerline ends at a node"""
+        return sum((self.ends[idx][0] == node) + (self.ends[idx][1] == node) for idx in self.edges.get(node, []))
+
+    def neighbors(self, idx: int) -> List[int]:
+        """the centerlines that share a node with a centerline"""
+        if self.ends[idx] is None:
+            return []
+        return sorted({j for node in set(self.ends[idx]) for j in self.edges[node] if j != idx})
+
+    def dangles(self) -> List[Munch]:
+        """finds the centerline ends that do not touch another centerline, these are dead ends
+        such as cul-de-sacs or places where the centerlines were not snapped
+
+        Returns:
+            List[Munch]: the issue, node, x, y, OID@ and end (from|to) for each dangle
+        """
+        found = []
+        for node, (x, y) in enumerate(self.nodes):
+            if self.degree(node) != 1:
+                continue
+            idx = self.edges[node][0]
+            found.append(Munch({
+                'issue': TOPOLOGY_ISSUES.DANGLE,
+                'node': node,
+                'x': x,
+                'y': y,
+                'OID@': self.roads.oids[idx],
+                'end': 'from' if self.ends[idx][0] == node else 'to'
+            }))
+        return found
+
+    @lazyprop
+    def chains(self) -> List[Munch]:
+        """the connected runs of each street, walked from a dead end of the street where there is one.
+        Each item has the street name and the segments as (centerline index, forward) where forward is
+        False when the centerline is digitized against the direction of the walk."""
+        chains = []
+        for street in self.streets.streets.values():
+            adjacent: Dict[int, List[int]] = {}
+            for idx in street.roads:
+                if self.ends[idx] is None:
+                    continue
+                for node in set(self.ends[idx]):
+                    adjacent.setdefault(node, []).append(idx)
+
+            visited = set()
+            # start at the ends of the street first so each run is walked from one end to the other
+            starts = [n for n, roads in adjacent.items() if len(roads) == 1] + list(adjacent)
+            for start in starts:
+                for first in adjacent[start]:
+                    if first in visited:
+                        continue
+                    node, current, segments = start, first, []
+                    while current is not None:
+                        visited.add(current)
+                        forward = self.ends[current][0] == node
+                        segments.append((current, forward))
+                        node = self.ends[current][1] if forward else self.ends[current][0]
+                        current = next((j for j in adjacent[node] if j not in visited), None)
+                    chains.append(Munch(street=street.name, segments=segments))
+        return chains
+
+    def walk_range(self, idx: int, forward: bool, side: str) -> Tuple[int, int]:
+        """the address range on one side of a centerline in the direction of a walk, the sides
+        and ends of the range are swapped for centerlines digitized against the walk
+
+        Args:
+            idx (int): the centerline index
+            forward (bool): False if the centerline is walked from its end to its start
+            side (str): the side of the walk (L|R)
+
+        Returns:
+            Tuple[int, int]: the first and last number along the walk, None if the range is not populated
+        """
+        if not forward:
+            side = 'R' if side == 'L' else 'L'
+        fromField, toField = SIDE_RANGES[side]
+        low, high = self.roads.value(fromField, idx), self.roads.value(toField, idx)
+        if not low and not high:
+            return None
+        if low is None or high is None:
+            low = high = low if high is None else high
+        return (low, high) if forward else (high, low)
+
+    def range_issues(self, maxGap: int=DEFAULT_MAX_RANGE_GAP) -> List[Munch]:
+        """compares the address ranges of consecutive segments along each street.  A street's numbers
+        should keep going the same way along a run, a range that goes back over the previous segment's
+        numbers is an overlap and one that skips more than maxGap numbers is a gap.
+
+        Args:
+            maxGap (int, optional): the most numbers between consecutive segments that is not a gap. Defaults to DEFAULT_MAX_RANGE_GAP.
+
+        Returns:
+            List[Munch]: the issue, street, side, the OID@ of both segments, the last number of the first
+                segment and first number of the next one, and the x and y of the node between them
+        """
+        found = []
+        for chain in self.chains:
+            for side in ['L', 'R']:
+                previous, direction = None, 0
+                for idx, forward in chain.segments:
+                    current = self.walk_range(idx, forward, side)
+                    if current is None:
+                        previous = None
+                        continue
+                    if current[1] != current[0]:
+                        direction = direction or (1 if current[1] > current[0] else -1)
+                    if previous is not None and direction:
+                        prevIdx, prevForward, prevRange = previous
+                        step = (current[0] - prevRange[1]) * direction
+                        issue = TOPOLOGY_ISSUES.RANGE_OVERLAP if step <= 0 else TOPOLOGY_ISSUES.RANGE_GAP if step > maxGap else None
+                        if issue:
+                            node = self.ends[idx][0] if forward else self.ends[idx][1]
+                            x, y = self.nodes[node]
+                            found.append(Munch(
+                                issue=issue,
+                                street=chain.street,
+                                side=side,
+                                oids=[self.roads.oids[prevIdx], self.roads.oids[idx]],
+                                numbers=[prevRange[1], current[0]],
+                                x=x,
+                                y=y
+                            ))
+                    previous = (idx, forward, current)
+        return found
+
+
+def check_road_topology(roads: FeatureColumns, tolerance: float=DEFAULT_SNAP_TOLERANCE, maxGap: int=DEFAULT_MAX_RANGE_GAP) -> Munch:
+    """builds the road topology and runs the connectivity and range continuity checks
+
+    Args:
+        roads (FeatureColumns): the road centerlines
+        tolerance (float, optional): the snapping tolerance in feet. Defaults to DEFAULT_SNAP_TOLERANCE.
+        maxGap (int, optional): the most numbers between consecutive segments that is not a gap. Defaults to DEFAULT_MAX_RANGE_GAP.
+
+    Returns:
+        Munch: the topology, dangles and range issues
+    """
+    topology = RoadTopology(roads, tolerance)
+    dangles = topology.dangles()
+    issues = topology.range_issues(maxGap)
+    log(f'road topology found {len(dangles)} dangles and {len(issues)} address range gaps or overlaps')
+    return Munch(topology=topology, dangles=dangles, rangeIssues=issues)
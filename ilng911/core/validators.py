@@ -1,57 +1,45 @@
 import os
-import math
+import time
 import arcpy
+import datetime
 import warnings
-from functools import partial
 from ilng911.support.munch import munchify, Munch
 from ilng911.schemas import DataSchema, DataType
 from ilng911.core.common import Feature
 from ilng911.env import get_ng911_db
 from ilng911.logging import log, timeit, timestamp
-from ilng911.core.fields import FIELDS, STREET_FIELDS, ADDRESS_FIELDS
-from ilng911.utils import PropIterator, cursors, iter_chunks
-from multiprocessing.pool import ThreadPool
-from typing import Union, List
-
-class VALIDATION_FLAGS(PropIterator):
-    __props__ = [
-        "ADDRESS_OUTSIDE_RANGE",
-        "DUPLICATE_ADDRESS",
-        "DUPLICATE_NENA_IDENTIFIER",
-        "INVALID_COUNTY",
-        'INVALID_STATE',
-        "INVALID_ESN",
-        "INVALID_INCORPORATED_MUNICIPALITY",
-        "INVALID_MSAG",
-        "INVALID_PARITY",
-        "INVALID_STREET_NAME",
-        "INVALID_UNINCORPORATED_MUNICIPALITY",
-        "MISSING_NENA_IDENTIFIER",
-        "MISSING_STREET_NAME",
-        "MISSING_ADDRESS_NUMBER",
-        'INVALID_POSTAL_CODE',
-        'INVALID_NEIGHBORHOOD',
-        'INVALID_ADDITIONAL_CODE'
-    ]
-
-    ADDRESS_OUTSIDE_RANGE = 'ADDRESS_OUTSIDE_RANGE'
-    DUPLICATE_ADDRESS = 'DUPLICATE_ADDRESS'
-    DUPLICATE_NENA_IDENTIFIER = 'DUPLICATE_NENA_IDENTIFIER'
-    INVALID_COUNTY = 'INVALID_COUNTY'
-    INVALID_STATE='INVALID_STATE'
-    INVALID_ESN = 'INVALID_ESN'
-    INVALID_INCORPORATED_MUNICIPALITY = 'INVALID_INCORPORATED_MUNICIPALITY'
-    INVALID_MSAG = 'INVALID_MSAG'
-    INVALID_PARITY = 'INVALID_PARITY'
-    INVALID_STREET_NAME = 'INVALID_STREET_NAME'
-    INVALID_UNINCORPORATED_MUNICIPALITY = 'INVALID_UNINCORPORATED_MUNICIPALITY'
-    MISSING_NENA_IDENTIFIER = 'MISSING_NENA_IDENTIFIER'
-    MISSING_STREET_NAME = 'MISSING_STREET_NAME'
-    MISSING_ADDRESS_NUMBER = "MISSING_ADDRESS_NUMBER"
-    INVALID_POSTAL_CODE = 'INVALID_POSTAL_CODE'
-    INVALID_NEIGHBORHOOD='INVALID_NEIGHBORHOOD'
-    INVALID_ADDITIONAL_CODE='INVALID_ADDITIONAL_CODE'
-
+from ilng911.core.fields import FIELDS, STREET_FIELDS, ADDRESS_FIELDS, VALIDATION_FLAGS, get_validation_template
+from ilng911.core.bulk import BulkAddressValidator, ADDRESS_VALIDATION_FIELDS, ROAD_VALIDATION_FIELDS, get_bulk_validator
+from ilng911.core.duplicates import DUPLICATE_ADDRESS_FIELDS, DuplicateAddressIndex, find_duplicate_addresses
+from ilng911.core.identifiers import NenaIdentifierAudit
+from ilng911.core.rules import ValidationRuleRegistry, DEFAULT_RULES, SCORE_FIELDS
+from ilng911.core.parallel import iter_validate_parallel
+from ilng911.core.ranges import RANGE_CHECK_FIELDS, find_range_conflicts
+from ilng911.core.checkpoints import get_checkpoint, save_checkpoint, clear_checkpoint
+from ilng911.core.results import ValidationResultSink, DEFAULT_FLUSH_SIZE
+from ilng911.core.database import NG911SchemaTables
+from ilng911.utils import cursors
+from ilng911.utils.columns import FeatureColumns
+from typing import Union, List, Set, Iterator
+
+# checkpoint name for the incremental address validation
+ADDRESS_VALIDATION_CHECKPOINT = 'AddressValidation'
+
+# checkpoint for a validation run that has not finished, removed when the run completes
+ADDRESS_VALIDATION_PROGRESS = 'AddressValidationProgress'
+
+# the progress of a run is saved after this many points or seconds, whichever comes first
+CHECKPOINT_RECORDS = 50000
+CHECKPOINT_SECONDS = 300
+
+# the most where clauses used to remove results before one scan of the results tables is used instead
+MAX_REMOVE_QUERIES = 5
+
+# fields written to the AddressRangeFlags table
+RANGE_FLAG_FIELDS = [
+    'SHAPE@', 'RCL_NGUID', 'ROAD_OID', 'ISSUE', 'STREET', 'MSAGComm', 'SIDE', 'FROM_ADDR', 'TO_ADDR',
+    'OTHER_RCL_NGUID', 'OTHER_ROAD_OID', 'OTHER_FROM_ADDR', 'OTHER_TO_ADDR', 'DateUpdate'
+]
 
 # Address Validation workflow psuedo code:
 # prerequisites:
@@ -62,14 +50,6 @@ class VALIDATION_FLAGS(PropIterator):
 #   take one address at a time
 #   query street according to 
 
-def get_validation_template() -> Munch:
-    return munchify(dict(
-        zip(
-            VALIDATION_FLAGS.__props__, 
-            [0] * len(VALIDATION_FLAGS.__props__)
-        )  
-    ))
-
 def get_range_and_parity(pt: Union[arcpy.PointGeometry, Feature], centerline: Union[int, Feature]) -> Munch:
     """finds address range and parity from a given street centerline Feature or OID
 
@@ -118,266 +98,457 @@ def get_range_and_parity(pt: Union[arcpy.PointGeometry, Feature], centerline: Un
 # roadSchema = DataSchema(DataType.ROAD_CENTERLINE)
 # addressSchema = DataSchema(DataType.ADDRESS_POINTS)
 
-def validate_address(pt: Feature, road: Union[Feature, int]=None, addresses=None, roads=None):
-    validators = get_validation_template()
+def validate_address(pt: Feature, road: Union[Feature, int]=None, addresses=None, duplicates: DuplicateAddressIndex=None, nena_audit: NenaIdentifierAudit=None, sink: ValidationResultSink=None, validator: BulkAddressValidator=None, rules: ValidationRuleRegistry=None, enabled: List[str]=None, disabled: List[str]=None):
+    """validates a single address point with the same rules as run_address_validation()
 
-    ng911_db = get_ng911_db()
-
-    # 1. check for duplicate address
-    addressAttrs = [
-        ADDRESS_FIELDS.NUMBER_PREFIX,
-        ADDRESS_FIELDS.NUMBER,
-        ADDRESS_FIELDS.NUMBER_SUFFIX,
-        ADDRESS_FIELDS.PRE_MOD,
-        ADDRESS_FIELDS.PRE_DIRECTION,
-        ADDRESS_FIELDS.PRE_TYPE,
-        ADDRESS_FIELDS.PRE_TYPE_SEPERATOR,
-        ADDRESS_FIELDS.NAME,
-        ADDRESS_FIELDS.POST_TYPE,
-        ADDRESS_FIELDS.POST_DIRECTION,
-        ADDRESS_FIELDS.POST_MODIFIER,
-        ADDRESS_FIELDS.BUILDING,
-        ADDRESS_FIELDS.FLOOR,
-        ADDRESS_FIELDS.UNIT,
-        ADDRESS_FIELDS.SEAT,
-
-    ]
-    addSearchAttrs = []
+    Args:
+        pt (Feature): the address point
+        road (Union[Feature, int], optional): the centerline (or its OBJECTID) for the address. Defaults to None (the closest centerline of its street).
+        addresses (optional): the address points layer, only used for the duplicate checks without an index. Defaults to None.
+        duplicates (DuplicateAddressIndex, optional): a prebuilt duplicate index. Defaults to None (a selection on the address points).
+        nena_audit (NenaIdentifierAudit, optional): a prebuilt identifier audit. Defaults to None (a selection on the address points).
+        sink (ValidationResultSink, optional): a shared result sink. Defaults to None (the result is written right away).
+        validator (BulkAddressValidator, optional): the in memory centerlines. Defaults to None (see get_bulk_validator()).
+        rules (ValidationRuleRegistry, optional): the validation rules. Defaults to None (the rules of the validator).
+        enabled (List[str], optional): only run the rules for these flags. Defaults to None (all rules).
+        disabled (List[str], optional): skip the rules for these flags. Defaults to None.
 
-    # check for address layer
-    if not addresses:
-        addresses = arcpy.management.MakeFeatureLayer(ng911_db.addressPoints, 'AddressPoints')
-    
-    for attr in addressAttrs:
-        v = pt.get(attr)
-        if v:
-            if isinstance(v, str):
-                addSearchAttrs.append(f"{attr} = '{v}'")
-            else:
-                addSearchAttrs.append(f"{attr} = {v}")
-
-    if not addSearchAttrs:
-        validators[VALIDATION_FLAGS.MISSING_STREET_NAME] = 1
-        validators[VALIDATION_FLAGS.MISSING_ADDRESS_NUMBER]
+    Returns:
+        Munch: the validation flags
+    """
+    validators = get_validation_template()
+    nena_id = pt.get(ADDRESS_FIELDS.GUID)
 
-    else:
-        # check for duplicate
-        dup_where = ' AND '.join(addSearchAttrs)
-        arcpy.management.SelectLayerByAttribute(addresses, 'NEW_SELECTION', dup_where)
-        if int(arcpy.management.GetCount(addresses).getOutput(0)) > 1:
-            validators[VALIDATION_FLAGS.DUPLICATE_ADDRESS] = 1
+    # 1. check for duplicate address and nena identifier, the layer is only made when there is no prebuilt index
+    if not addresses and (duplicates is None or nena_audit is None):
+        addresses = arcpy.management.MakeFeatureLayer(get_ng911_db().addressPoints, 'AddressPoints')
 
-    # check for missing nena identifier
-    nena_id = pt.get(ADDRESS_FIELDS.GUID)
-    if not nena_id:
-        validators[VALIDATION_FLAGS.MISSING_NENA_IDENTIFIER]
+    isDuplicate = False
+    if duplicates is not None:
+        # use the prebuilt hash index instead of selecting from the layer
+        isDuplicate = len(duplicates.find(pt)) > 1
     else:
-        # check for duplicate nena identifier
+        addSearchAttrs = []
+        for attr in DUPLICATE_ADDRESS_FIELDS:
+            v = pt.get(attr)
+            if v:
+                if isinstance(v, str):
+                    addSearchAttrs.append(f"{attr} = '{v}'")
+                else:
+                    addSearchAttrs.append(f"{attr} = {v}")
+        if addSearchAttrs:
+            dup_where = ' AND '.join(addSearchAttrs)
+            arcpy.management.SelectLayerByAttribute(addresses, 'NEW_SELECTION', dup_where)
+            isDuplicate = int(arcpy.management.GetCount(addresses).getOutput(0)) > 1
+
+    isNenaDuplicate = False
+    if nena_id and nena_audit is not None:
+        # use the identifier counts from the audit instead of selecting from the layer
+        isNenaDuplicate = nena_audit.is_duplicate(nena_id)
+    elif nena_id:
         nena_where = f"{ADDRESS_FIELDS.GUID} = '{nena_id}'"
         arcpy.management.SelectLayerByAttribute(addresses, 'NEW_SELECTION', nena_where)
-        if int(arcpy.management.GetCount(addresses).getOutput(0)) > 1:
-            validators[VALIDATION_FLAGS.DUPLICATE_NENA_IDENTIFIER] = 1
-    
-    st_attrs = [
-        STREET_FIELDS.PRE_TYPE,
-        STREET_FIELDS.PRE_TYPE_SEPERATOR,
-        STREET_FIELDS.NAME,
-        STREET_FIELDS.POST_TYPE,
-        STREET_FIELDS.POST_MODIFIER
-    ]
+        isNenaDuplicate = int(arcpy.management.GetCount(addresses).getOutput(0)) > 1
+
+    # 2. match the centerline and run the rules on the in memory roads, the same path as the bulk validation
+    validator = validator if validator is not None else get_bulk_validator()
+    geom = pt.geometry
+    sr = validator.roads.spatialReference
+    if geom and sr and geom.spatialReference and geom.spatialReference.name != sr.name:
+        geom = geom.projectAs(sr)
+    xy = (geom.firstPoint.X, geom.firstPoint.Y) if geom else None
+
+    roadIdx = None
+    if road:
+        if isinstance(road, Feature):
+            road = road.get(road.oidField)
+        if not isinstance(road, int):
+            raise RuntimeError(f'Invalid Type for Road Centerline input: "{type(road)}"')
+        if road not in validator.roads.oidIndex and validator.table:
+            # the centerline was created after the roads were read
+            validator = get_bulk_validator(refresh=True)
+        roadIdx = validator.roads.oidIndex.get(road)
+        if roadIdx is None:
+            raise RuntimeError(f'Road Centerline with OBJECTID {road} was not found')
+
+    result = validator.validate_point(
+        pt.get(pt.oidField), xy, {f: pt.get(f) for f in ADDRESS_VALIDATION_FIELDS}, roadIdx,
+        isDuplicate, isNenaDuplicate, rules, enabled, disabled
+    )
+    if result.roadOID is None and pt.get(ADDRESS_FIELDS.NAME):
+        warnings.warn('No roads found in vicinity')
+    validators.update(result.flags)
+    for flag, value in result.flags.items():
+        if value and flag not in SCORE_FIELDS:
+            log(f'\t"{nena_id}" - set validation flag warning: "{flag}" to 1')
+    flagCount = validators.FLAG_COUNT
+
+    # update validation tables, write right away unless a shared sink was given
+    if sink is not None:
+        sink.add(nena_id, pt.get(pt.oidField), pt.geometry, validators)
+    else:
+        with ValidationResultSink(1) as pointSink:
+            pointSink.add(nena_id, pt.get(pt.oidField), pt.geometry, validators)
+        log(f'added record to validated addresses: {pt.get(pt.oidField)} with flag count of {flagCount}')
 
-    # get block range for given point
-    addNum = pt.get('Add_Number', 0)
-
-    # create where clause
-    atts = []
-    for a in st_attrs:
-        v = pt.get(a)
-        if v:
-            atts.append(f"{a} = '{v}'")
-
-    where_clause = ' AND '.join(atts)
-    log(f'where clause for address validation chunk: "{where_clause}"')
-    roadSchema = DataSchema(DataType.ROAD_CENTERLINE)
-
-    if not road:
-
-        # get roads layer
-        if not roads:
-            roads = arcpy.management.MakeFeatureLayer(ng911_db.roadCenterlines,  'RoadCenterlines', where_clause)
-        else:
-            arcpy.management.SelectLayerByAttribute(roads, 'NEW_SELECTION', where_clause)
-
-        count = int(arcpy.management.GetCount(roads).getOutput(0))
-        # log(f'count of roads matching search criteria: {count}')
-        if not count:
-            # no matching roads?
-            return # for now...
-
-        if count > 1:
-            # first select by location
-            arcpy.management.SelectLayerByLocation(roads, 'WITHIN_A_DISTANCE', pt.geometry, '600 FEET', 'SUBSET_SELECTION')
-        
-        count = int(arcpy.management.GetCount(roads).getOutput(0))
-        # print(f'count of roads after location search: {count}')
-        if not count:
-            log(f'Address Point with NENA ID "{nena_id}" ({pt.get(addressSchema.oidField)}) found no roads within search radius, trying a larger area')
-            radii = [1000, 1500, 2000]
-            for dist in radii:
-                arcpy.management.SelectLayerByLocation(roads, 'WITHIN_A_DISTANCE', pt.geometry, f'{dist} FEET', 'SUBSET_SELECTION')
-                count = int(arcpy.management.GetCount(roads).getOutput(0))
-                if count:
-                    break
-            warnings.warn('No roads found in vicinity')
-            return
-
-        desc = arcpy.Describe(roads)
-        fields = [desc.oidFieldName, 'SHAPE@'] + [f.name for f in desc.fields]
-        distances = {}
-        with arcpy.da.SearchCursor(roads, fields) as rows:
+    return validators
+
+def find_duplicate_address_points(where: str=None) -> List[Munch]:
+    """finds all groups of duplicate address points with one read of the AddressPoints layer
+
+    Args:
+        where (str, optional): an optional where clause to limit the search. Defaults to None.
+
+    Returns:
+        List[Munch]: the duplicate groups, each with the "address" key values and the "oids" in the group
+    """
+    ng911_db = get_ng911_db()
+    addresses = cursors.read_columns(ng911_db.addressPoints, DUPLICATE_ADDRESS_FIELDS, where)
+    return find_duplicate_addresses(addresses)
+
+def write_validation_results(addresses: FeatureColumns, results: List[Munch], hashes: List[str]=None, flush_size: int=DEFAULT_FLUSH_SIZE, extra_flags: List[str]=None):
+    """writes bulk validation results to the AddressFlags and ValidatedAddresses tables
+
+    Args:
+        addresses (FeatureColumns): the address points that were validated
+        results (List[Munch]): the results from BulkAddressValidator.validate()
+        hashes (List[str], optional): the row hash of each address point, used by
+            incremental runs to find edited points. Defaults to None.
+        flush_size (int, optional): the number of results written per edit session. Defaults to DEFAULT_FLUSH_SIZE.
+        extra_flags (List[str], optional): flags from extra validation rules. Defaults to None.
+    """
+    guids = addresses.get(ADDRESS_FIELDS.GUID)
+    hashes = hashes or [None] * len(addresses)
+    with ValidationResultSink(flush_size, addresses.spatialReference, extra_flags) as sink:
+        for res in results:
+            sink.add(guids[res.index], res.oid, addresses.shapes[res.index], res.flags, hashes[res.index])
+    log(f'added {sink.validatedCount} records to validated addresses and {sink.flagCount} records to address flags')
+
+def read_validation_results(table: str, fields: List[str], oids: Set[int]=None) -> dict:
+    """reads records of the AddressFlags or ValidatedAddresses table by point OBJECTID
+
+    Args:
+        table (str): the table
+        fields (List[str]): the fields to read after POINT_OID
+        oids (Set[int], optional): only read the records of these address points. Defaults to None (every record).
+
+    Returns:
+        dict: the field values by POINT_OID, a single value when one field is read
+    """
+    wheres = [None] if oids is None else cursors.oid_where_clauses('POINT_OID', oids)
+    records = {}
+    for where in wheres:
+        with arcpy.da.SearchCursor(table, ['POINT_OID'] + fields, where) as rows:
             for r in rows:
-                distances[pt.geometry.distanceTo(r[1])] = r
+                records[r[0]] = r[1] if len(fields) == 1 else tuple(r[1:])
+    return records
 
-        if not distances:
-            raise RuntimeError('No roads found within search radius')
+def remove_validation_results(oids: Set[int]):
+    """removes the AddressFlags and ValidatedAddresses records for address points, a few points
+    are removed with where clauses on their OBJECTIDs instead of scanning the whole tables
 
-        shortest = min(distances.keys())  
-        road = roadSchema.fromRow(fields, distances.get(shortest))
-        # road.prettyPrint()
-                
-    else:
-        if isinstance(road, int):
-            road = roadSchema.find_feature_from_oid(road)
-        if not isinstance(road, Feature):
-            raise RuntimeError(f'Invalid Type for Road Centerline input: "{type(road)}"')
+    Args:
+        oids (Set[int]): the address point OBJECTIDs
+    """
+    if not oids:
+        return
+    ng911_db = get_ng911_db()
+    # past a few clauses one scan is cheaper than a query for each
+    wheres = cursors.oid_where_clauses('POINT_OID', oids)
+    scan = len(wheres) > MAX_REMOVE_QUERIES
+    for table in [ng911_db.addressFlags, ng911_db.validatedAddresses]:
+        removed = 0
+        for where in [None] if scan else wheres:
+            with cursors.UpdateCursor(table, ['POINT_OID'], where) as rows:
+                for r in rows:
+                    if r[0] in oids:
+                        rows.deleteRow()
+                        removed += 1
+        log(f'removed {removed} outdated records from "{os.path.basename(table)}"')
+
+def edited_since(values: list, since: datetime.datetime) -> List[bool]:
+    """checks which edit dates are on or after the day of a previous run, dates are compared by day
+    because DateUpdate only stores the day
 
-    # get parity and range info
-    info = get_range_and_parity(pt.geometry, road)
-
-    if addNum < info.get('from_address') or addNum > info.get('to_address'):
-        log(f'address is outside of range: {addNum} ({info.get("from_address")}-{info.get("to_address")})')
-        validators.ADDRESS_OUTSIDE_RANGE = 1
-
-    # check parity
-    isEven = pt.get('Add_Number', 0) % 2 == 0
-    if (info.get('parity') == 'Odd' and isEven) or (info.get('parity') == 'Even' and not isEven):
-        validators.INVALID_PARITY = 1
-
-    # check parity based attributes
-    parity_checks = [
-        [getattr(STREET_FIELDS, f'ESN_{info.side}'), ADDRESS_FIELDS.ESN, 'INVALID_ESN'],
-        [getattr(STREET_FIELDS, f'INC_MUNI_{info.side}'), ADDRESS_FIELDS.INC_MUNI, 'INVALID_INCORPORATED_MUNICIPALITY'],
-        [getattr(STREET_FIELDS, f'UNINC_MUNI_{info.side}'), ADDRESS_FIELDS.UNINC_MUNI, 'INVALID_UNINCORPORATED_MUNICIPALITY'],
-        [getattr(STREET_FIELDS, f'POST_CODE_{info.side}'), ADDRESS_FIELDS.POST_CODE, 'INVALID_POSTAL_CODE'],
-        [getattr(STREET_FIELDS, f'MSAG_COM_{info.side}'), ADDRESS_FIELDS.MSAG_COM, 'INVALID_MSAG'],
-        [getattr(STREET_FIELDS, f'NEIGHBORHOOD_COM_{info.side}'), ADDRESS_FIELDS.NEIGHBORHOOD_COM, 'INVALID_NEIGHBORHOOD'],
-        [getattr(STREET_FIELDS, f'ADD_CODE_{info.side}'), ADDRESS_FIELDS.CODE, 'INVALID_ADDITIONAL_CODE'],
-        [getattr(STREET_FIELDS, f'COUNTY_{info.side}'), ADDRESS_FIELDS.COUNTY, 'INVALID_COUNTY'],
-        [getattr(STREET_FIELDS, f'STATE_{info.side}'), ADDRESS_FIELDS.STATE, 'INVALID_STATE'],
+    Args:
+        values (list): the edit dates
+        since (datetime.datetime): when the previous run read the address points
+
+    Returns:
+        List[bool]: True for each record edited on or after that day, or without an edit date
+    """
+    day = since.date() if isinstance(since, datetime.datetime) else since
+    return [
+        v is None or (v.date() if isinstance(v, datetime.datetime) else v) >= day
+        for v in values
     ]
 
-    for (roadAttr, addAttr, vf) in parity_checks:
-        rv = road.get(roadAttr)
-        av = pt.get(addAttr)
-        # log(f'address parity check for {addAttr} based on side "{info.side}": {rv} -> {av}')
-        if rv != av:
-            validators[vf] = 1
-            log(f'\t"{nena_id}" - set validation flag warning: "{vf}" to 1')
-
-    # calculate flag count and score
-    flagCount = sum(validators.values())
-    flagCheckCount = len(VALIDATION_FLAGS.__props__)
-    validators['FLAG_COUNT'] = flagCount
-    validators['VALIDATION_SCORE'] = (flagCount / flagCheckCount) * 100 if flagCount else 100
-
-    # update validation tables
-    base_fields = ['NENA_GUID', 'POINT_OID', 'SHAPE@']
-    if flagCount > 0:
-        # found some flags, update flags table
-        keys = list(validators.keys())
-        flag_fields = base_fields + keys  
-        with cursors.InsertCursor(ng911_db.addressFlags, flag_fields) as irows:
-            r = [nena_id, pt.get(pt.oidField), pt.geometry] + [validators.get(f) for f in keys]
-            irows.insertRow(r)
-            log(f'added record to addresses flags: {pt.get(pt.oidField)} with flag count of {flagCount}')
-
-    with cursors.InsertCursor(ng911_db.validatedAddresses, base_fields) as irows:
-        irows.insertRow([nena_id, pt.get(pt.oidField), pt.geometry])
-        log(f'added record to validated addresses: {pt.get(pt.oidField)}')
-  
-    return validators
+def prepare_address_validation(incremental: bool=True) -> Munch:
+    """reads the address points and road centerlines into memory and finds the points to validate.
 
-@timeit
-def run_address_validation():
+    An incremental run first compares the signature of both tables (see cursors.table_signature())
+    with the last run and stops without reading them when nothing was added, deleted or edited.
+    Otherwise the points added since the last run (by OBJECTID) or edited since then (by their edit
+    date) are the candidates, and each validated point stores a hash of its attributes and location
+    so only candidates that really changed are validated.  Points that share an address or NENA
+    identifier with a candidate, or were flagged as duplicates, are checked again because an edit
+    can add or clear their duplicate flags.  All points are validated again when the road centerlines
+    have changed since the last run (tracked with a checkpoint digest).
+
+    Args:
+        incremental (bool, optional): only validate new or edited points. Defaults to True.
+
+    Returns:
+        Munch: the roads and addresses (FeatureColumns), the address row hashes (None for points that
+            were not checked), the roads digest, the table signature, the previous results of the checked
+            points ({POINT_OID: ROW_HASH}), the OBJECTIDs of "deleted" points with results, the NENA
+            identifier audit, the duplicate address OBJECTIDs and the pending address indices in OBJECTID
+            order.  When nothing changed only "unchanged", "signature" and an empty "pending" are returned.
+    """
     ng911_db = get_ng911_db()
-    desc = arcpy.Describe(ng911_db.addressPoints)
+    validatedTable = ng911_db.ensure_schema_table(NG911SchemaTables.VALIDATED_ADDRESSES)
+    started = datetime.datetime.now()
+
+    # a few single row reads tell if anything changed since the last complete run
+    dateField = cursors.edit_date_field(ng911_db.addressPoints)
+    signature = f'{cursors.table_signature(ng911_db.roadCenterlines)}|{cursors.table_signature(ng911_db.addressPoints, dateField)}'
+    checkpoint = get_checkpoint(ADDRESS_VALIDATION_CHECKPOINT)
+    if incremental and checkpoint and checkpoint.Signature == signature and not get_checkpoint(ADDRESS_VALIDATION_PROGRESS):
+        log('address points and road centerlines have not changed since the last run, nothing to validate')
+        return Munch(unchanged=True, signature=signature, pending=[])
+
+    # read addresses in the centerline coordinate system so distances line up
+    roads = cursors.read_columns(ng911_db.roadCenterlines, ROAD_VALIDATION_FIELDS)
+    addressFields = ADDRESS_VALIDATION_FIELDS + ([dateField] if dateField else [])
+    addresses = cursors.read_columns(ng911_db.addressPoints, addressFields, spatial_reference=roads.spatialReference)
+    log(f'loaded {len(addresses)} address points and {len(roads)} road centerlines into memory')
+    hashFields = [f for f in addresses.fields if f != dateField]
+    roadsDigest = roads.digest()
+
+    # the identifier audit is built from the columns already in memory, no extra scan
+    nenaAudit = NenaIdentifierAudit.from_columns(
+        addresses,
+        ADDRESS_FIELDS.GUID,
+        featureType=DataType.ADDRESS_POINTS,
+        prefix=DataSchema(DataType.ADDRESS_POINTS).agencyPrefix,
+        agencyID=ng911_db.agencyID
+    )
+    summary = nenaAudit.summary()
+    log(f'NENA identifier audit: {summary.duplicates} duplicated, {summary.nulls} missing, {summary.malformed} malformed')
+    duplicates = DuplicateAddressIndex(addresses)
+    duplicateOids = duplicates.duplicateOids
+
+    if not incremental or not checkpoint or checkpoint.Digest != roadsDigest:
+        log('no checkpoint found or road centerlines have changed, validating all address points')
+        hashes = addresses.row_hashes(hashFields)
+        validated = read_validation_results(validatedTable, ['ROW_HASH'])
+        deleted = set(validated).difference(addresses.oids)
+        pending = list(range(len(addresses)))
+    else:
+        # new points and points edited since the last run, without an edit date field every point is a candidate
+        lastOID = checkpoint.LastOID or 0
+        edited = edited_since(addresses.get(dateField), checkpoint.DateUpdate) if dateField and checkpoint.DateUpdate else [True] * len(addresses)
+        candidates = [i for i, oid in enumerate(addresses.oids) if oid > lastOID or edited[i]]
+
+        # an edit can also add or clear a duplicate flag on points that were not edited
+        guids = addresses.get(ADDRESS_FIELDS.GUID)
+        changedKeys = {duplicates.keys[i] for i in candidates}
+        changedGuids = {guids[i] for i in candidates if guids[i]}
+        flagFields = [VALIDATION_FLAGS.DUPLICATE_ADDRESS, VALIDATION_FLAGS.DUPLICATE_NENA_IDENTIFIER]
+        flagged = {}
+        for field in flagFields:
+            with arcpy.da.SearchCursor(ng911_db.addressFlags, ['POINT_OID'] + flagFields, f'{field} = 1') as rows:
+                flagged.update({r[0]: (bool(r[1]), bool(r[2])) for r in rows})
+        check = set(candidates)
+        check.update(i for k in changedKeys if k for i in duplicates.index.get(k, []))
+        check.update(i for i, g in enumerate(guids) if g in changedGuids)
+        check.update(addresses.oidIndex[oid] for oid in flagged if oid in addresses.oidIndex)
+        check = sorted(check)
+
+        hashes = [None] * len(addresses)
+        for i, h in zip(check, addresses.take(check).row_hashes(hashFields)):
+            hashes[i] = h
+        validated = read_validation_results(validatedTable, ['ROW_HASH'], {addresses.oids[i] for i in check})
+        pending = [
+            i for i in check
+            if validated.get(addresses.oids[i]) != hashes[i]
+            or flagged.get(addresses.oids[i], (False, False)) != (addresses.oids[i] in duplicateOids, addresses.oids[i] in nenaAudit.duplicateOids)
+        ]
+
+        # points were deleted when fewer of the points from the last run are left
+        deleted = set()
+        if sum(1 for oid in addresses.oids if oid <= lastOID) < (checkpoint.RecordCount or 0):
+            deleted = set(read_validation_results(validatedTable, ['ROW_HASH'])).difference(addresses.oids)
+        log(f'checked {len(check)} new, edited or duplicate address points for changes')
+    pending.sort(key=lambda i: addresses.oids[i])
+    log(f'found {len(pending)} new or edited address points to validate')
+
+    return Munch(
+        unchanged=False,
+        started=started,
+        signature=signature,
+        roads=roads,
+        addresses=addresses,
+        hashes=hashes,
+        roadsDigest=roadsDigest,
+        validated=validated,
+        deleted=deleted,
+        nenaAudit=nenaAudit,
+        duplicateOids=duplicateOids,
+        pending=pending
+    )
 
-    addresses = arcpy.management.MakeFeatureLayer(ng911_db.addressPoints, f'Address_Points')
-    roads = arcpy.management.MakeFeatureLayer(ng911_db.roadCenterlines,  f'Road_Centerlines')
-    # addresses = ng911_db.get_911_layer(ng911_db.types.ADDRESS_POINTS, check_map=True)
-    # roads = ng911_db.get_911_layer(ng911_db.types.ROAD_CENTERLINE)
+def iter_address_validation(processes: int=None, incremental: bool=True, flush_size: int=DEFAULT_FLUSH_SIZE,
+                            rules: ValidationRuleRegistry=None, enabled: List[str]=None, disabled: List[str]=None,
+                            resume: bool=True) -> Iterator[Munch]:
+    """validates the address points that were added or edited since the last run, yielding a
+    record for each point as it is validated.
 
-    # get all checked nena identifiers
-    with arcpy.da.SearchCursor(ng911_db.validatedAddresses, ['NENA_GUID']) as rows:
-        checkedIds = [r[0] for r in rows]
+    The points are validated in OBJECTID order, one batch of flush_size points at a time.
+    Every CHECKPOINT_RECORDS points or CHECKPOINT_SECONDS seconds the results are written
+    and a progress checkpoint is saved with the last OBJECTID, so a run that is stopped or
+    killed picks up after the last checkpoint the next time it is started.  Points written
+    after the last checkpoint are validated again and their results replaced.  The results
+    are written whether or not the records are kept, so nothing needs to stay in memory:
 
-    count = int(arcpy.management.GetCount(ng911_db.addressPoints).getOutput(0))
-    
-    if count > 1000: 
+        with open('flags.csv', 'w', newline='') as f:
+            writer = csv.writer(f)
+            for rec in iter_address_validation():
+                writer.writerow([rec.oid, rec.guid, rec.score, rec.roadOID])
 
-        minMax = r'memory\minMaxOIDs'
-        arcpy.analysis.Statistics(ng911_db.addressPoints, minMax, [[desc.oidFieldName, 'MIN'], [desc.oidFieldName, 'MAX']])
+    Args:
+        processes (int, optional): the number of worker processes. Defaults to None (the cpu count).
+        incremental (bool, optional): only validate new or edited points. Defaults to True.
+        flush_size (int, optional): the number of results written per edit session. Defaults to DEFAULT_FLUSH_SIZE.
+        rules (ValidationRuleRegistry, optional): the validation rules. Defaults to None (DEFAULT_RULES).
+        enabled (List[str], optional): only run the rules for these flags. Defaults to None (all rules).
+        disabled (List[str], optional): skip the rules for these flags. Defaults to None.
+        resume (bool, optional): skip the points written by an unfinished run. Defaults to True.
+
+    Yields:
+        Munch: the index, oid, guid, flags, score, flagCount, roadOID and side of each point, with
+            the average seconds spent on each rule per point for its batch as timings
+    """
+    rules = rules if rules is not None else DEFAULT_RULES
+    run = prepare_address_validation(incremental)
+    if run.unchanged:
+        return
+    addresses, hashes, validated = run.addresses, run.hashes, run.validated
+    pending = run.pending
+
+    count = 0
+    progress = get_checkpoint(ADDRESS_VALIDATION_PROGRESS)
+    if resume and progress and progress.Digest == run.roadsDigest and progress.LastOID is not None:
+        # points at or before the last written batch are done unless they were edited since
+        pending = [
+            i for i in pending
+            if addresses.oids[i] > progress.LastOID or validated.get(addresses.oids[i]) != hashes[i]
+        ]
+        count = progress.RecordCount or 0
+        log(f'resuming unfinished validation after OBJECTID {progress.LastOID}, {len(pending)} address points left to validate')
+
+    # replace the results for edited points and drop results for deleted points
+    stale = {addresses.oids[i] for i in pending if addresses.oids[i] in validated}
+    stale.update(run.deleted)
+    remove_validation_results(stale)
+
+    batches = iter_validate_parallel(
+        run.roads, addresses, pending, run.nenaAudit, processes, duplicateOids=run.duplicateOids,
+        rules=rules, enabled=enabled, disabled=disabled, chunkSize=flush_size
+    )
+    extraFlags = [f for f in rules.flags if f not in VALIDATION_FLAGS.__props__]
+    guids = addresses.get(ADDRESS_FIELDS.GUID)
+    lastOID, saved, savedAt = None, count, time.perf_counter()
+    with ValidationResultSink(flush_size, addresses.spatialReference, extraFlags) as sink:
+        for results, timings in batches:
+            perPoint = Munch({k: v / len(results) for k, v in timings.items()}) if results else Munch()
+            for res in results:
+                sink.add(guids[res.index], res.oid, addresses.shapes[res.index], res.flags, hashes[res.index])
+                res.guid = guids[res.index]
+                res.score = res.flags.VALIDATION_SCORE
+                res.flagCount = res.flags.FLAG_COUNT
+                res.timings = perPoint
+                yield res
+
+            count += len(results)
+            lastOID = max([lastOID or 0] + [r.oid for r in results])
+            if count - saved >= CHECKPOINT_RECORDS or time.perf_counter() - savedAt >= CHECKPOINT_SECONDS:
+                # the points are only marked as done once they have been written
+                sink.flush()
+                save_checkpoint(ADDRESS_VALIDATION_PROGRESS, run.roadsDigest, lastOID, count)
+                saved, savedAt = count, time.perf_counter()
+
+    log(f'added {sink.validatedCount} records to validated addresses and {sink.flagCount} records to address flags')
+    rules.timing_report()
+    save_checkpoint(ADDRESS_VALIDATION_CHECKPOINT, run.roadsDigest, max(addresses.oids, default=None), len(addresses), run.signature, run.started)
+    clear_checkpoint(ADDRESS_VALIDATION_PROGRESS)
 
-        # get min and max OIDs
-        minOid, maxOid = 0, 0
-        with arcpy.da.SearchCursor(minMax, [f'MIN_{desc.oidFieldName}', f'MAX_{desc.oidFieldName}']) as rows:
-            for r in rows:
-                minOid, maxOid = r
-                break
-
-        diff = maxOid - minOid
-
-        chunkSize = min([1000, math.ceil(diff / 10)])
-        chunkCount = math.ceil(count / chunkSize)
-        log(f'found min and max OID: {minOid} -> {maxOid}, using a chunksize of {chunkSize}')
-       
-        stOid = minOid
-        addressSchema = DataSchema(DataType.ADDRESS_POINTS)
-        addrFields = [f.name for f in desc.fields if f.type not in ('OID', 'Geometry')] + ['OID@', 'SHAPE@']
-        nenaIdx = addrFields.index(addressSchema.nenaIdentifier)
-        # processes = min([chunkSize, os.cpu_count() * 2])
-        log(addrFields)
-        log(nenaIdx)
-
-        # iterate in chunks to keep memory manageble
-        for i in range(chunkCount):
-            checkFeats = []
-            endRange = int(stOid + chunkSize)
-            where = f'{desc.oidFieldName} >= {int(stOid)} AND {desc.oidFieldName} < {endRange}'
-            log(i, where)
-
-            if i > 2:
-                break
-            # search for oids to check
-            with arcpy.da.SearchCursor(ng911_db.addressPoints, addrFields, where) as rows:
-                checkFeats = [addressSchema.fromRow(addrFields, r) for r in rows if r[nenaIdx] not in checkedIds]
-
-            for ft in checkFeats:
-                try:
-                    validate_address(ft, addresses=addresses, roads=roads)
-                except Exception as e:
-                    log('validate_address failed: ', e)
-            # if checkFeats:
-            #     # processes
-            #     chunks = iter_chunks(checkFeats, processes)
-            #     for chunk in chunks:
-            #         groups = ThreadPool(processes=processes).map(address_validator, chunk)
-            
-            stOid += chunkSize
+@timeit
+def run_address_validation(processes: int=None, incremental: bool=True, flush_size: int=DEFAULT_FLUSH_SIZE,
+                           rules: ValidationRuleRegistry=None, enabled: List[str]=None, disabled: List[str]=None,
+                           resume: bool=True) -> Munch:
+    """validates all address points that were added or edited since the last run.
 
-    
-    
+    Both the address points and road centerlines are read into memory once and all
+    checks run in bulk, sharded across worker processes for large layers.  The results
+    are written from this process only and are not kept in memory, see
+    iter_address_validation() to get the result for each point.
 
-    
-    
-    
\ No newline at end of file
+    Args:
+        processes (int, optional): the number of worker processes. Defaults to None (the cpu count).
+        incremental (bool, optional): only validate new or edited points. Defaults to True.
+        flush_size (int, optional): the number of results written per edit session. Defaults to DEFAULT_FLUSH_SIZE.
+        rules (ValidationRuleRegistry, optional): the validation rules. Defaults to None (DEFAULT_RULES).
+        enabled (List[str], optional): only run the rules for these flags. Defaults to None (all rules).
+        disabled (List[str], optional): skip the rules for these flags. Defaults to None.
+        resume (bool, optional): skip the points written by an unfinished run. Defaults to True.
+
+    Returns:
+        Munch: the number of address points "validated" and the number that were "flagged"
+    """
+    summary = Munch(validated=0, flagged=0)
+    for rec in iter_address_validation(processes, incremental, flush_size, rules, enabled, disabled, resume):
+        summary.validated += 1
+        if rec.flagCount:
+            summary.flagged += 1
+    return summary
+
+@timeit
+def run_address_range_check() -> List[Munch]:
+    """checks the road centerlines for overlapping address ranges and parity conflicts on the same street,
+    MSAG community and side.  The conflicts replace the results of the last check in the AddressRangeFlags
+    table, with the centerline shape so they can be reviewed and fixed in bulk.
+
+    Returns:
+        List[Munch]: the conflicts from find_range_conflicts()
+    """
+    ng911_db = get_ng911_db()
+    table = ng911_db.ensure_schema_table(NG911SchemaTables.ADDRESS_RANGE_FLAGS)
+    roads = cursors.read_columns(ng911_db.roadCenterlines, RANGE_CHECK_FIELDS)
+    conflicts = find_range_conflicts(roads)
+
+    guids = roads.get(STREET_FIELDS.GUID)
+    now = datetime.datetime.now()
+    with cursors.EditSession(table):
+        with arcpy.da.UpdateCursor(table, ['OID@']) as rows:
+            for r in rows:
+                rows.deleteRow()
+        with arcpy.da.InsertCursor(table, RANGE_FLAG_FIELDS) as irows:
+            for c in conflicts:
+                other = c.otherIndex
+                irows.insertRow([
+                    cursors.parts_to_geometry(roads.shapes[c.index], roads.spatialReference),
+                    guids[c.index],
+                    c.oid,
+                    c.issue,
+                    c.street,
+                    c.msag,
+                    c.side,
+                    *c.range,
+                    guids[other] if other is not None else None,
+                    c.otherOid,
+                    *(c.otherRange or [None, None]),
+                    now
+                ])
+    log(f'wrote {len(conflicts)} address range conflicts to "{os.path.basename(table)}"')
+    return conflicts
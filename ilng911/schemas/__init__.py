@@ -8,7 +8,7 @@ from ..utils.json_helpers import load_json
 from ..support.munch import Munch, munchify
 from .enums import FieldCategory
 from ..core.fields import TYPE_MAPPING
-from ..core.common import Feature, FeatureBase, LOCATION_FIELDS, is_shape_field
+from ..core.common import Feature, FeatureBase, LOCATION_FIELDS, is_shape_field, resolve_locations
 from ..env import get_ng911_db, DEBUG_WS
 from typing import List, Dict
 from ..utils import cursors, copy_schema, is_arc, PropIterator
@@ -210,6 +210,17 @@ class DataSchema(FeatureBase):
             expr = ft.calculate_custom_field(field.name, field.expression, self.fieldTypings.get(field.name))
             log(f'calculated {field}: {expr}')
 
+    def calculate_spatial_join_fields(self, ft: Feature):
+        """fill the overlay fields registered in the SpatialJoinFields table for feature
+
+        Args:
+            ft (Feature): the feature to fill fields for
+        """
+        from ..core.spatial_join import get_spatial_join_engine
+        attrs = get_spatial_join_engine(self.name).apply(ft)
+        if attrs:
+            log(f'calculated spatial join fields: {attrs}')
+
     def calculate_vendor_fields(self, ft: Feature):
         """calculate all custom CAD Vendor fields for feature
 
@@ -330,6 +341,8 @@ class DataSchema(FeatureBase):
         if self._features:
             editable_fields = [f.name for f in self.fields if f.editable]
             log(f'editable fields for schema "{self._schema.layer}": {editable_fields}')
+            # project the Lat and Long of every new feature in one batch
+            resolve_locations(self._features)
             copyTab = copy_schema(self.table, time.strftime(os.path.join(DEBUG_WS, 'temp_%Y%m%d%H%M%S')))
            
             if is_arc: 
@@ -381,4 +394,16 @@ class DataSchema(FeatureBase):
         # now register new nena highest id with identifiers table
         self.ng911_db.save_nena_id(self.name)
         log(f'registered new NENA Identifier in "{self.name}" table for numeric id {self.ng911_db.new_nena_ids.get(self.name)}')
+
+        # keep the closest centerline search and reverse geocoder current without rebuilding their indexes
+        from ..core.database import NG911LayerTypes
+        if count and self.name == NG911LayerTypes.ROAD_CENTERLINE:
+            from ..core.centerlines import update_centerline_index
+            from ..core.bulk import clear_bulk_validator
+            update_centerline_index()
+            # the address validator reads the centerlines again on next use
+            clear_bulk_validator()
+        elif count and self.name == NG911LayerTypes.ADDRESS_POINTS:
+            from ..core.reverse import update_reverse_geocoder
+            update_reverse_geocoder()
         return count
\ No newline at end of file
@@ -0,0 +1,350 @@
+import math
+import heapq
+from typing import List, Dict, Tuple, Hashable, Set, Iterable
+from .planar import LineLocation, point_segment_distance
+
+# polylines with this many segments or fewer for a key are searched directly instead of through the grid
+SMALL_KEY_SEGMENTS = 64
+
+def ring_cells(col: int, row: int, r: int) -> Iterable[Tuple[int, int]]:
+    """the grid cells r cells away from a cell, r=0 is the cell itself"""
+    if r == 0:
+        yield col, row
+        return
+    for c in range(col - r, col + r + 1):
+        yield c, row - r
+        yield c, row + r
+    for rw in range(row - r + 1, row + r):
+        yield col - r, rw
+        yield col + r, rw
+
+class SegmentIndex:
+    """uniform grid index of polyline segments for nearest segment lookups.
+
+    Every segment (pair of vertices) is stored in the grid cells its envelope covers.
+    A nearest query visits rings of cells around the point and stops once no
+    unvisited cell can hold a closer segment, distances are true point to segment
+    distances.  Features can be given a key (such as a normalized street name) to
+    restrict a query to matching features.
+    """
+    def __init__(self, shapes: List[List[List[tuple]]], keys: List[Hashable]=None, cellSize: float=None):
+        """creates the index
+
+        Args:
+            shapes (List[List[List[tuple]]]): the polylines, each as a list of parts of (x, y) coordinates
+            keys (List[Hashable], optional): a key for each polyline used to filter queries. Defaults to None.
+            cellSize (float, optional): the grid cell size, in coordinate units. Defaults to None (twice the mean segment length).
+        """
+        self.ax: List[float] = []
+        self.ay: List[float] = []
+        self.bx: List[float] = []
+        self.by: List[float] = []
+        self.feature: List[int] = []
+        self.measure: List[float] = []
+        self.lengths: List[float] = [0.0] * len(shapes)
+        self.keys = list(keys) if keys is not None else None
+        self.keySegments: Dict[Hashable, List[int]] = {}
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        self.extent = None
+        self.cellSize = cellSize
+
+        for idx, parts in enumerate(shapes):
+            self._add_segments(idx, parts or [])
+
+        if not self.cellSize:
+            total = sum(self.seg_length(s) for s in range(len(self.feature)))
+            self.cellSize = (2 * total / len(self.feature)) if self.feature and total else 1.0
+
+        for s in range(len(self.feature)):
+            self._insert_segment(s)
+
+    def __len__(self):
+        return len(self.feature)
+
+    def add(self, idx: int, parts: List[List[tuple]], key: Hashable=None) -> List[int]:
+        """adds a polyline that was created after the index was built, the cell size is not changed
+
+        Args:
+            idx (int): the polyline index, must not already be in the index
+            parts (List[List[tuple]]): the polyline parts
+            key (Hashable, optional): the key for the polyline. Defaults to None.
+
+        Returns:
+            List[int]: the ids of the added segments
+        """
+        if key is not None and self.keys is None:
+            self.keys = [None] * len(self.lengths)
+        if self.keys is not None:
+            self.keys.extend([None] * (idx + 1 - len(self.keys)))
+            self.keys[idx] = key
+        added = self._add_segments(idx, parts or [])
+        for s in added:
+            self._insert_segment(s)
+        return added
+
+    def seg_length(self, s: int) -> float:
+        return math.hypot(self.bx[s] - self.ax[s], self.by[s] - self.ay[s])
+
+    def _add_segments(self, idx: int, parts: List[List[tuple]]) -> List[int]:
+        added = []
+        travelled = 0.0
+        key = self.keys[idx] if self.keys else None
+        for part in parts:
+            for i in range(len(part) - 1):
+                (ax, ay), (bx, by) = part[i], part[i+1]
+                s = len(self.feature)
+                self.ax.append(ax)
+                self.ay.append(ay)
+                self.bx.append(bx)
+                self.by.append(by)
+                self.feature.append(idx)
+                self.measure.append(travelled)
+                travelled += math.hypot(bx - ax, by - ay)
+                if key is not None:
+                    self.keySegments.setdefault(key, []).append(s)
+                added.append(s)
+        if idx >= len(self.lengths):
+            self.lengths.extend([0.0] * (idx + 1 - len(self.lengths)))
+        self.lengths[idx] = travelled
+        return added
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return int(math.floor(x / self.cellSize)), int(math.floor(y / self.cellSize))
+
+    def _insert_segment(self, s: int):
+        x0, x1 = sorted((self.ax[s], self.bx[s]))
+        y0, y1 = sorted((self.ay[s], self.by[s]))
+        c0, r0 = self._cell(x0, y0)
+        c1, r1 = self._cell(x1, y1)
+        for c in range(c0, c1 + 1):
+            for r in range(r0, r1 + 1):
+                self.cells.setdefault((c, r), []).append(s)
+        if self.extent is None:
+            self.extent = [c0, r0, c1, r1]
+        else:
+            ext = self.extent
+            self.extent = [min(ext[0], c0), min(ext[1], r0), max(ext[2], c1), max(ext[3], r1)]
+
+    def locate(self, s: int, px: float, py: float) -> LineLocation:
+        """locates a point on a single indexed segment
+
+        Args:
+            s (int): the segment id
+            px (float): the point x
+            py (float): the point y
+
+        Returns:
+            LineLocation: the location, measured along the whole polyline
+        """
+        ax, ay, bx, by = self.ax[s], self.ay[s], self.bx[s], self.by[s]
+        dist, t = point_segment_distance(px, py, ax, ay, bx, by)
+        cross = (bx - ax) * (py - ay) - (by - ay) * (px - ax)
+        return LineLocation(
+            dist,
+            self.measure[s] + t * self.seg_length(s),
+            self.lengths[self.feature[s]],
+            'R' if cross < 0 else 'L',
+            ax + t * (bx - ax),
+            ay + t * (by - ay)
+        )
+
+    def _ring(self, col: int, row: int, r: int) -> Iterable[Tuple[int, int]]:
+        return ring_cells(col, row, r)
+
+    def _search(self, x: float, y: float, maxDistance: float=None, key: Hashable=None, features: Set[int]=None) -> Iterable[Tuple[int, float]]:
+        """yields (segment id, None) for candidate segments ring by ring, after each ring (None, bound)
+        is yielded where bound is the closest any segment in a later ring can be.  The caller stops the search."""
+        col, row = self._cell(x, y)
+        ext = self.extent
+        if ext is None:
+            return
+        # rings needed to cover the whole grid (or the max distance) from the query cell
+        maxRing = max(abs(col - ext[0]), abs(col - ext[2]), abs(row - ext[1]), abs(row - ext[3]))
+        if maxDistance is not None:
+            maxRing = min(maxRing, int(math.ceil(maxDistance / self.cellSize)))
+        seen = set()
+        for r in range(maxRing + 1):
+            for cell in self._ring(col, row, r):
+                for s in self.cells.get(cell, []):
+                    if s in seen:
+                        continue
+                    seen.add(s)
+                    if key is not None and self.keys[self.feature[s]] != key:
+                        continue
+                    if features is not None and self.feature[s] not in features:
+                        continue
+                    yield s, None
+            # everything in the next ring is at least this far from the point
+            yield None, r * self.cellSize
+
+    def nearest(self, x: float, y: float, maxDistance: float=None, key: Hashable=None, features: Set[int]=None) -> Tuple[int, LineLocation]:
+        """finds the closest polyline to a point
+
+        Args:
+            x (float): the point x
+            y (float): the point y
+            maxDistance (float, optional): the search distance. Defaults to None (no limit).
+            key (Hashable, optional): only search polylines with this key. Defaults to None.
+            features (Set[int], optional): only search these polylines. Defaults to None.
+
+        Returns:
+            Tuple[int, LineLocation]: the polyline index and the location of the point along it,
+                (None, None) if nothing was found
+        """
+        best, bestSeg = None, None
+        if key is not None and len(self.keySegments.get(key, [])) <= SMALL_KEY_SEGMENTS:
+            # few segments for this key, checking them directly is faster than walking the grid
+            candidates = ((s, None) for s in self.keySegments.get(key, []) if features is None or self.feature[s] in features)
+        else:
+            candidates = self._search(x, y, maxDistance, key, features)
+
+        for s, bound in candidates:
+            if s is None:
+                # end of a ring, stop once the best match is closer than any unvisited cell
+                if bestSeg is not None and best <= bound:
+                    break
+                continue
+            dist = point_segment_distance(x, y, self.ax[s], self.ay[s], self.bx[s], self.by[s])[0]
+            if maxDistance is not None and dist > maxDistance:
+                continue
+            # ties go to the first segment along the line, like locate_on_polyline()
+            if bestSeg is None or dist < best or (dist == best and s < bestSeg):
+                best, bestSeg = dist, s
+        if bestSeg is None:
+            return None, None
+        return self.feature[bestSeg], self.locate(bestSeg, x, y)
+
+    def nearest_k(self, x: float, y: float, k: int=1, maxDistance: float=None, distinctKeys: bool=False) -> List[Tuple[int, LineLocation]]:
+        """finds the k closest polylines to a point
+
+        Args:
+            x (float): the point x
+            y (float): the point y
+            k (int, optional): the number of polylines to find. Defaults to 1.
+            maxDistance (float, optional): the search distance. Defaults to None (no limit).
+            distinctKeys (bool, optional): only return the closest polyline for each key, such as one segment
+                per street. Polylines without a key are always returned. Defaults to False.
+
+        Returns:
+            List[Tuple[int, LineLocation]]: the polyline indices and the location of the point along each, sorted by distance
+        """
+        # the closest segment for each group as (distance, segment id)
+        best: Dict[Hashable, Tuple[float, int]] = {}
+        for s, bound in self._search(x, y, maxDistance):
+            if s is None:
+                if len(best) >= k and heapq.nsmallest(k, best.values())[-1][0] <= bound:
+                    break
+                continue
+            dist = point_segment_distance(x, y, self.ax[s], self.ay[s], self.bx[s], self.by[s])[0]
+            if maxDistance is not None and dist > maxDistance:
+                continue
+            idx = self.feature[s]
+            key = self.keys[idx] if distinctKeys and self.keys else None
+            group = (0, key) if key is not None else (1, idx)
+            current = best.get(group)
+            if current is None or (dist, s) < current:
+                best[group] = (dist, s)
+        return [(self.feature[s], self.locate(s, x, y)) for dist, s in heapq.nsmallest(k, best.values())]
+
+    def within(self, x: float, y: float, distance: float, key: Hashable=None) -> List[Tuple[int, LineLocation]]:
+        """finds every polyline within a distance of a point
+
+        Args:
+            x (float): the point x
+            y (float): the point y
+            distance (float): the search distance
+            key (Hashable, optional): only search polylines with this key. Defaults to None.
+
+        Returns:
+            List[Tuple[int, LineLocation]]: the polyline indices and the closest location on each, sorted by distance
+        """
+        found: Dict[int, Tuple[int, LineLocation]] = {}
+        for s, bound in self._search(x, y, distance, key):
+            if s is None:
+                continue
+            loc = self.locate(s, x, y)
+            idx = self.feature[s]
+            if loc.distance <= distance and (idx not in found or (loc.distance, s) < (found[idx][1].distance, found[idx][0])):
+                found[idx] = (s, loc)
+        return sorted(((idx, loc) for idx, (s, loc) in found.items()), key=lambda f: f[1].distance)
+
+
+class PointIndex:
+    """uniform grid index of points for nearest point lookups, searched ring by ring like SegmentIndex"""
+    def __init__(self, points: List[tuple], cellSize: float=None):
+        """creates the index
+
+        Args:
+            points (List[tuple]): the (x, y) points, None for records without a shape
+            cellSize (float, optional): the grid cell size, in coordinate units. Defaults to None (about 4 points per cell).
+        """
+        self.points = list(points)
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        self.extent = None
+        self.cellSize = cellSize
+        valid = [p for p in self.points if p]
+        if not self.cellSize:
+            if len(valid) > 1:
+                xs, ys = [p[0] for p in valid], [p[1] for p in valid]
+                area = (max(xs) - min(xs)) * (max(ys) - min(ys))
+                self.cellSize = math.sqrt(4 * area / len(valid)) if area else 1.0
+            else:
+                self.cellSize = 1.0
+        for idx, p in enumerate(self.points):
+            if p:
+                self._insert(idx, p)
+
+    def __len__(self):
+        return len(self.points)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return int(math.floor(x / self.cellSize)), int(math.floor(y / self.cellSize))
+
+    def _insert(self, idx: int, point: tuple):
+        c, r = self._cell(point[0], point[1])
+        self.cells.setdefault((c, r), []).append(idx)
+        ext = self.extent
+        self.extent = [c, r, c, r] if ext is None else [min(ext[0], c), min(ext[1], r), max(ext[2], c), max(ext[3], r)]
+
+    def add(self, idx: int, point: tuple):
+        """adds a point that was created after the index was built
+
+        Args:
+            idx (int): the point index, must not already be in the index
+            point (tuple): the (x, y) point
+        """
+        self.points.extend([None] * (idx + 1 - len(self.points)))
+        self.points[idx] = point
+        if point:
+            self._insert(idx, point)
+
+    def nearest(self, x: float, y: float, maxDistance: float=None) -> Tuple[int, float]:
+        """finds the closest point
+
+        Args:
+            x (float): the x coordinate
+            y (float): the y coordinate
+            maxDistance (float, optional): the search distance. Defaults to None (no limit).
+
+        Returns:
+            Tuple[int, float]: the point index and distance, (None, None) if nothing was found
+        """
+        ext = self.extent
+        if ext is None:
+            return None, None
+        col, row = self._cell(x, y)
+        maxRing = max(abs(col - ext[0]), abs(col - ext[2]), abs(row - ext[1]), abs(row - ext[3]))
+        if maxDistance is not None:
+            maxRing = min(maxRing, int(math.ceil(maxDistance / self.cellSize)))
+        best, bestIdx = None, None
+        for r in range(maxRing + 1):
+            for cell in ring_cells(col, row, r):
+                for idx in self.cells.get(cell, []):
+                    px, py = self.points[idx]
+                    dist = math.hypot(x - px, y - py)
+                    if (maxDistance is None or dist <= maxDistance) and (bestIdx is None or (dist, idx) < (best, bestIdx)):
+                        best, bestIdx = dist, idx
+            # everything in the next ring is at least this far from the point
+            if bestIdx is not None and best <= r * self.cellSize:
+                break
+        return bestIdx, best
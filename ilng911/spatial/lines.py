@@ -0,0 +1,186 @@
+import math
+import numpy as np
+from typing import List, Tuple, Union
+
+# the line helpers in ilng911.utils.geometry, these only need objects with X and Y (or firstPoint
+# and lastPoint) so they are kept here without arcpy, along with the batch versions for many lines
+
+def line_dir(line_geometry):
+    """returns a tuple of direction in y,x
+
+    ex: line_dir(line) --> ('N','E')
+    """
+    start_x = line_geometry.firstPoint.X
+    end_x = line_geometry.lastPoint.X
+    start_y =line_geometry.firstPoint.Y
+    end_y = line_geometry.lastPoint.Y
+
+    easting = start_x - end_x
+    northing = start_y - end_y
+
+    # get directions
+    if easting < 0:
+        e_dir = 'E'
+    else:
+        e_dir = 'W'
+    if northing < 0:
+        n_dir = 'N'
+    else:
+        n_dir = 'S'
+    return n_dir, e_dir
+
+def get_angle(xy1, xy2):
+    """Calculate azimuth angle from two points. (Zero is north.)
+
+    # Curtis Price, cprice@usgs.gov,  9/18/2013 11:51:10 AM
+    """
+    try:
+        # ArcPy point objects
+        x1, y1, x2, y2 = xy1.X, xy1.Y, xy2.X, xy2.Y
+    except:
+        # xy strings, e.g. "0 0"
+        if isinstance(xy1, str) and isinstance(xy2, str):
+            xy1, xy2 = xy1.replace('NaN',''), xy2.replace('NaN','')
+        x1, y1 = map(float, xy1.split())
+        x2, y2 = map(float, xy2.split())
+    dx, dy = (x2 - x1, y2 - y1)
+    return 90 - math.degrees(math.atan2(dy, dx))
+
+def midpoint(point_a, point_b):
+    """returns the midpoint of a line"""
+    x1 = point_a.X
+    y1 = point_a.Y
+    x2 = point_b.X
+    y2 = point_b.Y
+
+    # Find midpoint
+    x = (x1 + x2) / 2.0
+    y = (y1 + y2) / 2.0
+    return (x, y)
+
+def extended_xy(fp, lp, dist):
+    """computes the coordinates at a distance along the prolongation of the line from fp to lp,
+    see extended_coord() in ilng911.utils.geometry
+
+    Returns:
+        tuple: the x and y
+    """
+    coords = [(fp.X, fp.Y), (lp.X, lp.Y)]
+    (x1,y1),(x2,y2) = coords
+    dx = x2 - x1
+    dy = y2 - y1
+    linelen = math.hypot(dx, dy)
+
+    x3 = x2 + dx/linelen * dist
+    y3 = y2 + dy/linelen * dist
+    return (x3, y3)
+
+def format_quadrant_bearing(angle: float) -> str:
+    """formats an azimuth (zero is north) as a quadrant bearing
+
+    ex: format_quadrant_bearing(135.5) --> S 44°30'00" E
+    """
+    angle %= 360
+    if angle <= 90:
+        ns, ew, degrees = 'N', 'E', angle
+    elif angle <= 180:
+        ns, ew, degrees = 'S', 'E', 180 - angle
+    elif angle <= 270:
+        ns, ew, degrees = 'S', 'W', angle - 180
+    else:
+        ns, ew, degrees = 'N', 'W', 360 - angle
+    seconds = int(round(degrees * 3600))
+    return f'{ns} {seconds // 3600}°{seconds % 3600 // 60:02d}\'{seconds % 60:02d}" {ew}'
+
+def quadrant_bearing(line_geometry):
+    """returns the quadrant bearing between the first and last point of a line
+
+    ex: quadrant_bearing(line) --> N 45°00'00" E
+    """
+    return format_quadrant_bearing(get_angle(line_geometry.firstPoint, line_geometry.lastPoint))
+
+def _xy(points: Union[np.ndarray, List[tuple]]) -> Tuple[np.ndarray, np.ndarray]:
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return points[:, 0], points[:, 1]
+
+def line_dirs(firstPoints: np.ndarray, lastPoints: np.ndarray) -> np.ndarray:
+    """line_dir() for many lines
+
+    Args:
+        firstPoints (np.ndarray): the (n, 2) first points
+        lastPoints (np.ndarray): the (n, 2) last points
+
+    Returns:
+        np.ndarray: the (n, 2) directions, each row is the ('N'|'S', 'E'|'W') from line_dir()
+    """
+    x1, y1 = _xy(firstPoints)
+    x2, y2 = _xy(lastPoints)
+    return np.column_stack([np.where(y1 - y2 < 0, 'N', 'S'), np.where(x1 - x2 < 0, 'E', 'W')])
+
+def get_angles(firstPoints: np.ndarray, lastPoints: np.ndarray) -> np.ndarray:
+    """get_angle() for many lines, numpy's arctan2 may differ from math.atan2 in the last bit
+
+    Args:
+        firstPoints (np.ndarray): the (n, 2) first points
+        lastPoints (np.ndarray): the (n, 2) last points
+
+    Returns:
+        np.ndarray: the azimuth of each line, zero is north
+    """
+    x1, y1 = _xy(firstPoints)
+    x2, y2 = _xy(lastPoints)
+    return 90 - np.degrees(np.arctan2(y2 - y1, x2 - x1))
+
+def midpoints(firstPoints: np.ndarray, lastPoints: np.ndarray) -> np.ndarray:
+    """midpoint() for many lines
+
+    Args:
+        firstPoints (np.ndarray): the (n, 2) first points
+        lastPoints (np.ndarray): the (n, 2) last points
+
+    Returns:
+        np.ndarray: the (n, 2) midpoints
+    """
+    x1, y1 = _xy(firstPoints)
+    x2, y2 = _xy(lastPoints)
+    return np.column_stack([(x1 + x2) / 2.0, (y1 + y2) / 2.0])
+
+def extended_coords(firstPoints: np.ndarray, lastPoints: np.ndarray, dist: Union[float, np.ndarray]) -> np.ndarray:
+    """extended_coord() for many lines, zero length lines give NaN where extended_coord() raises ZeroDivisionError.
+    numpy's hypot may differ from math.hypot in the last bit
+
+    Args:
+        firstPoints (np.ndarray): the (n, 2) first points
+        lastPoints (np.ndarray): the (n, 2) last points, the lines are extended past these
+        dist (Union[float, np.ndarray]): the distance, for all of the lines or for each one
+
+    Returns:
+        np.ndarray: the (n, 2) extended points
+    """
+    x1, y1 = _xy(firstPoints)
+    x2, y2 = _xy(lastPoints)
+    dx = x2 - x1
+    dy = y2 - y1
+    linelen = np.hypot(dx, dy)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.column_stack([x2 + dx/linelen * dist, y2 + dy/linelen * dist])
+
+def quadrant_bearings(firstPoints: np.ndarray, lastPoints: np.ndarray) -> List[str]:
+    """quadrant_bearing() for many lines
+
+    Args:
+        firstPoints (np.ndarray): the (n, 2) first points
+        lastPoints (np.ndarray): the (n, 2) last points
+
+    Returns:
+        List[str]: the quadrant bearing of each line
+    """
+    angle = get_angles(firstPoints, lastPoints) % 360
+    ns = np.where((angle > 90) & (angle <= 270), 'S', 'N')
+    ew = np.where(angle <= 180, 'E', 'W')
+    degrees = np.select([angle <= 90, angle <= 180, angle <= 270], [angle, 180 - angle, angle - 180], 360 - angle)
+    seconds = np.rint(degrees * 3600).astype(np.int64)
+    return [
+        f'{n} {s // 3600}°{s % 3600 // 60:02d}\'{s % 60:02d}" {e}'
+        for n, e, s in zip(ns.tolist(), ew.tolist(), seconds.tolist())
+    ]
@@ -0,0 +1,131 @@
+import math
+from collections import namedtuple
+from typing import List, Tuple
+
+# result of locating a point on a polyline, "side" matches arcpy's queryPointAndDistance (R or L)
+LineLocation = namedtuple('LineLocation', ['distance', 'along', 'length', 'side', 'x', 'y'])
+
+def point_segment_distance(px: float, py: float, ax: float, ay: float, bx: float, by: float) -> Tuple[float, float]:
+    """finds the distance from a point to a line segment
+
+    Args:
+        px (float): the point x
+        py (float): the point y
+        ax (float): the segment start x
+        ay (float): the segment start y
+        bx (float): the segment end x
+        by (float): the segment end y
+
+    Returns:
+        Tuple[float, float]: the distance and the ratio (0-1) along the segment of the closest point
+    """
+    dx, dy = bx - ax, by - ay
+    seg_len_sq = dx * dx + dy * dy
+    if seg_len_sq == 0:
+        return math.hypot(px - ax, py - ay), 0.0
+    t = ((px - ax) * dx + (py - ay) * dy) / seg_len_sq
+    if t < 0:
+        t = 0.0
+    elif t > 1:
+        t = 1.0
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy)), t
+
+def polyline_extent(parts: List[List[tuple]]) -> Tuple[float, float, float, float]:
+    """gets the extent of a polyline
+
+    Args:
+        parts (List[List[tuple]]): the polyline parts
+
+    Returns:
+        Tuple[float, float, float, float]: xmin, ymin, xmax, ymax
+    """
+    xs = [c[0] for part in parts for c in part]
+    ys = [c[1] for part in parts for c in part]
+    if not xs:
+        return None
+    return min(xs), min(ys), max(xs), max(ys)
+
+def polyline_length(parts: List[List[tuple]]) -> float:
+    """gets the planar length of a polyline"""
+    return sum(
+        math.hypot(part[i+1][0] - part[i][0], part[i+1][1] - part[i][1])
+        for part in parts for i in range(len(part) - 1)
+    )
+
+def locate_on_polyline(px: float, py: float, parts: List[List[tuple]]) -> LineLocation:
+    """locates a point on a polyline, the planar equivalent of arcpy.Polyline.queryPointAndDistance()
+
+    Args:
+        px (float): the point x
+        py (float): the point y
+        parts (List[List[tuple]]): the polyline parts
+
+    Returns:
+        LineLocation: the distance to the line, the distance along the line, the line length,
+            the side of the line (R|L) and the closest point on the line
+    """
+    best = None
+    travelled = 0.0
+    for part in parts:
+        for i in range(len(part) - 1):
+            (ax, ay), (bx, by) = part[i], part[i+1]
+            dist, t = point_segment_distance(px, py, ax, ay, bx, by)
+            seg_len = math.hypot(bx - ax, by - ay)
+            if best is None or dist < best[0]:
+                # cross product sign tells which side of the segment the point falls on
+                cross = (bx - ax) * (py - ay) - (by - ay) * (px - ax)
+                best = (dist, travelled + t * seg_len, 'R' if cross < 0 else 'L', ax + t * (bx - ax), ay + t * (by - ay))
+            travelled += seg_len
+    if best is None:
+        return None
+    dist, along, side, x, y = best
+    return LineLocation(dist, along, travelled, side, x, y)
+
+def point_along_polyline(parts: List[List[tuple]], distance: float) -> Tuple[float, float, float, float]:
+    """finds the point a distance along a polyline, the planar equivalent of arcpy.Polyline.positionAlongLine()
+
+    Args:
+        parts (List[List[tuple]]): the polyline parts
+        distance (float): the distance from the start of the line, clamped to the line
+
+    Returns:
+        Tuple[float, float, float, float]: the x, y and the unit direction (dx, dy) of the segment at the point
+    """
+    last = None
+    travelled = 0.0
+    for part in parts:
+        for i in range(len(part) - 1):
+            (ax, ay), (bx, by) = part[i], part[i+1]
+            seg_len = math.hypot(bx - ax, by - ay)
+            if not seg_len:
+                continue
+            last = (ax, ay, bx, by, seg_len)
+            if travelled + seg_len >= distance:
+                t = max(distance - travelled, 0.0) / seg_len
+                return ax + t * (bx - ax), ay + t * (by - ay), (bx - ax) / seg_len, (by - ay) / seg_len
+            travelled += seg_len
+    if last is None:
+        return None
+    ax, ay, bx, by, seg_len = last
+    return bx, by, (bx - ax) / seg_len, (by - ay) / seg_len
+
+def point_in_polygon(px: float, py: float, parts: List[List[tuple]]) -> bool:
+    """checks if a point falls inside a polygon with the even-odd rule, so holes are
+    handled the same way as outer rings.  Points on the boundary may fall either way.
+
+    Args:
+        px (float): the point x
+        py (float): the point y
+        parts (List[List[tuple]]): the polygon rings
+
+    Returns:
+        bool: True if the point is inside the polygon
+    """
+    inside = False
+    for ring in parts:
+        n = len(ring)
+        for i in range(n):
+            (ax, ay), (bx, by) = ring[i - 1], ring[i]
+            if (ay > py) != (by > py) and px < ax + (py - ay) * (bx - ax) / (by - ay):
+                inside = not inside
+    return inside
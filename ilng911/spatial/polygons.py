@@ -0,0 +1,242 @@
+import math
+import numpy as np
+from typing import List, Tuple, Iterable
+from .planar import polyline_extent
+
+# boxes per node of the bounding box tree
+DEFAULT_NODE_SIZE = 16
+
+# the edges of each polygon are bucketed into horizontal bands of about this many edges
+EDGES_PER_BAND = 8
+
+# the most point to edge pairs tested at once in find_many(), limits memory for large batches
+DEFAULT_PAIR_CHUNK = 2000000
+
+class BoxTree:
+    """static bounding box tree, packed with the sort-tile-recursive method.
+
+    The boxes are sorted into vertical slices by their center x and then by their center y
+    within each slice, and grouped into nodes of nodeSize boxes.  Each level is grouped the
+    same way until there is a single root.
+    """
+    def __init__(self, boxes: List[Tuple[float, float, float, float]], nodeSize: int=DEFAULT_NODE_SIZE):
+        """creates the tree
+
+        Args:
+            boxes (List[Tuple[float, float, float, float]]): the (xmin, ymin, xmax, ymax) of each item, None for empty items
+            nodeSize (int, optional): the most children per node. Defaults to DEFAULT_NODE_SIZE.
+        """
+        self.nodeSize = nodeSize
+        self.boxes = boxes
+        # each level is a list of (box, children), the children of the first level are item ids
+        self.levels: List[List[Tuple[tuple, List[int]]]] = []
+        entries = [(box, i) for i, box in enumerate(boxes) if box]
+        while entries:
+            nodes = self._pack(entries)
+            self.levels.append(nodes)
+            if len(nodes) == 1:
+                break
+            entries = [(box, i) for i, (box, children) in enumerate(nodes)]
+
+    def _pack(self, entries: List[Tuple[tuple, int]]) -> List[Tuple[tuple, List[int]]]:
+        size = self.nodeSize
+        slices = max(1, int(math.ceil(math.sqrt(math.ceil(len(entries) / size)))))
+        perSlice = slices * size
+        entries = sorted(entries, key=lambda e: e[0][0] + e[0][2])
+        nodes = []
+        for s in range(0, len(entries), perSlice):
+            column = sorted(entries[s:s + perSlice], key=lambda e: e[0][1] + e[0][3])
+            for n in range(0, len(column), size):
+                group = column[n:n + size]
+                box = (
+                    min(e[0][0] for e in group), min(e[0][1] for e in group),
+                    max(e[0][2] for e in group), max(e[0][3] for e in group)
+                )
+                nodes.append((box, [e[1] for e in group]))
+        return nodes
+
+    def query(self, x: float, y: float) -> List[int]:
+        """finds the items whose box contains a point
+
+        Args:
+            x (float): the x coordinate
+            y (float): the y coordinate
+
+        Returns:
+            List[int]: the item ids, in ascending order
+        """
+        if not self.levels:
+            return []
+        level = len(self.levels) - 1
+        candidates = range(len(self.levels[level]))
+        while level >= 0:
+            found = []
+            for n in candidates:
+                (xmin, ymin, xmax, ymax), children = self.levels[level][n]
+                if xmin <= x <= xmax and ymin <= y <= ymax:
+                    found.extend(children)
+            candidates = found
+            level -= 1
+        boxes = self.boxes
+        return sorted(i for i in candidates if boxes[i][0] <= x <= boxes[i][2] and boxes[i][1] <= y <= boxes[i][3])
+
+class PolygonIndex:
+    """point in polygon index for polygon layers such as municipal boundaries and ZIP codes.
+
+    The polygon envelopes are held in a BoxTree.  The edges of each polygon are bucketed into
+    horizontal bands, a ray cast from a point only crosses the edges in the point's band, so
+    a lookup tests a handful of edges instead of every vertex of the polygon.  Results are the
+    same as point_in_polygon() (even-odd rule).
+    """
+    def __init__(self, shapes: List[List[List[tuple]]], nodeSize: int=DEFAULT_NODE_SIZE, edgesPerBand: int=EDGES_PER_BAND):
+        """creates the index
+
+        Args:
+            shapes (List[List[List[tuple]]]): the polygons, each as a list of rings of (x, y) coordinates, None for empty shapes
+            nodeSize (int, optional): the most children per tree node. Defaults to DEFAULT_NODE_SIZE.
+            edgesPerBand (int, optional): about how many edges go in each band. Defaults to EDGES_PER_BAND.
+        """
+        self.extents = [polyline_extent(parts) if parts else None for parts in shapes]
+        self.tree = BoxTree(self.extents, nodeSize)
+        self.edgesPerBand = edgesPerBand
+        # per polygon: edge arrays (ax, ay, bx, by), band height, band offsets and the edge ids of each band
+        self.edges: List[Tuple[np.ndarray, ...]] = []
+        self.bands: List[Tuple[float, int, np.ndarray, np.ndarray]] = []
+        # the ymin, band height, band count and the band edges as tuples for single point lookups
+        self.rays: List[Tuple[float, float, int, List[List[tuple]]]] = []
+        for idx, parts in enumerate(shapes):
+            self._add_polygon(idx, parts or [])
+
+    def __len__(self):
+        return len(self.extents)
+
+    def _add_polygon(self, idx: int, parts: List[List[tuple]]):
+        ax, ay, bx, by = [], [], [], []
+        for ring in parts:
+            for i in range(len(ring)):
+                (x0, y0), (x1, y1) = ring[i - 1][:2], ring[i][:2]
+                # horizontal edges are never crossed by the ray
+                if y0 != y1:
+                    ax.append(x0)
+                    ay.append(y0)
+                    bx.append(x1)
+                    by.append(y1)
+        edges = tuple(np.array(a, dtype=np.float64) for a in (ax, ay, bx, by))
+        self.edges.append(edges)
+        ext = self.extents[idx]
+        count = max(1, len(ax) // self.edgesPerBand)
+        height = (ext[3] - ext[1]) / count if ext and ext[3] > ext[1] else 0.0
+        if not height:
+            count = 1
+        lo = self._band(np.minimum(edges[1], edges[3]), ext, height, count)
+        hi = self._band(np.maximum(edges[1], edges[3]), ext, height, count)
+        spans = hi - lo + 1
+        edgeIds = np.repeat(np.arange(len(ax)), spans)
+        bandIds = np.repeat(lo, spans) + (np.arange(spans.sum()) - np.repeat(np.cumsum(spans) - spans, spans))
+        order = np.argsort(bandIds, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(bandIds, minlength=count))]).astype(np.int64)
+        bandEdges = edgeIds[order]
+        self.bands.append((height, count, offsets, bandEdges))
+        self.rays.append((ext[1] if ext else 0.0, height, count, [
+            [(ax[e], ay[e], bx[e], by[e]) for e in bandEdges[offsets[b]:offsets[b + 1]].tolist()]
+            for b in range(count)
+        ]))
+
+    @staticmethod
+    def _band(ys, ext, height: float, count: int):
+        if not height:
+            return np.zeros(np.shape(ys), dtype=np.int64) if np.ndim(ys) else 0
+        return np.clip(np.floor((np.asarray(ys) - ext[1]) / height).astype(np.int64), 0, count - 1)
+
+    def contains(self, idx: int, x: float, y: float) -> bool:
+        """checks if a polygon contains a point
+
+        Args:
+            idx (int): the polygon index
+            x (float): the x coordinate
+            y (float): the y coordinate
+
+        Returns:
+            bool: True if the point is inside the polygon
+        """
+        ext = self.extents[idx]
+        if ext is None or not (ext[0] <= x <= ext[2] and ext[1] <= y <= ext[3]):
+            return False
+        return self._ray_cast(idx, x, y)
+
+    def _ray_cast(self, idx: int, x: float, y: float) -> bool:
+        ymin, height, count, bands = self.rays[idx]
+        inside = False
+        for ax, ay, bx, by in bands[min(int((y - ymin) / height), count - 1) if height else 0]:
+            if (ay > y) != (by > y) and x < ax + (y - ay) * (bx - ax) / (by - ay):
+                inside = not inside
+        return inside
+
+    def find(self, x: float, y: float) -> int:
+        """finds the first polygon that contains a point
+
+        Args:
+            x (float): the x coordinate
+            y (float): the y coordinate
+
+        Returns:
+            int: the polygon index, or None
+        """
+        for idx in self.tree.query(x, y):
+            if self._ray_cast(idx, x, y):
+                return idx
+        return None
+
+    def find_all(self, x: float, y: float) -> List[int]:
+        """finds every polygon that contains a point, for layers with overlapping polygons"""
+        return [idx for idx in self.tree.query(x, y) if self._ray_cast(idx, x, y)]
+
+    def _contains_many(self, idx: int, xs: np.ndarray, ys: np.ndarray, pairChunk: int) -> np.ndarray:
+        ext = self.extents[idx]
+        ax, ay, bx, by = self.edges[idx]
+        height, count, offsets, bandEdges = self.bands[idx]
+        bands = self._band(ys, ext, height, count)
+        counts = offsets[bands + 1] - offsets[bands]
+        inside = np.zeros(len(xs), dtype=bool)
+        total = np.cumsum(counts)
+        lo = 0
+        while lo < len(xs):
+            done = total[lo - 1] if lo else 0
+            hi = max(int(np.searchsorted(total, done + pairChunk, side='right')), lo + 1)
+            c = counts[lo:hi]
+            # one (point, edge) pair for each edge in the point's band
+            pair = np.repeat(np.arange(lo, hi), c)
+            e = bandEdges[np.repeat(offsets[bands[lo:hi]], c) + (np.arange(pair.size) - np.repeat(np.cumsum(c) - c, c))]
+            px, py = xs[pair], ys[pair]
+            eax, eay, ebx, eby = ax[e], ay[e], bx[e], by[e]
+            crosses = ((eay > py) != (eby > py)) & (px < eax + (py - eay) * (ebx - eax) / (eby - eay))
+            inside[lo:hi] = np.bincount(pair - lo, weights=crosses, minlength=hi - lo) % 2 == 1
+            lo = hi
+        return inside
+
+    def find_many(self, xs: Iterable[float], ys: Iterable[float], pairChunk: int=DEFAULT_PAIR_CHUNK) -> np.ndarray:
+        """finds the first polygon that contains each point of a batch
+
+        Args:
+            xs (Iterable[float]): the x coordinates
+            ys (Iterable[float]): the y coordinates
+            pairChunk (int, optional): the most point to edge pairs tested at once. Defaults to DEFAULT_PAIR_CHUNK.
+
+        Returns:
+            np.ndarray: the polygon index for each point, -1 where no polygon contains the point
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        found = np.full(len(xs), -1, dtype=np.int64)
+        # points sorted by x so the points inside each envelope are found with a binary search
+        order = np.argsort(xs, kind='stable')
+        sortedX = xs[order]
+        for idx, ext in enumerate(self.extents):
+            if ext is None:
+                continue
+            candidates = order[np.searchsorted(sortedX, ext[0], 'left'):np.searchsorted(sortedX, ext[2], 'right')]
+            candidates = candidates[(found[candidates] < 0) & (ys[candidates] >= ext[1]) & (ys[candidates] <= ext[3])]
+            if candidates.size:
+                hits = candidates[self._contains_many(idx, xs[candidates], ys[candidates], pairChunk)]
+                found[hits] = idx
+        return found
@@ -0,0 +1,238 @@
+import numpy as np
+from typing import List, Iterable, Tuple
+from .lines import get_angles, midpoints, extended_coords
+
+# version of the layout written by PolylineStore.save()
+STORE_FORMAT_VERSION = 1
+
+# [version, line count, part count, vertex count, wkid, meters per unit]
+STORE_HEADER_SIZE = 6
+
+class PolylineStore:
+    """the vertices of a set of polylines in contiguous float64 arrays.
+
+    The store is a two level ragged array, polyline i owns parts lineOffsets[i] to
+    lineOffsets[i+1] and part j owns vertices partOffsets[j] to partOffsets[j+1] of
+    the (n, 2) coords array.  Lengths, end points, angles, flipping and extending are
+    done for every polyline at once, and the whole store is saved to a single .npy file
+    that can be memory mapped, so the road geometry of a county can be opened without arcpy.
+    """
+    def __init__(self, coords: np.ndarray, partOffsets: np.ndarray, lineOffsets: np.ndarray, oids: np.ndarray=None,
+                 wkid: int=None, metersPerUnit: float=1.0):
+        """creates the store from its arrays, see from_shapes() to create one from polyline parts
+
+        Args:
+            coords (np.ndarray): the (n, 2) vertex coordinates
+            partOffsets (np.ndarray): the first vertex of each part, followed by the vertex count
+            lineOffsets (np.ndarray): the first part of each polyline, followed by the part count
+            oids (np.ndarray, optional): the OBJECTID of each polyline. Defaults to None (1 to n).
+            wkid (int, optional): the wkid of the coordinate system. Defaults to None.
+            metersPerUnit (float, optional): meters per coordinate unit. Defaults to 1.0.
+        """
+        self.coords = coords
+        self.partOffsets = np.asarray(partOffsets, dtype=np.int64)
+        self.lineOffsets = np.asarray(lineOffsets, dtype=np.int64)
+        self.oids = np.arange(1, len(self.lineOffsets), dtype=np.int64) if oids is None else np.asarray(oids, dtype=np.int64)
+        self.wkid = wkid
+        self.metersPerUnit = metersPerUnit or 1.0
+
+    def __len__(self):
+        return len(self.lineOffsets) - 1
+
+    def __getitem__(self, index: int) -> List[List[tuple]]:
+        """the parts of a polyline as lists of (x, y) tuples, the same as FeatureColumns.shapes"""
+        parts = self.partOffsets[self.lineOffsets[index]:self.lineOffsets[index + 1] + 1]
+        return [[tuple(c) for c in self.coords[a:b].tolist()] for a, b in zip(parts[:-1], parts[1:])]
+
+    @property
+    def partCount(self) -> int:
+        return len(self.partOffsets) - 1
+
+    @property
+    def vertexCount(self) -> int:
+        return len(self.coords)
+
+    @classmethod
+    def from_shapes(cls, shapes: Iterable[List[List[tuple]]], oids: Iterable[int]=None, wkid: int=None, metersPerUnit: float=1.0) -> 'PolylineStore':
+        """creates a store from polylines
+
+        Args:
+            shapes (Iterable[List[List[tuple]]]): the polylines, each as a list of parts of (x, y) coordinates, None for empty shapes
+            oids (Iterable[int], optional): the OBJECTID of each polyline. Defaults to None (1 to n).
+            wkid (int, optional): the wkid of the coordinate system. Defaults to None.
+            metersPerUnit (float, optional): meters per coordinate unit. Defaults to 1.0.
+
+        Returns:
+            PolylineStore: the store
+        """
+        coords, partCounts, lineCounts = [], [], []
+        for parts in shapes:
+            parts = [p for p in (parts or []) if p]
+            lineCounts.append(len(parts))
+            for part in parts:
+                partCounts.append(len(part))
+                coords.extend(c[:2] for c in part)
+        return cls(
+            np.array(coords, dtype=np.float64).reshape(-1, 2),
+            np.concatenate([[0], np.cumsum(partCounts, dtype=np.int64)]),
+            np.concatenate([[0], np.cumsum(lineCounts, dtype=np.int64)]),
+            None if oids is None else list(oids),
+            wkid,
+            metersPerUnit
+        )
+
+    @classmethod
+    def from_columns(cls, columns) -> 'PolylineStore':
+        """creates a store from the shapes of a FeatureColumns"""
+        sr = columns.spatialReference
+        return cls.from_shapes(columns.shapes, columns.oids, sr.factoryCode if sr else None, columns.metersPerUnit)
+
+    @classmethod
+    def from_table(cls, table: str, where: str=None) -> 'PolylineStore':
+        """reads the polylines of a feature class or layer
+
+        Args:
+            table (str): the polyline feature class or layer
+            where (str, optional): an optional where clause. Defaults to None.
+
+        Returns:
+            PolylineStore: the store
+        """
+        from ..utils import cursors
+        return cls.from_columns(cursors.read_columns(table, [], where))
+
+    @property
+    def partLines(self) -> np.ndarray:
+        """the polyline index of each part"""
+        return np.repeat(np.arange(len(self)), np.diff(self.lineOffsets))
+
+    @property
+    def vertexParts(self) -> np.ndarray:
+        """the part index of each vertex"""
+        return np.repeat(np.arange(self.partCount), np.diff(self.partOffsets))
+
+    def segment_lengths(self) -> np.ndarray:
+        """the length of the segment starting at each vertex, 0 for the last vertex of each part"""
+        lengths = np.zeros(self.vertexCount)
+        if self.vertexCount > 1:
+            lengths[:-1] = np.hypot(*np.diff(self.coords, axis=0).T)
+        # no segment from the last vertex of a part to the first vertex of the next one
+        lengths[self.partOffsets[1:][np.diff(self.partOffsets) > 0] - 1] = 0
+        return lengths
+
+    def lengths(self) -> np.ndarray:
+        """the planar length of each polyline, the same as polyline_length()"""
+        perPart = np.zeros(self.partCount)
+        segments = self.segment_lengths()
+        filled = np.diff(self.partOffsets) > 0
+        perPart[filled] = np.add.reduceat(segments, self.partOffsets[:-1][filled]) if segments.size else 0
+        perLine = np.zeros(len(self))
+        np.add.at(perLine, self.partLines, perPart)
+        return perLine
+
+    def end_points(self) -> Tuple[np.ndarray, np.ndarray]:
+        """the first and last vertex of each polyline as (n, 2) arrays, NaN for empty polylines"""
+        first, last = np.full((len(self), 2), np.nan), np.full((len(self), 2), np.nan)
+        filled = np.diff(self.lineOffsets) > 0
+        first[filled] = self.coords[self.partOffsets[self.lineOffsets[:-1][filled]]]
+        last[filled] = self.coords[self.partOffsets[self.lineOffsets[1:][filled]] - 1]
+        return first, last
+
+    def midpoints(self) -> np.ndarray:
+        """the point halfway between the first and last vertex of each polyline, the same as Line.midpoint"""
+        return midpoints(*self.end_points())
+
+    def angles(self) -> np.ndarray:
+        """the azimuth (zero is north) from the first to the last vertex of each polyline, the same as get_angle()"""
+        return get_angles(*self.end_points())
+
+    def flip(self) -> 'PolylineStore':
+        """reverses the vertices of every part, the part order is kept like Line.flip()
+
+        Returns:
+            PolylineStore: a new store with the flipped polylines
+        """
+        starts = self.partOffsets[:-1]
+        ends = self.partOffsets[1:]
+        parts = self.vertexParts
+        # vertex i of a part from a to b moves to a + b - 1 - i
+        order = (starts + ends - 1)[parts] - np.arange(self.vertexCount)
+        return PolylineStore(self.coords[order], self.partOffsets.copy(), self.lineOffsets.copy(), self.oids.copy(), self.wkid, self.metersPerUnit)
+
+    def extend(self, distance: float, end: bool=True) -> 'PolylineStore':
+        """extends every part by a distance along the direction of its last (or first) segment, like Line.extend().
+        Parts with a single vertex or a zero length end segment are left as they are.
+
+        Args:
+            distance (float): the distance in the units of the coordinates
+            end (bool, optional): extend the end of the parts, False to extend the start. Defaults to True.
+
+        Returns:
+            PolylineStore: a new store with the extended polylines
+        """
+        starts, ends = self.partOffsets[:-1], self.partOffsets[1:]
+        valid = np.flatnonzero(ends - starts >= 2)
+        if end:
+            tip, previous, at = ends[valid] - 1, ends[valid] - 2, ends[valid]
+        else:
+            tip, previous, at = starts[valid], starts[valid] + 1, starts[valid]
+        points = extended_coords(self.coords[previous], self.coords[tip], distance)
+        keep = np.isfinite(points).all(axis=1)
+        valid, at, points = valid[keep], at[keep], points[keep]
+
+        added = np.zeros(self.partCount, dtype=np.int64)
+        added[valid] = 1
+        coords = np.insert(self.coords, at, points, axis=0)
+        partOffsets = self.partOffsets + np.concatenate([[0], np.cumsum(added)])
+        return PolylineStore(coords, partOffsets, self.lineOffsets.copy(), self.oids.copy(), self.wkid, self.metersPerUnit)
+
+    def to_shapes(self) -> List[List[List[tuple]]]:
+        """the polylines as lists of parts of (x, y) tuples"""
+        return [self[i] for i in range(len(self))]
+
+    def save(self, path: str) -> str:
+        """writes the store to a single .npy file
+
+        Args:
+            path (str): the output file, ".npy" is added when it has no extension
+
+        Returns:
+            str: the output file
+        """
+        if not path.lower().endswith('.npy'):
+            path += '.npy'
+        header = [STORE_FORMAT_VERSION, len(self), self.partCount, self.vertexCount, self.wkid or 0, self.metersPerUnit]
+        np.save(path, np.concatenate([
+            np.array(header, dtype=np.float64),
+            self.oids.astype(np.float64),
+            self.lineOffsets.astype(np.float64),
+            self.partOffsets.astype(np.float64),
+            np.asarray(self.coords, dtype=np.float64).ravel()
+        ]))
+        return path
+
+    @classmethod
+    def load(cls, path: str, mmap: bool=True) -> 'PolylineStore':
+        """opens a store written with save()
+
+        Args:
+            path (str): the .npy file
+            mmap (bool, optional): memory map the coordinates instead of reading them. Defaults to True.
+
+        Returns:
+            PolylineStore: the store, the coordinates are read only when memory mapped
+        """
+        data = np.load(path, mmap_mode='r' if mmap else None)
+        version, lines, parts, vertices, wkid, metersPerUnit = (data[:STORE_HEADER_SIZE]).tolist()
+        if int(version) != STORE_FORMAT_VERSION:
+            raise RuntimeError(f'unsupported polyline store version {version} in "{path}"')
+        lines, parts, vertices = int(lines), int(parts), int(vertices)
+        pos = STORE_HEADER_SIZE
+        oids = np.array(data[pos:pos + lines], dtype=np.int64)
+        pos += lines
+        lineOffsets = np.array(data[pos:pos + lines + 1], dtype=np.int64)
+        pos += lines + 1
+        partOffsets = np.array(data[pos:pos + parts + 1], dtype=np.int64)
+        pos += parts + 1
+        coords = data[pos:pos + vertices * 2].reshape(-1, 2)
+        return cls(coords, partOffsets, lineOffsets, oids, int(wkid) or None, metersPerUnit)
@@ -0,0 +1,147 @@
+import numpy as np
+from typing import Dict, Tuple, Iterable, Union, Any
+
+WGS_84_WKID = 4326
+
+# Web Mercator (auxiliary sphere) wkids, these are projected to and from WGS84 with the closed form equations
+WEB_MERCATOR_WKIDS = (102100, 3857, 102113, 900913)
+EARTH_RADIUS = 6378137.0
+
+# the transformers for the session, see get_transformer()
+_transformers: Dict[Tuple[Any, Any], 'Transformer'] = {}
+
+def spatial_reference_key(spatialReference: Union[int, Any]) -> Any:
+    """the key for a coordinate system, the wkid when it has one or the projection string for custom ones
+
+    Args:
+        spatialReference (Union[int, arcpy.SpatialReference]): the wkid or spatial reference
+
+    Returns:
+        Any: the key
+    """
+    if spatialReference is None or isinstance(spatialReference, (int, np.integer)):
+        return spatialReference
+    return spatialReference.factoryCode or spatialReference.exportToString()
+
+def web_mercator_to_wgs84(xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """converts Web Mercator meters to longitude and latitude"""
+    lon = np.degrees(xs / EARTH_RADIUS)
+    lat = np.degrees(2 * np.arctan(np.exp(ys / EARTH_RADIUS)) - np.pi / 2)
+    return lon, lat
+
+def wgs84_to_web_mercator(xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """converts longitude and latitude to Web Mercator meters"""
+    x = np.radians(xs) * EARTH_RADIUS
+    y = np.log(np.tan(np.pi / 4 + np.radians(ys) / 2)) * EARTH_RADIUS
+    return x, y
+
+class Transformer:
+    """projects coordinates from one coordinate system to another.
+
+    The spatial reference objects are created once, and a whole batch of coordinates is
+    projected with a single projectAs() call on a multipoint instead of one call per point.
+    Web Mercator and WGS84 are converted directly with numpy.
+    """
+    def __init__(self, source: Union[int, Any], target: Union[int, Any]=WGS_84_WKID):
+        """creates the transformer
+
+        Args:
+            source (Union[int, arcpy.SpatialReference]): the source wkid or spatial reference
+            target (Union[int, arcpy.SpatialReference], optional): the target wkid or spatial reference. Defaults to WGS_84_WKID.
+        """
+        self.source = source
+        self.target = target
+        self.key = (spatial_reference_key(source), spatial_reference_key(target))
+        self._spatialReferences = None
+        if self.key[0] == self.key[1]:
+            self._func = None
+        elif self.key[0] in WEB_MERCATOR_WKIDS and self.key[1] == WGS_84_WKID:
+            self._func = web_mercator_to_wgs84
+        elif self.key[0] == WGS_84_WKID and self.key[1] in WEB_MERCATOR_WKIDS:
+            self._func = wgs84_to_web_mercator
+        else:
+            self._func = self._project_arcpy
+
+    @property
+    def spatialReferences(self) -> Tuple[Any, Any]:
+        """the source and target arcpy.SpatialReference"""
+        if self._spatialReferences is None:
+            import arcpy
+            self._spatialReferences = tuple(
+                arcpy.SpatialReference(sr) if isinstance(sr, (int, np.integer)) else sr
+                for sr in (self.source, self.target)
+            )
+        return self._spatialReferences
+
+    def _project_arcpy(self, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        import arcpy
+        source, target = self.spatialReferences
+        # each distinct coordinate is projected once, the multipoint keeps its vertices in order
+        coords, inverse = np.unique(np.column_stack([xs, ys]), axis=0, return_inverse=True)
+        multipoint = arcpy.Multipoint(arcpy.Array([arcpy.Point(x, y) for x, y in coords]), source).projectAs(target)
+        if multipoint.pointCount == len(coords):
+            projected = np.array([(p.X, p.Y) for p in multipoint], dtype=np.float64)
+        else:
+            # vertices were dropped, project them one at a time
+            projected = np.array([
+                (lambda p: (p.X, p.Y))(arcpy.PointGeometry(arcpy.Point(x, y), source).projectAs(target).firstPoint)
+                for x, y in coords
+            ], dtype=np.float64)
+        projected = projected[inverse.ravel()]
+        return projected[:, 0], projected[:, 1]
+
+    def project(self, xs: Iterable[float], ys: Iterable[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """projects a batch of coordinates
+
+        Args:
+            xs (Iterable[float]): the x coordinates
+            ys (Iterable[float]): the y coordinates
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: the projected x and y coordinates, NaN coordinates stay NaN
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        if self._func is None:
+            return xs.copy(), ys.copy()
+        outX, outY = np.full(xs.shape, np.nan), np.full(ys.shape, np.nan)
+        valid = np.isfinite(xs) & np.isfinite(ys)
+        if valid.any():
+            outX[valid], outY[valid] = self._func(xs[valid], ys[valid])
+        return outX, outY
+
+    def project_point(self, x: float, y: float) -> Tuple[float, float]:
+        """projects a single coordinate"""
+        outX, outY = self.project([x], [y])
+        return float(outX[0]), float(outY[0])
+
+
+def get_transformer(source: Union[int, Any], target: Union[int, Any]=WGS_84_WKID) -> Transformer:
+    """gets the transformer for a pair of coordinate systems, they are created once per session
+
+    Args:
+        source (Union[int, arcpy.SpatialReference]): the source wkid or spatial reference
+        target (Union[int, arcpy.SpatialReference], optional): the target wkid or spatial reference. Defaults to WGS_84_WKID.
+
+    Returns:
+        Transformer: the transformer
+    """
+    key = (spatial_reference_key(source), spatial_reference_key(target))
+    transformer = _transformers.get(key)
+    if transformer is None:
+        transformer = _transformers[key] = Transformer(source, target)
+    return transformer
+
+def project_coordinates(xs: Iterable[float], ys: Iterable[float], source: Union[int, Any], target: Union[int, Any]=WGS_84_WKID) -> Tuple[np.ndarray, np.ndarray]:
+    """projects a batch of coordinates with the cached transformer for the coordinate systems
+
+    Args:
+        xs (Iterable[float]): the x coordinates
+        ys (Iterable[float]): the y coordinates
+        source (Union[int, arcpy.SpatialReference]): the source wkid or spatial reference
+        target (Union[int, arcpy.SpatialReference], optional): the target wkid or spatial reference. Defaults to WGS_84_WKID.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the projected x and y coordinates
+    """
+    return get_transformer(source, target).project(xs, ys)
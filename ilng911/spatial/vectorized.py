@@ -0,0 +1,129 @@
+import numpy as np
+from typing import List, Iterable
+from ..support.munch import Munch
+
+# the most point to segment pairs measured at once, limits memory for large batches
+DEFAULT_PAIR_CHUNK = 2000000
+
+class SegmentArrays:
+    """the segments of a set of polylines as flat numpy arrays.
+
+    The segments of each polyline are contiguous, polyline i owns segments
+    start[i] to start[i+1], so all of the segments for a batch of points can be
+    gathered without Python loops.
+    """
+    def __init__(self, shapes: List[List[List[tuple]]]):
+        """creates the arrays
+
+        Args:
+            shapes (List[List[List[tuple]]]): the polylines, each as a list of parts of (x, y) coordinates
+        """
+        ax, ay, bx, by, measure = [], [], [], [], []
+        counts = np.zeros(len(shapes), dtype=np.int64)
+        lengths = np.zeros(len(shapes), dtype=np.float64)
+        for idx, parts in enumerate(shapes):
+            travelled = 0.0
+            for part in parts or []:
+                for i in range(len(part) - 1):
+                    (x0, y0), (x1, y1) = part[i], part[i+1]
+                    ax.append(x0)
+                    ay.append(y0)
+                    bx.append(x1)
+                    by.append(y1)
+                    measure.append(travelled)
+                    travelled += ((x1 - x0) ** 2 + (y1 - y0) ** 2) ** 0.5
+                    counts[idx] += 1
+            lengths[idx] = travelled
+
+        self.ax = np.array(ax, dtype=np.float64)
+        self.ay = np.array(ay, dtype=np.float64)
+        self.bx = np.array(bx, dtype=np.float64)
+        self.by = np.array(by, dtype=np.float64)
+        self.measure = np.array(measure, dtype=np.float64)
+        self.lengths = lengths
+        self.start = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    def __len__(self):
+        return len(self.ax)
+
+def _locate_chunk(segments: SegmentArrays, xs: np.ndarray, ys: np.ndarray, features: np.ndarray, out: Munch, rows: np.ndarray):
+    counts = segments.start[features + 1] - segments.start[features]
+    # one (point, segment) pair for each segment of the matched polyline
+    pair = np.repeat(np.arange(len(features)), counts)
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    seg = segments.start[features][pair] + (np.arange(pair.size) - offsets[pair])
+
+    ax, ay = segments.ax[seg], segments.ay[seg]
+    dx, dy = segments.bx[seg] - ax, segments.by[seg] - ay
+    px, py = xs[pair], ys[pair]
+    lenSq = dx * dx + dy * dy
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(lenSq > 0, ((px - ax) * dx + (py - ay) * dy) / lenSq, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    cx, cy = ax + t * dx, ay + t * dy
+    dist = np.hypot(px - cx, py - cy)
+
+    # closest segment for each point, ties go to the first segment along the line like locate_on_polyline()
+    has = counts > 0
+    closest = np.minimum.reduceat(dist, offsets[has])
+    best = np.flatnonzero(dist == np.repeat(closest, counts[has]))
+    first = best[np.unique(pair[best], return_index=True)[1]]
+    hit = rows[has]
+    s = seg[first]
+    out.distance[hit] = dist[first]
+    out.along[hit] = segments.measure[s] + t[first] * np.sqrt(lenSq[first])
+    out.x[hit] = cx[first]
+    out.y[hit] = cy[first]
+    cross = dx[first] * (py[first] - ay[first]) - dy[first] * (px[first] - ax[first])
+    out.right[hit] = cross < 0
+    out.matched[hit] = True
+
+def locate_points(segments: SegmentArrays, xs: Iterable[float], ys: Iterable[float], features: Iterable[int],
+                  pairChunk: int=DEFAULT_PAIR_CHUNK) -> Munch:
+    """locates many points on their matched polylines at once, the vectorized equivalent of
+    calling locate_on_polyline() for each point
+
+    Args:
+        segments (SegmentArrays): the polyline segments
+        xs (Iterable[float]): the point x coordinates
+        ys (Iterable[float]): the point y coordinates
+        features (Iterable[int]): the matched polyline index for each point, -1 or None when there is no match.
+            Points with NaN or infinite coordinates are left unmatched.
+        pairChunk (int, optional): the most point to segment pairs measured at once. Defaults to DEFAULT_PAIR_CHUNK.
+
+    Returns:
+        Munch: arrays of distance, along, length, percent (0-100 along the line), x and y of the closest
+            point on the line (NaN without a match), right (True for the R side) and matched
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    features = np.array([-1 if f is None else f for f in features], dtype=np.int64)
+    n = len(features)
+    out = Munch(
+        distance=np.full(n, np.nan),
+        along=np.full(n, np.nan),
+        x=np.full(n, np.nan),
+        y=np.full(n, np.nan),
+        right=np.zeros(n, dtype=bool),
+        matched=np.zeros(n, dtype=bool)
+    )
+
+    # points without a usable location cannot be measured, their distances would all be NaN
+    located = (features >= 0) & np.isfinite(xs) & np.isfinite(ys)
+    rows = np.flatnonzero(located)
+    counts = segments.start[features[rows] + 1] - segments.start[features[rows]]
+    # split the points so no chunk measures more than pairChunk pairs
+    total = np.cumsum(counts)
+    lo = 0
+    while lo < len(rows):
+        done = total[lo - 1] if lo else 0
+        hi = max(int(np.searchsorted(total, done + pairChunk, side='right')), lo + 1)
+        chunk = rows[lo:hi]
+        _locate_chunk(segments, xs[chunk], ys[chunk], features[chunk], out, chunk)
+        lo = hi
+
+    out.length = np.where(located, segments.lengths[np.maximum(features, 0)], np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out.percent = np.where(out.length > 0, out.along / out.length * 100, 0.0)
+    out.percent[~out.matched] = np.nan
+    return out
@@ -1,6 +1,5 @@
 import os
 import sys
-import arcpy
 import datetime
 import warnings
 from itertools import zip_longest
@@ -84,7 +83,7 @@ def date_to_mil(date=None):
         return int((date - epoch).total_seconds() * 1000.0)
 
 
-def copy_schema(template: str, output: str, sr: arcpy.SpatialReference=None, shapeType: str='') -> str:
+def copy_schema(template: str, output: str, sr: 'arcpy.SpatialReference'=None, shapeType: str='') -> str:
     """creates an empty feature class or table based on a template
 
     Args:
@@ -99,6 +98,8 @@ def copy_schema(template: str, output: str, sr: arcpy.SpatialReference=None, sha
     >>> #Example
     >>> copy_schema(r'C:\Temp\soils_city.shp', r'C:\Temp\soils_county.shp')
     """
+    # imported here so the in memory helpers in this package can be used without arcpy
+    import arcpy
     path, name = os.path.split(output)
     desc = arcpy.Describe(template)
     ftype = desc.dataType
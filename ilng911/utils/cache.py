@@ -0,0 +1,73 @@
+from collections import OrderedDict
+from typing import Any, Hashable
+
+# the default number of results kept by an LRUCache
+DEFAULT_CACHE_SIZE = 50000
+
+# returned by LRUCache.get() when a key is not cached, None can be a cached result
+MISSING = object()
+
+class LRUCache:
+    """least recently used cache, the oldest entries are dropped once maxSize is reached"""
+    def __init__(self, maxSize: int=DEFAULT_CACHE_SIZE):
+        """creates the cache
+
+        Args:
+            maxSize (int, optional): the most entries to keep, 0 or None keeps everything. Defaults to DEFAULT_CACHE_SIZE.
+        """
+        self.maxSize = maxSize
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key: Hashable):
+        return key in self.items
+
+    def get(self, key: Hashable, default: Any=MISSING) -> Any:
+        """gets a cached value and marks it as recently used
+
+        Args:
+            key (Hashable): the key
+            default (Any, optional): returned when the key is not cached. Defaults to MISSING.
+
+        Returns:
+            Any: the value
+        """
+        try:
+            value = self.items[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any) -> Any:
+        """caches a value
+
+        Args:
+            key (Hashable): the key
+            value (Any): the value
+
+        Returns:
+            Any: the value
+        """
+        self.items[key] = value
+        self.items.move_to_end(key)
+        if self.maxSize and len(self.items) > self.maxSize:
+            self.items.popitem(last=False)
+        return value
+
+    def clear(self):
+        """removes every entry and resets the statistics"""
+        self.items.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def stats(self) -> dict:
+        """the size, hits and misses of the cache"""
+        return dict(size=len(self.items), maxSize=self.maxSize, hits=self.hits, misses=self.misses)
@@ -0,0 +1,157 @@
+import hashlib
+from ..support.munch import munchify, Munch
+from ..utils import lazyprop
+from typing import List, Dict, Any, Iterable
+
+FEET_TO_METERS = 0.3048
+
+# rough length of one degree, only used when data is stored in a geographic coordinate system
+METERS_PER_DEGREE = 111319.49
+
+def round_coordinates(shape: Any, precision: int=3) -> Any:
+    """rounds the coordinates of a point (x, y) or a list of parts"""
+    if not shape:
+        return shape
+    if not isinstance(shape[0], (list, tuple)):
+        return tuple(None if c is None else round(c, precision) for c in shape)
+    return [round_coordinates(p, precision) for p in shape]
+
+class FeatureColumns:
+    """column oriented, in memory copy of a table's attributes and geometry
+
+    shapes are stored as plain coordinates: an (x, y) tuple for points and a list
+    of parts (each a list of (x, y) tuples) for polylines and polygons.
+    """
+    def __init__(self, fields: List[str], metersPerUnit: float=1.0, spatialReference=None, shapeType: str=None):
+        self.fields = list(fields)
+        self.columns: Dict[str, List[Any]] = {f: [] for f in self.fields}
+        self.oids: List[int] = []
+        self.shapes: List[Any] = []
+        self.metersPerUnit = metersPerUnit or 1.0
+        self.spatialReference = spatialReference
+        self.shapeType = shapeType
+
+    def __len__(self):
+        return len(self.oids)
+
+    def __getstate__(self):
+        # arcpy spatial references cannot be pickled, they are not needed to send records to other processes
+        state = self.__dict__.copy()
+        state['spatialReference'] = None
+        return state
+
+    def append(self, oid: int, shape: Any, values: Iterable[Any]):
+        """appends a record
+
+        Args:
+            oid (int): the OBJECTID
+            shape (Any): the coordinates for the record
+            values (Iterable[Any]): the attribute values, in the same order as the fields
+        """
+        self.oids.append(oid)
+        self.shapes.append(shape)
+        for f, v in zip(self.fields, values):
+            self.columns[f].append(v)
+        # keep the OBJECTID lookup current for records added after it was built
+        oidIndex = self.__dict__.get('oidIndex')
+        if oidIndex is not None:
+            oidIndex[oid] = len(self.oids) - 1
+
+    def get(self, field: str) -> List[Any]:
+        """returns the values for a field, a column of None is returned for missing fields
+
+        Args:
+            field (str): the field name
+
+        Returns:
+            List[Any]: the column values
+        """
+        if field in self.columns:
+            return self.columns[field]
+        return [None] * len(self)
+
+    def value(self, field: str, index: int) -> Any:
+        """returns a single value, None for missing fields
+
+        Args:
+            field (str): the field name
+            index (int): the record index
+
+        Returns:
+            Any: the value
+        """
+        column = self.columns.get(field)
+        return column[index] if column is not None else None
+
+    def row(self, index: int) -> Munch:
+        """returns a single record as a Munch
+
+        Args:
+            index (int): the record index
+
+        Returns:
+            Munch: the record attributes
+        """
+        return munchify({f: self.columns[f][index] for f in self.fields})
+
+    def take(self, indices: Iterable[int]) -> 'FeatureColumns':
+        """creates a new FeatureColumns instance from a subset of records
+
+        Args:
+            indices (Iterable[int]): the record indices to keep
+
+        Returns:
+            FeatureColumns: the subset
+        """
+        indices = list(indices)
+        subset = FeatureColumns(self.fields, self.metersPerUnit, self.spatialReference, self.shapeType)
+        subset.oids = [self.oids[i] for i in indices]
+        subset.shapes = [self.shapes[i] for i in indices]
+        subset.columns = {f: [col[i] for i in indices] for f, col in self.columns.items()}
+        return subset
+
+    @lazyprop
+    def oidIndex(self) -> Dict[int, int]:
+        """lookup of OBJECTID to record index"""
+        return {oid: i for i, oid in enumerate(self.oids)}
+
+    def row_hashes(self, fields: List[str]=None, precision: int=3) -> List[str]:
+        """creates a content hash for each record, used to find records that changed between runs
+
+        Args:
+            fields (List[str], optional): the fields to include. Defaults to None (all fields).
+            precision (int, optional): the number of decimals kept for coordinates. Defaults to 3.
+
+        Returns:
+            List[str]: the md5 hex digest of each record
+        """
+        columns = [self.get(f) for f in (fields or self.fields)]
+        shapes = [round_coordinates(s, precision) for s in self.shapes]
+        return [hashlib.md5(repr(values).encode('utf-8')).hexdigest() for values in zip(shapes, *columns)]
+
+    def digest(self, fields: List[str]=None, precision: int=3) -> str:
+        """creates a single content hash for the whole table
+
+        Args:
+            fields (List[str], optional): the fields to include. Defaults to None (all fields).
+            precision (int, optional): the number of decimals kept for coordinates. Defaults to 3.
+
+        Returns:
+            str: the md5 hex digest
+        """
+        md5 = hashlib.md5()
+        for oid, h in sorted(zip(self.oids, self.row_hashes(fields, precision))):
+            md5.update(f'{oid}:{h};'.encode('utf-8'))
+        return md5.hexdigest()
+
+    def from_feet(self, distance: float) -> float:
+        """converts a distance in feet to the units of the coordinates
+
+        Args:
+            distance (float): the distance in feet
+
+        Returns:
+            float: the distance in coordinate units
+        """
+        return distance * FEET_TO_METERS / self.metersPerUnit
+
@@ -1,6 +1,14 @@
 import os
 import arcpy
 import warnings
+from .columns import FeatureColumns, METERS_PER_DEGREE
+from typing import List, Dict, Iterable
+
+# the NG911 field for the date a feature was last edited, see edit_date_field()
+EDIT_DATE_FIELD = 'DateUpdate'
+
+# the most OBJECTIDs in one "IN (...)" where clause, see oid_where_clauses()
+MAX_WHERE_OIDS = 1000
 
 LAYER_TYPE = arcpy.mapping.Layer if hasattr(arcpy, 'mapping') else arcpy._mp.Layer
 TABLE_TYPE = arcpy.mapping.TableView if hasattr(arcpy, 'mapping') else arcpy._mp.Table
@@ -253,4 +261,232 @@ class UpdateCursor(object):
         try:
             del self.cursor
         except:
-            pass
\ No newline at end of file
+            pass
+
+
+class EditSession(object):
+    """starts a single edit session and operation for the workspace of a table, use
+    plain arcpy.da cursors inside of it to write to several tables in one session.
+    Edits are saved on exit, or discarded if an error was raised."""
+    def __init__(self, table: str):
+        self.ws = find_ws(table)
+        self.edit = None
+        self.alreadyInEditSession = False
+
+    def __enter__(self):
+        try:
+            self.edit = arcpy.da.Editor(self.ws)
+            self.edit.startEditing()
+            self.edit.startOperation()
+        except Exception as e:
+            # do not leave a session open that is never saved, the edits would be lost with it
+            if self.edit is not None and self.edit.isEditing:
+                self.edit.stopEditing(False)
+            self.edit = None
+            # explicit check for active edit session, the edits go into the session that is already open
+            msg = ((hasattr(e,'message') and e.message == 'start edit session') or (hasattr(e,'msg') and e.msg == 'start edit session'))
+            if isinstance(e, RuntimeError) and msg:
+                self.alreadyInEditSession = True
+            else:
+                # errors with edit session, edit without one
+                warnings.warn("Could not start edit session, editing without one: {}".format(e))
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if self.edit:
+            if type is None:
+                self.edit.stopOperation()
+                self.edit.stopEditing(True)
+            else:
+                self.edit.abortOperation()
+                self.edit.stopEditing(False)
+        self.edit = None
+
+
+def update_changed_rows(table: str, fields: List[str], values: Dict[int, list], where: str=None) -> int:
+    """writes new values to a table with a single UpdateCursor in one edit session, only the rows where
+    a value changed are updated.  None values leave the current value as it is.
+
+    Args:
+        table (str): the feature class or layer, a layer's selection is honored
+        fields (List[str]): the fields to update
+        values (Dict[int, list]): the new values for the fields, by OBJECTID
+        where (str, optional): an optional where clause. Defaults to None.
+
+    Returns:
+        int: the number of rows that were updated
+    """
+    count = 0
+    with EditSession(table):
+        with arcpy.da.UpdateCursor(table, ['OID@'] + fields, where) as rows:
+            for r in rows:
+                new = values.get(r[0])
+                if new is None:
+                    continue
+                current = list(r[1:])
+                row = [n if n is not None else c for n, c in zip(new, current)]
+                if row != current:
+                    rows.updateRow([r[0]] + row)
+                    count += 1
+    return count
+
+
+def edit_date_field(table) -> str:
+    """finds the field that records when a row was last edited, the editor tracking field when
+    editor tracking is enabled, otherwise the NG911 DateUpdate field
+
+    Args:
+        table: the feature class or layer
+
+    Returns:
+        str: the field name, or None if the table has neither
+    """
+    desc = arcpy.Describe(table)
+    if getattr(desc, 'editorTrackingEnabled', False) and getattr(desc, 'editedAtFieldName', None):
+        return desc.editedAtFieldName
+    names = {f.name.lower(): f.name for f in desc.fields}
+    return names.get(EDIT_DATE_FIELD.lower())
+
+def max_value(table, field: str):
+    """gets the largest value of a field by reading a single row sorted in descending order
+
+    Args:
+        table: the feature class or layer
+        field (str): the field name, or OID@
+
+    Returns:
+        the largest value, None for an empty table
+    """
+    name = arcpy.Describe(table).oidFieldName if field == 'OID@' else field
+    where = None if field == 'OID@' else f'{field} IS NOT NULL'
+    with arcpy.da.SearchCursor(table, [field], where, sql_clause=(None, f'ORDER BY {name} DESC')) as rows:
+        for r in rows:
+            return r[0]
+    return None
+
+def table_signature(table, dateField: str=None) -> str:
+    """a signature that changes when rows are added to, deleted from or edited in a table: the row
+    count, the highest OBJECTID and the latest edit date.  Only single rows are read, so the table
+    does not need to be scanned to find out it has not changed.  In place edits are only seen when
+    they update the edit date field.
+
+    Args:
+        table: the feature class or layer
+        dateField (str, optional): the edit date field. Defaults to None (see edit_date_field()).
+
+    Returns:
+        str: the signature
+    """
+    dateField = dateField or edit_date_field(table)
+    count = int(arcpy.management.GetCount(table).getOutput(0))
+    lastEdit = max_value(table, dateField) if dateField else None
+    return f'{count}:{max_value(table, "OID@")}:{lastEdit}'
+
+def oid_where_clauses(field: str, oids: Iterable[int], chunkSize: int=MAX_WHERE_OIDS) -> List[str]:
+    """creates "field IN (...)" where clauses for a set of OBJECTIDs, split so no clause gets too long
+
+    Args:
+        field (str): the field holding the OBJECTIDs
+        oids (Iterable[int]): the OBJECTIDs
+        chunkSize (int, optional): the most OBJECTIDs in each clause. Defaults to MAX_WHERE_OIDS.
+
+    Returns:
+        List[str]: the where clauses
+    """
+    oids = sorted(set(oids))
+    return [f'{field} IN ({",".join(str(o) for o in oids[i:i+chunkSize])})' for i in range(0, len(oids), chunkSize)]
+
+def get_meters_per_unit(sr: arcpy.SpatialReference) -> float:
+    """gets the number of meters in one coordinate unit for a spatial reference
+
+    Args:
+        sr (arcpy.SpatialReference): the spatial reference
+
+    Returns:
+        float: meters per unit, degrees are approximated at the equator
+    """
+    if not sr or sr.type == 'Unknown':
+        return 1.0
+    if sr.type == 'Geographic':
+        return METERS_PER_DEGREE
+    return sr.metersPerUnit or 1.0
+
+def geometry_to_parts(geometry: arcpy.Geometry) -> List[List[tuple]]:
+    """converts a polyline or polygon to a list of parts of (x, y) coordinates
+
+    Args:
+        geometry (arcpy.Geometry): the geometry
+
+    Returns:
+        List[List[tuple]]: the parts, null points (polygon ring separators) start a new part
+    """
+    parts = []
+    if not geometry:
+        return parts
+    for part in geometry:
+        coords = []
+        for pt in part:
+            if pt:
+                coords.append((pt.X, pt.Y))
+            elif coords:
+                parts.append(coords)
+                coords = []
+        if coords:
+            parts.append(coords)
+    return parts
+
+def parts_to_geometry(parts: List[List[tuple]], spatial_reference: arcpy.SpatialReference=None, shapeType: str='Polyline') -> arcpy.Geometry:
+    """converts a list of parts of (x, y) coordinates back to a polyline or polygon, the reverse of geometry_to_parts()
+
+    Args:
+        parts (List[List[tuple]]): the parts
+        spatial_reference (arcpy.SpatialReference, optional): the spatial reference of the coordinates. Defaults to None.
+        shapeType (str, optional): the geometry type (Polyline|Polygon). Defaults to 'Polyline'.
+
+    Returns:
+        arcpy.Geometry: the geometry, None when there are no parts
+    """
+    if not parts:
+        return None
+    array = arcpy.Array([arcpy.Array([arcpy.Point(*c[:2]) for c in part]) for part in parts])
+    cls = arcpy.Polygon if shapeType == 'Polygon' else arcpy.Polyline
+    return cls(array, spatial_reference)
+
+def read_columns(table, fields: List[str], where: str=None, spatial_reference: arcpy.SpatialReference=None) -> FeatureColumns:
+    """reads a table into memory with a single SearchCursor
+
+    Args:
+        table: the feature class or layer to read
+        fields (List[str]): the attribute fields to read, fields that do not exist are skipped
+        where (str, optional): an optional where clause. Defaults to None.
+        spatial_reference (arcpy.SpatialReference, optional): an optional spatial reference to read the shapes in. Defaults to None.
+
+    Returns:
+        FeatureColumns: the columnar table
+    """
+    desc = arcpy.Describe(table)
+    existing = [f.name for f in desc.fields]
+    fields = [f for f in fields if f in existing]
+    shapeType = getattr(desc, 'shapeType', None)
+    sr = spatial_reference or getattr(desc, 'spatialReference', None)
+    cols = FeatureColumns(fields, get_meters_per_unit(sr), sr, shapeType)
+
+    if shapeType == 'Point':
+        shapeToken = 'SHAPE@XY'
+    elif shapeType:
+        shapeToken = 'SHAPE@'
+    else:
+        shapeToken = None
+
+    cursorFields = ['OID@'] + ([shapeToken] if shapeToken else []) + fields
+    offset = len(cursorFields) - len(fields)
+    with arcpy.da.SearchCursor(table, cursorFields, where, spatial_reference=spatial_reference) as rows:
+        for r in rows:
+            shape = None
+            if shapeToken == 'SHAPE@XY':
+                shape = r[1] if r[1] and r[1][0] is not None else None
+            elif shapeToken:
+                shape = geometry_to_parts(r[1])
+            cols.append(r[0], shape, r[offset:])
+
+    return cols
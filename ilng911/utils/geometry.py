@@ -1,5 +1,10 @@
 import math
 import arcpy
+# the batch versions take (n, 2) arrays of first and last points for many lines
+from ..spatial.lines import (
+    line_dir, get_angle, midpoint, extended_xy, quadrant_bearing, format_quadrant_bearing,
+    line_dirs, get_angles, midpoints, extended_coords, quadrant_bearings
+)
 
 def extended_coord(fp, lp, dist):
     """https://gis.stackexchange.com/questions/71645/extending-line-by-specified-distance-in-arcgis-for-desktop
@@ -7,15 +12,7 @@ def extended_coord(fp, lp, dist):
     Computes new coordinates x3,y3 at a specified distance
     along the prolongation of the line from x1,y1 to x2,y2
     """
-    coords = [(fp.X, fp.Y), (lp.X, lp.Y)]
-    (x1,y1),(x2,y2) = coords
-    dx = x2 - x1
-    dy = y2 - y1
-    linelen = math.hypot(dx, dy)
-
-    x3 = x2 + dx/linelen * dist
-    y3 = y2 + dy/linelen * dist
-    return arcpy.Point(x3, y3)
+    return arcpy.Point(*extended_xy(fp, lp, dist))
 
 
 def flip_array(array):
@@ -28,59 +25,6 @@ def flip_array(array):
         array.replace(i, flipped.getObject(i))
 
 
-def midpoint(point_a, point_b):
-    """returns the midpoint of a line"""
-    x1 = point_a.X
-    y1 = point_a.Y
-    x2 = point_b.X
-    y2 = point_b.Y
-
-    # Find midpoint
-    x = (x1 + x2) / 2.0
-    y = (y1 + y2) / 2.0
-    return (x, y)
-
-def line_dir(line_geometry):
-    """returns a tuple of direction in y,x
-
-    ex: line_dir(line) --> ('N','E')
-    """
-    start_x = line_geometry.firstPoint.X
-    end_x = line_geometry.lastPoint.X
-    start_y =line_geometry.firstPoint.Y
-    end_y = line_geometry.lastPoint.Y
-
-    easting = start_x - end_x
-    northing = start_y - end_y
-
-    # get directions
-    if easting < 0:
-        e_dir = 'E'
-    else:
-        e_dir = 'W'
-    if northing < 0:
-        n_dir = 'N'
-    else:
-        n_dir = 'S'
-    return n_dir, e_dir
-
-def get_angle(xy1, xy2):
-    """Calculate azimuth angle from two points. (Zero is north.)
-
-    # Curtis Price, cprice@usgs.gov,  9/18/2013 11:51:10 AM
-    """
-    try:
-        # ArcPy point objects
-        x1, y1, x2, y2 = xy1.X, xy1.Y, xy2.X, xy2.Y
-    except:
-        # xy strings, e.g. "0 0"
-        if isinstance(xy1, str) and isinstance(xy2, str):
-            xy1, xy2 = xy1.replace('NaN',''), xy2.replace('NaN','')
-        x1, y1 = map(float, xy1.split())
-        x2, y2 = map(float, xy2.split())
-    dx, dy = (x2 - x1, y2 - y1)
-    return 90 - math.degrees(math.atan2(dy, dx))
-
 class Line(arcpy.Polyline):
     def __init__(self, geometry=None, firstPoint=None, lastPoint=None, array=None, sr=None):
         if not geometry:
@@ -0,0 +1,216 @@
+"""a stand in for arcpy so the table logic can be tested without ArcGIS.
+
+The arcpy.da cursors and editor read and write in memory tables and record every
+cursor and edit session that was opened, the rest of arcpy is a MagicMock.  It is
+only installed when arcpy cannot be imported, tests that need it are skipped
+when the real arcpy is available (see ARCPY_STUB).
+"""
+import re
+import sys
+import types
+from unittest import mock
+
+# simple where clauses, "Field = 'value' AND Other > 3 OR Field is null", "OID IN (1,2)"
+CONDITION_PAT = re.compile(r"^\s*(\w+)\s*(=|<>|>=|<=|>|<|is null|is not null|in)\s*(.*?)\s*$", re.I)
+
+COMPARISONS = {
+    '=': lambda a, b: a == b, '<>': lambda a, b: a != b, '>': lambda a, b: a > b,
+    '<': lambda a, b: a < b, '>=': lambda a, b: a >= b, '<=': lambda a, b: a <= b
+}
+
+def parse_value(text: str):
+    text = text.strip()
+    if text.startswith("'") and text.endswith("'"):
+        return text[1:-1]
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+def make_condition(clause: str):
+    field, op, value = CONDITION_PAT.match(clause).groups()
+    op = op.lower()
+    if op == 'is null':
+        return lambda row: row.get(field) is None
+    if op == 'is not null':
+        return lambda row: row.get(field) is not None
+    if op == 'in':
+        values = {parse_value(v) for v in value.strip('()').split(',')}
+        return lambda row: row.get(field) in values
+    v, compare = parse_value(value), COMPARISONS[op]
+    return lambda row: row.get(field) is not None and compare(row.get(field), v)
+
+def make_filter(where: str):
+    """creates a row filter from a simple where clause"""
+    if not where:
+        return lambda row: True
+    groups = [
+        [make_condition(c) for c in re.split(r'\s+and\s+', group, flags=re.I)]
+        for group in re.split(r'\s+or\s+', where, flags=re.I)
+    ]
+    return lambda row: any(all(c(row) for c in group) for group in groups)
+
+def sort_rows(rows: list, sql_clause) -> list:
+    """sorts rows by an "ORDER BY field [DESC]" postfix clause"""
+    postfix = (sql_clause or (None, None))[1] or ''
+    match = re.match(r'ORDER BY (\w+)( DESC)?', postfix, re.I)
+    if not match:
+        return rows
+    field = 'OID@' if match.group(1).upper() == 'OBJECTID' else match.group(1)
+    return sorted(rows, key=lambda r: r.get(field), reverse=bool(match.group(2)))
+
+
+class FakeTable:
+    """an in memory table, each row is a dict of field values with its OBJECTID in OID@"""
+    def __init__(self, fields=None, rows=None, shapeType=None):
+        self.fields = list(fields or [])
+        self.shapeType = shapeType
+        self.rows = []
+        self.nextOID = 1
+        for r in rows or []:
+            self.insert(r)
+
+    def insert(self, attrs: dict) -> int:
+        row = dict(attrs)
+        row['OID@'] = self.nextOID
+        self.nextOID += 1
+        for f in row:
+            if f not in self.fields and '@' not in f:
+                self.fields.append(f)
+        self.rows.append(row)
+        return row['OID@']
+
+    def values(self, field: str) -> list:
+        return [r.get(field) for r in self.rows]
+
+
+class FakeCursor:
+    """base for the arcpy.da cursors, bound to a FakeArcpy by subclassing"""
+    arcpy: 'FakeArcpy' = None
+    kind = None
+
+    def __init__(self, in_table, field_names, where_clause=None, *args, sql_clause=None, **kwargs):
+        self.table = self.arcpy.tables.setdefault(str(in_table), FakeTable([f for f in field_names if '@' not in f]))
+        self.fields = list(field_names)
+        self.where = where_clause
+        self.arcpy.cursors.append((self.kind, str(in_table)))
+        self._rows = sort_rows([r for r in self.table.rows if make_filter(where_clause)(r)], sql_clause) if self.kind != 'insert' else []
+        self._current = None
+
+    def __iter__(self):
+        for row in list(self._rows):
+            self._current = row
+            yield [row.get(f) for f in self.fields]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def updateRow(self, values):
+        if self._current is None:
+            raise RuntimeError('updateRow() called outside of the cursor loop')
+        self._current.update({f: v for f, v in zip(self.fields, values) if f != 'OID@'})
+
+    def deleteRow(self):
+        if self._current is None:
+            raise RuntimeError('deleteRow() called outside of the cursor loop')
+        self.table.rows.remove(self._current)
+
+    def insertRow(self, values):
+        return self.table.insert({f: v for f, v in zip(self.fields, values) if f != 'OID@'})
+
+
+class FakeEditor:
+    """records the edit sessions, set arcpy.editorErrors to make a call raise, ex: {'startOperation': RuntimeError()}"""
+    arcpy: 'FakeArcpy' = None
+
+    def __init__(self, workspace):
+        self.workspace = workspace
+        self.calls = []
+        self.isEditing = False
+        self.arcpy.editors.append(self)
+
+    def __getattr__(self, name):
+        if name.startswith(('start', 'stop', 'abort')):
+            return lambda *args: self._call(name)
+        raise AttributeError(name)
+
+    def _call(self, name: str):
+        self.calls.append(name)
+        if name in self.arcpy.editorErrors:
+            raise self.arcpy.editorErrors[name]
+        if name in ('startEditing', 'stopEditing'):
+            self.isEditing = name == 'startEditing'
+
+
+class FakeArcpy(mock.MagicMock):
+    """arcpy with in memory arcpy.da cursors, use reset() between tests"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        da = types.SimpleNamespace()
+        for name, kind in [('SearchCursor', 'search'), ('UpdateCursor', 'update'), ('InsertCursor', 'insert')]:
+            setattr(da, name, type(name, (FakeCursor,), {'arcpy': self, 'kind': kind}))
+        da.Editor = type('Editor', (FakeEditor,), {'arcpy': self})
+        self.da = da
+        self.mapping = types.SimpleNamespace(Layer=type('Layer', (), {}), TableView=type('TableView', (), {}))
+        self.Exists.side_effect = lambda path: True
+        self.Describe.side_effect = self._describe
+        self.ListFields.side_effect = lambda path: self._describe(path).fields
+        self.management.GetCount.side_effect = self._count
+        self.reset()
+
+    def _get_child_mock(self, **kwargs):
+        return mock.MagicMock(**kwargs)
+
+    def reset(self):
+        self.tables = {}
+        self.cursors = []
+        self.editors = []
+        self.editorErrors = {}
+
+    def _describe(self, path):
+        table = self.tables.get(str(path), FakeTable())
+        return types.SimpleNamespace(
+            catalogPath=str(path),
+            workspaceType='LocalDatabase',
+            fields=[types.SimpleNamespace(name=f) for f in table.fields],
+            shapeType=table.shapeType,
+            spatialReference=None,
+            oidFieldName='OBJECTID'
+        )
+
+    def _count(self, path):
+        count = len(self.tables.get(str(path), FakeTable()).rows)
+        return types.SimpleNamespace(getOutput=lambda i: str(count))
+
+
+class FakeDatabase:
+    """the table paths of the NG911 database, for patching get_ng911_db()"""
+    def __init__(self, arcpy: FakeArcpy, **tables):
+        self.arcpy = arcpy
+        self.gdb_path = '/fake/NG911.gdb'
+        self.agencyID = 'test.il.us'
+        self.addressFlags = self.path('AddressFlags')
+        self.validatedAddresses = self.path('ValidatedAddresses')
+        for name, path in tables.items():
+            setattr(self, name, path)
+
+    def path(self, name: str) -> str:
+        return f'{self.gdb_path}/{name}'
+
+    def ensure_schema_table(self, name: str) -> str:
+        path = self.path(name)
+        self.arcpy.tables.setdefault(path, FakeTable())
+        return path
+
+    get_table = path
+
+
+try:
+    import arcpy
+    ARCPY_STUB = None
+except ImportError:
+    ARCPY_STUB = sys.modules['arcpy'] = FakeArcpy(name='arcpy')
@@ -0,0 +1,44 @@
+import unittest
+
+from ilng911.core.fields import ADDRESS_FIELDS
+from ilng911.core.bulk import BulkAddressValidator
+from ilng911.core.rules import get_default_rules
+from benchmarks.synthetic import generate_county, ERROR_FLAGS, ADDRESS_POINT_FIELDS
+from benchmarks.storage import MemoryWorkspace
+
+class TestSyntheticCounty(unittest.TestCase):
+
+    def setUp(self):
+        self.county = generate_county(2000, seed=7)
+
+    def test_deterministic(self):
+        other = generate_county(2000, seed=7)
+        self.assertEqual(len(self.county.addresses), 2000)
+        self.assertEqual(self.county.addresses.digest(), other.addresses.digest())
+        self.assertEqual(self.county.roads.digest(), other.roads.digest())
+        self.assertNotEqual(self.county.addresses.digest(), generate_county(2000, seed=8).addresses.digest())
+
+    def test_errors_are_flagged(self):
+        validator = BulkAddressValidator(self.county.roads, rules=get_default_rules())
+        results = {r.oid: r.flags for r in validator.validate(self.county.addresses)}
+        damaged = set()
+        for kind, oids in self.county.errors.items():
+            damaged.update(oids)
+            for oid in oids:
+                self.assertEqual(results[oid][ERROR_FLAGS[kind]], 1, f'{kind} not flagged for {oid}')
+        # clean points are not flagged
+        self.assertTrue(damaged)
+        self.assertFalse([oid for oid, flags in results.items() if flags.FLAG_COUNT and oid not in damaged])
+
+    def test_commit_features(self):
+        workspace = MemoryWorkspace('test')
+        table = workspace.create_table('AddressPoints', ADDRESS_POINT_FIELDS + ['SHAPE@', 'DateUpdate'])
+        features = [{ADDRESS_FIELDS.NUMBER: n, 'SHAPE@': (n, n)} for n in range(3)]
+        self.assertEqual(workspace.commit_features('AddressPoints', features, ADDRESS_FIELDS.GUID, 'SITE'), 3)
+        self.assertEqual(workspace.commit_features('AddressPoints', features[:1], ADDRESS_FIELDS.GUID, 'SITE'), 1)
+        guids = [row[table.fields.index(ADDRESS_FIELDS.GUID)] for row in table.rows]
+        self.assertEqual(guids, [f'SITE{n}@test' for n in range(1, 5)])
+        self.assertEqual([row[0] for row in table.rows], [1, 2, 3, 4])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,235 @@
+import unittest
+
+from ilng911.utils.columns import FeatureColumns
+from ilng911.core.fields import VALIDATION_FLAGS
+from ilng911.core.bulk import BulkAddressValidator, ADDRESS_VALIDATION_FIELDS, ROAD_VALIDATION_FIELDS, batch_range_and_parity
+from ilng911.core.rules import get_default_rules, ValidationBatch, ValidationRule, score_flags, parity_matches
+from ilng911.core import parallel
+from ilng911.core.parallel import iter_validate_parallel
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from ilng911.core.duplicates import DuplicateAddressIndex, address_key, find_duplicate_addresses
+from ilng911.core.identifiers import NenaIdentifierAudit
+
+def make_roads() -> FeatureColumns:
+    roads = FeatureColumns(ROAD_VALIDATION_FIELDS)
+    attrs = {f: None for f in ROAD_VALIDATION_FIELDS}
+    attrs.update(St_Name='MAIN', FromAddr_L=101, ToAddr_L=199, Parity_L='O', FromAddr_R=100, ToAddr_R=198, Parity_R='E')
+    roads.append(1, [[(0, 0), (1000, 0)]], [attrs[f] for f in ROAD_VALIDATION_FIELDS])
+    return roads
+
+def make_addresses(*rows) -> FeatureColumns:
+    addresses = FeatureColumns(ADDRESS_VALIDATION_FIELDS)
+    for oid, xy, values in rows:
+        attrs = {f: None for f in ADDRESS_VALIDATION_FIELDS}
+        attrs.update(values)
+        addresses.append(oid, xy, [attrs[f] for f in ADDRESS_VALIDATION_FIELDS])
+    return addresses
+
+class TestValidationRules(unittest.TestCase):
+
+    def setUp(self):
+        self.rules = get_default_rules()
+        self.validator = BulkAddressValidator(make_roads(), rules=self.rules)
+        self.addresses = make_addresses(
+            (1, (100, 10), dict(Add_Number=101, St_Name='Main', Site_NGUID='SITE1@test')),
+            (2, (200, -10), dict(Add_Number=101, St_Name='Main', Site_NGUID='SITE1@test')),
+            (3, (300, 10), dict(St_Name='Elm', Site_NGUID='SITE3@test')),
+        )
+
+    def test_default_rules_cover_every_flag(self):
+        self.assertEqual(sorted(self.rules.flags), sorted(VALIDATION_FLAGS.__props__))
+
+    def test_flags(self):
+        results = self.validator.validate(self.addresses)
+        first, second, third = [r.flags for r in results]
+        self.assertEqual(first.INVALID_PARITY, 0)
+        self.assertEqual(second.INVALID_PARITY, 1)
+        self.assertEqual(first.DUPLICATE_ADDRESS, 1)
+        self.assertEqual(first.DUPLICATE_NENA_IDENTIFIER, 1)
+        self.assertEqual(third.MISSING_ADDRESS_NUMBER, 1)
+        self.assertEqual(third.INVALID_STREET_NAME, 1)
+        self.assertEqual(third.DUPLICATE_NENA_IDENTIFIER, 0)
+
+    def test_disabled_rules(self):
+        results = self.validator.validate(self.addresses, disabled=[VALIDATION_FLAGS.INVALID_PARITY])
+        self.assertEqual(results[1].flags.INVALID_PARITY, 0)
+        self.assertNotIn(VALIDATION_FLAGS.INVALID_PARITY, self.rules.timings)
+
+    def test_extra_rule(self):
+        @self.rules.rule('MISSING_UNIT')
+        def missing_unit(batch: ValidationBatch):
+            return [not u for u in batch.address('Unit')]
+
+        results = self.validator.validate(self.addresses)
+        self.assertEqual(results[0].flags.MISSING_UNIT, 1)
+        self.assertIn('MISSING_UNIT', self.rules.timings)
+        with self.assertRaises(RuntimeError):
+            self.rules.rule('MISSING_UNIT')(missing_unit)
+
+    def test_chunked_results(self):
+        expected = [(r.oid, r.flags) for r in self.validator.validate(self.addresses)]
+        chunks = list(iter_validate_parallel(self.validator.roads, self.addresses, processes=1, rules=self.rules, chunkSize=2))
+        self.assertEqual([len(results) for results, timings in chunks], [2, 1])
+        self.assertEqual([(r.oid, r.flags) for results, timings in chunks for r in results], expected)
+        self.assertIn(VALIDATION_FLAGS.INVALID_PARITY, chunks[0][1])
+
+    def test_timings_are_per_run(self):
+        list(iter_validate_parallel(self.validator.roads, self.addresses, processes=1, rules=self.rules))
+        first = dict(self.rules.timings)
+        list(iter_validate_parallel(self.validator.roads, self.addresses, processes=1, rules=self.rules, disabled=[VALIDATION_FLAGS.INVALID_PARITY]))
+        self.assertIn(VALIDATION_FLAGS.INVALID_PARITY, first)
+        self.assertNotIn(VALIDATION_FLAGS.INVALID_PARITY, self.rules.timings)
+        self.assertEqual(self.rules.timings.keys(), first.keys() - {VALIDATION_FLAGS.INVALID_PARITY})
+
+    def test_rules_must_implement_run(self):
+        with self.assertRaises(TypeError):
+            ValidationRule('MISSING_UNIT')
+
+    def test_batch_range_and_parity(self):
+        info = batch_range_and_parity(self.validator.roads, [100, 250, 5], [10, -10, 5], [0, 0, None])
+        self.assertEqual(info.side, ['L', 'R', None])
+        self.assertEqual(info.parity, ['O', 'E', None])
+        self.assertEqual(info.from_address, [101, 100, None])
+        self.assertEqual(info.to_address, [199, 198, None])
+        self.assertAlmostEqual(info.percent[1], 25)
+        self.assertAlmostEqual(info.distance[0], 10)
+
+    def test_score(self):
+        flags = score_flags({f: 0 for f in VALIDATION_FLAGS.__props__})
+        self.assertEqual(flags['VALIDATION_SCORE'], 100)
+        self.assertFalse(parity_matches(100, 'Odd'))
+        self.assertTrue(parity_matches(100, 'B'))
+
+class TestDuplicateAddresses(unittest.TestCase):
+
+    def setUp(self):
+        self.addresses = make_addresses(
+            (1, (0, 0), dict(Add_Number=101, St_Name='Main', St_PosTyp='ST', Unit='APT #2.')),
+            (2, (0, 0), dict(Add_Number=101.0, St_Name='  main ', St_PosTyp='st', Unit='apt 2', St_PreDir='')),
+            (3, (0, 0), dict(Add_Number=101, St_Name='Main', St_PosTyp='ST', Unit='APT 3')),
+            (4, (0, 0), dict(Add_Number=200, St_Name='Oak Hill', St_PreDir='North')),
+            (5, (0, 0), dict(Add_Number=200, St_Name='OAK  HILL', St_PreDir='N')),
+            (6, (0, 0), dict()),
+            (7, (0, 0), dict(St_PreDir=' ')),
+        )
+        self.index = DuplicateAddressIndex(self.addresses)
+
+    def test_key_normalization(self):
+        key = address_key(dict(Add_Number=101.0, St_Name='  main ', St_PosTyp='st', Unit='apt 2', St_PreDir=''))
+        self.assertEqual(key, address_key(dict(Add_Number=101, St_Name='MAIN', St_PosTyp='ST', Unit='APT #2.')))
+        self.assertNotEqual(key, address_key(dict(Add_Number=101, St_Name='MAIN', St_PosTyp='ST', Unit='APT 3')))
+        self.assertIsNone(address_key(dict(St_Name=None, Unit='  ')))
+
+    def test_groups(self):
+        groups = sorted(sorted(idx) for idx in self.index.duplicateGroups.values())
+        self.assertEqual(groups, [[0, 1], [3, 4]])
+        self.assertEqual(self.index.duplicateOids, {1, 2, 4, 5})
+        self.assertEqual(self.index.find(dict(Add_Number='101', St_Name='Main', St_PosTyp='St', Unit='Apt 2')), [0, 1])
+        self.assertEqual(sorted(g.oids for g in find_duplicate_addresses(self.addresses)), [[1, 2], [4, 5]])
+
+    def test_flags(self):
+        validator = BulkAddressValidator(make_roads(), rules=get_default_rules())
+        flags = {r.oid: r.flags.DUPLICATE_ADDRESS for r in validator.validate(self.addresses)}
+        self.assertEqual(flags, {1: 1, 2: 1, 3: 0, 4: 1, 5: 1, 6: 0, 7: 0})
+
+class TestNenaIdentifierAudit(unittest.TestCase):
+
+    def test_single_pass(self):
+        audit = NenaIdentifierAudit('ADDRESS_POINTS', 'SITE', 'test.il.us').update([
+            (1, 'SITE1@test.il.us'), (2, 'SITE12@test.il.us'), (3, 'SITE12@test.il.us'),
+            (4, None), (5, '  '), (6, 'RCL40@test.il.us'), (7, 'SITE99@other.il.us'), (8, 'site7@TEST.IL.US')
+        ])
+        summary = audit.summary()
+        self.assertEqual(audit.duplicates, {'SITE12@test.il.us': [2, 3]})
+        self.assertEqual(audit.duplicateOids, {2, 3})
+        self.assertEqual(audit.nulls, [4, 5])
+        self.assertEqual(audit.malformed, [6, 7])
+        self.assertEqual((summary.total, summary.unique, summary.duplicates, summary.nulls, summary.malformed), (8, 5, 1, 2, 2))
+        self.assertTrue(audit.is_duplicate('SITE12@test.il.us'))
+        self.assertEqual(audit.copy_duplicates().duplicateOids, {2, 3})
+
+    def test_next_id_per_prefix(self):
+        rows = [(1, 'SITE3@test'), (2, 'RCL20@test'), (3, 'SITE8@test'), (4, 'RCL5@test'), (5, 'ES2@test')]
+        expected = {'SITE': (8, 'SITE9@test'), 'RCL': (20, 'RCL21@test'), 'ES': (2, 'ES3@test'), 'PSAP': (0, 'PSAP1@test')}
+        for prefix, (maxId, nextIdentifier) in expected.items():
+            audit = NenaIdentifierAudit(prefix=prefix, agencyID='test').update(rows)
+            self.assertEqual(audit.maxId, maxId, prefix)
+            self.assertEqual(audit.nextId, maxId + 1, prefix)
+            self.assertEqual(audit.next_identifier(), nextIdentifier, prefix)
+
+class TestParallelValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.roads = make_roads()
+        # OBJECTIDs out of order so shard indices and OBJECTIDs differ, 10 and 50 and 20 and 60 are duplicates in different shards
+        self.addresses = make_addresses(*[
+            (oid, (x, 10 if oid % 2 else -10), dict(Add_Number=100 + oid % 40, St_Name='Main', Site_NGUID=f'SITE{oid}@test'))
+            for oid, x in [(50, 100), (10, 200), (40, 300), (20, 400), (30, 500), (60, 600)]
+        ])
+        self.expected = {r.oid: r.flags for r in BulkAddressValidator(self.roads, rules=get_default_rules()).validate(self.addresses)}
+
+    def test_shards(self):
+        # threads stand in for the worker processes, the shards go through the same take() and remapping
+        with mock.patch.object(parallel, 'MIN_PARALLEL_RECORDS', 0), mock.patch.object(parallel, 'ProcessPoolExecutor', ThreadPoolExecutor):
+            shards = list(iter_validate_parallel(self.roads, self.addresses, [0, 1, 2, 3, 5], processes=2, rules=get_default_rules(), chunkSize=3))
+        results = [r for shard, timings in shards for r in shard]
+        self.assertGreaterEqual(len(shards), 2)
+        self.assertEqual(sorted(r.oid for r in results), [10, 20, 40, 50, 60])
+        self.assertEqual([r.oid for r in results], sorted(r.oid for r in results))
+        for r in results:
+            self.assertEqual(self.addresses.oids[r.index], r.oid)
+            self.assertEqual(r.flags, self.expected[r.oid])
+        self.assertEqual({r.oid for r in results if r.flags.DUPLICATE_ADDRESS}, {10, 20, 50, 60})
+
+    def test_serial_fallback(self):
+        with mock.patch.object(parallel, 'ProcessPoolExecutor', side_effect=AssertionError('workers were started')):
+            shards = list(iter_validate_parallel(self.roads, self.addresses, processes=4, rules=get_default_rules()))
+        self.assertEqual(len(shards), 1)
+        self.assertEqual(sorted(r.oid for r in shards[0][0]), sorted(self.expected))
+
+class TestPerPointValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.validator = BulkAddressValidator(make_roads(), rules=get_default_rules())
+        self.addresses = make_addresses(
+            (1, (100, 10), dict(Add_Number=101, St_Name='Main', Site_NGUID='SITE1@test')),
+            (2, (200, -10), dict(Add_Number=151, St_Name='Main', Site_NGUID='SITE2@test')),
+            (3, (300, 10), dict(Add_Number=301, St_Name='Main', Site_NGUID='SITE3@test')),
+            (4, (400, -10), dict(Add_Number=250, St_Name=' main ', Site_NGUID='SITE4@test')),
+            (5, (500, 10), dict(Add_Number=101, St_Name='Elm', Site_NGUID='SITE5@test')),
+            (6, None, dict(Add_Number=103, St_Name='Main', Site_NGUID='SITE6@test')),
+        )
+
+    def test_same_flags_as_bulk(self):
+        bulk = self.validator.validate(self.addresses)
+        for i, expected in enumerate(bulk):
+            attrs = {f: self.addresses.value(f, i) for f in ADDRESS_VALIDATION_FIELDS}
+            result = self.validator.validate_point(self.addresses.oids[i], self.addresses.shapes[i], attrs)
+            self.assertEqual(result.flags, expected.flags, f'OBJECTID {expected.oid}')
+            self.assertEqual((result.roadOID, result.side), (expected.roadOID, expected.side))
+
+        flags = {r.oid: r.flags for r in bulk}
+        self.assertEqual([r.side for r in bulk], ['L', 'R', 'L', 'R', None, None])
+        self.assertEqual(flags[1].FLAG_COUNT, 0)
+        self.assertEqual(flags[2].INVALID_PARITY, 1)
+        self.assertEqual(flags[3].ADDRESS_OUTSIDE_RANGE, 1)
+        self.assertEqual(flags[4].ADDRESS_OUTSIDE_RANGE, 1)
+        self.assertEqual(flags[4].INVALID_PARITY, 0)
+        self.assertEqual(flags[5].INVALID_STREET_NAME, 1)
+
+    def test_sides_match_batch_range_and_parity(self):
+        located = [r for r in self.validator.validate(self.addresses) if r.roadOID is not None]
+        xs = [self.addresses.shapes[r.index][0] for r in located]
+        ys = [self.addresses.shapes[r.index][1] for r in located]
+        info = self.validator.range_and_parity(xs, ys, [0] * len(located))
+        self.assertEqual(info.side, [r.side for r in located])
+
+    def test_known_road(self):
+        attrs = {f: self.addresses.value(f, 4) for f in ADDRESS_VALIDATION_FIELDS}
+        result = self.validator.validate_point(5, (500, 10), attrs, roadIdx=0)
+        self.assertEqual((result.roadOID, result.side), (1, 'L'))
+        self.assertEqual(result.flags.INVALID_STREET_NAME, 0)
+
+if __name__ == '__main__':
+    unittest.main()
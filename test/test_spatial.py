@@ -0,0 +1,417 @@
+import math
+import os
+import tempfile
+import unittest
+
+from ilng911.spatial.planar import locate_on_polyline, point_in_polygon
+from ilng911.spatial.polygons import PolygonIndex
+from ilng911.core.overlays import OverlayLayer, OverlayCache, ZipCodeService, ZIP_SOURCES
+from ilng911.core.spatial_join import SpatialJoinEngine
+from ilng911.core.refresh import AddressOverlayRefresher
+from ilng911.support.munch import Munch
+from ilng911.spatial.grid import SegmentIndex, PointIndex
+from ilng911.utils.columns import FeatureColumns, FEET_TO_METERS
+from ilng911.core.centerlines import CenterlineIndex, CENTERLINE_FIELDS, INDEX_FIELDS
+from ilng911.core.streets import merge_ranges
+from ilng911.core.geocoder import AddressGeocoder
+from ilng911.core.topology import RoadTopology, TOPOLOGY_ISSUES
+from ilng911.core.ranges import find_range_conflicts, RANGE_ISSUES
+from ilng911.spatial.projection import get_transformer, project_coordinates
+from ilng911.spatial.polylines import PolylineStore
+from ilng911.spatial.vectorized import SegmentArrays, locate_points
+from ilng911.spatial.lines import (
+    line_dir, get_angle, midpoint, extended_xy, quadrant_bearing, format_quadrant_bearing,
+    line_dirs, get_angles, midpoints, extended_coords, quadrant_bearings
+)
+from benchmarks.lines import random_lines
+from ilng911.core.reverse import ReverseGeocoder, REVERSE_ADDRESS_FIELDS, interpolate_number
+
+# a small street grid: Main runs east-west, Oak runs north-south
+ROADS = [
+    [[(0, 0), (100, 0), (200, 0)]],
+    [[(200, 0), (400, 0)]],
+    [[(100, -200), (100, 200)]],
+]
+NAMES = ['MAIN', 'MAIN', 'OAK']
+
+class TestSegmentIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SegmentIndex(ROADS, NAMES, cellSize=50)
+
+    def test_nearest_matches_brute_force(self):
+        for x, y in [(150, 10), (90, -30), (390, 25), (-50, 60), (105, 180)]:
+            idx, loc = self.index.nearest(x, y)
+            expected = min(range(len(ROADS)), key=lambda i: locate_on_polyline(x, y, ROADS[i]).distance)
+            self.assertEqual(idx, expected)
+            self.assertAlmostEqual(loc.distance, locate_on_polyline(x, y, ROADS[expected]).distance)
+
+    def test_side_and_measure(self):
+        idx, loc = self.index.nearest(150, 10, key='MAIN')
+        self.assertEqual(idx, 0)
+        self.assertEqual(loc.side, 'L')
+        self.assertAlmostEqual(loc.along, 150)
+        self.assertAlmostEqual(loc.length, 200)
+
+    def test_key_filter(self):
+        idx, loc = self.index.nearest(105, 10, key='MAIN')
+        self.assertEqual(idx, 0)
+        idx, loc = self.index.nearest(150, 10, key='OAK')
+        self.assertEqual(idx, 2)
+
+    def test_max_distance(self):
+        self.assertEqual(self.index.nearest(300, 500, maxDistance=100), (None, None))
+
+    def test_within(self):
+        found = [idx for idx, loc in self.index.within(110, 10, 20)]
+        self.assertEqual(found, [0, 2])
+
+    def test_nearest_k(self):
+        found = [(idx, round(loc.distance)) for idx, loc in self.index.nearest_k(190, 10, k=3)]
+        self.assertEqual(found, [(0, 10), (1, 14), (2, 90)])
+        # one segment per street
+        found = [(idx, round(loc.distance)) for idx, loc in self.index.nearest_k(190, 10, k=3, distinctKeys=True)]
+        self.assertEqual(found, [(0, 10), (2, 90)])
+        self.assertEqual(self.index.nearest_k(190, 10, k=3, maxDistance=50), self.index.nearest_k(190, 10, k=2)[:2])
+
+    def test_add(self):
+        self.index.add(3, [[(150, 5), (150, 50)]], 'ELM')
+        idx, loc = self.index.nearest(155, 20)
+        self.assertEqual(idx, 3)
+        self.assertEqual(self.index.nearest(155, 20, key='ELM')[0], 3)
+        self.assertEqual([idx for idx, loc in self.index.nearest_k(155, 20, k=2, distinctKeys=True)], [3, 0])
+
+class TestCenterlineIndex(unittest.TestCase):
+
+    def test_closest_streets(self):
+        roads = FeatureColumns(CENTERLINE_FIELDS)
+        roads.append(10, ROADS[0], ['Main', 'St', 101, 199, 100, 198])
+        roads.append(11, ROADS[1], ['MAIN', 'ST', 201, 299, 200, 298])
+        index = CenterlineIndex(roads)
+        index.add(12, ROADS[2], ['Oak', 'Ave', None, None, 300, 398])
+        found = index.closest(190, 10, maxDistance=500)
+        self.assertEqual([r['OID@'] for r in found], [10, 12])
+        self.assertEqual(found[0].range, '100 - 199')
+        self.assertEqual(found[1].block, 300)
+        self.assertEqual(index.maxOID, 12)
+
+    def test_street_index(self):
+        roads = FeatureColumns(INDEX_FIELDS)
+        roads.append(10, ROADS[0], ['Main', 'St', 101, 199, 100, 198, 'North', None, None, 'O', 'E', None, None])
+        roads.append(11, ROADS[1], ['MAIN', 'ST', 201, 299, 200, 298, 'N', None, None, 'O', 'E', None, None])
+        roads.append(12, [[(-200, -1000), (0, -1000)]], ['Main', 'St', 1, 99, 2, 98, 'S', None, None, 'O', 'E', None, None])
+        index = CenterlineIndex(roads)
+        street = index.streets.get({'St_PreDir': 'N', 'St_Name': 'main', 'St_PosTyp': 'St'})
+        self.assertEqual(street.name, 'N MAIN ST')
+        self.assertEqual(street.roads, [0, 1])
+        self.assertEqual(street.ranges.L, [(101, 299)])
+        self.assertTrue(index.streets.in_range({'St_PreDir': 'N', 'St_Name': 'MAIN', 'St_PosTyp': 'ST'}, 250))
+        # the pre direction is not required, but narrows the search to one street
+        self.assertEqual(len(index.streets.find({'St_Name': 'MAIN'})), 2)
+        self.assertEqual(index.streets.segments_near({'St_Name': 'MAIN'}, 190, 10, 50), [0, 1])
+        self.assertEqual(index.streets.segments_near({'St_Name': 'MAIN', 'St_PreDir': 'S'}, 190, 10, 50), [])
+        self.assertEqual(merge_ranges([(200, 298), (100, 198), (400, 498)]), [(100, 298), (400, 498)])
+
+    def test_geocode(self):
+        roads = FeatureColumns(INDEX_FIELDS, metersPerUnit=FEET_TO_METERS)
+        roads.append(10, ROADS[0], ['Main', 'St', 101, 199, 100, 198, 'N', None, None, 'O', 'E', None, None])
+        roads.append(11, ROADS[1], ['Main', 'St', 201, 299, 200, 298, 'N', None, None, 'O', 'E', None, None])
+        roads.append(12, ROADS[2], ['Oak', 'Ave', 101, 199, 100, 198, None, None, None, 'O', 'E', None, None])
+        geocoder = AddressGeocoder(CenterlineIndex(roads), offset=10)
+        result = geocoder.geocode('150 North Main St., Springfield IL')
+        self.assertEqual((result.status, result.roadOID, result.side, result.street), ('M', 10, 'R', 'N MAIN ST'))
+        # 150 is about halfway between 100 and 198 along the 200 foot line, moved 10 feet to the right
+        self.assertAlmostEqual(result.x, 200 * 50 / 98)
+        self.assertAlmostEqual(result.y, -10)
+        self.assertEqual(geocoder.geocode('251 MAIN').roadOID, 11)
+        self.assertEqual(geocoder.geocode({'Add_Number': 151, 'St_Name': 'oak', 'St_PosTyp': 'AVE'}).side, 'L')
+        self.assertEqual(geocoder.geocode('301 N MAIN ST').status, 'U')
+        self.assertEqual(geocoder.geocode('150 NORTH MAIN ST').x, result.x)
+        self.assertEqual(geocoder.cache.hits, 1)
+
+class TestReverseGeocoder(unittest.TestCase):
+
+    def test_reverse(self):
+        roads = FeatureColumns(INDEX_FIELDS, metersPerUnit=FEET_TO_METERS)
+        attrs = {'St_Name': 'MAIN', 'St_PosTyp': 'ST', 'FromAddr_L': 101, 'ToAddr_L': 199, 'FromAddr_R': 100, 'ToAddr_R': 198,
+                 'Parity_L': 'O', 'Parity_R': 'E', 'MSAGComm_L': 'NORTHSIDE', 'MSAGComm_R': 'SOUTHSIDE'}
+        roads.append(10, ROADS[0], [attrs.get(f) for f in INDEX_FIELDS])
+        addresses = FeatureColumns(REVERSE_ADDRESS_FIELDS)
+        addresses.append(1, (50, 40), [{'Add_Number': 151, 'St_Name': 'MAIN', 'St_PosTyp': 'ST'}.get(f) for f in REVERSE_ADDRESS_FIELDS])
+        geocoder = ReverseGeocoder(CenterlineIndex(roads), addresses, tolerance=5)
+        result = geocoder.reverse(100, -20)
+        self.assertEqual(result.address.address, '151 MAIN ST')
+        self.assertEqual(result.centerline.address, '150 MAIN ST')
+        self.assertEqual(result.centerline.attributes.MSAGComm, 'SOUTHSIDE')
+        # a click within the tolerance is answered from the cache, changing a result does not change the cache
+        result.centerline.attributes.MSAGComm = 'CHANGED'
+        result.address = None
+        cached = geocoder.reverse(101, -21)
+        self.assertEqual(geocoder.cache.hits, 1)
+        self.assertEqual(cached.address.address, '151 MAIN ST')
+        self.assertEqual(cached.centerline.attributes.MSAGComm, 'SOUTHSIDE')
+        geocoder.add_address(2, (100, -20), [None] * len(REVERSE_ADDRESS_FIELDS))
+        self.assertEqual(geocoder.reverse(101, -21).address['OID@'], 2)
+
+    def test_point_index(self):
+        points = [(0, 0), None, (10, 10), (3, 4)]
+        index = PointIndex(points, cellSize=2)
+        self.assertEqual(index.nearest(4, 4), (3, 1.0))
+        self.assertEqual(index.nearest(20, 20, maxDistance=5), (None, None))
+        index.add(4, (20, 21))
+        self.assertEqual(index.nearest(20, 20, maxDistance=5), (4, 1.0))
+        self.assertEqual(interpolate_number(0.5, 101, 199, 'O'), 151)
+        self.assertEqual(interpolate_number(0.25, 100, 198, 'E'), 124)
+
+class TestRoadTopology(unittest.TestCase):
+
+    def test_range_issues(self):
+        fields = ['St_Name', 'St_PosTyp', 'FromAddr_L', 'ToAddr_L', 'FromAddr_R', 'ToAddr_R']
+        roads = FeatureColumns(fields, metersPerUnit=FEET_TO_METERS)
+        roads.append(1, [[(0, 0), (100, 0)]], ['MAIN', 'ST', 101, 199, 100, 198])
+        # digitized the other way, the right side continues the left side numbers of the first segment
+        roads.append(2, [[(200, 0.5), (100, 0.2)]], ['MAIN', 'ST', 298, 200, 299, 201])
+        roads.append(3, [[(200, 0), (300, 0)]], ['MAIN', 'ST', 251, 349, 400, 498])
+        roads.append(4, [[(100, 0), (100, 100)]], ['OAK', 'AVE', 101, 199, 100, 198])
+        topology = RoadTopology(roads)
+        self.assertEqual(len(topology), 5)
+        self.assertEqual(topology.neighbors(0), [1, 3])
+        self.assertEqual(sorted((d.x, d.y) for d in topology.dangles()), [(0, 0), (100, 100), (300, 0)])
+        issues = {(i.issue, i.side): i for i in topology.range_issues()}
+        self.assertEqual(set(issues), {(TOPOLOGY_ISSUES.RANGE_OVERLAP, 'L'), (TOPOLOGY_ISSUES.RANGE_GAP, 'R')})
+        self.assertEqual(issues[(TOPOLOGY_ISSUES.RANGE_OVERLAP, 'L')].oids, [2, 3])
+        self.assertEqual(issues[(TOPOLOGY_ISSUES.RANGE_GAP, 'R')].numbers, [298, 400])
+
+class TestRangeConflicts(unittest.TestCase):
+
+    def test_find_range_conflicts(self):
+        fields = ['St_Name', 'St_PosTyp', 'FromAddr_L', 'ToAddr_L', 'Parity_L', 'MSAGComm_L', 'FromAddr_R', 'ToAddr_R', 'Parity_R', 'MSAGComm_R']
+        roads = FeatureColumns(fields)
+        roads.append(1, [[(0, 0), (100, 0)]], ['MAIN', 'ST', 101, 199, 'O', 'SPRINGFIELD', 100, 198, 'E', 'SPRINGFIELD'])
+        # overlaps the left side of the first segment
+        roads.append(2, [[(100, 0), (200, 0)]], ['MAIN', 'ST', 151, 249, 'O', 'Springfield', 200, 298, 'E', 'SPRINGFIELD'])
+        # same numbers in another community and on the other side are fine
+        roads.append(3, [[(500, 0), (600, 0)]], ['MAIN', 'ST', 101, 199, 'O', 'CHATHAM', 101, 199, 'O', 'CHATHAM'])
+        # even right side range overlapping an odd one is a parity conflict, so are mismatched range ends
+        roads.append(4, [[(200, 0), (300, 0)]], ['MAIN', 'ST', 301, 398, 'O', 'SPRINGFIELD', 151, 199, 'O', 'SPRINGFIELD'])
+        issues = {(i.issue, i.oid, i.otherOid) for i in find_range_conflicts(roads)}
+        self.assertEqual(issues, {
+            (RANGE_ISSUES.RANGE_OVERLAP, 2, 1),
+            (RANGE_ISSUES.PARITY_CONFLICT, 4, 1),
+            (RANGE_ISSUES.PARITY_CONFLICT, 4, None),
+        })
+
+class TestProjection(unittest.TestCase):
+
+    def test_web_mercator_round_trip(self):
+        transformer = get_transformer(102100, 4326)
+        self.assertIs(transformer, get_transformer(102100))
+        xs, ys = transformer.project([-9755000.0, float('nan'), 0.0], [5130000.0, 1.0, 0.0])
+        self.assertAlmostEqual(xs[0], -87.6305, places=3)
+        self.assertAlmostEqual(ys[0], 41.7929, places=3)
+        self.assertTrue(xs[1] != xs[1])
+        self.assertEqual((xs[2], ys[2]), (0.0, 0.0))
+        backX, backY = project_coordinates(xs[[0]], ys[[0]], 4326, 3857)
+        self.assertAlmostEqual(backX[0], -9755000.0, places=4)
+        self.assertAlmostEqual(backY[0], 5130000.0, places=4)
+
+    def test_same_coordinate_system(self):
+        xs, ys = get_transformer(4326, 4326).project([1.5], [2.5])
+        self.assertEqual((xs[0], ys[0]), (1.5, 2.5))
+
+class TestPolylineStore(unittest.TestCase):
+
+    def setUp(self):
+        self.shapes = ROADS + [None, [[(0, 0), (3, 4)], [(10, 10), (10, 12), (13, 16)]]]
+        self.store = PolylineStore.from_shapes(self.shapes, wkid=3435)
+
+    def test_measures(self):
+        self.assertEqual(self.store.lengths().tolist(), [200, 200, 400, 0, 12])
+        self.assertEqual(self.store.midpoints()[0].tolist(), [100, 0])
+        self.assertEqual(self.store.angles()[2], 0)
+        self.assertTrue(all(v != v for v in self.store.angles()[3:4]))
+
+    def test_flip_and_extend(self):
+        self.assertEqual(self.store.flip()[4], [[(3, 4), (0, 0)], [(13, 16), (10, 12), (10, 10)]])
+        self.assertEqual(self.store.flip().flip().to_shapes(), self.store.to_shapes())
+        self.assertEqual(self.store.extend(5)[4], [[(0, 0), (3, 4), (6, 8)], [(10, 10), (10, 12), (13, 16), (16, 20)]])
+        self.assertEqual(self.store.extend(50, end=False)[1], [[(150, 0), (200, 0), (400, 0)]])
+
+    def test_save_and_load(self):
+        path = self.store.save(os.path.join(tempfile.mkdtemp(), 'roads'))
+        store = PolylineStore.load(path)
+        self.assertEqual(store.to_shapes(), self.store.to_shapes())
+        self.assertEqual((store.wkid, store.oids.tolist()), (3435, [1, 2, 3, 4, 5]))
+
+class TestLineHelpers(unittest.TestCase):
+
+    def test_batch_matches_per_line(self):
+        data = random_lines(500, seed=3)
+        lines, first, last = data.lines, data.first, data.last
+        self.assertEqual([tuple(d) for d in line_dirs(first, last).tolist()], [line_dir(l) for l in lines])
+        # numpy's arctan2 may differ from math.atan2 in the last bit
+        for angle, l in zip(get_angles(first, last).tolist(), lines):
+            self.assertAlmostEqual(angle, get_angle(l.firstPoint, l.lastPoint), places=9)
+        self.assertEqual([tuple(m) for m in midpoints(first, last).tolist()], [midpoint(l.firstPoint, l.lastPoint) for l in lines])
+        self.assertEqual(quadrant_bearings(first, last), [quadrant_bearing(l) for l in lines])
+        for (x, y), l in zip(extended_coords(first, last, 10).tolist(), lines):
+            ex, ey = extended_xy(l.firstPoint, l.lastPoint, 10)
+            self.assertAlmostEqual(x, ex, places=6)
+            self.assertAlmostEqual(y, ey, places=6)
+
+    def test_quadrant_bearing(self):
+        self.assertEqual(format_quadrant_bearing(45), 'N 45°00\'00" E')
+        self.assertEqual(format_quadrant_bearing(135.5), 'S 44°30\'00" E')
+        self.assertEqual(format_quadrant_bearing(-30), 'N 30°00\'00" W')
+        self.assertEqual(quadrant_bearings([(0, 0)], [(-1, -1)]), ['S 45°00\'00" W'])
+
+class TestLocatePoints(unittest.TestCase):
+
+    def test_matches_per_point(self):
+        xs, ys, features = [50, 150, 300, 100, 10], [10, -5, 20, 50, 10], [0, 0, 1, 2, None]
+        loc = locate_points(SegmentArrays(ROADS), xs, ys, features, pairChunk=2)
+        for i, (x, y, f) in enumerate(zip(xs, ys, features[:-1])):
+            expected = locate_on_polyline(x, y, ROADS[f])
+            self.assertAlmostEqual(loc.distance[i], expected.distance)
+            self.assertAlmostEqual(loc.along[i], expected.along)
+            self.assertEqual('R' if loc.right[i] else 'L', expected.side)
+        self.assertEqual(loc.matched.tolist(), [True, True, True, True, False])
+
+    def test_empty_point(self):
+        nan = float('nan')
+        loc = locate_points(SegmentArrays(ROADS), [50, nan, 150, float('inf')], [10, nan, -5, 0], [0, 0, 0, 1])
+        self.assertEqual(loc.matched.tolist(), [True, False, True, False])
+        self.assertEqual(loc.right.tolist(), [False, False, True, False])
+        self.assertAlmostEqual(loc.percent[2], 75)
+        for field in ('distance', 'along', 'length', 'percent', 'x', 'y'):
+            self.assertTrue(math.isnan(loc[field][1]) and math.isnan(loc[field][3]), field)
+
+class TestPolygonIndex(unittest.TestCase):
+
+    def setUp(self):
+        circle = [(50 + 40 * math.cos(a / 10), 50 + 40 * math.sin(-a / 10)) for a in range(63)]
+        self.polygons = [
+            # a circle with a square hole
+            [circle + [circle[0]], [(40, 40), (40, 60), (60, 60), (60, 40), (40, 40)]],
+            None,
+            [[(80, 0), (80, 100), (200, 100), (200, 0), (80, 0)]],
+        ]
+        self.index = PolygonIndex(self.polygons, nodeSize=2, edgesPerBand=4)
+
+    def test_matches_ray_cast(self):
+        points = [(x * 7.3 % 210, y * 3.1 % 105) for x in range(40) for y in range(40)] + [(50, 50), (30, 50), (85, 50)]
+        expected = [next((i for i, p in enumerate(self.polygons) if p and point_in_polygon(x, y, p)), None) for x, y in points]
+        self.assertEqual([self.index.find(x, y) for x, y in points], expected)
+        many = self.index.find_many([p[0] for p in points], [p[1] for p in points], pairChunk=50)
+        self.assertEqual(many.tolist(), [-1 if e is None else e for e in expected])
+        self.assertEqual(expected[-3:], [None, 0, 0])
+        self.assertEqual(self.index.find_all(85, 50), [0, 2])
+
+class TestZipCodeService(unittest.TestCase):
+
+    def test_fallback(self):
+        zipCodes = FeatureColumns(['ZipCode', 'ZipCode4'])
+        zipCodes.append(1, [[(0, 0), (0, 100), (100, 100), (100, 0), (0, 0)]], ['62701', '1234'])
+        fallback = FeatureColumns(['ZIP_CODE'])
+        fallback.append(1, [[(0, 0), (0, 100), (300, 100), (300, 0), (0, 0)]], ['62702'])
+        service = ZipCodeService(OverlayLayer(zipCodes), OverlayLayer(fallback))
+        expected = [
+            ('62701', '1234', ZIP_SOURCES.AUTHORITATIVE),
+            ('62702', None, ZIP_SOURCES.FALLBACK),
+            (None, None, None),
+        ]
+        points = [(50, 50), (150, 50), (500, 50)]
+        self.assertEqual([tuple(service.lookup(x, y).values()) for x, y in points], expected)
+        self.assertEqual([tuple(r.values()) for r in service.lookup_many([p[0] for p in points], [p[1] for p in points])], expected)
+        self.assertEqual(ZipCodeService(None, OverlayLayer(fallback)).lookup(50, 50).source, ZIP_SOURCES.FALLBACK)
+
+class TestSpatialJoinEngine(unittest.TestCase):
+
+    def test_join(self):
+        esb = FeatureColumns(['ESN', 'Alt_ESN'])
+        esb.append(1, [[(0, 0), (0, 100), (100, 100), (100, 0), (0, 0)]], [None, '200'])
+        esb.append(2, [[(100, 0), (100, 100), (200, 100), (200, 0), (100, 0)]], ['300', '301'])
+        psap = FeatureColumns(['PSAP_ID'])
+        psap.append(1, [[(0, 0), (0, 100), (150, 100), (150, 0), (0, 0)]], ['P1'])
+        rules = [
+            Munch(TargetField='ESN', TableName='ESB', JoinField='ESN'),
+            Munch(TargetField='ESN', TableName='ESB', JoinField='Alt_ESN'),
+            Munch(TargetField='PSAP', TableName='PSAP', JoinField='PSAP_ID'),
+            Munch(TargetField='Fire', TableName='Missing', JoinField='Name'),
+        ]
+        engine = SpatialJoinEngine(rules, {'ESB': OverlayLayer(esb), 'PSAP': OverlayLayer(psap), 'Missing': None})
+        self.assertEqual(engine.targetFields, ['ESN', 'PSAP'])
+        points = [(50, 50), (160, 50), (500, 50)]
+        expected = [('200', 'P1'), ('300', None), (None, None)]
+        self.assertEqual([tuple(engine.join(x, y).values()) for x, y in points], expected)
+        joined = engine.join_many([p[0] for p in points] + [math.nan], [p[1] for p in points] + [math.nan])
+        self.assertEqual(list(zip(joined.ESN, joined.PSAP)), expected + [(None, None)])
+
+    def test_apply_replaces_centerline_values(self):
+        esb = FeatureColumns(['ESN'])
+        esb.append(1, [[(0, 0), (0, 100), (100, 100), (100, 0), (0, 0)]], ['200'])
+        rules = [
+            Munch(TargetField='ESN', TableName='ESB', JoinField='ESN'),
+            Munch(TargetField='PSAP', TableName='ESB', JoinField='PSAP_ID'),
+        ]
+        engine = SpatialJoinEngine(rules, {'ESB': OverlayLayer(esb)})
+        # ESN already came from the centerline, the registered join wins like AddressOverlayRefresher.compute()
+        geometry = Munch(type='point', firstPoint=Munch(X=50, Y=50), spatialReference=None)
+        ft = Munch(geometry=geometry, attributes=Munch(ESN='CENTERLINE', PSAP='P1'), _writable=['ESN', 'PSAP'])
+        self.assertEqual(engine.apply(ft), {'ESN': '200'})
+        self.assertEqual(ft.attributes, {'ESN': '200', 'PSAP': 'P1'})
+        # outside of every source polygon the centerline value is kept
+        ft = Munch(geometry=Munch(geometry, firstPoint=Munch(X=500, Y=50)), attributes=Munch(ESN='CENTERLINE'), _writable=['ESN', 'PSAP'])
+        self.assertEqual(engine.apply(ft), {})
+        self.assertEqual(ft.attributes.ESN, 'CENTERLINE')
+
+class TestAddressOverlayRefresher(unittest.TestCase):
+
+    def test_compute(self):
+        roads = FeatureColumns(['St_Name', 'St_PosTyp', 'ESN_L', 'ESN_R', 'IncMuni_L', 'IncMuni_R', 'PostCode_L', 'PostCode_R'])
+        roads.append(10, ROADS[0], ['Main', 'St', '100', '101', 'SPRINGFIELD', 'SPRINGFIELD', '62701', None])
+        roads.append(12, ROADS[2], ['Oak', 'Ave', '200', '201', None, None, None, None])
+        cities = FeatureColumns(['Inc_Muni'])
+        cities.append(1, [[(0, 0), (0, 100), (150, 100), (150, 0), (0, 0)]], ['CHATHAM'])
+        zipCodes = FeatureColumns(['ZipCode', 'ZipCode4'])
+        zipCodes.append(1, [[(-500, -500), (-500, 500), (500, 500), (500, -500), (-500, -500)]], ['62702', '0001'])
+        refresher = AddressOverlayRefresher(
+            CenterlineIndex(roads),
+            {'IncorporatedMunicipal': OverlayLayer(cities)},
+            ZipCodeService(OverlayLayer(zipCodes))
+        )
+        addresses = FeatureColumns(['St_Name', 'St_PosTyp'])
+        addresses.append(1, (50, -10), ['MAIN', 'ST'])
+        addresses.append(2, (110, 50), ['Oak', 'Ave'])
+        addresses.append(3, (300, 50), ['Elm', 'St'])
+        addresses.append(4, None, ['Main', 'St'])
+        columns = refresher.compute(addresses)
+        # Oak runs north, so the second address is on its right side
+        self.assertEqual(columns.ESN, ['101', '201', None, None])
+        self.assertEqual(columns.Inc_Muni, ['SPRINGFIELD', 'CHATHAM', 'UNINCORPORATED', None])
+        self.assertEqual(columns.Post_Code, ['62702', '62702', '62702', None])
+        self.assertEqual(columns.Post_Code4, ['0001', '0001', '0001', None])
+
+class TestOverlayCache(unittest.TestCase):
+
+    def test_lookup(self):
+        calls = []
+        def compute(x, y):
+            calls.append((x, y))
+            return len(calls)
+        signature = [(1, 10)]
+        cache = OverlayCache(gridSize=10, maxSize=2, checkInterval=0)
+        cache.check('ZipCodes', lambda: signature[0])
+        # coordinates in feet, the first two points snap to the same 10 foot cell
+        self.assertEqual([cache.lookup('ZipCodes', x, y, compute, FEET_TO_METERS) for x, y in [(101, 99), (103, 102), (150, 100)]], [1, 1, 2])
+        self.assertEqual(cache.lookup('ZipCodes', 101, 99, compute, FEET_TO_METERS, kind='other'), 3)
+        # the oldest cell was dropped
+        self.assertEqual(cache.lookup('ZipCodes', 101, 99, compute, FEET_TO_METERS), 4)
+        self.assertFalse(cache.check('ZipCodes', lambda: signature[0]))
+        signature[0] = (2, 11)
+        self.assertTrue(cache.check('ZipCodes', lambda: signature[0]))
+        self.assertEqual(cache.lookup('ZipCodes', 101, 99, compute, FEET_TO_METERS), 5)
+        self.assertEqual(len(calls), 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,315 @@
+import datetime
+import types
+import unittest
+from unittest import mock
+
+from test.arcpy_stub import ARCPY_STUB, FakeTable, FakeDatabase
+from ilng911.support.munch import Munch
+from ilng911.core.database import NG911Data, NG911LayerTypes
+from ilng911 import schemas
+from ilng911.admin import schemas as admin_schemas
+from ilng911.core.spatial_join import read_spatial_join_rules
+from ilng911.core import overlays
+from ilng911.core.overlays import OverlayCache, OverlayLayer, overlay_signature, get_overlay_cache, get_overlay_layer
+from ilng911.utils.columns import FeatureColumns
+from ilng911.core import validators, checkpoints, results
+from ilng911.core.results import ValidationResultSink
+from ilng911.core.checkpoints import get_checkpoint, save_checkpoint, clear_checkpoint
+
+ROADS = '/gdb/RoadCenterline'
+ADDRESSES = '/gdb/AddressPoints'
+LAST_YEAR = datetime.datetime.now() - datetime.timedelta(days=365)
+
+def make_road(x1: float, x2: float, **attrs) -> dict:
+    attrs.update({'SHAPE@': [[types.SimpleNamespace(X=x1, Y=0), types.SimpleNamespace(X=x2, Y=0)]], 'DateUpdate': LAST_YEAR})
+    return attrs
+
+def make_address(x: float, y: float, number: int, guid: str, street: str='Main', edited: datetime.datetime=LAST_YEAR) -> dict:
+    return {'SHAPE@XY': (x, y), 'Add_Number': number, 'St_Name': street, 'Site_NGUID': guid, 'DateUpdate': edited}
+
+class ValidationTablesTestCase(unittest.TestCase):
+    """runs the address validation against in memory tables"""
+
+    def setUp(self):
+        ARCPY_STUB.reset()
+        self.db = FakeDatabase(ARCPY_STUB, addressPoints=ADDRESSES, roadCenterlines=ROADS)
+        ARCPY_STUB.tables[ROADS] = FakeTable(shapeType='Polyline', rows=[
+            make_road(0, 1000, St_Name='Main', FromAddr_L=101, ToAddr_L=199, Parity_L='O', FromAddr_R=100, ToAddr_R=198, Parity_R='E')
+        ])
+        self.addresses = ARCPY_STUB.tables[ADDRESSES] = FakeTable(shapeType='Point', rows=[
+            make_address(100, 10, 101, 'SITE1@test.il.us'),
+            make_address(200, -10, 120, 'SITE2@test.il.us'),
+            make_address(300, 10, 131, 'SITE3@test.il.us'),
+        ])
+        for module in (validators, checkpoints, results):
+            patcher = mock.patch.object(module, 'get_ng911_db', return_value=self.db)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(validators, 'DataSchema', return_value=mock.Mock(agencyPrefix='SITE'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def table(self, name: str) -> FakeTable:
+        return ARCPY_STUB.tables[self.db.path(name)]
+
+    def pending_oids(self, run: Munch) -> list:
+        return [run.addresses.oids[i] for i in run.pending]
+
+@unittest.skipIf(ARCPY_STUB is None, 'uses the arcpy stand in')
+class TestIncrementalValidation(ValidationTablesTestCase):
+
+    def test_pending_rows(self):
+        validators.run_address_validation(processes=1)
+        self.assertEqual(sorted(self.table('ValidatedAddresses').values('POINT_OID')), [1, 2, 3])
+
+        # edit 2, add 4 with the same address as 3, leave 1 alone
+        self.addresses.rows[1].update(Add_Number=122, DateUpdate=datetime.datetime.now())
+        self.addresses.insert(make_address(300, 10, 131, 'SITE4@test.il.us', edited=None))
+        run = validators.prepare_address_validation()
+        self.assertEqual(self.pending_oids(run), [2, 3, 4])
+        self.assertEqual(run.deleted, set())
+
+        validators.run_address_validation(processes=1)
+        self.assertEqual(sorted(self.table('ValidatedAddresses').values('POINT_OID')), [1, 2, 3, 4])
+        flags = {r['POINT_OID']: r for r in self.table('AddressFlags').rows}
+        self.assertEqual((flags[3]['DUPLICATE_ADDRESS'], flags[4]['DUPLICATE_ADDRESS']), (1, 1))
+
+        # removing the duplicate clears the flag on the point that was not edited
+        self.addresses.rows.pop()
+        run = validators.prepare_address_validation()
+        self.assertEqual(self.pending_oids(run), [3])
+        self.assertEqual(run.deleted, {4})
+
+    def test_unchanged_tables_are_not_read(self):
+        validators.run_address_validation(processes=1)
+        ARCPY_STUB.cursors.clear()
+        run = validators.prepare_address_validation()
+        self.assertTrue(run.unchanged)
+        self.assertEqual(run.pending, [])
+        # only the single row signature reads of each table
+        self.assertLessEqual(ARCPY_STUB.cursors.count(('search', ADDRESSES)), 2)
+        self.assertLessEqual(ARCPY_STUB.cursors.count(('search', ROADS)), 2)
+        self.assertNotIn(('search', self.db.validatedAddresses), ARCPY_STUB.cursors)
+        self.assertEqual(list(validators.iter_address_validation(processes=1)), [])
+
+        # a full run still reads everything
+        self.assertFalse(validators.prepare_address_validation(incremental=False).unchanged)
+
+    def test_road_edits_validate_everything(self):
+        validators.run_address_validation(processes=1)
+        ARCPY_STUB.tables[ROADS].rows[0].update(ToAddr_L=151, DateUpdate=datetime.datetime.now())
+        self.assertEqual(self.pending_oids(validators.prepare_address_validation()), [1, 2, 3])
+
+    @mock.patch.object(validators, 'CHECKPOINT_RECORDS', 2)
+    def test_resume(self):
+        records = validators.iter_address_validation(processes=1, flush_size=1)
+        self.assertEqual([next(records).oid for _ in range(3)], [1, 2, 3])
+        # stopped after the checkpoint for the first 2 points, the 3rd was written on the way out
+        records.close()
+        self.assertEqual(get_checkpoint(validators.ADDRESS_VALIDATION_PROGRESS).LastOID, 2)
+        self.assertIsNone(get_checkpoint(validators.ADDRESS_VALIDATION_CHECKPOINT))
+
+        summary = validators.run_address_validation(processes=1, flush_size=1)
+        self.assertEqual(summary, Munch(validated=1, flagged=0))
+        # the point after the checkpoint replaced its earlier result
+        self.assertEqual(sorted(self.table('ValidatedAddresses').values('POINT_OID')), [1, 2, 3])
+        self.assertIsNone(get_checkpoint(validators.ADDRESS_VALIDATION_PROGRESS))
+        self.assertTrue(validators.prepare_address_validation().unchanged)
+
+    def test_checkpoints(self):
+        self.assertIsNone(get_checkpoint('Test'))
+        save_checkpoint('Test', 'abc', 10, 3, '3:10:None')
+        save_checkpoint('Other', 'def', 1, 1)
+        saved = save_checkpoint('Test', 'ghi', 20, 5, '5:20:None')
+        checkpoint = get_checkpoint('Test')
+        self.assertEqual((checkpoint.Digest, checkpoint.LastOID, checkpoint.RecordCount, checkpoint.Signature), ('ghi', 20, 5, '5:20:None'))
+        self.assertEqual(checkpoint.DateUpdate, saved.DateUpdate)
+        self.assertEqual(self.table('ValidationCheckpoints').values('Name'), ['Test', 'Other'])
+        clear_checkpoint('Test')
+        self.assertIsNone(get_checkpoint('Test'))
+        self.assertEqual(get_checkpoint('Other').Digest, 'def')
+
+@unittest.skipIf(ARCPY_STUB is None, 'uses the arcpy stand in')
+class TestValidationResultSink(ValidationTablesTestCase):
+
+    def test_flush_batches(self):
+        flagged = Munch(FLAG_COUNT=1, VALIDATION_SCORE=90, DUPLICATE_ADDRESS=1)
+        with ValidationResultSink(flushSize=4) as sink:
+            for oid in range(1, 11):
+                sink.add(f'SITE{oid}@test.il.us', oid, (oid, 0), flagged if oid % 2 else Munch(FLAG_COUNT=0), f'hash{oid}')
+            # two full flushes, the last 2 results are still buffered
+            self.assertEqual(len(sink), 2)
+            self.assertEqual(len(ARCPY_STUB.editors), 2)
+
+        # one edit session per flush, including the one on exit, and one InsertCursor per table in each
+        self.assertEqual(len(ARCPY_STUB.editors), 3)
+        for editor in ARCPY_STUB.editors:
+            self.assertEqual(editor.calls, ['startEditing', 'startOperation', 'stopOperation', 'stopEditing'])
+        self.assertEqual(ARCPY_STUB.cursors, [('insert', self.db.addressFlags), ('insert', self.db.validatedAddresses)] * 3)
+        self.assertEqual(self.table('ValidatedAddresses').values('POINT_OID'), list(range(1, 11)))
+        self.assertEqual(self.table('AddressFlags').values('POINT_OID'), [1, 3, 5, 7, 9])
+        self.assertEqual((sink.validatedCount, sink.flagCount), (10, 5))
+
+        # nothing buffered, nothing written
+        ARCPY_STUB.cursors.clear()
+        sink.flush()
+        self.assertEqual(ARCPY_STUB.cursors, [])
+
+    def write_one(self):
+        with ValidationResultSink() as sink:
+            sink.add('SITE1@test.il.us', 1, (1, 0), Munch(FLAG_COUNT=0), 'hash1')
+        self.assertEqual(self.table('ValidatedAddresses').values('POINT_OID'), [1])
+        return ARCPY_STUB.editors[0]
+
+    def test_failed_operation_closes_the_session(self):
+        ARCPY_STUB.editorErrors['startOperation'] = RuntimeError('cannot start operation')
+        with self.assertWarns(UserWarning):
+            editor = self.write_one()
+        # the session that was started is closed without saving, the rows are written without one
+        self.assertEqual(editor.calls, ['startEditing', 'startOperation', 'stopEditing'])
+        self.assertFalse(editor.isEditing)
+
+    def test_already_in_edit_session(self):
+        error = RuntimeError()
+        error.message = 'start edit session'
+        ARCPY_STUB.editorErrors['startEditing'] = error
+        with mock.patch('warnings.warn') as warn:
+            editor = self.write_one()
+        warn.assert_not_called()
+        self.assertEqual(editor.calls, ['startEditing'])
+
+@unittest.skipIf(ARCPY_STUB is None, 'uses the arcpy stand in')
+class TestCommitFeatures(unittest.TestCase):
+
+    def setUp(self):
+        ARCPY_STUB.reset()
+        for name, value in [('is_arc', False), ('resolve_locations', mock.Mock()), ('copy_schema', mock.Mock())]:
+            patcher = mock.patch.object(schemas, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def commit(self, name: str, table: str, guidField: str) -> int:
+        """commits one new feature through a stand in for a DataSchema"""
+        ARCPY_STUB.tables[table] = FakeTable(fields=['St_Name', guidField])
+        feature = types.SimpleNamespace(attributes={'St_Name': 'Main'}, geometry=None)
+        schema = types.SimpleNamespace(
+            name=name, table=table, oidField='OBJECTID', nenaIdentifier=guidField,
+            fields=[types.SimpleNamespace(name='St_Name', editable=True)], _features=[feature], _commited=[],
+            _schema=types.SimpleNamespace(layer=name), ng911_db=mock.Mock(), create_identifier=lambda: 'NEW1@test.il.us'
+        )
+        count = schemas.DataSchema.commit_features(schema)
+        self.assertEqual(ARCPY_STUB.tables[table].values(guidField), ['NEW1@test.il.us'])
+        return count
+
+    @mock.patch('ilng911.core.bulk.clear_bulk_validator')
+    @mock.patch('ilng911.core.centerlines.update_centerline_index')
+    def test_centerline_index_is_updated(self, update_centerline_index, clear_bulk_validator):
+        self.assertEqual(self.commit(NG911LayerTypes.ROAD_CENTERLINE, ROADS, 'RCL_NGUID'), 1)
+        update_centerline_index.assert_called_once_with()
+        clear_bulk_validator.assert_called_once_with()
+
+    @mock.patch('ilng911.core.reverse.update_reverse_geocoder')
+    @mock.patch('ilng911.core.centerlines.update_centerline_index')
+    def test_reverse_geocoder_is_updated(self, update_centerline_index, update_reverse_geocoder):
+        self.assertEqual(self.commit(NG911LayerTypes.ADDRESS_POINTS, ADDRESSES, 'Site_NGUID'), 1)
+        update_reverse_geocoder.assert_called_once_with()
+        update_centerline_index.assert_not_called()
+
+@unittest.skipIf(ARCPY_STUB is None, 'uses the arcpy stand in')
+class TestSpatialJoinRegistration(unittest.TestCase):
+
+    def setUp(self):
+        ARCPY_STUB.reset()
+        self.db = FakeDatabase(ARCPY_STUB)
+        # read_spatial_join_rules() imports get_ng911_db when it runs
+        for target in ('ilng911.admin.schemas.get_ng911_db', 'ilng911.env.get_ng911_db'):
+            patcher = mock.patch(target, return_value=self.db)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.features = ARCPY_STUB.tables[self.db.path('SpatialJoinFeatures')] = FakeTable(rows=[dict(Path='/a.gdb/./ESB', TableName='ESB')])
+
+    def test_register(self):
+        admin_schemas.register_spatial_join_fields('ADDRESS_POINTS', 'ESN', '/a.gdb/ESB', ['ESN'])
+        # the same path written another way is the same table, the path is updated in place
+        self.assertEqual([(r['Path'], r['TableName']) for r in self.features.rows], [('/a.gdb/ESB', 'ESB')])
+
+        # a table with the same name in another workspace is a different table
+        admin_schemas.register_spatial_join_fields('ADDRESS_POINTS', 'MSAGComm', '/b.gdb/ESB', ['MSAG'])
+        admin_schemas.register_spatial_join_fields('ADDRESS_POINTS', 'ESN', '/a.gdb/ESB', ['ESN', 'ESN_ALT'])
+        self.assertEqual([(r['Path'], r['TableName']) for r in self.features.rows], [('/a.gdb/ESB', 'ESB'), ('/b.gdb/ESB', 'ESB_2')])
+
+        rules = read_spatial_join_rules('ADDRESS_POINTS')
+        self.assertEqual(
+            [(r.TargetField, r.JoinField, r.Path) for r in rules],
+            [('ESN', 'ESN', '/a.gdb/ESB'), ('MSAGComm', 'MSAG', '/b.gdb/ESB'), ('ESN', 'ESN_ALT', '/a.gdb/ESB')]
+        )
+
+@unittest.skipIf(ARCPY_STUB is None, 'uses the arcpy stand in')
+class TestOverlaySignature(unittest.TestCase):
+
+    def setUp(self):
+        ARCPY_STUB.reset()
+        self.esb = ARCPY_STUB.tables['/gdb/ESB'] = FakeTable(shapeType='Polygon', rows=[
+            {'ESN': '100', 'DateUpdate': LAST_YEAR},
+            {'ESN': '200', 'DateUpdate': LAST_YEAR},
+        ])
+
+    def test_edits_in_place(self):
+        cache = OverlayCache(checkInterval=0)
+        signature = lambda: overlay_signature('/gdb/ESB')
+        cache.check('ESB', signature)
+        ARCPY_STUB.cursors.clear()
+        self.assertFalse(cache.check('ESB', signature))
+        # the latest edit date and highest OBJECTID are single row reads, the table is not scanned
+        self.assertEqual(ARCPY_STUB.cursors, [('search', '/gdb/ESB')] * 2)
+
+        # an attribute edited in place with the same row count
+        self.esb.rows[1].update(ESN='300', DateUpdate=datetime.datetime.now())
+        self.assertTrue(cache.check('ESB', signature))
+        self.assertFalse(cache.check('ESB', signature))
+        # a polygon that is added
+        self.esb.insert({'ESN': '400', 'DateUpdate': LAST_YEAR})
+        self.assertTrue(cache.check('ESB', signature))
+        self.assertEqual(cache.states['ESB'].generation, 2)
+
+    def test_fallback_zip_codes_not_checked(self):
+        zipCodes = FeatureColumns([overlays.FALLBACK_ZIP_CODE_FIELD])
+        layer = OverlayLayer(zipCodes, overlays.FALLBACK_ZIP_CODES)
+        layer.requestedFields = [overlays.FALLBACK_ZIP_CODE_FIELD]
+        with mock.patch.dict(overlays._overlayLayers, {overlays.FALLBACK_ZIP_CODES: layer}):
+            self.assertIs(get_overlay_layer(overlays.FALLBACK_ZIP_CODES, [overlays.FALLBACK_ZIP_CODE_FIELD]), layer)
+        self.assertEqual(ARCPY_STUB.cursors, [])
+        self.assertNotIn(overlays.FALLBACK_ZIP_CODES, get_overlay_cache().states)
+
+@unittest.skipIf(ARCPY_STUB is None, 'uses the arcpy stand in')
+class TestNenaIdentifierTables(unittest.TestCase):
+
+    def setUp(self):
+        ARCPY_STUB.reset()
+
+    def test_audit_nena_identifiers(self):
+        ARCPY_STUB.tables['/gdb/AddressPoints'] = FakeTable(rows=[
+            dict(Site_NGUID='SITE1@test.il.us'), dict(Site_NGUID='SITE4@test.il.us'),
+            dict(Site_NGUID='SITE4@test.il.us'), dict(Site_NGUID=None), dict(Site_NGUID='SITE@test.il.us')
+        ])
+        ARCPY_STUB.tables['/gdb/RoadCenterline'] = FakeTable(rows=[dict(RCL_NGUID='RCL7@test.il.us'), dict(RCL_NGUID='RCL2@test.il.us')])
+        db = mock.Mock(agencyID='test.il.us')
+        db.get_911_features.return_value = [
+            Munch(FeatureType='ADDRESS_POINTS', Path='/gdb/AddressPoints', GUID_Field='Site_NGUID', NENA_PREFIX='SITE'),
+            Munch(FeatureType='ROAD_CENTERLINE', Path='/gdb/RoadCenterline', GUID_Field='RCL_NGUID', NENA_PREFIX='RCL'),
+            Munch(FeatureType='PSAP', Path='/gdb/PSAP', GUID_Field=None, NENA_PREFIX='PSAP'),
+        ]
+        audits = NG911Data.audit_nena_identifiers(db)
+        self.assertEqual(sorted(audits), ['ADDRESS_POINTS', 'ROAD_CENTERLINE'])
+        sites, roads = audits['ADDRESS_POINTS'], audits['ROAD_CENTERLINE']
+        self.assertEqual(sites.duplicateOids, {2, 3})
+        self.assertEqual(sites.nulls, [4])
+        self.assertEqual(sites.malformed, [5])
+        self.assertEqual((sites.nextId, roads.nextId), (5, 8))
+        self.assertEqual(roads.summary().duplicates, 0)
+        # one scan of each table
+        self.assertEqual(ARCPY_STUB.cursors, [('search', '/gdb/AddressPoints'), ('search', '/gdb/RoadCenterline')])
+        self.assertEqual(NG911Data.audit_nena_identifiers(db, ['ROAD_CENTERLINE']).keys(), {'ROAD_CENTERLINE'})
+
+if __name__ == '__main__':
+    unittest.main()